@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: motores de inferencia del análisis '5 Por Qué'.
+
+Para cada motor mide el tiempo de carga del modelo, los tokens/s de la
+generación y la latencia completa de AccidentAnalyzer.analyze_5whys
+(prompt, generación y parseo).
+
+Uso:
+    python bench_accident_backends.py [--backend NOMBRE[=RUTA] ...] [--repeat N]
+                                      [--cpu-quantization bf16|int8|int4 ...]
+
+Sin --backend se miden el modelo sustituto ('stub'), el modelo diminuto de
+pesos aleatorios ('tiny', generación real sin los pesos de 7B) y el motor
+configurado en Config.get_model_config() (SGSST_MODEL_BACKEND / SGSST_MODEL_PATH).
+Cada motor que admite cuantización en CPU se mide con cada --cpu-quantization
+(por defecto, la configurada).
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from accident_config import Config  # noqa: E402
+from accident_llm import BACKENDS, CPU_QUANTIZATIONS, AccidentAnalyzer  # noqa: E402
+
+DESCRIPCION = (
+    "El trabajador se encontraba descargando cajas del camión cuando resbaló en la rampa "
+    "de acceso, que estaba mojada, y cayó sobre el brazo derecho."
+)
+
+
+def parse_backend(value):
+    name, _, model_path = value.partition("=")
+    return name, model_path or None
+
+
+def bench(name, model_path, cpu_quantization, repeat):
+    start = time.perf_counter()
+    # Los mensajes de carga de los motores van a stderr; no interesan aquí.
+    with contextlib.redirect_stderr(io.StringIO()):
+        analyzer = AccidentAnalyzer(backend=name, model_path=model_path, result_cache=False,
+                                    cpu_quantization=cpu_quantization)
+    load = time.perf_counter() - start
+
+    latencies, rates = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        analyzer.analyze_5whys(DESCRIPCION)
+        latencies.append(time.perf_counter() - start)
+        stats = analyzer.last_generation
+        if stats and stats["seconds"] > 0:
+            rates.append(stats["tokens"] / stats["seconds"])
+    return load, statistics.median(rates) if rates else 0.0, statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", action="append", type=parse_backend,
+                        help="Motor a medir, opcionalmente con la ruta del modelo (p. ej. onnx=C:/modelos/mistral-onnx-int8).")
+    parser.add_argument("--repeat", type=int, default=3, help="Análisis por motor.")
+    parser.add_argument("--cpu-quantization", action="append", choices=CPU_QUANTIZATIONS,
+                        help="Pesos en CPU de los motores que lo admiten (transformers, tiny).")
+    args = parser.parse_args()
+
+    configured = Config.get_model_config()
+    backends = args.backend or [("stub", None), ("tiny", None), (configured["backend"], configured["path"])]
+    quantizations = args.cpu_quantization or [configured["cpu_quantization"]]
+
+    print(f"{'motor':<20} {'carga s':>9} {'tokens/s':>10} {'analyze_5whys s':>16}")
+    for name, model_path in backends:
+        quantized = name in BACKENDS and BACKENDS[name].supports_cpu_quantization
+        for cpu_quantization in quantizations if quantized else [None]:
+            label = f"{name} ({cpu_quantization})" if cpu_quantization else name
+            try:
+                load, rate, latency = bench(name, model_path, cpu_quantization, args.repeat)
+            except Exception as e:
+                print(f"{label:<20} no disponible: {e}")
+                continue
+            print(f"{label:<20} {load:>9.2f} {rate:>10.1f} {latency:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: análisis '5 Por Qué' de varios accidentes, uno por uno y en lotes.
+
+Analiza N descripciones primero con analyze_5whys (una llamada a generate()
+por accidente) y después con analyze_batch para cada presupuesto de memoria
+indicado. Informa el tiempo total, los tokens/s y los tamaños de lote que
+eligió plan_batches. Ambos modos usan generación libre con parada temprana
+y sin caché de resultados.
+
+Uso:
+    python bench_accident_batch.py [--backend NOMBRE] [--model-path RUTA]
+                                   [--count N] [--memory-mb MB ...] [--max-batch N]
+
+Con --backend tiny el lote recorre generate_batch de TransformersBackend sin
+los pesos de 7B (modelo diminuto de pesos aleatorios).
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from accident_llm import AccidentAnalyzer  # noqa: E402
+
+DESCRIPCIONES = [
+    "El trabajador resbaló en la rampa mojada mientras descargaba cajas del camión.",
+    "Al cortar una lámina con la pulidora, el disco se fracturó y golpeó la mano izquierda del operario.",
+    "La auxiliar de aseo sufrió una quemadura química al mezclar dos productos de limpieza sin guantes.",
+    "El operario de montacargas atropelló el pie de un compañero al retroceder en el pasillo de bodega.",
+    "Un electricista recibió una descarga al manipular un tablero que no había sido desenergizado.",
+    "La secretaria tropezó con un cable de extensión atravesado en la oficina y se torció el tobillo.",
+    "Un soldador presentó irritación ocular por proyección de escoria al retirar la careta antes de tiempo.",
+    "El ayudante de obra cayó desde la segunda sección del andamio, que no tenía barandas.",
+]
+
+
+def sequential(analyzer, corpus):
+    tokens = 0
+    start = time.perf_counter()
+    for descripcion in corpus:
+        analyzer.analyze_5whys(descripcion)
+        tokens += analyzer.last_generation["tokens"]
+    return time.perf_counter() - start, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=None, help="Motor de inferencia (por defecto, el configurado).")
+    parser.add_argument("--model-path", default=None, help="Ruta del modelo (por defecto, la configurada).")
+    parser.add_argument("--count", type=int, default=12, help="Accidentes a analizar.")
+    parser.add_argument("--memory-mb", type=float, action="append",
+                        help="Presupuesto de caché K/V por lote (se puede repetir). Por defecto, el configurado.")
+    parser.add_argument("--max-batch", type=int, default=None, help="Accidentes por lote como máximo.")
+    args = parser.parse_args()
+
+    corpus = list(itertools.islice(itertools.cycle(DESCRIPCIONES), args.count))
+    with contextlib.redirect_stderr(io.StringIO()):
+        analyzer = AccidentAnalyzer(backend=args.backend, model_path=args.model_path, structured=False,
+                                    result_cache=False, max_batch_size=args.max_batch)
+    print(f"Motor: {analyzer.backend_name}  accidentes: {len(corpus)}  "
+          f"K/V: {analyzer.backend.kv_bytes_per_token() / 1024:.0f} KB/token")
+    print(f"{'modo':<22} {'total s':>9} {'tokens/s':>10}  lotes")
+
+    with contextlib.redirect_stderr(io.StringIO()):
+        seconds, tokens = sequential(analyzer, corpus)
+    print(f"{'uno por uno':<22} {seconds:>9.2f} {tokens / seconds if seconds else 0:>10.1f}  {[1] * len(corpus)}")
+
+    for memory_mb in args.memory_mb or [analyzer.batch_memory_mb]:
+        analyzer.batch_memory_mb = memory_mb
+        with contextlib.redirect_stderr(io.StringIO()):
+            analyzer.analyze_batch(corpus)
+        stats = analyzer.last_batch
+        print(f"{f'lotes ({memory_mb:.0f} MB)':<22} {stats['seconds']:>9.2f} {stats['tokens_per_second']:>10.1f}  {stats['batches']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: arranque en frío de cada acción del flujo de accidentes.
+
+Cada acción se mide en un intérprete nuevo que importa exactamente los
+módulos que carga su ruta de código (accident_processor extract/analyze,
+accident_config --get-config, accident_report_generator y la interfaz de
+Invest_APP_V_3). Se informa la mediana del tiempo hasta terminar las
+importaciones y el pico de memoria residente (RSS) del proceso.
+
+Uso:
+    python bench_accident_cold_start.py [--repeat N]
+
+Las acciones cuyas dependencias no están instaladas se marcan como tales.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+ACTIONS = {
+    "python (referencia)": [],
+    "--get-config": ["accident_config"],
+    "extract": ["accident_processor", "accident_extraction"],
+    "report": ["accident_report_generator"],
+    "analyze": ["accident_processor", "accident_llm"],
+    "interfaz (Invest_APP_V_3)": ["Invest_APP_V_3"],
+}
+
+# Se ejecuta en el proceso hijo: importa los módulos y reporta tiempo y pico de RSS.
+CHILD = r"""
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, SRC_DIR)
+error = None
+try:
+    for name in MODULES:
+        __import__(name)
+except ImportError as e:
+    error = str(e)
+elapsed = time.perf_counter() - start
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                             ctypes.byref(counters), counters.cb)
+    peak = counters.PeakWorkingSetSize
+else:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak *= 1 if sys.platform == "darwin" else 1024
+
+print(json.dumps({"elapsed": elapsed, "peak_rss": peak, "error": error}))
+"""
+
+
+def run_child(modules):
+    code = f"SRC_DIR = {str(SRC_DIR)!r}\nMODULES = {modules!r}\n" + CHILD
+    # cwd en src, como lo lanza main.js (Invest_APP_V_3 escribe su log ahí).
+    wall_start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - wall_start
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    result["wall"] = wall
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por acción.")
+    args = parser.parse_args()
+
+    print(f"{'acción':<28} {'importación ms':>15} {'proceso ms':>11} {'pico RSS MB':>12}")
+    for action, modules in ACTIONS.items():
+        runs = [run_child(modules) for _ in range(args.repeat)]
+        if runs[0]["error"]:
+            print(f"{action:<28} {'no instalado: ' + runs[0]['error']}")
+            continue
+        imports = statistics.median(r["elapsed"] for r in runs) * 1000
+        wall = statistics.median(r["wall"] for r in runs) * 1000
+        peak = max(r["peak_rss"] for r in runs) / (1024 * 1024)
+        print(f"{action:<28} {imports:>15.1f} {wall:>11.1f} {peak:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: caché K/V del prefijo fijo del prompt '5 Por Qué'.
+
+Carga el modelo una vez y mide, para varias descripciones de accidente, el
+tiempo hasta el primer token (TTFT) y la latencia total de
+AccidentAnalyzer.analyze_5whys con la caché de PROMPT_RULES y sin ella
+(prefill completo). La decodificación es greedy y corta (--max-new-tokens)
+para que la diferencia refleje el prefill.
+
+Uso:
+    python bench_accident_prefix_cache.py [--backend NOMBRE] [--model-path RUTA]
+                                          [--max-new-tokens N] [--repeat N]
+
+Solo los motores con supports_prefix_cache (transformers, tiny) admiten la
+caché. Con --backend tiny se mide sin los pesos de 7B (modelo diminuto de
+pesos aleatorios: los tiempos son del camino de generación, no del modelo real).
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+import accident_llm  # noqa: E402
+from accident_llm import AccidentAnalyzer  # noqa: E402
+
+DESCRIPCIONES = [
+    "El trabajador resbaló en la rampa mojada mientras descargaba cajas del camión.",
+    "Al cortar una lámina con la pulidora, el disco se fracturó y golpeó la mano izquierda del operario.",
+    "La auxiliar de aseo sufrió una quemadura química al mezclar dos productos de limpieza sin guantes.",
+]
+
+
+def measure(analyzer, repeat):
+    ttfts, totals = [], []
+    for _ in range(repeat):
+        for descripcion in DESCRIPCIONES:
+            analyzer.analyze_5whys(descripcion)
+            stats = analyzer.last_generation
+            totals.append(stats["seconds"])
+            if stats.get("ttft") is not None:
+                ttfts.append(stats["ttft"])
+    return (statistics.median(ttfts) if ttfts else float("nan")), statistics.median(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=None, help="Motor de inferencia (por defecto, el configurado).")
+    parser.add_argument("--model-path", default=None, help="Ruta del modelo (por defecto, la configurada).")
+    parser.add_argument("--max-new-tokens", type=int, default=32, help="Tokens generados por análisis.")
+    parser.add_argument("--repeat", type=int, default=2, help="Repeticiones de cada descripción.")
+    args = parser.parse_args()
+
+    accident_llm.GENERATION_KWARGS.update(max_new_tokens=args.max_new_tokens, do_sample=False, temperature=None)
+
+    with contextlib.redirect_stderr(io.StringIO()):
+        analyzer = AccidentAnalyzer(backend=args.backend, model_path=args.model_path, result_cache=False)
+    backend = analyzer.backend
+    if not backend.supports_prefix_cache or backend.prefix_cache is None:
+        sys.exit(f"El motor '{analyzer.backend_name}' no tiene caché de prefijo.")
+
+    print(f"Motor: {analyzer.backend_name}  prefijo: {len(backend.prefix_ids)} tokens  "
+          f"descripciones: {len(DESCRIPCIONES)} x {args.repeat}")
+    print(f"{'modo':<18} {'TTFT s':>8} {'total s':>8}")
+
+    cached = measure(analyzer, args.repeat)
+    prefix_cache, backend.prefix_cache = backend.prefix_cache, None
+    full = measure(analyzer, args.repeat)
+    backend.prefix_cache = prefix_cache
+
+    print(f"{'prefijo en caché':<18} {cached[0]:>8.3f} {cached[1]:>8.3f}")
+    print(f"{'prefill completo':<18} {full[0]:>8.3f} {full[1]:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: parada temprana y decodificación guiada del análisis '5 Por Qué'.
+
+Sobre un corpus de descripciones de accidentes compara tres modos de
+AccidentAnalyzer.analyze_5whys:
+
+    libre             generación sin restricciones hasta max_new_tokens o EOS
+    parada temprana   se detiene al completar la línea 'Material' del nivel 5
+    guiado            el formato (5 niveles x 5M) lo inserta la plantilla y el
+                      modelo solo completa cada línea (TEMPLATE_SEGMENTS)
+
+Para cada modo informa la media de tokens generados, la latencia media y la
+tasa de fallos de parseo: análisis con algún nivel que no se encontró en la
+respuesta (o el análisis de respaldo tras un error).
+
+Uso:
+    python bench_accident_structured.py [--backend NOMBRE] [--model-path RUTA]
+                                        [--corpus ARCHIVO] [--repeat N]
+
+--corpus es un archivo de texto con una descripción por línea. El modo guiado
+solo se mide con motores que tienen supports_structured_decoding (transformers,
+tiny). Con el modelo diminuto ('tiny') el texto es aleatorio: los fallos de
+parseo de los modos libres son esperables; sirve para medir tokens y latencia
+sin los pesos de 7B.
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from accident_llm import AccidentAnalyzer  # noqa: E402
+
+DESCRIPCIONES = [
+    "El trabajador resbaló en la rampa mojada mientras descargaba cajas del camión.",
+    "Al cortar una lámina con la pulidora, el disco se fracturó y golpeó la mano izquierda del operario.",
+    "La auxiliar de aseo sufrió una quemadura química al mezclar dos productos de limpieza sin guantes.",
+    "El operario de montacargas atropelló el pie de un compañero al retroceder en el pasillo de bodega.",
+    "Un electricista recibió una descarga al manipular un tablero que no había sido desenergizado.",
+    "La secretaria tropezó con un cable de extensión atravesado en la oficina y se torció el tobillo.",
+    "Un soldador presentó irritación ocular por proyección de escoria al retirar la careta antes de tiempo.",
+    "El ayudante de obra cayó desde la segunda sección del andamio, que no tenía barandas.",
+]
+
+# (nombre, structured, early_stop)
+MODES = [
+    ("libre", False, False),
+    ("parada temprana", False, True),
+    ("guiado", True, True),
+]
+
+FAILED_CAUSES = ("Análisis no generado", "Análisis no disponible")
+
+
+def parse_failed(analysis):
+    return any(level["causa"] in FAILED_CAUSES for level in analysis.values())
+
+
+def measure(analyzer, corpus, repeat):
+    tokens, seconds, failures = [], [], 0
+    for _ in range(repeat):
+        for descripcion in corpus:
+            analyzer.last_generation = None
+            analysis = analyzer.analyze_5whys(descripcion)
+            failures += parse_failed(analysis)
+            stats = analyzer.last_generation
+            if stats:
+                tokens.append(stats["tokens"])
+                seconds.append(stats["seconds"])
+    runs = len(corpus) * repeat
+    return (statistics.mean(tokens) if tokens else float("nan"),
+            statistics.mean(seconds) if seconds else float("nan"),
+            failures / runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=None, help="Motor de inferencia (por defecto, el configurado).")
+    parser.add_argument("--model-path", default=None, help="Ruta del modelo (por defecto, la configurada).")
+    parser.add_argument("--corpus", type=Path, default=None, help="Archivo con una descripción por línea.")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones del corpus por modo.")
+    args = parser.parse_args()
+
+    corpus = DESCRIPCIONES
+    if args.corpus:
+        corpus = [line.strip() for line in args.corpus.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    # Los mensajes de carga y el log del parseo no interesan aquí.
+    with contextlib.redirect_stderr(io.StringIO()):
+        analyzer = AccidentAnalyzer(backend=args.backend, model_path=args.model_path, result_cache=False)
+    print(f"Motor: {analyzer.backend_name}  descripciones: {len(corpus)} x {args.repeat}")
+    print(f"{'modo':<16} {'tokens':>8} {'latencia s':>11} {'fallos parseo':>14}")
+
+    for name, structured, early_stop in MODES:
+        if structured and not analyzer.backend.supports_structured_decoding:
+            print(f"{name:<16} no disponible en el motor '{analyzer.backend_name}'")
+            continue
+        analyzer.structured, analyzer.early_stop = structured, early_stop
+        with contextlib.redirect_stderr(io.StringIO()):
+            tokens, seconds, failure_rate = measure(analyzer, corpus, args.repeat)
+        print(f"{name:<16} {tokens:>8.1f} {seconds:>11.3f} {failure_rate:>13.1%}")
+
+
+if __name__ == "__main__":
+    main()
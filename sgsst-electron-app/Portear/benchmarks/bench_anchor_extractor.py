@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: reglas genéricas con re.search secuencial vs AnchorExtractor.
+
+Genera certificados sintéticos de varias páginas (certificado + anexos de
+laboratorio), verifica que ambos métodos devuelven exactamente los mismos
+valores y compara el tiempo de extracción.
+
+Uso:
+    python bench_anchor_extractor.py [--pages 1 10 40 100] [--repeat 20]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from anchor_extractor import AnchorExtractor, DEFAULT_FLAGS  # noqa: E402
+from extraction_rules import REGISTRY  # noqa: E402
+
+GENERIC_EXTRACTION_RULES = REGISTRY.get('formato_generico').fields
+
+CERTIFICADO = """CERTIFICADO DE APTITUD LABORAL
+PACIENTE: JUAN CARLOS PEREZ GOMEZ
+DOCUMENTO : CC 1234567890 Fecha Nac: 12/05/1990 Edad: 34 Sexo: MASCULINO
+Afiliación: TEMPOACTIVA S.A.S. Estado civil: SOLTERO
+Ocupacion: OPERARIO
+TIPO DE EVALUACIÓN REALIZADA: INGRESO Fecha de atención: 15/08/2025
+Cargo: AUXILIAR DE BODEGA Fecha de ingreso: 01/08/2025
+EXÁMENES REALIZADOS: AUDIOMETRIA, OPTOMETRIA, ESPIROMETRIA
+RECOMENDACIONES LABORALES: USO DE ELEMENTOS DE PROTECCION PERSONAL
+PAUSAS ACTIVAS CADA DOS HORAS
+{manejo}Incluir SVE: OSTEOMUSCULAR
+RESTRICCIONES LABORALES: NO LEVANTAR MAS DE 25 KG
+CONCEPTO: APTO
+Concepto Medico: APTO CON RECOMENDACIONES
+Concepto Manipulación Alimento: NO APLICA
+Concepto Altura: APTO
+Concepto de trabajo en espacios confinados: NO APLICA
+MOTIVO DE RESTRICCIÓN: NINGUNO
+FIRMA MEDICO
+"""
+
+ANEXO = """Página {n} de {total}
+RESULTADO DE LABORATORIO {n}
+Hemograma tipo IV: hemoglobina 14.2 g/dl hematocrito 42 % leucocitos 7200
+Glicemia basal 92 mg/dl colesterol total 180 mg/dl trigliceridos 140 mg/dl
+Observaciones del bacteriologo sin hallazgos relevantes para la aptitud laboral
+""" * 3
+
+
+def build_text(pages, with_manejo):
+    manejo = "MANEJO EPS/ARL: NO\n" if with_manejo else ""
+    text = CERTIFICADO.format(manejo=manejo)
+    return text + "".join(ANEXO.format(n=n, total=pages) for n in range(2, pages + 1))
+
+
+def legacy_extract(rules, text):
+    data = {}
+    for key, rule in rules.items():
+        match = re.search(rule['pattern'], text, DEFAULT_FLAGS)
+        data[key] = next((g for g in match.groups() if g is not None), "") if match else None
+    return data
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 40, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    extractor = AnchorExtractor(GENERIC_EXTRACTION_RULES)
+    print(f"{'páginas':>8} {'MANEJO':>7} {'caracteres':>11} {'re.search':>11} {'anclas':>10} {'mejora':>7}")
+    for pages in args.pages:
+        for with_manejo in (True, False):
+            text = build_text(pages, with_manejo)
+            legacy_time, legacy = timeit(lambda: legacy_extract(GENERIC_EXTRACTION_RULES, text), args.repeat)
+            anchor_time, anchored = timeit(lambda: extractor.extract(text), args.repeat)
+            if legacy != anchored:
+                diff = {k: (legacy[k], anchored[k]) for k in legacy if legacy[k] != anchored[k]}
+                sys.exit(f"Los resultados difieren con {pages} páginas: {diff}")
+            print(f"{pages:>8} {'sí' if with_manejo else 'no':>7} {len(text):>11} "
+                  f"{legacy_time * 1000:>8.2f} ms {anchor_time * 1000:>7.2f} ms {legacy_time / anchor_time:>6.1f}x")
+    print("Resultados idénticos en todos los casos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: envío de N correos de remisión contra un servidor SMTP local.
+
+Levanta un servidor SMTP mínimo en 127.0.0.1 (EHLO, AUTH, MAIL, RCPT, DATA)
+que simula la latencia del saludo con Gmail (conexión, STARTTLS y login) y
+mide:
+
+    por mensaje     una conexión, login y quit por correo (como
+                    EmailSender.enviar_correo antes)
+    sesión          BulkMailer con una sesión por cuenta
+    con cortes      BulkMailer con un servidor que cierra la conexión cada K
+                    mensajes; los envíos se reconectan sin perder correos
+    con límite      BulkMailer con un límite de R mensajes por minuto
+
+Informa mensajes/s, conexiones abiertas y correos recibidos por el servidor.
+
+Uso:
+    python bench_bulk_mailer.py [--messages N] [--handshake-ms MS] [--drop-every K] [--rate R]
+"""
+import argparse
+import socketserver
+import sys
+import threading
+import time
+import smtplib
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email import encoders
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from bulk_mailer import BulkMailer, SmtpSettings  # noqa: E402
+
+CREDENCIALES = {"email": "remisiones@example.com", "password": "clave"}
+
+
+class StandInSmtp(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay=0.0, drop_every=0):
+        super().__init__(("127.0.0.1", 0), _SmtpHandler)
+        self.handshake_delay = handshake_delay
+        self.drop_every = drop_every
+        self.received = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, text):
+        self.wfile.write(text.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake_delay)  # TCP + TLS
+        self.reply("220 standin ESMTP")
+        messages = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-standin\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+            elif verb == "AUTH":
+                time.sleep(server.handshake_delay)
+                if command.upper().startswith("AUTH LOGIN"):
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 2.7.0 Accepted")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                messages += 1
+                with server.lock:
+                    server.received += 1
+                self.reply("250 OK queued")
+                if server.drop_every and messages % server.drop_every == 0:
+                    return
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def build_message(i, attachment):
+    msg = MIMEMultipart()
+    msg["From"] = CREDENCIALES["email"]
+    msg["To"] = f"trabajador{i}@example.com"
+    msg["Subject"] = "Remisión EPS"
+    msg.attach(MIMEText(f"Cordial saludo, trabajador {i}.", "plain", "utf-8"))
+    parte = MIMEBase("application", "octet-stream")
+    parte.set_payload(attachment)
+    encoders.encode_base64(parte)
+    parte.add_header("Content-Disposition", "attachment; filename= remision.docx")
+    msg.attach(parte)
+    return msg
+
+
+def per_message(server, messages):
+    start = time.perf_counter()
+    for i, msg in enumerate(messages):
+        with smtplib.SMTP("127.0.0.1", server.port) as smtp:
+            smtp.login(CREDENCIALES["email"], CREDENCIALES["password"])
+            smtp.send_message(msg, CREDENCIALES["email"], msg["To"])
+    return time.perf_counter() - start, len(messages)
+
+
+def with_mailer(server, messages, rate=0):
+    settings = SmtpSettings(host="127.0.0.1", port=server.port, starttls=False, timeout=10)
+    mailer = BulkMailer(settings, rate_per_minute=rate, backoff=0.05)
+    for i, msg in enumerate(messages):
+        mailer.enqueue(CREDENCIALES, msg, msg["To"], key=i)
+    report = mailer.run()
+    mailer.close()
+    return report["seconds"], report["sent"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50, help="Correos por medición.")
+    parser.add_argument("--handshake-ms", type=float, default=150, help="Latencia simulada de conexión y de login.")
+    parser.add_argument("--drop-every", type=int, default=10, help="El servidor corta la sesión cada K mensajes.")
+    parser.add_argument("--rate", type=float, default=300, help="Límite por minuto de la medición con límite.")
+    parser.add_argument("--attachment-kb", type=int, default=60, help="Tamaño del adjunto.")
+    args = parser.parse_args()
+
+    attachment = bytes(range(256)) * (args.attachment_kb * 4)
+    messages = [build_message(i, attachment) for i in range(args.messages)]
+    delay = args.handshake_ms / 1000
+    print(f"Correos: {args.messages}  adjunto: {args.attachment_kb} KB  saludo: {args.handshake_ms:.0f} ms x 2")
+    print(f"{'modo':<14} {'total s':>9} {'msj/s':>8} {'conexiones':>11} {'recibidos':>10}")
+
+    runs = [
+        ("por mensaje", dict(), lambda s: per_message(s, messages)),
+        ("sesión", dict(), lambda s: with_mailer(s, messages)),
+        ("con cortes", dict(drop_every=args.drop_every), lambda s: with_mailer(s, messages)),
+        ("con límite", dict(), lambda s: with_mailer(s, messages, rate=args.rate)),
+    ]
+    for name, options, run in runs:
+        server = StandInSmtp(handshake_delay=delay, **options)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            seconds, sent = run(server)
+        finally:
+            server.shutdown()
+            server.server_close()
+        status = "" if server.received == args.messages else f"  ¡faltan {args.messages - server.received}!"
+        print(f"{name:<14} {seconds:>9.2f} {sent / seconds:>8.1f} {server.connections:>11} {server.received:>10}{status}")
+
+
+if __name__ == "__main__":
+    main()
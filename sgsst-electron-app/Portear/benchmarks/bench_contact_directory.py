@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: búsqueda de contactos en la base de personal.
+
+Genera una base de N filas con las columnas habituales de la hoja COMPLETO
+y mide:
+
+    pandas (anterior)   pd.read_excel de la hoja completa y comparación de
+                        la cédula contra todas las filas, por cada búsqueda
+    carga               primera lectura de ContactDirectory (solo cédula,
+                        celular y correo)
+    búsqueda            coste medio de lookup() con el directorio cargado
+    recarga             lookup() después de modificar el libro
+
+Uso:
+    python bench_contact_directory.py [--rows N] [--lookups N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from openpyxl import Workbook  # noqa: E402
+
+from contact_directory import ContactDirectory, DEFAULT_SHEET  # noqa: E402
+
+ENCABEZADOS = [
+    "ITEM", "NOMBRES Y APELLIDOS", "TIPO DOC", "CEDULA", "FECHA NACIMIENTO", "EDAD", "SEXO", "ESTADO CIVIL",
+    "DIRECCIÓN", "BARRIO", "CIUDAD", "CELULAR", "CORREO ELECTRÓNICO", "EPS", "AFP", "ARL", "CAJA",
+    "CARGO", "EMPRESA USUARIA", "FECHA INGRESO", "SALARIO", "TIPO CONTRATO", "NIVEL EDUCATIVO",
+]
+
+
+def build_personnel(path, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(DEFAULT_SHEET)
+    sheet.append(ENCABEZADOS)
+    for i in range(rows):
+        sheet.append([i + 1, f"TRABAJADOR {i}", "CC", 1000000000 + i, "1990/01/01", 35, "F", "SOLTERO",
+                      f"CALLE {i % 100} # {i % 50}-{i % 30}", "CENTRO", "BARRANQUILLA", 3000000000 + i,
+                      f"trabajador{i}@correo.com", "SURA", "PORVENIR", "SURA", "COMFAMILIAR",
+                      "MESERO", "ASEL", "2024/01/01", 1300000, "OBRA LABOR", "BACHILLER"])
+    workbook.save(path)
+
+
+def bench_pandas(path, cedulas):
+    try:
+        import pandas as pd
+    except ImportError:
+        return None
+    start = time.perf_counter()
+    for cedula in cedulas:
+        df = pd.read_excel(path, sheet_name=DEFAULT_SHEET, dtype=str)
+        col_cedula = next(col for col in df.columns if 'CEDULA' in col.upper())
+        df[df[col_cedula].astype(str).str.strip() == cedula]
+    return (time.perf_counter() - start) / len(cedulas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Filas de la base de personal.")
+    parser.add_argument("--lookups", type=int, default=10000, help="Búsquedas con el directorio cargado.")
+    parser.add_argument("--pandas-lookups", type=int, default=3, help="Búsquedas con el método anterior.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "Base de Datos Personal.xlsx"
+        build_personnel(path, args.rows)
+        print(f"Filas: {args.rows}  tamaño: {path.stat().st_size / 1e6:.1f} MB")
+
+        cedulas = [str(1000000000 + random.randrange(args.rows)) for _ in range(args.lookups)]
+        pandas_seconds = bench_pandas(path, cedulas[:args.pandas_lookups])
+        if pandas_seconds is None:
+            print(f"{'pandas (anterior)':<18} no disponible (pandas no está instalado)")
+        else:
+            print(f"{'pandas (anterior)':<18} {pandas_seconds * 1000:>10.1f} ms por búsqueda")
+
+        directory = ContactDirectory(path, DEFAULT_SHEET)
+        start = time.perf_counter()
+        directory.lookup(cedulas[0])
+        print(f"{'carga':<18} {(time.perf_counter() - start) * 1000:>10.1f} ms ({len(directory)} contactos)")
+
+        start = time.perf_counter()
+        found = sum(directory.lookup(cedula) is not None for cedula in cedulas)
+        per_lookup = (time.perf_counter() - start) / len(cedulas)
+        print(f"{'búsqueda':<18} {per_lookup * 1e6:>10.2f} µs ({found}/{len(cedulas)} encontradas)")
+
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+        start = time.perf_counter()
+        directory.lookup(cedulas[0])
+        print(f"{'recarga':<18} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
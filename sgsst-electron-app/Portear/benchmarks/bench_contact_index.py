@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: búsqueda de contactos en un proceso nuevo (como cada
+`remision_utils.py --send-email` lanzado por Electron).
+
+Genera dos bases de personal (temporales con N filas y ASEL con N/10) y mide:
+
+    directorio          proceso nuevo que lee la base con ContactDirectory y
+                        busca una cédula (lo que hacía cada envío)
+    índice (creación)   primera indexación de las dos bases
+    índice (en frío)    proceso nuevo que importa contact_index, comprueba
+                        las bases y busca una cédula en el índice ya creado
+    reindexado          refresh() después de modificar solo la base de ASEL
+    lote                resolve() de B cédulas en una sola consulta, frente
+                        a un proceso por cédula (B veces el tiempo en frío,
+                        estimado)
+
+Los tiempos "en frío" se miden dentro del proceso hijo (importación incluida)
+y no cuentan el arranque del intérprete.
+
+Uso:
+    python bench_contact_index.py [--rows N] [--runs N] [--batch B]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from bench_contact_directory import build_personnel  # noqa: E402
+
+_CHILD_DIRECTORY = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+from contact_directory import find_contact
+find_contact({path!r}, 'COMPLETO', {cedula!r})
+print(json.dumps(time.perf_counter() - start))
+"""
+
+_CHILD_INDEX = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+from contact_index import find_contact
+find_contact({bases!r}, 'TEMPOSUM', {cedula!r})
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def run_child(code, env):
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def rename_sheet(path, sheet):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path)
+    workbook.active.title = sheet
+    workbook.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Filas de la base de temporales.")
+    parser.add_argument("--runs", type=int, default=5, help="Procesos en frío por medición.")
+    parser.add_argument("--batch", type=int, default=1000, help="Cédulas por lote.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        temporales = Path(tmp) / "Base de Datos Personal Temporales.xlsx"
+        asel = Path(tmp) / "Formato - Base de datos personal ASEL.xlsx"
+        build_personnel(temporales, args.rows)
+        build_personnel(asel, max(args.rows // 10, 1))
+        rename_sheet(asel, "FORMATO")
+        bases = {"TEMPOACTIVA": str(temporales), "TEMPOSUM": str(temporales),
+                 "ASEPLUS": str(temporales), "ASEL": str(asel)}
+        cedula = str(1000000000 + args.rows // 2)
+        print(f"Filas: {args.rows} + {max(args.rows // 10, 1)}  tamaño: {temporales.stat().st_size / 1e6:.1f} MB")
+
+        env = {**os.environ, "SGSST_CACHE_DIR": str(Path(tmp) / "cache")}
+        os.environ["SGSST_CACHE_DIR"] = env["SGSST_CACHE_DIR"]
+
+        seconds = min(run_child(_CHILD_DIRECTORY.format(src=str(SRC_DIR), path=str(temporales), cedula=cedula), env)
+                      for _ in range(max(args.runs // 2, 1)))
+        print(f"{'directorio':<20} {seconds * 1000:>10.1f} ms por proceso")
+
+        from contact_index import ContactIndex, contact_sources
+        index = ContactIndex()
+        start = time.perf_counter()
+        index.refresh(contact_sources(bases))
+        print(f"{'índice (creación)':<20} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+        code = _CHILD_INDEX.format(src=str(SRC_DIR), bases=bases, cedula=cedula)
+        timings = sorted(run_child(code, env) for _ in range(args.runs))
+        print(f"{'índice (en frío)':<20} {timings[len(timings) // 2] * 1000:>10.1f} ms por proceso (mediana)")
+
+        os.utime(asel, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+        start = time.perf_counter()
+        rebuilt = index.refresh(contact_sources(bases))
+        print(f"{'reindexado':<20} {(time.perf_counter() - start) * 1000:>10.1f} ms ({rebuilt} de 2 bases)")
+
+        # Una parte de las cédulas no existe; las de ASEL también están en temporales.
+        cedulas = [str(1000000000 + random.randrange(args.rows + args.rows // 10)) for _ in range(args.batch)]
+        start = time.perf_counter()
+        results = index.resolve([(cedula, None) for cedula in cedulas])
+        batch = time.perf_counter() - start
+        counts = {status: sum(r['status'] == status for r in results) for status in ('found', 'not_found', 'ambiguous')}
+        cold = timings[len(timings) // 2] * args.batch
+        print(f"{'lote (procesos)':<20} {cold * 1000:>10.1f} ms para {args.batch} cédulas (estimado)")
+        print(f"{'lote (resolve)':<20} {batch * 1000:>10.1f} ms para {args.batch} cédulas {counts}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: escritores concurrentes sobre el mismo archivo de control.
+
+Lanza W procesos que registran M remisiones cada uno, de una en una, en el
+mismo GI-FO-012 (como varias ventanas o una tanda y Electron a la vez). Cada
+registro pasa por WorkbookSpool, igual que ControlTransaction.commit:
+
+    sin agrupar   cada escritor toma el bloqueo y guarda solo lo suyo
+    agrupado      quien tiene el bloqueo aplica también lo que otros dejaron
+                  pendiente, en un solo guardado
+
+Informa el tiempo total, los registros por segundo, los guardados del libro
+y comprueba que no se perdió ninguna fila.
+
+Uso:
+    python bench_control_lock.py [--writers W] [--records M] [--rows N]
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from control_workbook import ControlWorkbook, apply_upsert_batches, serialize_upsert  # noqa: E402
+from workbook_lock import WorkbookSpool  # noqa: E402
+
+from bench_control_writer import COLUMNAS, build_control  # noqa: E402
+
+
+def writer(path, writer_id, records, coalesce, saves_path):
+    def apply(batches):
+        with open(saves_path, "a", encoding="utf-8") as f:
+            f.write(f"{sum(len(b) for b in batches)}\n")
+        return apply_upsert_batches(path, COLUMNAS, batches)
+
+    spool = WorkbookSpool(path, coalesce=coalesce)
+    for i in range(records):
+        cedula = str(3000000000 + writer_id * 100000 + i)
+        record = serialize_upsert(cedula, "15/08/2025", {"Nombre Completo": f"ESCRITOR {writer_id}",
+                                                         "No. Identificación": cedula,
+                                                         "Fecha de Atención": "15/08/2025"}, {})
+        result = spool.commit([record], apply)
+        if not result[0]["success"]:
+            print(f"  error del escritor {writer_id}: {result[0]['error']}")
+
+
+def run(base_rows, writers, records, coalesce, tmp):
+    path = Path(tmp) / f"control_{'agrupado' if coalesce else 'individual'}.xlsx"
+    saves_path = Path(tmp) / f"saves_{coalesce}.txt"
+    build_control(path, base_rows)
+    saves_path.write_text("")
+
+    start = time.perf_counter()
+    processes = [multiprocessing.Process(target=writer, args=(path, w, records, coalesce, saves_path))
+                 for w in range(writers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    seconds = time.perf_counter() - start
+
+    saves = len(saves_path.read_text().splitlines())
+    workbook = ControlWorkbook(path, COLUMNAS, use_index=False).load()
+    rows = workbook.index.last_row - base_rows - 7
+    workbook.close()
+    return seconds, saves, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4, help="Procesos escritores.")
+    parser.add_argument("--records", type=int, default=10, help="Registros por escritor.")
+    parser.add_argument("--rows", type=int, default=2000, help="Filas iniciales del control.")
+    args = parser.parse_args()
+
+    expected = args.writers * args.records
+    print(f"Escritores: {args.writers}  registros: {expected}  filas iniciales: {args.rows}")
+    print(f"{'modo':<12} {'total s':>9} {'reg/s':>8} {'guardados':>10} {'filas nuevas':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, coalesce in (("sin agrupar", False), ("agrupado", True)):
+            seconds, saves, rows = run(args.rows, args.writers, args.records, coalesce, tmp)
+            status = "" if rows == expected else f"  ¡se perdieron {expected - rows}!"
+            print(f"{name:<12} {seconds:>9.2f} {expected / seconds:>8.1f} {saves:>10} {rows:>13}{status}")
+
+
+if __name__ == "__main__":
+    main()
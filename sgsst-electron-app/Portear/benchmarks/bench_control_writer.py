@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: escritura de remisiones en el archivo de control (GI-FO-012).
+
+Genera controles de N filas y mide, para cada tamaño:
+
+    pandas (anterior)   leer todo el libro con pandas, añadir la fila y
+                        reescribirlo con pd.ExcelWriter (un registro)
+    abrir / guardar     load_workbook y save de ControlWorkbook
+    escritura           coste medio de upsert() por registro, con el libro
+                        ya abierto (--records altas y actualizaciones)
+
+La escritura por registro se mantiene constante al crecer el control; abrir y
+guardar el .xlsx sigue dependiendo del tamaño del archivo y se paga una vez
+por sesión de escritura.
+
+Uso:
+    python bench_control_writer.py [--rows N ...] [--records N]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from openpyxl import Workbook  # noqa: E402
+
+from control_workbook import ControlWorkbook, HEADER_ROW  # noqa: E402
+
+COLUMNAS = [
+    "Item", "Nombre Completo", "No. Identificación", "Fecha Nac", "Edad", "Sexo",
+    "Afiliación", "Estado civil", "Evaluación Ocupacional", "Fecha de Atención",
+    "Cargo", "Exámenes realizados", "Recomendaciones Laborales", "Incluir SVE",
+    "Restricciones Laborales", "Concepto medico laboral", "Concepto Medico",
+    "Concepto Manipulación Alimento", "Concepto Altura",
+    "Concepto de trabajo en espacios confinados", "Motivo de Restricción"
+]
+
+
+def build_control(path, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["CONTROL DE REMISIONES"])
+    for _ in range(HEADER_ROW - 2):
+        sheet.append([])
+    sheet.append(COLUMNAS)
+    for i in range(1, rows + 1):
+        sheet.append([i, f"TRABAJADOR {i}", 1000000000 + i, "1990/01/01", 35, "Femenino", "ASEL", "Soltero",
+                      "PERIODICO", f"2025/{i % 12 + 1:02d}/{i % 28 + 1:02d}", "MESERO", "OSTEOMUSCULAR",
+                      "PAUSAS ACTIVAS", "NO", "NINGUNO", "APTO", "APTO", "NINGUNO", "NINGUNO", "NINGUNO", "NINGUNO"])
+    workbook.save(path)
+
+
+def record(i):
+    cedula = str(2000000000 + i)
+    return cedula, "15/08/2025", {"Nombre Completo": f"NUEVO {i}", "No. Identificación": cedula,
+                                  "Fecha de Atención": "15/08/2025", "Cargo": "MESERO", "Edad": "30"}
+
+
+def bench_pandas(path):
+    try:
+        import pandas as pd
+    except ImportError:
+        return None
+    start = time.perf_counter()
+    df = pd.read_excel(path, engine="openpyxl", header=HEADER_ROW - 1, dtype={"No. Identificación": str})
+    cedula, fecha, values = record(0)
+    df = pd.concat([df, pd.DataFrame([{"Item": len(df) + 1, **values}])], ignore_index=True)
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, header=True, startrow=HEADER_ROW - 1)
+    return time.perf_counter() - start
+
+
+def bench_writer(path, records):
+    start = time.perf_counter()
+    workbook = ControlWorkbook(path, COLUMNAS).load()
+    loaded = time.perf_counter()
+    for i in range(records):
+        cedula, fecha, values = record(i)
+        workbook.upsert(cedula, fecha, values, {})
+    # La segunda pasada encuentra los mismos registros y los actualiza.
+    for i in range(records):
+        cedula, fecha, values = record(i)
+        workbook.upsert(cedula, fecha, values, {"Cargo": "AUXILIAR"})
+    written = time.perf_counter()
+    workbook.save()
+    workbook.close()
+    saved = time.perf_counter()
+    return loaded - start, (written - loaded) / (2 * records), saved - written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, action="append", help="Filas del control (se puede repetir).")
+    parser.add_argument("--records", type=int, default=200, help="Registros escritos por sesión.")
+    args = parser.parse_args()
+
+    sizes = args.rows or [1000, 5000, 10000, 20000, 40000]
+    print(f"{'filas':>7} {'pandas s':>10} {'abrir s':>9} {'escritura µs':>13} {'guardar s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            base = Path(tmp) / f"control_{rows}.xlsx"
+            build_control(base, rows)
+
+            copy = Path(tmp) / "pandas.xlsx"
+            shutil.copy(base, copy)
+            pandas_seconds = bench_pandas(copy)
+            pandas_text = f"{pandas_seconds:>10.2f}" if pandas_seconds is not None else f"{'n/d':>10}"
+
+            shutil.copy(base, copy)
+            load_s, per_record_s, save_s = bench_writer(copy, args.records)
+            print(f"{rows:>7} {pandas_text} {load_s:>9.2f} {per_record_s * 1e6:>13.1f} {save_s:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tiempo que la interfaz espera al enviar una remisión por correo.
+
+Levanta el servidor SMTP local de bench_bulk_mailer (con la latencia del
+saludo con Gmail) y mide, para N remisiones con documentos distintos:
+
+    directo         EmailSender.enviar_correo: la llamada vuelve cuando el
+                    servidor aceptó el mensaje (SGSST_EMAIL_OUTBOX=0)
+    bandeja         EmailOutbox.enqueue + ensure_worker: la llamada vuelve
+                    en cuanto el envío queda registrado
+    entrega         tiempo hasta que el worker en segundo plano envió todos
+                    los mensajes de la bandeja
+    reenvío         volver a encolar las mismas N remisiones: no debe salir
+                    ningún correo nuevo
+
+Informa la latencia por llamada (mediana y máxima) y los correos recibidos
+por el servidor.
+
+Uso:
+    python bench_email_outbox.py [--messages N] [--handshake-ms MS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from bench_bulk_mailer import StandInSmtp  # noqa: E402
+
+EMPRESA = "TEMPOSUM"
+
+
+def latencies(calls):
+    timings = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[-1]
+
+
+def report(name, median, worst, received):
+    print(f"{name:<10} {median * 1000:>12.1f} {worst * 1000:>12.1f} {received:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20, help="Remisiones por medición.")
+    parser.add_argument("--handshake-ms", type=float, default=300, help="Latencia simulada de conexión y de login.")
+    parser.add_argument("--attachment-kb", type=int, default=60, help="Tamaño de cada documento.")
+    args = parser.parse_args()
+
+    server = StandInSmtp(handshake_delay=args.handshake_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # El worker es otro proceso: hereda el servidor y la caché por el entorno.
+        os.environ.update(SGSST_CACHE_DIR=str(Path(tmp) / "cache"), SGSST_SMTP_HOST="127.0.0.1",
+                          SGSST_SMTP_PORT=str(server.port), SGSST_SMTP_STARTTLS="0", SGSST_SMTP_RATE_PER_MIN="0")
+        import email_outbox
+        from remision_utils import EmailSender
+
+        documents = []
+        for i in range(args.messages):
+            path = Path(tmp) / f"REMISION {i}.docx"
+            path.write_bytes(i.to_bytes(4, "big") * (args.attachment_kb * 256))
+            documents.append((str(1000000000 + i), f"trabajador{i}@example.com", str(path)))
+
+        print(f"Remisiones: {args.messages}  adjunto: {args.attachment_kb} KB  saludo: {args.handshake_ms:.0f} ms x 2")
+        print(f"{'modo':<10} {'mediana ms':>12} {'máximo ms':>12} {'recibidos':>10}")
+
+        sender = EmailSender(EMPRESA)
+        median, worst = latencies(
+            lambda doc=doc: sender.enviar_correo(doc[1], "Trabajador", "15/08/2025", doc[2]) for doc in documents)
+        report("directo", median, worst, server.received)
+
+        outbox = email_outbox.EmailOutbox()
+        received = server.received
+
+        def enqueue(cedula, destinatario, path):
+            outbox.enqueue(EMPRESA, cedula, destinatario, path, nombre="Trabajador", fecha_atencion="15/08/2025",
+                           filename=Path(path).name)
+            email_outbox.ensure_worker(outbox)
+
+        start = time.perf_counter()
+        median, worst = latencies(lambda doc=doc: enqueue(*doc) for doc in documents)
+        report("bandeja", median, worst, server.received - received)
+
+        while outbox.has_work():
+            time.sleep(0.05)
+        delivered = time.perf_counter() - start
+        report("entrega", delivered, delivered, server.received - received)
+
+        received = server.received
+        median, worst = latencies(lambda doc=doc: enqueue(*doc) for doc in documents)
+        time.sleep(1)
+        report("reenvío", median, worst, server.received - received)
+        print(f"Bandeja: {outbox.counts()}  conexiones al servidor: {server.connections}")
+        outbox.close()
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
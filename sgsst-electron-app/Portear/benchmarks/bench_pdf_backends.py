@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: motores de texto (PyMuPDF / pypdfium2 / pdfplumber).
+
+Para cada certificado mide el rendimiento de cada motor instalado (páginas/s,
+leyendo el documento completo) y compara los campos que extrae
+process_pdf_cli.PdfProcessor con los obtenidos a partir del texto de
+pdfplumber, que es el motor de referencia de las reglas.
+
+Un motor rápido solo debe incluirse en SGSST_PDF_FAST_BACKENDS (ver
+pdf_text.py) si la columna 'promovible' dice 'sí': todos los campos iguales
+a los de pdfplumber en todos los certificados de muestra.
+
+Uso:
+    python bench_pdf_backends.py [pdf ...] [--repeat N]
+
+Sin rutas usa los certificados de ejemplo de Portear/Utils.
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+UTILS_DIR = Path(__file__).resolve().parent.parent / "Utils"
+sys.path.insert(0, str(SRC_DIR))
+
+from pdf_text import available_backends, read_pdf_text  # noqa: E402
+from process_pdf_cli import PdfProcessor  # noqa: E402
+
+REFERENCE = "pdfplumber"
+
+
+def bench_backend(backend, pdfs, repeat):
+    pages = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pdf in pdfs:
+            _, _, total = read_pdf_text(pdf, backend=backend)
+            pages += total
+    return pages / (time.perf_counter() - start)
+
+
+def extract_fields(backend, pdf):
+    text, _, _ = read_pdf_text(pdf, backend=backend)
+    # Los mensajes de log de process_pdf_cli van a stdout; no interesan aquí.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return PdfProcessor().extract_pdf_data(pdf, text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="Certificados PDF a procesar.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por archivo.")
+    args = parser.parse_args()
+
+    pdfs = [Path(p) for p in args.pdfs] or sorted(UTILS_DIR.glob("*.pdf"))
+    if not pdfs:
+        sys.exit("No se encontraron PDFs para el benchmark.")
+
+    backends = available_backends()
+    print(f"Archivos: {len(pdfs)}  repeticiones: {args.repeat}  motores: {', '.join(backends)}")
+
+    reference = {pdf: extract_fields(REFERENCE, pdf) for pdf in pdfs} if REFERENCE in backends else None
+    if reference is None:
+        print(f"{REFERENCE} no está instalado: se omite la comparación de campos.")
+
+    print(f"{'motor':<12} {'páginas/s':>10} {'campos iguales':>16} {'promovible':>11}")
+    for backend in backends:
+        throughput = bench_backend(backend, pdfs, args.repeat)
+        parity = promotable = "-"
+        if reference is not None:
+            same = total = 0
+            for pdf in pdfs:
+                fields = extract_fields(backend, pdf)
+                for key, expected in reference[pdf].items():
+                    total += 1
+                    if fields.get(key) == expected:
+                        same += 1
+                    elif backend != REFERENCE:
+                        print(f"  [{backend}] {pdf.name} · {key}: {fields.get(key)!r} != {expected!r}")
+            parity = f"{same}/{total}"
+            if backend != REFERENCE:
+                promotable = "sí" if same == total else "no"
+        print(f"{backend:<12} {throughput:>10.1f} {parity:>16} {promotable:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: un proceso de Python por operación vs el sidecar residente.
+
+Para cada operación mide la latencia de lanzar el script como lo hacía
+main.js (intérprete nuevo + importaciones), la primera llamada al sidecar
+(importa el módulo) y la mediana de las llamadas siguientes. Las operaciones
+con efectos (remisiones, correos, informes) no se miden. Si falta una
+dependencia, la operación se marca como no disponible.
+
+Uso:
+    python bench_sidecar.py [pdf ...] [--repeat N]
+
+Sin rutas usa los certificados de ejemplo de Portear/Utils.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+UTILS_DIR = Path(__file__).resolve().parent.parent / "Utils"
+
+
+def _read_result(stdout):
+    """Resultado de un script: un JSON único (config, mapeo) o el sobre 'result' del NDJSON."""
+    try:
+        return json.loads(stdout)
+    except json.JSONDecodeError:
+        pass
+    for line in stdout.splitlines():
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if message.get("type") == "result":
+            return message["payload"]
+    return {"success": False, "error": "El proceso terminó sin devolver un resultado."}
+
+
+def run_process(argv):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, *argv], cwd=SRC_DIR, capture_output=True, text=True, encoding="utf-8")
+    seconds = time.perf_counter() - start
+    return seconds, _read_result(proc.stdout)
+
+
+class SidecarClient:
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, str(SRC_DIR / "sidecar.py")],
+            cwd=SRC_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", bufsize=1
+        )
+        self.request_id = 0
+        for line in self.proc.stdout:
+            if json.loads(line).get("type") == "ready":
+                break
+
+    def call(self, method, params):
+        self.request_id += 1
+        start = time.perf_counter()
+        self.proc.stdin.write(json.dumps({"id": self.request_id, "method": method, "params": params}) + "\n")
+        self.proc.stdin.flush()
+        for line in self.proc.stdout:
+            message = json.loads(line)
+            if message.get("type") == "result" and message.get("id") == self.request_id:
+                return time.perf_counter() - start, message["payload"]
+        raise RuntimeError("El sidecar terminó sin responder.")
+
+    def close(self):
+        self.proc.stdin.write(json.dumps({"method": "shutdown"}) + "\n")
+        self.proc.stdin.flush()
+        self.proc.wait(timeout=30)
+
+
+def operations(pdfs, directory):
+    """(nombre, argv del script, método del sidecar, params)"""
+    ops = [
+        ("config.get", ["accident_config.py", "--get-config", "TEMPOACTIVA"], "config.get", {"empresa": "TEMPOACTIVA"}),
+        ("directory.map", ["map_directory.py", directory], "directory.map", {"path": directory}),
+    ]
+    for pdf in pdfs:
+        ops.append((f"pdf.process {pdf.name[:20]}", ["process_pdf_cli.py", str(pdf)], "pdf.process", {"path": str(pdf)}))
+    return ops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="Certificados PDF a procesar.")
+    parser.add_argument("--repeat", type=int, default=5, help="Llamadas por operación.")
+    args = parser.parse_args()
+
+    pdfs = [Path(p) for p in args.pdfs] or sorted(UTILS_DIR.glob("*.pdf"))
+    sidecar = SidecarClient()
+    print(f"{'operación':<32} {'proceso ms':>11} {'sidecar 1a ms':>14} {'sidecar ms':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, argv, method, params in operations(pdfs, directory):
+            process = []
+            for _ in range(args.repeat):
+                seconds, result = run_process(argv)
+                process.append(seconds)
+            first, payload = sidecar.call(method, params)
+            if not result.get("success", True) or not payload.get("success", True):
+                print(f"{name:<32} no disponible: {payload.get('error') or result.get('error')}")
+                continue
+            warm = [sidecar.call(method, params)[0] for _ in range(args.repeat)]
+            print(f"{name:<32} {statistics.median(process) * 1000:>11.1f} "
+                  f"{first * 1000:>14.1f} {statistics.median(warm) * 1000:>11.1f}")
+    sidecar.close()
+
+
+if __name__ == "__main__":
+    main()
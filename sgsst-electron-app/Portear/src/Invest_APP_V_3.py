@@ -1,430 +1,30 @@
 # Esta Es la Versión 0.7 de la Aplicación de Inversión de Accidentes
 
 import os
-import re
 import json
 import logging
 import traceback
 import threading
-import unicodedata
 from pathlib import Path
 from datetime import datetime
 from tkinter import messagebox, filedialog, StringVar
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.scrolled import ScrolledFrame
-from docxtpl import DocxTemplate
 import jinja2
-from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
 import torch
-import warnings
-import fitz
 import sys
 
-#-------------------------------------------------------------------------------------------------------------------
-# Configuración de la GPU y advertencias
-warnings.filterwarnings("ignore")
-os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
-os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"
-os.environ["CUDA_VISIBLE_DEVICES"] = "0"
-
-#-------------------------------------------------------------------------------------------------------------------
-class AccidentAnalyzer:
-    """Genera la metodología '5 Por Qué' usando un LLM (Mistral-7B-Instruct-v0.3)."""
-    def __init__(self):
-        self.model_path = r"D:\1. Estudio\1.1 IA\1.1.2. LLM's\Inv. AT\models--mistralai--Mistral-7B-Instruct-v0.3\snapshots\e0bc86c23ce5aae1db576c8cca6f06f1f73af2db"
-        if not os.path.exists(self.model_path):
-            raise FileNotFoundError(f"No se encontró el modelo en la ruta: {self.model_path}")
-        try:
-            print("Cargando tokenizer...", file=sys.stderr)
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-            print("Modelo cargado.", file=sys.stderr)
-            
-            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            print(f"Usando dispositivo: {device}", file=sys.stderr)
-            quantization_config = BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_quant_type="nf4",
-                bnb_4bit_compute_dtype=torch.float16,
-                bnb_4bit_use_double_quant=True
-            )
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_path,
-                quantization_config=quantization_config,
-                device_map="auto",
-                torch_dtype=torch.float16,
-                trust_remote_code=True,
-                low_cpu_mem_usage=True
-            )
-            print(" Modelo cargado exitosamente.", file=sys.stderr)
-        except Exception as e:
-            raise RuntimeError(f"No se pudo cargar el modelo: {e}")
-
-    def analyze_5whys(self, descripcion_accidente: str, contexto_adicional: str = "") -> dict:
-        if not descripcion_accidente or descripcion_accidente.strip() == "N/A":
-            logging.warning("No se proporcionó descripción del accidente para el análisis. Saltando.")
-            return self._generate_fallback_analysis()
-
-        prompt_rules = ("""
-Tu rol es ser un analista experto en seguridad laboral. Tu única tarea es realizar un análisis '5 Porqués' para un accidente, siguiendo el formato 5M.
-REGLA ABSOLUTA: Debes responder exclusivamente en español y seguir el formato del ejemplo al pie de la letra.
-
-EJEMPLO DE RESPUESTA ESTRUCTURADA:
-1. ¿Por qué el trabajador se cayó de la escalera? [Causa Directa]
-   • Mano de Obra: El trabajador no mantuvo tres puntos de contacto.
-   • Método: El procedimiento de trabajo en alturas era ambiguo.
-   • Maquinaria: La escalera tenía un peldaño dañado.
-   • Medio Ambiente: El suelo estaba resbaladizo por un derrame.
-   • Material: N/A
-2. ¿Por qué el trabajador no mantuvo tres puntos de contacto?
-   • Mano de Obra: Intentaba cargar una caja mientras subía.
-   • Método: No se prohibió explícitamente subir con objetos en las manos.
-   • Maquinaria: N/A
-   • Medio Ambiente: N/A
-   • Material: La caja era pesada y voluminosa.
-3. ¿Por qué intentaba cargar una caja mientras subía?
-   • Mano de Obra: Quería terminar la tarea más rápido.
-   • Método: La planificación del trabajo no incluyó un sistema de izado.
-   • Maquinaria: No había montacargas disponible en esa área.
-   • Medio Ambiente: N/A
-   • Material: N/A
-4. ¿Por qué la planificación no incluyó un sistema de izado?
-   • Mano de Obra: El supervisor no evaluó correctamente los riesgos.
-   • Método: El formato de permiso de trabajo no tiene un campo para equipos de izado.
-   • Maquinaria: N/A
-   • Medio Ambiente: N/A
-   • Material: N/A
-5. ¿Por qué el supervisor no evaluó correctamente los riesgos?
-   • Mano de Obra: Falta de capacitación en identificación de peligros.
-   • Método: La empresa no tiene un programa de capacitación continua.
-   • Maquinaria: N/A
-   • Medio Ambiente: N/A
-   • Material: N/A
-
-Ahora, realiza el análisis para el siguiente accidente, imitando el formato del ejemplo y siguiendo las reglas.
-- Basa tu análisis en la información proporcionada.
-- Completa los 5 niveles del porqué.
-- Para cada nivel, analiza las 5M (Mano de Obra, Método, Maquinaria, Medio Ambiente, Material). Si una categoría no aplica, indica "N/A".
-- Sé conciso y accionable.""")
-        descripcion_str = f"**Descripción del accidente:**\n{descripcion_accidente}"
-        contexto_str = f"\n\n**Contexto Adicional:**\n{contexto_adicional}" if contexto_adicional and "Añade aquí" not in contexto_adicional else ""
-        final_user_prompt = f"{prompt_rules}\n\n{descripcion_str}{contexto_str}\n\n**Análisis de 5 Porqués:**"
-        messages = [{"role": "user", "content": final_user_prompt}]
-        
-        logging.info(f"Enviando el siguiente prompt al modelo:\n{final_user_prompt}")
-
-        try:
-            input_ids = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, return_tensors="pt").to(self.model.device)
-            outputs = self.model.generate(input_ids=input_ids, max_new_tokens=1024, temperature=0.7, do_sample=True, pad_token_id=self.tokenizer.eos_token_id)
-            analysis = self.tokenizer.decode(outputs[0][input_ids.shape[-1]:], skip_special_tokens=True)
-            
-            logging.info(f"Respuesta cruda del modelo:\n---\n{analysis}\n---")
-
-            parsed_analysis = self._parse_structured_analysis(analysis)
-            logging.info(f"Análisis parseado: {json.dumps(parsed_analysis, indent=2, ensure_ascii=False)}")
-            
-            return parsed_analysis
-        except Exception as e:
-            logging.error(f"Error en análisis '5 Por Qué': {e}\n{traceback.format_exc()}")
-            return self._generate_fallback_analysis()
-
-    def _parse_structured_analysis(self, text: str) -> dict:
-        logging.info(f"Iniciando parseo del siguiente texto:\n---\n{text}\n---")
-        causas = {}
-        level_pattern = r'(\d+)\.\s*¿Por qué(.*?)(?=\n\d+\. ¿Por qué|\Z)'
-        matches = re.finditer(level_pattern, text, re.DOTALL | re.IGNORECASE)
-        
-        found_matches = False
-        for match in matches:
-            found_matches = True
-            level = int(match.group(1))
-            if 1 <= level <= 5:
-                level_content = match.group(2).strip()
-                logging.info(f"Encontrado 'Por Qué {level}': Contenido='{level_content[:100]}...' صلصل")
-                causas[f"Por Qué {level}"] = self._parse_level_content(level_content)
-        
-        if not found_matches:
-            logging.warning("No se encontraron coincidencias para el patrón de 'Por Qué' en la respuesta del modelo.")
-
-        for i in range(1, 6):
-            if f"Por Qué {i}" not in causas:
-                causas[f"Por Qué {i}"] = {"causa": "Análisis no generado", "Mano de Obra": "N/A", "Método": "N/A", "Maquinaria": "N/A", "Medio Ambiente": "N/A", "Material": "N/A"}
-        
-        logging.info(f"Resultado final del parseo: {json.dumps(causas, indent=2, ensure_ascii=False)}")
-        return causas
-
-    def _parse_level_content(self, content: str) -> dict:
-        lines = content.split('\n')
-        causa_principal = lines[0].strip()
-        level_data = {"causa": causa_principal, "Mano de Obra": "N/A", "Método": "N/A", "Maquinaria": "N/A", "Medio Ambiente": "N/A", "Material": "N/A"}
-        category_pattern = r'•\s*(Mano de Obra|Método|Maquinaria|Medio Ambiente|Material):\s*(.*?)(?=\n\s*•|\Z)'
-        for match in re.finditer(category_pattern, content, re.DOTALL | re.IGNORECASE):
-            category_map = {"mano de obra": "Mano de Obra", "método": "Método", "maquinaria": "Maquinaria", "medio ambiente": "Medio Ambiente", "material": "Material"}
-            category = next((v for k, v in category_map.items() if k in match.group(1).lower()), None)
-            if category: level_data[category] = match.group(2).strip()
-        return level_data
-
-    def _generate_fallback_analysis(self) -> dict:
-        return {f"Por Qué {i}": {"causa": "Análisis no disponible", "Mano de Obra": "N/A", "Método": "N/A", "Maquinaria": "N/A", "Medio Ambiente": "N/A", "Material": "N/A"} for i in range(1, 6)}
+# El análisis, la configuración, la extracción y el informe viven en módulos
+# propios para que accident_processor.py y main.js importen solo lo que usan.
+from accident_llm import AccidentAnalyzer
+from accident_config import Config
+from accident_extraction import PdfProcessor
+from accident_documents import DocumentGenerator
 
 #-------------------------------------------------------------------------------------------------------------------
 logging.basicConfig(filename='accidentes_app.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
 
-class Config:
-    RUTA_BASE = Path("G:/Mi unidad/2. Trabajo/1. SG-SST")
-    RUTAS = {
-        "TEMPOACTIVA": {
-            "investigaciones": RUTA_BASE / "2. Temporales Comfa/1. Tempoactiva Est SAS/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/Investigaciones/2. Accidentes",
-            "plantilla": RUTA_BASE / "2. Temporales Comfa/1. Tempoactiva Est SAS/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/Investigaciones/4. Procedimientos/GI-FO-020 INVESTIGACION.docx"
-        },
-        "TEMPOSUM": {
-            "investigaciones": RUTA_BASE / "2. Temporales Comfa/2. Temposum Est SAS/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades",
-            "plantilla": RUTA_BASE / "2. Temporales Comfa/2. Temposum Est SAS/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/4. Procedimientos/GI-FO-020 INVESTIGACION.docx"
-        },
-        "ASEPLUS": {
-            "investigaciones": RUTA_BASE / "2. Temporales Comfa/3. Aseplus/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/3.2.2.1. Investigaciones",
-            "plantilla": RUTA_BASE / "2. Temporales Comfa/3. Aseplus/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/4. Procedimientos/GI-FO-020 INVESTIGACION.docx"
-        },
-        "ASEL": {
-            "investigaciones": RUTA_BASE / "19. Asel S.A.S/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/Investigaciones/2. Accidentes",
-            "plantilla": RUTA_BASE / "19. Asel S.A.S/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/Investigaciones/4. Procedimientos/GI-FO-020 INVESTIGACION.docx"
-        }
-    },
-    
-    @classmethod
-    def get_empresa_paths(cls, empresa):
-        return cls.RUTAS.get(empresa.upper(), cls.RUTAS["TEMPOACTIVA"])
-
-    @classmethod
-    def get_template_path(cls, empresa):
-        return str(cls.get_empresa_paths(empresa)["plantilla"])
-
-    @classmethod
-    def get_output_dir(cls, empresa):
-        return str(cls.get_empresa_paths(empresa)["generated_reports"])
-
-#-------------------------------------------------------------------------------------------------------------------
-class PdfProcessor:
-    def _format_date(self, date_str):
-        if not date_str:
-            return ""
-        formats = [
-            '%d/%m/%Y %I:%M:%S %p', '%Y-%m-%d %H:%M:%S',
-            '%d/%m/%Y %H:%M', '%d/%m/%Y', '%Y-%m-%d',
-            '%d-%m-%Y %H:%M:%S', '%d-%m-%Y'
-        ]
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_str, fmt)
-                return date_obj.strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-        date_parts = re.findall(r'\b(\d{2}/\d{2}/\d{4})\b', date_str)
-        if date_parts:
-            try:
-                date_obj = datetime.strptime(date_parts[0], '%d/%m/%Y')
-                return date_obj.strftime('%Y-%m-%d')
-            except ValueError:
-                pass
-        logging.warning(f"No se pudo formatear la fecha: {date_str}")
-        return date_str
-
-    def extract_pdf_data(self, pdf_path):
-        try:
-            pdf_path = Path(pdf_path)
-            if not pdf_path.exists():
-                raise FileNotFoundError(f"El archivo PDF no existe: {pdf_path}")
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text() + "\n"
-            
-            # Guardar el texto extraído para depuración
-            log_dir = Path("logs")
-            log_dir.mkdir(exist_ok=True)
-            with open(log_dir / f"{pdf_path.stem}_extracted_text.log", "w", encoding="utf-8") as f:
-                f.write(text)
-
-            text = unicodedata.normalize('NFC', text)
-            
-            extraction_rules = {
-                'No. Identificación': {
-                    'patterns': [
-                        r'Identificación\n+C\.C\.\s*([\d\.]+)',
-                        r'(?:No\.?\s+Identificación|Identificación|Cédula de Ciudadanía|C\.C\.)\s*[:\s]*\n?(\d[\d\.\s]{5,11}\d)',
-                        r'(\d{1,3}(?:\.\d{3})*-\d)',
-                    ],
-                    'processor': lambda x: re.sub(r'[^\d]', '', x.strip()) if x else ""
-                },
-                'Nombre Completo': {
-                    'patterns': [
-                        r'Primer Apellido\n(.*?)\nNombres\n(.*?)\n',
-                        r'Primer Apellido\s*([\w\s]+?)\s*Segundo Apellido\s*([\w\s]+?)\s*Nombres\s*([\w\s]+?)(?=\n)',
-                        r'Nombre(?:s y|\s+)Apellidos\s*[:\s]*([\w\s]+?)(?=\n)',
-                        r'Nombre Completo\s*[:\s]*([\w\s]+?)(?=\n)'
-                    ],
-                    'processor': lambda x: " ".join(x).strip().upper() if isinstance(x, tuple) else x.strip().upper()
-                },
-                'Fecha del Accidente': {
-                    'patterns': [
-                        r'Fecha y Hora del Accidente\n(\d{2}/\d{2}/\d{4})',
-                        r'(?:Fecha y Hora del Accidente|Fecha del Accidente|Fecha de Ocurrencia|Fecha Accidente)\s*[:\s]*\b(\d{2}/\d{2}/\d{4})',
-                        r'Fecha del evento:\s*(\d{2}/\d{2}/\d{4})'
-                    ],
-                    'processor': lambda x: self._format_date(x.strip())
-                },
-                'Hora del Accidente': {
-                    'patterns': [
-                        r'Fecha y Hora del Accidente\n\d{2}/\d{2}/\d{4}\s*([0-9:]+\s*[AP]M)',
-                        r'(?:Fecha y Hora del Accidente|Hora del Accidente|Hora de Ocurrencia)\s*[:\s]*.*?(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)',
-                        r'Hora del evento:\s*(\d{1,2}:\d{2})'
-                    ],
-                    'processor': lambda x: x.strip()
-                },
-                'Cargo': {
-                    'patterns': [
-                        r'Cargo\n([A-Z\s]+?)\nOcupación Habitual',
-                        r'Cargo\s*\n.*?\n([\w\s]+?)\n',
-                        r'Ocupación Habitual\s*[:\s]*([\w\s]+?)(?=\n|Código)'
-                        ],
-                    'processor': lambda x: x.strip().upper()
-                },
-                'Descripcion del Accidente': {
-                    'patterns': [
-                        r'IV. DESCRIPCIÓN DEL ACCIDENTE\nObservaciones\n(.*?)(?=\nPersonas que Presenciaron)',
-                        r'IV\.\s*DESCRIPCIÓN\s+DEL\s+ACCIDENTE\s*\n(.*?)(?=\nPersonas|V\.\s*DATOS)',
-                        r'Descripción detallada del Accidente\s*[:\s]*(.*?)(?=\n\n|Firma)'
-                    ],
-                    'processor': lambda x: x.strip().replace('\n', ' ') if x else ''
-                },
-                'Fecha de Nacimiento': {
-                    'patterns': [
-                        r'Fecha de Nacimiento\s+Sexo\n(?:.|)*?(\d{2}/\d{2}/\d{4})',
-                        r'Fecha\s+de\s+Nacimiento\s*[:\s]*([\d/]+)',
-                        r'Nacimiento\s*[:\s]*([\d/]+)'
-                        ],
-                    'processor': self._format_date
-                },
-                'Telefono Domicilio': {
-                    'patterns': [
-                        r'Teléfono Domicilio(?:.|)*?(\d{10})',
-                        r'Teléfono:\s*([\d\s()-]+)'
-                        ],
-                    'processor': lambda x: x.strip() if x else "N/A"
-                },
-                'Fecha de Ingreso a la Empresa': {
-                    'patterns': [
-                        r'Fecha de Ingreso a la Empresa\s+Salario(?:.|)*?(\d{2}/\d{2}/\d{4})',
-                        r'Fecha de Ingreso\s*[:\s]*([\d/]+)'
-                        ],
-                    'processor': self._format_date
-                },
-                'Tipo de Accidente': {
-                    'patterns': [
-                        r'Tipo de Accidente\n([^\n]+)',
-                        r'Propios del trabajo\s*[:\s]*(.*?)(?:\n|$)',
-                    ],
-                    'processor': lambda x: x.strip()
-                },
-                'Lugar del Accidente': {
-                    'patterns': [r'Lugar donde Ocurrio el accidente\n([^\n]+)'],
-                    'processor': lambda x: x.strip()
-                },
-                'Sitio de Ocurrencia': {
-                    'patterns': [
-                        r'Sitio de Ocurrencia\n([^\n]+)',
-                        r'AREAS DE PRODUCCION\s*[:\s]*(.*?)(?:\n|$)',
-                    ],
-                    'processor': lambda x: x.strip()
-                },
-                'Tipo de Lesion': {
-                    'patterns': [r'Tipo de Lesión\n([^\n]+)'],
-                    'processor': lambda x: x.strip()
-                },
-                'Parte del Cuerpo Afectada': {
-                    'patterns': [r'Parte del Cuerpo Aparentemente Afectada\n([^\n]+)'],
-                    'processor': lambda x: x.strip()
-                },
-                'Agente del Accidente': {
-                    'patterns': [r'Agente del Accidente\n([^\n]+)'],
-                    'processor': lambda x: x.strip()
-                },
-                'Mecanismo o Forma del Accidente': {
-                    'patterns': [r'Mecanismo o Forma del Accidente\n([^\n]+)'],
-                    'processor': lambda x: x.strip()
-                },
-                'Jornada de Trabajo Habitual': {
-                    'patterns': [
-                        r'Jornada de Trabajo Habitual(?:.|)+?([A-Za-z]+)\n+III',
-                        r'Jornada de Trabajo\s*[:\s]*([a-zA-Z\s]+)'
-                        ],
-                    'processor': lambda x: x.strip() if x else "N/A"
-                },
-                'Tiempo de Ocupacion': {
-                    'patterns': [
-                        r'Tiempo de Ocupación Habitual al Momento del Accidente\n([^\n]+)',
-                        r'Tiempo de Ocupación Habitual\s*[:\s]*([\w\s.,]+)'
-                        ],
-                    'processor': lambda x: x.strip() if x else "N/A"
-                },
-                'Tipo de Vinculacion': {
-                    'patterns': [
-                        r'Tipo de Vinculación\n([^\n]+)',
-                        r'Vinculación\s*[:\s]*([\w\s]+)'
-                        ],
-                    'processor': lambda x: x.strip() if x else "N/A"
-                },
-            }
-            data = {}
-            for key, rule in extraction_rules.items():
-                value = ""
-                for pattern in rule['patterns']:
-                    match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-                    if match:
-                        groups = match.groups()
-                        if isinstance(groups, tuple) and len(groups) > 1:
-                            value = rule['processor'](groups)
-                        else:
-                            value = rule['processor'](groups[0])
-                        logging.debug(f"Campo '{key}' extraído con patrón '{pattern}': {value}")
-                        break
-                data[key] = value or "N/A"
-
-            self._validate_critical_data(data, pdf_path)
-            return data
-        except Exception as e:
-            logging.error(f"Error en extract_pdf_data: {e}")
-            raise
-
-    def _validate_critical_data(self, data, pdf_path):
-        errors = [f"{field} no encontrado" for field, value in data.items() if value == "N/A" and field in ['No Identificacion', 'Nombre Completo', 'Fecha del Accidente']]
-        if errors:
-            raise ValueError(f"Errores en la extracción de datos en {pdf_path.name}: {', '.join(errors)}")
-
-#-------------------------------------------------------------------------------------------------------------------
-class DocumentGenerator:
-    def generate_informe_accidente(self, data, template_path, output_dir):
-        try:
-            doc = DocxTemplate(template_path)
-            context = data.copy()
-            context = {k.replace(' ', '_').replace('.', ''): v for k, v in data.items()}
-
-            for i in range(1, 6):
-                por_que_key = f"Por Qué {i}"
-                context[f"por_que_{i}"] = data.get(por_que_key, {}).get("causa", "N/A")
-                for m in ["Mano de Obra", "Método", "Maquinaria", "Medio Ambiente", "Material"]:
-                    context[f"por_que_{i}_{m.lower().replace(' ', '_')}"] = data.get(por_que_key, {}).get(m, "N/A")
-            
-            doc.render(context)
-            nombre_sanitizado = re.sub(r'[^\w\s-]', '', data.get('Nombre_Completo', 'sin_nombre')).replace(' ', '_')
-            output_path = Path(output_dir) / f"GI-FO-020_INVESTIGACION_{nombre_sanitizado}_{datetime.now().strftime('%Y%m%d')}.docx"
-            doc.save(output_path)
-            logging.info(f"Informe creado: {output_path}")
-            return str(output_path)
-        except Exception as e:
-            logging.error(f"Error en generate_informe_accidente: {e}")
-            raise
 
 #-------------------------------------------------------------------------------------------------------------------
 from tkinter.font import Font
@@ -18,7 +18,6 @@ from tkinter import messagebox, filedialog, StringVar, BooleanVar, Tk, Button
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.scrolled import ScrolledFrame
-import pdfplumber
 import pandas as pd
 from docxtpl import DocxTemplate
 import webbrowser
@@ -34,6 +33,11 @@ import warnings
 from logging.handlers import RotatingFileHandler
 import sys
 
+from extraction_rules import REGISTRY
+from pdf_text import extract_with_fallback
+from contact_directory import find_contact, get_directory, sheet_for_empresa
+from bulk_mailer import get_mailer
+
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
 # Configuración de logging
@@ -208,68 +212,89 @@ class Config:
 
 # Clase PdfProcessor para extraer datos de PDFs
 class PdfProcessor:
-    def extract_pdf_data(self, pdf_path):
+    def extract_pdf_data(self, pdf_path, stream=True):
         try:
             pdf_path = Path(pdf_path)
             if not pdf_path.exists():
                 raise FileNotFoundError(f"El archivo PDF no existe: {pdf_path}")
 
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text() or ""
-                    text += page_text + "\n"
-            
-            # LOG DE DEPURACIÓN: Guardar todo el texto del PDF para análisis
-            logging.info(f"--- INICIO TEXTO COMPLETO PDF: {pdf_path.name} ---")
-            logging.info(text)
-            logging.info(f"--- FIN TEXTO COMPLETO PDF: {pdf_path.name} ---")
+            # pdfplumber primero; un motor rápido promovido (SGSST_PDF_FAST_BACKENDS) solo
+            # se acepta si todos los campos obligatorios tienen la forma esperada.
+            # Con stream=True se deja de leer en cuanto los campos obligatorios están resueltos.
+            data, _, text_info = extract_with_fallback(
+                pdf_path,
+                lambda text: self._extract_from_text(text, pdf_path),
+                validate=self._has_critical_fields,
+                until=self._required_fields_resolved if stream else None,
+                page_suffix="\n",
+                on_fallback=lambda backend, error: logging.warning(f"Motor de texto '{backend}' descartado para {pdf_path.name}: {error}"),
+            )
+            if text_info['pages_read'] < text_info['pages_total']:
+                logging.info(f"Lectura detenida en la página {text_info['pages_read']} de {text_info['pages_total']} de {pdf_path.name}: campos obligatorios resueltos.")
 
-            logging.debug(f"Texto extraído del PDF {pdf_path.name}:\n{text[:1000]}...")
-            text = unicodedata.normalize('NFC', text)
+            data['motor_texto'] = text_info['backend']
+            data['archivo_origen'] = str(pdf_path)
+            data['fecha_procesamiento'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-            # Determinar el formato del PDF
-            pdf_format = self._detect_pdf_format(text)
-            logging.info(f"Formato de PDF detectado: {pdf_format} para {pdf_path.name}")
+            return data
 
-            # Extraer datos según el formato
-            data = self._extract_data_based_on_format(text, pdf_format)
+        except Exception as e:
+            logging.error(f"Error en extract_pdf_data para {pdf_path}: {str(e)}")
+            logging.debug(traceback.format_exc())
+            raise
 
-            # Pre-procesamiento: Eliminar secciones irrelevantes
-            text = self._remove_header_footer(text)
+    def _extract_from_text(self, text, pdf_path):
+        """Extrae, post-procesa y valida los datos a partir del texto de un motor"""
+        # LOG DE DEPURACIÓN: Guardar todo el texto del PDF para análisis
+        logging.info(f"--- INICIO TEXTO COMPLETO PDF: {pdf_path.name} ---")
+        logging.info(text)
+        logging.info(f"--- FIN TEXTO COMPLETO PDF: {pdf_path.name} ---")
 
-            # Pre-procesamiento: Eliminar encabezados redundantes
-            text = self._remove_redundant_headers(text)
+        logging.debug(f"Texto extraído del PDF {pdf_path.name}:\n{text[:1000]}...")
+        text = unicodedata.normalize('NFC', text)
 
-            # Detectar y procesar solo la última sección relevante
-            if "LEVANTAMIENTO DE RESTRICCIONES" in text:
-                # Conservar solo texto después del último levantamiento
-                relevant_section = text.split("LEVANTAMIENTO DE RESTRICCIONES")[-1]
-                # Combinar con el inicio (para mantener datos básicos)
-                text = text.split("LEVANTAMIENTO DE RESTRICCIONES")[0] + relevant_section
+        # Determinar el formato del PDF
+        pdf_format = self._detect_pdf_format(text)
+        self.last_format = pdf_format
+        logging.info(f"Formato de PDF detectado: {pdf_format} para {pdf_path.name}")
 
-            # Post-procesamiento
-            data = self._post_process_data(data)
+        # Extraer datos según el formato
+        data = self._extract_data_based_on_format(text, pdf_format)
 
-            # Validación de datos críticos con manejo más suave
-            self._validate_critical_data(data, pdf_path)
+        # Pre-procesamiento: Eliminar secciones irrelevantes
+        text = self._remove_header_footer(text)
 
-            # Agregar campos faltantes con NINGUNO
-            for campo in ['Concepto Altura', 'Concepto de trabajo en espacios confinados',
-                          'Motivo de Restricción', 'Incluir SVE', 'Restricciones Laborales',
-                          'Concepto Manipulación Alimento']:
-                if not data.get(campo):
-                    data[campo] = "NINGUNO"
+        # Pre-procesamiento: Eliminar encabezados redundantes
+        text = self._remove_redundant_headers(text)
 
-            data['archivo_origen'] = str(pdf_path)
-            data['fecha_procesamiento'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # Detectar y procesar solo la última sección relevante
+        if "LEVANTAMIENTO DE RESTRICCIONES" in text:
+            # Conservar solo texto después del último levantamiento
+            relevant_section = text.split("LEVANTAMIENTO DE RESTRICCIONES")[-1]
+            # Combinar con el inicio (para mantener datos básicos)
+            text = text.split("LEVANTAMIENTO DE RESTRICCIONES")[0] + relevant_section
 
-            return data
+        # Post-procesamiento
+        data = self._post_process_data(data)
 
-        except Exception as e:
-            logging.error(f"Error en extract_pdf_data para {pdf_path}: {str(e)}")
-            logging.debug(traceback.format_exc())
-            raise
+        # Validación de datos críticos con manejo más suave
+        self._validate_critical_data(data, pdf_path)
+
+        # Agregar campos faltantes con NINGUNO
+        for campo in ['Concepto Altura', 'Concepto de trabajo en espacios confinados',
+                      'Motivo de Restricción', 'Incluir SVE', 'Restricciones Laborales',
+                      'Concepto Manipulación Alimento']:
+            if not data.get(campo):
+                data[campo] = "NINGUNO"
+
+        return data
+
+    def _has_critical_fields(self, data):
+        """Indica si todos los campos obligatorios del formato tienen la forma esperada"""
+        invalid = REGISTRY.get(self._rules_format(self.last_format)).invalid_fields(data)
+        if invalid:
+            logging.warning(f"Campos obligatorios vacíos o con formato inesperado: {', '.join(invalid)}")
+        return not invalid
 
     def _remove_redundant_headers(self, text):
         """Elimina encabezados redundantes que interfieren con la extracción"""
@@ -310,6 +335,14 @@ class PdfProcessor:
         else:
             return "formato_desconocido"
 
+    def _required_fields_resolved(self, text):
+        """Indica si el texto leído hasta ahora ya contiene los campos obligatorios de su formato"""
+        return REGISTRY.get(self._rules_format(self._detect_pdf_format(text))).resolved(text)
+
+    def _rules_format(self, pdf_format):
+        """Formato de extraction_rules.json con las reglas del formato detectado"""
+        return pdf_format if pdf_format in ("formato_1", "formato_2") else "formato_generico_remisiones_gui"
+
     def _extract_data_based_on_format(self, text, pdf_format):
         """Extrae datos basados en el formato detectado del PDF"""
         if pdf_format == "formato_1":
@@ -324,21 +357,14 @@ class PdfProcessor:
 
     def _extract_formato_1(self, text):
         """Extracción para formato 1 (como Santiago Algarin)"""
+        rules = REGISTRY.get('formato_1')
         data = {}
         # Patrón mejorado que maneja múltiples formatos
-        paciente_match = re.search(
-            r'PACIENTE[:\s]*([^:\n]+?)\s*(?=(?:EDAD|SEXO|DOCUMENTO|FECHA|\n|$))',
-            text,
-            re.IGNORECASE
-        )
+        paciente_match = rules.pattern('Nombre Completo').search(text)
         
         if not paciente_match:
             # Patrón alternativo para formato con nombre en línea independiente
-            paciente_match = re.search(
-                r'PACIENTE:\s*\n([A-ZÁÉÍÓÚÑ\s]+)\b',
-                text,
-                re.IGNORECASE
-            )
+            paciente_match = rules.pattern('Nombre Completo (línea independiente)').search(text)
         
         if paciente_match:
             nombre_completo = paciente_match.group(1).strip().upper()
@@ -360,7 +386,7 @@ class PdfProcessor:
                 data['Nombre Completo'] = nombre_completo
             else:
                 # Último recurso: extraer toda la línea y tomar las palabras válidas
-                line_match = re.search(r'PACIENTE[:\s]*(.*?)\n', text, re.IGNORECASE)
+                line_match = rules.pattern('Nombre Completo (línea)').search(text)
                 if line_match:
                     words = [word for word in line_match.group(1).split() 
                             if len(word) > 3 and word.isalpha()]
@@ -374,31 +400,27 @@ class PdfProcessor:
         logging.debug(f"Match encontrado: {paciente_match.group(0) if paciente_match else 'Ninguno'}")
 
         # Cédula
-        documento_match = re.search(r'DOCUMENTO[:\s]*CC[:\s]*(\d+)', text, re.IGNORECASE)
+        documento_match = rules.pattern('No. Identificación').search(text)
         if documento_match:
             data['No. Identificación'] = documento_match.group(1).strip()
 
         # Fecha de nacimiento
-        fecha_nac_match = re.search(r'FECHA\s*(?:DE)?\s*NAC[:\s]*([\d/-]+)', text, re.IGNORECASE)
+        fecha_nac_match = rules.pattern('Fecha Nac').search(text)
         if fecha_nac_match:
             data['Fecha Nac'] = self._format_date(fecha_nac_match.group(1).strip())
 
         # Edad
-        edad_match = re.search(r'EDAD[:\s]*(\d+)', text, re.IGNORECASE)
+        edad_match = rules.pattern('Edad').search(text)
         if edad_match:
             data['Edad'] = edad_match.group(1).strip()
 
         # Sexo
-        sexo_match = re.search(r'SEXO[:\s]*([A-Za-zÁ-Úá-ú]+)', text, re.IGNORECASE)
+        sexo_match = rules.pattern('Sexo').search(text)
         if sexo_match:
             data['Sexo'] = sexo_match.group(1).strip().capitalize()
 
         # Afiliación
-        afiliacion_match = re.search(
-            r'AFILIACI[OÓ]N[:\s]*(.*?)(?=\s*(?:ACOMPAÑANTE|MOVIL|TELEFONO|$))',
-            text,
-            re.IGNORECASE | re.DOTALL  # Permitir múltiples líneas
-        )
+        afiliacion_match = rules.pattern('Afiliación').search(text)
         if afiliacion_match:
             afiliacion = afiliacion_match.group(1).strip()
             # Limpiar texto residual y normalizar
@@ -407,57 +429,49 @@ class PdfProcessor:
             data['Afiliación'] = self._process_afiliacion(afiliacion)
 
         # Estado civil
-        estado_civil_match = re.search(r'ESTADO\s*CIVIL[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        estado_civil_match = rules.pattern('Estado civil').search(text)
         if estado_civil_match:
             data['Estado civil'] = estado_civil_match.group(1).strip().capitalize()
 
         # Evaluación ocupacional
-        evaluacion_match = re.search(r'Evaluaci[óo]n\s*Ocupacional[:\s]*([^:\n]+?)(?=\s*Fecha\s*de\s*atenci[óo]n:|$)', text, re.IGNORECASE)
+        evaluacion_match = rules.pattern('Evaluación Ocupacional').search(text)
         if evaluacion_match:
             data['Evaluación Ocupacional'] = evaluacion_match.group(1).strip().upper()
 
         # Fecha de atención
-        fecha_atencion_match = re.search(r'Fecha\s*de\s*atenci[óo]n[:\s]*([\d/-]+)', text, re.IGNORECASE)
+        fecha_atencion_match = rules.pattern('Fecha de Atención').search(text)
         if fecha_atencion_match:
             data['Fecha de Atención'] = self._format_date(fecha_atencion_match.group(1).strip())
 
         # Cargo
-        cargo_match = re.search(r'Cargo[:\s]*([^:\n]+?)(?:\s*Fecha\s*de\s*atenci[óo]n:|$)', text, re.IGNORECASE)
+        cargo_match = rules.pattern('Cargo').search(text)
         if cargo_match:
             data['Cargo'] = cargo_match.group(1).strip().upper()
 
         # Exámenes realizados
-        examenes_match = re.search(r'EX[ÁA]MENES\s*REALIZADOS[:\s]*(.*?)(?=RECOMENDACIONES|$)', text, re.DOTALL | re.IGNORECASE)
+        examenes_match = rules.pattern('Exámenes realizados').search(text)
         if examenes_match:
             data['Exámenes realizados'] = examenes_match.group(1).strip().upper()
 
         # Recomendaciones laborales
-        recomendaciones_match = re.search(r'RECOMENDACIONES\s*LABORALES[:\s]*(.*?)(?=MANEJO\s*EPS/ARL|$)', text, re.DOTALL | re.IGNORECASE)
+        recomendaciones_match = rules.pattern('Recomendaciones Laborales').search(text)
         if recomendaciones_match:
             data['Recomendaciones Laborales'] = recomendaciones_match.group(1).strip().upper()
 
         # Incluir SVE - Buscar solo valores válidos
-        sve_match = re.search(
-            r'Incluir\s*SVE[:\s]*([^\n:]+?)(?=\s*(?:RESTRICCIONES|Concepto|$))', 
-            text, 
-            re.IGNORECASE
-        )
+        sve_match = rules.pattern('Incluir SVE').search(text)
         if sve_match and sve_match.group(1).strip() and not sve_match.group(1).strip().startswith("RESTRICCIONES"):
             data['Incluir SVE'] = sve_match.group(1).strip().upper()
         else:
             data['Incluir SVE'] = "NINGUNO"
 
         # Restricciones laborales
-        restricciones_match = re.search(r'RESTRICCIONES\s*LABORALES[:\s]*(.*?)(?=Para\s*la\s*revisi[óo]n|CONCEPTO|$)', text, re.DOTALL | re.IGNORECASE)
+        restricciones_match = rules.pattern('Restricciones Laborales').search(text)
         if restricciones_match:
             data['Restricciones Laborales'] = restricciones_match.group(1).strip() or "NINGUNO"
 
         # Concepto médico - Buscar la ÚLTIMA ocurrencia válida
-        concepto_matches = re.findall(
-            r'Concepto\s*Medico[:\s]*((?!LEVANTAMIENTO)[^:\n]+)', 
-            text, 
-            re.IGNORECASE
-        )
+        concepto_matches = rules.pattern('Concepto Medico').findall(text)
         if concepto_matches:
             # Tomar el último valor válido (ignorando encabezados)
             data['Concepto Medico'] = concepto_matches[-1].strip().upper()
@@ -465,32 +479,24 @@ class PdfProcessor:
             data['Concepto Medico'] = "NINGUNO"
 
         # Concepto manipulación alimentos
-        alimentos_match = re.search(r'Concepto\s*Manipulaci[óo]n\s*Alimento[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        alimentos_match = rules.pattern('Concepto Manipulación Alimento').search(text)
         if alimentos_match:
             data['Concepto Manipulación Alimento'] = alimentos_match.group(1).strip() or "NINGUNO"
 
         # Concepto altura
-        altura_match = re.search(r'Concepto\s*Altura[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        altura_match = rules.pattern('Concepto Altura').search(text)
         if altura_match:
             data['Concepto Altura'] = altura_match.group(1).strip() or "NINGUNO"
 
         # Concepto de trabajo en espacios confinados - Buscar solo valores válidos
-        espacios_match = re.search(
-            r'Concepto\s*de\s*trabajo\s*en\s*espacios\s*confinados[:\s]*([^\n:]+?)(?=\s*(?:MOTIVO|$))', 
-            text, 
-            re.IGNORECASE
-        )
+        espacios_match = rules.pattern('Concepto de trabajo en espacios confinados').search(text)
         if espacios_match and espacios_match.group(1).strip() and not espacios_match.group(1).strip().startswith("MOTIVO"):
             data['Concepto de trabajo en espacios confinados'] = espacios_match.group(1).strip().upper()
         else:
             data['Concepto de trabajo en espacios confinados'] = "NINGUNO"
 
         # Motivo de restricción - Buscar la ÚLTIMA ocurrencia
-        motivo_matches = re.findall(
-            r'MOTIVO\s*DE\s*RESTRICCI[OÓ]N[:\s]*(.*?)(?=FIRMA|$)',
-            text,
-            re.IGNORECASE | re.DOTALL
-        )
+        motivo_matches = rules.pattern('Motivo de Restricción').findall(text)
         if motivo_matches:
             # Tomar el último match y limpiarlo
             motivo = motivo_matches[-1].strip()
@@ -506,100 +512,101 @@ class PdfProcessor:
 
     def _extract_formato_2(self, text):
         """Extracción para formato 2 (como Ortiz Galindo)"""
+        rules = REGISTRY.get('formato_2')
         data = {}
         # Nombre Completo
-        nombre_match = re.search(r'Nombre\s*Completo[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        nombre_match = rules.pattern('Nombre Completo').search(text)
         if nombre_match:
             data['Nombre Completo'] = nombre_match.group(1).strip().upper()
 
         # Cédula
-        identificacion_match = re.search(r'(?:No\.|N[úu]mero)\s*Identificaci[óo]n[:\s]*(?:CC\s*-\s*)?(\d+)', text, re.IGNORECASE)
+        identificacion_match = rules.pattern('No. Identificación').search(text)
         if identificacion_match:
             data['No. Identificación'] = identificacion_match.group(1).strip()
 
         # Fecha de nacimiento
-        fecha_nac_match = re.search(r'Fecha\s*Nac[:\s]*([\d/-]+)', text, re.IGNORECASE)
+        fecha_nac_match = rules.pattern('Fecha Nac').search(text)
         if fecha_nac_match:
             data['Fecha Nac'] = self._format_date(fecha_nac_match.group(1).strip())
 
         # Edad
-        edad_match = re.search(r'Edad[:\s]*(\d+)', text, re.IGNORECASE)
+        edad_match = rules.pattern('Edad').search(text)
         if edad_match:
             data['Edad'] = edad_match.group(1).strip()
 
         # Sexo
-        sexo_match = re.search(r'Sexo[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        sexo_match = rules.pattern('Sexo').search(text)
         if sexo_match:
             data['Sexo'] = sexo_match.group(1).strip().capitalize()
 
         # Afiliación
-        afiliacion_match = re.search(r'Afiliaci[óo]n[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        afiliacion_match = rules.pattern('Afiliación').search(text)
         if afiliacion_match:
             afiliacion = afiliacion_match.group(1).strip()
             data['Afiliación'] = self._process_afiliacion(afiliacion)
 
         # Estado civil
-        estado_civil_match = re.search(r'Estado\s*civil[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        estado_civil_match = rules.pattern('Estado civil').search(text)
         if estado_civil_match:
             data['Estado civil'] = estado_civil_match.group(1).strip().capitalize()
 
         # Evaluación ocupacional
-        evaluacion_match = re.search(r'Evaluaci[óo]n\s*Ocupacional[:\s]*([^:\n]+?)(?=\s*Fecha\s*de\s*atenci[óo]n:|$)', text, re.IGNORECASE)
+        evaluacion_match = rules.pattern('Evaluación Ocupacional').search(text)
         if evaluacion_match:
             data['Evaluación Ocupacional'] = evaluacion_match.group(1).strip().upper()
 
         # Fecha de atención
-        fecha_atencion_match = re.search(r'Fecha\s*de\s*atenci[óo]n[:\s]*([\d/-]+)', text, re.IGNORECASE)
+        fecha_atencion_match = rules.pattern('Fecha de Atención').search(text)
         if fecha_atencion_match:
             data['Fecha de Atención'] = self._format_date(fecha_atencion_match.group(1).strip())
 
         # Cargo
-        cargo_match = re.search(r'Cargo[:\s]*([^:\n]+?)(?:\s*Fecha\s*de|$)', text, re.IGNORECASE)
+        cargo_match = rules.pattern('Cargo').search(text)
         if cargo_match:
             data['Cargo'] = cargo_match.group(1).strip().upper()
 
         # Exámenes realizados
-        examenes_match = re.search(r'EX[ÁA]MENES\s*REALIZADOS[:\s]*(.*?)(?=RECOMENDACIONES|$)', text, re.DOTALL | re.IGNORECASE)
+        examenes_match = rules.pattern('Exámenes realizados').search(text)
         if examenes_match:
             data['Exámenes realizados'] = examenes_match.group(1).strip().upper()
 
         # Recomendaciones laborales
-        recomendaciones_match = re.search(r'RECOMENDACIONES\s*LABORALES[:\s]*(.*?)(?=MANEJO\s*EPS/ARL|$)', text, re.DOTALL | re.IGNORECASE)
+        recomendaciones_match = rules.pattern('Recomendaciones Laborales').search(text)
         if recomendaciones_match:
             data['Recomendaciones Laborales'] = recomendaciones_match.group(1).strip().upper()
 
         # Incluir SVE
-        sve_match = re.search(r'Incluir\s*SVE[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        sve_match = rules.pattern('Incluir SVE').search(text)
         if sve_match:
             data['Incluir SVE'] = sve_match.group(1).strip() or "NINGUNO"
 
         # Restricciones laborales
-        restricciones_match = re.search(r'RESTRICCIONES\s*LABORALES[:\s]*(.*?)(?=Para\s*la\s*revisi[óo]n|CONCEPTO|$)', text, re.DOTALL | re.IGNORECASE)
+        restricciones_match = rules.pattern('Restricciones Laborales').search(text)
         if restricciones_match:
             data['Restricciones Laborales'] = restricciones_match.group(1).strip() or "NINGUNO"
 
         # Concepto médico
-        concepto_match = re.search(r'Concepto\s*Medico[:\s]*([^:\n]+)', text, re.IGNORECASE)
+        concepto_match = rules.pattern('Concepto Medico').search(text)
         if concepto_match:
             data['Concepto Medico'] = concepto_match.group(1).strip().upper()
 
         # Concepto manipulación alimentos
-        alimentos_match = re.search(r'Concepto\s*Manipulaci[óo]n\s*Alimento[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        alimentos_match = rules.pattern('Concepto Manipulación Alimento').search(text)
         if alimentos_match:
             data['Concepto Manipulación Alimento'] = alimentos_match.group(1).strip() or "NINGUNO"
 
         # Concepto altura
-        altura_match = re.search(r'Concepto\s*Altura[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        altura_match = rules.pattern('Concepto Altura').search(text)
         if altura_match:
             data['Concepto Altura'] = altura_match.group(1).strip() or "NINGUNO"
 
         # Concepto espacios confinados
-        espacios_match = re.search(r'Concepto\s*de\s*trabajo\s*en\s*espacios\s*confinados[:\s]*(.*?)(?:\n|$)', text, re.IGNORECASE)
+        espacios_match = rules.pattern('Concepto de trabajo en espacios confinados').search(text)
         if espacios_match:
             data['Concepto de trabajo en espacios confinados'] = espacios_match.group(1).strip() or "NINGUNO"
 
         # Motivo de restricción
-        motivo_match = re.search(r'MOTIVO\s*DE\s*RESTRICCI[OÓ]N[:\s]*(.*?)(?=FIRMA|$)', text, re.DOTALL | re.IGNORECASE)
+        motivo_match = rules.pattern('Motivo de Restricción').search(text)
         if motivo_match:
             data['Motivo de Restricción'] = motivo_match.group(1).strip() or "NINGUNO"
 
@@ -607,94 +614,16 @@ class PdfProcessor:
 
     def _extract_formato_generico(self, text):
         """Extracción genérica para manejar otros formatos posibles"""
-        extraction_rules = {
-            'Nombre Completo': {
-                'pattern': r'(?:Nombre\s*Completo|Paciente|Nombre)[:\s]*(.*?)(?:\n|SEXO:|DOCUMENTO|IDENTIFICACI[ÓO]N|$)',
-                'processor': lambda x: x.strip().upper() if x else ""
-            },
-            'No. Identificación': {
-                'pattern': r'(?:Documento[:\s]*CC[:\s]*(\d+))|'
-                           r'(?:(?:No\.|N[úu]mero)\s*(?:de)?\s*Identificaci[óo]n[:\s]*(?:CC\s*-\s*)?(\d{7,12}))|'
-                           r'(?:(?:CC|TI|CE)[:\s-]*(\d{7,12}))|'
-                           r'(?:(?:c[ée]dula|documento|identificaci[óo]n)[:\s]*(\d{7,12}))',
-                'processor': lambda x: re.sub(r'[^\d]', '', x.strip()) if x else ""
-            },
-            'Fecha Nac': {
-                'pattern': r'Fecha\s*(?:de)?\s*Nac(?:imiento)?[:\s]*([\d/-]+)',
-                'processor': lambda x: self._format_date(x.strip(), 'YYYY/MM/DD') if x else ""
-            },
-            'Edad': {
-                'pattern': r'Edad[:\s]*(\d+)',
-                'processor': lambda x: int(x.strip()) if x and x.strip().isdigit() else ""
-            },
-            'Sexo': {
-                'pattern': r'(?:Sexo|G[ée]nero)[:\s]*([A-Za-zÁ-Úá-ú]+)',
-                'processor': lambda x: x.strip().capitalize() if x else ""
-            },
-            'Afiliación': {
-                'pattern': r'(?:Afiliaci[óo]n|Empresa)[:\s]*(.*?)(?:\n|$)',
-                'processor': lambda x: self._process_afiliacion(x.strip()) if x else ""
-            },
-            'Estado civil': {
-                'pattern': r'Estado\s*civil[:\s]*(.*?)(?:\n|$)',
-                'processor': lambda x: x.strip().capitalize() if x else ""
-            },
-            'Evaluación Ocupacional': {
-                'pattern': r'(?:TIPO\s*DE\s*EVALUACI[ÓO]N\s*REALIZADA|Tipo\s*de\s*Examen|Evaluaci[óo]n\s*Ocupacional)[:\s]*([^:\n]+?)(?=\s*Fecha\s*de\s*atenci[óo]n:|$)',
-                'processor': lambda x: x.strip().upper() if x else ""
-            },
-            'Fecha de Atención': {
-                'pattern': r'Fecha\s*(?:de)?\s*atenci[óo]n[:\s]*([\d/-]+)',
-                'processor': lambda x: self._format_date(x.strip(), 'YYYY/MM/DD') if x else ""
-            },
-            'Cargo': {
-                'pattern': r'Cargo[:\s]*([^:\n]+?)(?=\s*Fecha\s*de|$)',
-                'processor': self._process_cargo
-            },
-            'Exámenes realizados': {
-                'pattern': r'EX[ÁA]MENES\s*REALIZADOS[:\s]*(.*?)(?=\s*(?:RECOMENDACIONES|INCLUIR|RESTRICCIONES|MANEJO|$))',
-                'processor': lambda x: x.strip().replace('\n', ' ').strip().upper() if x else ""
-            },
-            'Recomendaciones Laborales': {
-                'pattern': r'RECOMENDACIONES\s*LABORALES[:\s]*(.*?)(?=MANEJO\s*EPS/ARL|\Z)',
-                'processor': lambda x: x.strip().upper() if x else ""
-            },
-            'Incluir SVE': {
-                'pattern': r'Incluir\s*SVE[:\s]*([^\n:]+?)(?=\s*(?:RESTRICCIONES|Concepto|$))',
-                'processor': lambda x: x.strip().upper() if x and not x.strip().startswith('RESTRICCIONES') else "NINGUNO"
-            },
-            'Restricciones Laborales': {
-                'pattern': r'RESTRICCIONES\s*LABORALES[:\s]*(.*?)(?=\s*(?:Para\s*la\s*revisi[óo]n|INCLUIR|CONCEPTO|[A-ZÁ-Ú]+:|$))',
-                'processor': lambda x: x.strip().upper() if x else "NINGUNO"
-            },
-            'Concepto Medico': {
-                'pattern': r'Concepto\s*Medico[:\s]*((?!LEVANTAMIENTO)[^:\n]+)',
-                'processor': lambda x: x.strip().upper() if x else "NINGUNO"
-            },
-            'Concepto Manipulación Alimento': {
-                'pattern': r'Concepto\s*(?:Manipulaci[óo]n)?\s*Alimento[:\s]*(.*?)(?:\n|$)',
-                'processor': lambda x: x.strip().upper() if x else "NINGUNO"
-            },
-            'Concepto Altura': {
-                'pattern': r'Concepto\s*Altura[:\s]*(.*?)(?:\n|$)',
-                'processor': lambda x: x.strip().upper() if x else "NINGUNO"
-            },
-            'Concepto de trabajo en espacios confinados': {
-                'pattern': r'Concepto\s*de\s*trabajo\s*en\s*espacios\s*confinados[:\s]*([^\n:]+?)(?=\s*(?:MOTIVO|$))',
-                'processor': lambda x: x.strip().upper() if x and not x.strip().startswith('MOTIVO') else "NINGUNO"
-            },
-            'Motivo de Restricción': {
-                'pattern': r'MOTIVO\s*DE\s*RESTRICCI[OÓ]N[:\s]*(.*?)(?=\nFIRMA|\Z)',
-                'processor': lambda x: x.strip().upper() if x else "NINGUNO"
-            },
-        }
-
+        # Reglas en extraction_rules.json (formato_generico_remisiones_gui), compiladas al importar.
+        extracted = REGISTRY.get('formato_generico_remisiones_gui').extract(text, processors={
+            'format_date': self._format_date,
+            'afiliacion': self._process_afiliacion,
+            'cargo': self._process_cargo,
+        })
         data = {}
-        for key, rule in extraction_rules.items():
-            match = re.search(rule['pattern'], text, re.IGNORECASE | re.DOTALL)
-            if match:
-                value = next((g for g in match.groups() if g is not None), "")
-                data[key] = rule['processor'](value)
+        for key, value in extracted.items():
+            if value is not None:
+                data[key] = value
             else:
                 data[key] = ""
                 logging.warning(f"No se encontró el campo '{key}' usando regex genérico")
@@ -1181,30 +1110,7 @@ Correo: {remitente}"""
                 self.logger.warning(f"Base de datos no encontrada: {self.base_datos}")
                 return None, None
                 
-            df = pd.read_excel(
-                self.base_datos,
-                sheet_name="FORMATO" if self.empresa == "ASEL" else "COMPLETO",
-                dtype=str
-            )
-            
-            # Buscar columnas relevantes
-            col_cedula = next((col for col in df.columns if 'CEDULA' in col.upper() or 'IDENTIFICACIÓN' in col.upper()), None)
-            col_celular = next((col for col in df.columns if 'CELULAR' in col.upper() or 'TELÉFONO' in col.upper()), None)
-            col_email = next((col for col in df.columns if 'CORREO' in col.upper() or 'EMAIL' in col.upper()), None)
-            
-            if not col_cedula or not col_celular:
-                self.logger.error("Columnas críticas no encontradas en la base de datos")
-                return None, None
-                
-            # Buscar el registro
-            registro = df[df[col_cedula].astype(str).str.strip() == str(cedula).strip()]
-            
-            if not registro.empty:
-                telefono = registro.iloc[0][col_celular]
-                email = registro.iloc[0][col_email] if col_email else None
-                return telefono, email
-                
-            return None, None
+            return find_contact(self.base_datos, sheet_for_empresa(self.empresa), cedula)
         except Exception as e:
             self.logger.error(f"Error al obtener contacto: {str(e)}")
             return None, None
@@ -1261,11 +1167,8 @@ Correo: {remitente}"""
                 )
                 msg.attach(parte)
 
-            # Enviar correo usando SMTP
-            with smtplib.SMTP('smtp.gmail.com', 587) as servidor:
-                servidor.starttls()
-                servidor.login(self.credenciales["email"], self.credenciales["password"])
-                servidor.send_message(msg)
+            # Enviar correo usando la sesión SMTP compartida de la cuenta
+            get_mailer().send(self.credenciales, msg, destinatario)
                 
             self.logger.info(f"Correo enviado exitosamente a {destinatario}")
             return True
@@ -1582,7 +1485,6 @@ class RemisionesApp(ttk.Window):
             empresa = empresa.upper()
             self.log_message(f"Iniciando búsqueda de contacto para Cédula: '{cedula}', Empresa: '{empresa}'")
 
-            import pandas as pd
             import os
             import logging
             import traceback
@@ -1605,31 +1507,14 @@ class RemisionesApp(ttk.Window):
                 self.log_message(f"El archivo Excel no existe en la ruta: {excel_path}", error=True)
                 return None, None
 
-            df = pd.read_excel(excel_path, sheet_name=sheet_name, dtype=str)
-
-            # 3. Encontrar columnas de forma segura y estandarizada
-            cedula_col = next((col for col in df.columns if 'CEDULA' in str(col).upper() or 'IDENTIFICACIÓN' in str(col).upper()), None)
-            celular_col = next((col for col in df.columns if 'CELULAR' in str(col).upper() or 'TELÉFONO' in str(col).upper()), None)
-            email_col = next((col for col in df.columns if 'CORREO' in str(col).upper() or 'EMAIL' in str(col).upper()), None)
-
-            if not cedula_col:
-                self.log_message(f"No se encontró la columna de Cédula/Identificación en '{excel_path}'", error=True)
-                return None, None
-            if not celular_col:
-                self.log_message(f"No se encontró la columna de Celular/Teléfono en '{excel_path}'", error=True)
-                return None, None
-
-            self.log_message(f"Columnas a usar -> Cédula: '{cedula_col}', Celular: '{celular_col}', Email: '{email_col or 'No encontrada'}'")
+            # 3. Buscar la cédula en el directorio de contactos (se lee una vez por versión del libro)
+            contact = get_directory(excel_path, sheet_name).lookup(cedula)
 
-            # 4. Buscar la fila y extraer los datos
-            # Limpiar la columna de cédulas en el dataframe para una comparación más robusta
-            df[cedula_col] = df[cedula_col].astype(str).str.strip()
-            row = df[df[cedula_col] == cedula]
-
-            if not row.empty:
-                self.log_message(f"Cédula '{cedula}' encontrada en la fila de índice {row.index[0]}.")
-                phone = str(row.iloc[0][celular_col]).strip()
-                email = str(row.iloc[0][email_col]).strip() if email_col and pd.notna(row.iloc[0][email_col]) else None
+            # 4. Extraer los datos
+            if contact:
+                self.log_message(f"Cédula '{cedula}' encontrada en la fila {contact['row']}.")
+                phone = contact['telefono'] or ''
+                email = contact['email']
 
                 if not phone or phone.lower() == 'nan':
                     self.log_message(f"Teléfono no encontrado para la cédula {cedula}, pero se encontró el email: {email or 'Ninguno'}", error=True)
@@ -1759,7 +1644,7 @@ class RemisionesApp(ttk.Window):
 
         row = 0
         for key, value in data.items():
-            if key in ['archivo_origen', 'fecha_procesamiento']:
+            if key in ['archivo_origen', 'fecha_procesamiento', 'motor_texto']:
                 continue
             label = ttk.Label(self.scrolled_frame, text=f"{key}:", anchor=E)
             label.grid(row=row, column=0, sticky=E, padx=5, pady=1)
@@ -2401,30 +2286,7 @@ Correo: {remitente}"""
                 self.logger.warning(f"Base de datos no encontrada: {self.base_datos}")
                 return None, None
                 
-            df = pd.read_excel(
-                self.base_datos,
-                sheet_name="FORMATO" if self.empresa == "ASEL" else "COMPLETO",
-                dtype=str
-            )
-            
-            # Buscar columnas relevantes
-            col_cedula = next((col for col in df.columns if 'CEDULA' in col.upper() or 'IDENTIFICACIÓN' in col.upper()), None)
-            col_celular = next((col for col in df.columns if 'CELULAR' in col.upper() or 'TELÉFONO' in col.upper()), None)
-            col_email = next((col for col in df.columns if 'CORREO' in col.upper() or 'EMAIL' in col.upper()), None)
-            
-            if not col_cedula or not col_celular:
-                self.logger.error("Columnas críticas no encontradas en la base de datos")
-                return None, None
-                
-            # Buscar el registro
-            registro = df[df[col_cedula].astype(str).str.strip() == str(cedula).strip()]
-            
-            if not registro.empty:
-                telefono = registro.iloc[0][col_celular]
-                email = registro.iloc[0][col_email] if col_email else None
-                return telefono, email
-                
-            return None, None
+            return find_contact(self.base_datos, sheet_for_empresa(self.empresa), cedula)
         except Exception as e:
             self.logger.error(f"Error al obtener contacto: {str(e)}")
             return None, None
@@ -2481,11 +2343,8 @@ Correo: {remitente}"""
                 )
                 msg.attach(parte)
 
-            # Enviar correo usando SMTP
-            with smtplib.SMTP('smtp.gmail.com', 587) as servidor:
-                servidor.starttls()
-                servidor.login(self.credenciales["email"], self.credenciales["password"])
-                servidor.send_message(msg)
+            # Enviar correo usando la sesión SMTP compartida de la cuenta
+            get_mailer().send(self.credenciales, msg, destinatario)
                 
             self.logger.info(f"Correo enviado exitosamente a {destinatario}")
             return True
@@ -2802,7 +2661,6 @@ class RemisionesApp(ttk.Window):
             empresa = empresa.upper()
             self.log_message(f"Iniciando búsqueda de contacto para Cédula: '{cedula}', Empresa: '{empresa}'")
 
-            import pandas as pd
             import os
             import logging
             import traceback
@@ -2825,31 +2683,14 @@ class RemisionesApp(ttk.Window):
                 self.log_message(f"El archivo Excel no existe en la ruta: {excel_path}", error=True)
                 return None, None
 
-            df = pd.read_excel(excel_path, sheet_name=sheet_name, dtype=str)
-
-            # 3. Encontrar columnas de forma segura y estandarizada
-            cedula_col = next((col for col in df.columns if 'CEDULA' in str(col).upper() or 'IDENTIFICACIÓN' in str(col).upper()), None)
-            celular_col = next((col for col in df.columns if 'CELULAR' in str(col).upper() or 'TELÉFONO' in str(col).upper()), None)
-            email_col = next((col for col in df.columns if 'CORREO' in str(col).upper() or 'EMAIL' in str(col).upper()), None)
-
-            if not cedula_col:
-                self.log_message(f"No se encontró la columna de Cédula/Identificación en '{excel_path}'", error=True)
-                return None, None
-            if not celular_col:
-                self.log_message(f"No se encontró la columna de Celular/Teléfono en '{excel_path}'", error=True)
-                return None, None
-
-            self.log_message(f"Columnas a usar -> Cédula: '{cedula_col}', Celular: '{celular_col}', Email: '{email_col or 'No encontrada'}'")
-
-            # 4. Buscar la fila y extraer los datos
-            # Limpiar la columna de cédulas en el dataframe para una comparación más robusta
-            df[cedula_col] = df[cedula_col].astype(str).str.strip()
-            row = df[df[cedula_col] == cedula]
+            # 3. Buscar la cédula en el directorio de contactos (se lee una vez por versión del libro)
+            contact = get_directory(excel_path, sheet_name).lookup(cedula)
 
-            if not row.empty:
-                self.log_message(f"Cédula '{cedula}' encontrada en la fila de índice {row.index[0]}.")
-                phone = str(row.iloc[0][celular_col]).strip()
-                email = str(row.iloc[0][email_col]).strip() if email_col and pd.notna(row.iloc[0][email_col]) else None
+            # 4. Extraer los datos
+            if contact:
+                self.log_message(f"Cédula '{cedula}' encontrada en la fila {contact['row']}.")
+                phone = contact['telefono'] or ''
+                email = contact['email']
 
                 if not phone or phone.lower() == 'nan':
                     self.log_message(f"Teléfono no encontrado para la cédula {cedula}, pero se encontró el email: {email or 'Ninguno'}", error=True)
@@ -3679,30 +3520,7 @@ Correo: {remitente}"""
                 self.logger.warning(f"Base de datos no encontrada: {self.base_datos}")
                 return None, None
                 
-            df = pd.read_excel(
-                self.base_datos,
-                sheet_name="FORMATO" if self.empresa == "ASEL" else "COMPLETO",
-                dtype=str
-            )
-            
-            # Buscar columnas relevantes
-            col_cedula = next((col for col in df.columns if 'CEDULA' in col.upper() or 'IDENTIFICACIÓN' in col.upper()), None)
-            col_celular = next((col for col in df.columns if 'CELULAR' in col.upper() or 'TELÉFONO' in col.upper()), None)
-            col_email = next((col for col in df.columns if 'CORREO' in col.upper() or 'EMAIL' in col.upper()), None)
-            
-            if not col_cedula or not col_celular:
-                self.logger.error("Columnas críticas no encontradas en la base de datos")
-                return None, None
-                
-            # Buscar el registro
-            registro = df[df[col_cedula].astype(str).str.strip() == str(cedula).strip()]
-            
-            if not registro.empty:
-                telefono = registro.iloc[0][col_celular]
-                email = registro.iloc[0][col_email] if col_email else None
-                return telefono, email
-                
-            return None, None
+            return find_contact(self.base_datos, sheet_for_empresa(self.empresa), cedula)
         except Exception as e:
             self.logger.error(f"Error al obtener contacto: {str(e)}")
             return None, None
@@ -3759,11 +3577,8 @@ Correo: {remitente}"""
                 )
                 msg.attach(parte)
 
-            # Enviar correo usando SMTP
-            with smtplib.SMTP('smtp.gmail.com', 587) as servidor:
-                servidor.starttls()
-                servidor.login(self.credenciales["email"], self.credenciales["password"])
-                servidor.send_message(msg)
+            # Enviar correo usando la sesión SMTP compartida de la cuenta
+            get_mailer().send(self.credenciales, msg, destinatario)
                 
             self.logger.info(f"Correo enviado exitosamente a {destinatario}")
             return True
@@ -4081,7 +3896,6 @@ class RemisionesApp(ttk.Window):
             empresa = empresa.upper()
             self.log_message(f"Iniciando búsqueda de contacto para Cédula: '{cedula}', Empresa: '{empresa}'")
 
-            import pandas as pd
             import os
             import logging
             import traceback
@@ -4104,31 +3918,14 @@ class RemisionesApp(ttk.Window):
                 self.log_message(f"El archivo Excel no existe en la ruta: {excel_path}", error=True)
                 return None, None
 
-            df = pd.read_excel(excel_path, sheet_name=sheet_name, dtype=str)
-
-            # 3. Encontrar columnas de forma segura y estandarizada
-            cedula_col = next((col for col in df.columns if 'CEDULA' in str(col).upper() or 'IDENTIFICACIÓN' in str(col).upper()), None)
-            celular_col = next((col for col in df.columns if 'CELULAR' in str(col).upper() or 'TELÉFONO' in str(col).upper()), None)
-            email_col = next((col for col in df.columns if 'CORREO' in str(col).upper() or 'EMAIL' in str(col).upper()), None)
-
-            if not cedula_col:
-                self.log_message(f"No se encontró la columna de Cédula/Identificación en '{excel_path}'", error=True)
-                return None, None
-            if not celular_col:
-                self.log_message(f"No se encontró la columna de Celular/Teléfono en '{excel_path}'", error=True)
-                return None, None
+            # 3. Buscar la cédula en el directorio de contactos (se lee una vez por versión del libro)
+            contact = get_directory(excel_path, sheet_name).lookup(cedula)
 
-            self.log_message(f"Columnas a usar -> Cédula: '{cedula_col}', Celular: '{celular_col}', Email: '{email_col or 'No encontrada'}'")
-
-            # 4. Buscar la fila y extraer los datos
-            # Limpiar la columna de cédulas en el dataframe para una comparación más robusta
-            df[cedula_col] = df[cedula_col].astype(str).str.strip()
-            row = df[df[cedula_col] == cedula]
-
-            if not row.empty:
-                self.log_message(f"Cédula '{cedula}' encontrada en la fila de índice {row.index[0]}.")
-                phone = str(row.iloc[0][celular_col]).strip()
-                email = str(row.iloc[0][email_col]).strip() if email_col and pd.notna(row.iloc[0][email_col]) else None
+            # 4. Extraer los datos
+            if contact:
+                self.log_message(f"Cédula '{cedula}' encontrada en la fila {contact['row']}.")
+                phone = contact['telefono'] or ''
+                email = contact['email']
 
                 if not phone or phone.lower() == 'nan':
                     self.log_message(f"Teléfono no encontrado para la cédula {cedula}, pero se encontró el email: {email or 'Ninguno'}", error=True)
@@ -4900,30 +4697,7 @@ Correo: {remitente}"""
                 self.logger.warning(f"Base de datos no encontrada: {self.base_datos}")
                 return None, None
                 
-            df = pd.read_excel(
-                self.base_datos,
-                sheet_name="FORMATO" if self.empresa == "ASEL" else "COMPLETO",
-                dtype=str
-            )
-            
-            # Buscar columnas relevantes
-            col_cedula = next((col for col in df.columns if 'CEDULA' in col.upper() or 'IDENTIFICACIÓN' in col.upper()), None)
-            col_celular = next((col for col in df.columns if 'CELULAR' in col.upper() or 'TELÉFONO' in col.upper()), None)
-            col_email = next((col for col in df.columns if 'CORREO' in col.upper() or 'EMAIL' in col.upper()), None)
-            
-            if not col_cedula or not col_celular:
-                self.logger.error("Columnas críticas no encontradas en la base de datos")
-                return None, None
-                
-            # Buscar el registro
-            registro = df[df[col_cedula].astype(str).str.strip() == str(cedula).strip()]
-            
-            if not registro.empty:
-                telefono = registro.iloc[0][col_celular]
-                email = registro.iloc[0][col_email] if col_email else None
-                return telefono, email
-                
-            return None, None
+            return find_contact(self.base_datos, sheet_for_empresa(self.empresa), cedula)
         except Exception as e:
             self.logger.error(f"Error al obtener contacto: {str(e)}")
             return None, None
@@ -4980,11 +4754,8 @@ Correo: {remitente}"""
                 )
                 msg.attach(parte)
 
-            # Enviar correo usando SMTP
-            with smtplib.SMTP('smtp.gmail.com', 587) as servidor:
-                servidor.starttls()
-                servidor.login(self.credenciales["email"], self.credenciales["password"])
-                servidor.send_message(msg)
+            # Enviar correo usando la sesión SMTP compartida de la cuenta
+            get_mailer().send(self.credenciales, msg, destinatario)
                 
             self.logger.info(f"Correo enviado exitosamente a {destinatario}")
             return True
@@ -5301,7 +5072,6 @@ class RemisionesApp(ttk.Window):
             empresa = empresa.upper()
             self.log_message(f"Iniciando búsqueda de contacto para Cédula: '{cedula}', Empresa: '{empresa}'")
 
-            import pandas as pd
             import os
             import logging
             import traceback
@@ -5324,31 +5094,14 @@ class RemisionesApp(ttk.Window):
                 self.log_message(f"El archivo Excel no existe en la ruta: {excel_path}", error=True)
                 return None, None
 
-            df = pd.read_excel(excel_path, sheet_name=sheet_name, dtype=str)
-
-            # 3. Encontrar columnas de forma segura y estandarizada
-            cedula_col = next((col for col in df.columns if 'CEDULA' in str(col).upper() or 'IDENTIFICACIÓN' in str(col).upper()), None)
-            celular_col = next((col for col in df.columns if 'CELULAR' in str(col).upper() or 'TELÉFONO' in str(col).upper()), None)
-            email_col = next((col for col in df.columns if 'CORREO' in str(col).upper() or 'EMAIL' in str(col).upper()), None)
-
-            if not cedula_col:
-                self.log_message(f"No se encontró la columna de Cédula/Identificación en '{excel_path}'", error=True)
-                return None, None
-            if not celular_col:
-                self.log_message(f"No se encontró la columna de Celular/Teléfono en '{excel_path}'", error=True)
-                return None, None
-
-            self.log_message(f"Columnas a usar -> Cédula: '{cedula_col}', Celular: '{celular_col}', Email: '{email_col or 'No encontrada'}'")
-
-            # 4. Buscar la fila y extraer los datos
-            # Limpiar la columna de cédulas en el dataframe para una comparación más robusta
-            df[cedula_col] = df[cedula_col].astype(str).str.strip()
-            row = df[df[cedula_col] == cedula]
+            # 3. Buscar la cédula en el directorio de contactos (se lee una vez por versión del libro)
+            contact = get_directory(excel_path, sheet_name).lookup(cedula)
 
-            if not row.empty:
-                self.log_message(f"Cédula '{cedula}' encontrada en la fila de índice {row.index[0]}.")
-                phone = str(row.iloc[0][celular_col]).strip()
-                email = str(row.iloc[0][email_col]).strip() if email_col and pd.notna(row.iloc[0][email_col]) else None
+            # 4. Extraer los datos
+            if contact:
+                self.log_message(f"Cédula '{cedula}' encontrada en la fila {contact['row']}.")
+                phone = contact['telefono'] or ''
+                email = contact['email']
 
                 if not phone or phone.lower() == 'nan':
                     self.log_message(f"Teléfono no encontrado para la cédula {cedula}, pero se encontró el email: {email or 'Ninguno'}", error=True)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Rutas de investigaciones y plantillas por empresa, y ubicación del modelo
+del análisis '5 Por Qué'.
+
+Sin dependencias: main.js lo consulta con --get-config sin cargar la
+interfaz ni el modelo.
+
+Uso:
+    python accident_config.py --get-config <EMPRESA>
+    python accident_config.py --get-template-path <EMPRESA>
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+
+
+class Config:
+    RUTA_BASE = Path("G:/Mi unidad/2. Trabajo/1. SG-SST")
+    RUTAS = {
+        "TEMPOACTIVA": {
+            "investigaciones": RUTA_BASE / "2. Temporales Comfa/1. Tempoactiva Est SAS/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/Investigaciones/2. Accidentes",
+            "plantilla": RUTA_BASE / "2. Temporales Comfa/1. Tempoactiva Est SAS/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/Investigaciones/4. Procedimientos/GI-FO-020 INVESTIGACION.docx"
+        },
+        "TEMPOSUM": {
+            "investigaciones": RUTA_BASE / "2. Temporales Comfa/2. Temposum Est SAS/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades",
+            "plantilla": RUTA_BASE / "2. Temporales Comfa/2. Temposum Est SAS/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/4. Procedimientos/GI-FO-020 INVESTIGACION.docx"
+        },
+        "ASEPLUS": {
+            "investigaciones": RUTA_BASE / "2. Temporales Comfa/3. Aseplus/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/3.2.2.1. Investigaciones",
+            "plantilla": RUTA_BASE / "2. Temporales Comfa/3. Aseplus/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/4. Procedimientos/GI-FO-020 INVESTIGACION.docx"
+        },
+        "ASEL": {
+            "investigaciones": RUTA_BASE / "19. Asel S.A.S/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/Investigaciones/2. Accidentes",
+            "plantilla": RUTA_BASE / "19. Asel S.A.S/3. Gestión de la Salud/3.2.2 Investigación de Accidentes, incidentes y Enfermedades/Investigaciones/4. Procedimientos/GI-FO-020 INVESTIGACION.docx"
+        }
+    }
+
+    # Modelo del análisis '5 Por Qué'. Las variables SGSST_MODEL_* tienen
+    # prioridad (main.js las toma de la sección "model" de config.json).
+    # batch_memory_mb: memoria de caché K/V que puede ocupar un lote de
+    # analyze_batch; max_batch_size: accidentes por lote como máximo.
+    # cpu_quantization: pesos del motor 'transformers' sin GPU ("bf16",
+    # "int8" o "int4"; los dos últimos con optimum-quanto).
+    MODELO = {
+        "backend": "transformers",
+        "deterministic": False,
+        "cpu_quantization": "bf16",
+        "batch_memory_mb": 2048,
+        "max_batch_size": 8,
+        "path": r"D:\1. Estudio\1.1 IA\1.1.2. LLM's\Inv. AT\models--mistralai--Mistral-7B-Instruct-v0.3\snapshots\e0bc86c23ce5aae1db576c8cca6f06f1f73af2db",
+    }
+
+    @classmethod
+    def get_model_config(cls):
+        return {
+            "backend": os.environ.get("SGSST_MODEL_BACKEND") or cls.MODELO["backend"],
+            "path": os.environ.get("SGSST_MODEL_PATH") or cls.MODELO["path"],
+            "deterministic": os.environ.get("SGSST_MODEL_DETERMINISTIC", "").lower() in ("1", "true", "yes")
+                             if os.environ.get("SGSST_MODEL_DETERMINISTIC") else cls.MODELO["deterministic"],
+            "batch_memory_mb": float(os.environ.get("SGSST_MODEL_BATCH_MEMORY_MB") or cls.MODELO["batch_memory_mb"]),
+            "max_batch_size": int(os.environ.get("SGSST_MODEL_MAX_BATCH") or cls.MODELO["max_batch_size"]),
+            "cpu_quantization": os.environ.get("SGSST_MODEL_CPU_QUANT") or cls.MODELO["cpu_quantization"],
+        }
+
+    @classmethod
+    def get_empresa_paths(cls, empresa):
+        return cls.RUTAS.get(empresa.upper(), cls.RUTAS["TEMPOACTIVA"])
+
+    @classmethod
+    def get_template_path(cls, empresa):
+        return str(cls.get_empresa_paths(empresa)["plantilla"])
+
+    @classmethod
+    def get_output_dir(cls, empresa):
+        return str(cls.get_empresa_paths(empresa)["generated_reports"])
+
+
+def get_config(empresa):
+    """Rutas de la empresa como cadenas, listas para serializar a JSON."""
+    paths = Config.get_empresa_paths(empresa)
+    return {"empresa": empresa.upper(), **{key: str(value) for key, value in paths.items()}}
+
+
+def main(argv):
+    if len(argv) > 2 and argv[1] == '--get-config':
+        print(json.dumps(get_config(argv[2]), ensure_ascii=False))
+        return 0
+    if len(argv) > 2 and argv[1] == '--get-template-path':
+        print(json.dumps({"template_path": Config.get_template_path(argv[2])}))
+        return 0
+    print(__doc__.strip(), file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Generación del informe GI-FO-020 a partir de la plantilla de la empresa."""
+
+import re
+import logging
+from pathlib import Path
+from datetime import datetime
+
+from docxtpl import DocxTemplate
+
+
+class DocumentGenerator:
+    def generate_informe_accidente(self, data, template_path, output_dir):
+        try:
+            doc = DocxTemplate(template_path)
+            context = data.copy()
+            context = {k.replace(' ', '_').replace('.', ''): v for k, v in data.items()}
+
+            for i in range(1, 6):
+                por_que_key = f"Por Qué {i}"
+                context[f"por_que_{i}"] = data.get(por_que_key, {}).get("causa", "N/A")
+                for m in ["Mano de Obra", "Método", "Maquinaria", "Medio Ambiente", "Material"]:
+                    context[f"por_que_{i}_{m.lower().replace(' ', '_')}"] = data.get(por_que_key, {}).get(m, "N/A")
+            
+            doc.render(context)
+            nombre_sanitizado = re.sub(r'[^\w\s-]', '', data.get('Nombre_Completo', 'sin_nombre')).replace(' ', '_')
+            output_path = Path(output_dir) / f"GI-FO-020_INVESTIGACION_{nombre_sanitizado}_{datetime.now().strftime('%Y%m%d')}.docx"
+            doc.save(output_path)
+            logging.info(f"Informe creado: {output_path}")
+            return str(output_path)
+        except Exception as e:
+            logging.error(f"Error en generate_informe_accidente: {e}")
+            raise
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción de datos del FURAT (PDF del reporte de accidente).
+
+Solo depende de PyMuPDF (fitz) y del registro de reglas, para que la acción
+'extract' de accident_processor.py no cargue la interfaz ni el modelo.
+"""
+
+import re
+import logging
+import unicodedata
+from pathlib import Path
+from datetime import datetime
+
+import fitz
+
+from extraction_rules import REGISTRY
+
+
+class PdfProcessor:
+    def _format_date(self, date_str):
+        if not date_str:
+            return ""
+        formats = [
+            '%d/%m/%Y %I:%M:%S %p', '%Y-%m-%d %H:%M:%S',
+            '%d/%m/%Y %H:%M', '%d/%m/%Y', '%Y-%m-%d',
+            '%d-%m-%Y %H:%M:%S', '%d-%m-%Y'
+        ]
+        for fmt in formats:
+            try:
+                date_obj = datetime.strptime(date_str, fmt)
+                return date_obj.strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+        date_parts = re.findall(r'\b(\d{2}/\d{2}/\d{4})\b', date_str)
+        if date_parts:
+            try:
+                date_obj = datetime.strptime(date_parts[0], '%d/%m/%Y')
+                return date_obj.strftime('%Y-%m-%d')
+            except ValueError:
+                pass
+        logging.warning(f"No se pudo formatear la fecha: {date_str}")
+        return date_str
+
+    def extract_pdf_data(self, pdf_path):
+        try:
+            pdf_path = Path(pdf_path)
+            if not pdf_path.exists():
+                raise FileNotFoundError(f"El archivo PDF no existe: {pdf_path}")
+            doc = fitz.open(pdf_path)
+            text = ""
+            for page in doc:
+                text += page.get_text() + "\n"
+            
+            # Guardar el texto extraído para depuración
+            log_dir = Path("logs")
+            log_dir.mkdir(exist_ok=True)
+            with open(log_dir / f"{pdf_path.stem}_extracted_text.log", "w", encoding="utf-8") as f:
+                f.write(text)
+
+            text = unicodedata.normalize('NFC', text)
+            
+            # Reglas del FURAT en extraction_rules.json, compiladas una sola vez al importar.
+            extracted = REGISTRY.get('furat').extract(text, processors={'format_date': self._format_date})
+            data = {}
+            for key, value in extracted.items():
+                if value is not None:
+                    logging.debug(f"Campo '{key}' extraído: {value}")
+                data[key] = value or "N/A"
+
+            self._validate_critical_data(data, pdf_path)
+            return data
+        except Exception as e:
+            logging.error(f"Error en extract_pdf_data: {e}")
+            raise
+
+    def _validate_critical_data(self, data, pdf_path):
+        errors = [f"{field} no encontrado" for field, value in data.items() if value == "N/A" and field in ['No Identificacion', 'Nombre Completo', 'Fecha del Accidente']]
+        if errors:
+            raise ValueError(f"Errores en la extracción de datos en {pdf_path.name}: {', '.join(errors)}")
+
@@ -0,0 +1,888 @@
+# -*- coding: utf-8 -*-
+"""
+Análisis '5 Por Qué' con el LLM local.
+
+Es el único módulo del flujo de accidentes que carga un modelo; solo lo usan
+la acción 'analyze' de accident_processor.py, accident_model_server.py y la
+interfaz de Invest_APP_V_3.py.
+
+Motores de inferencia (BACKENDS), elegidos con Config.get_model_config():
+
+    transformers  Pesos de Hugging Face. Con CUDA, 4 bits (BitsAndBytes);
+                  sin GPU, bfloat16 o, según cpu_quantization, int8/int4
+                  (optimum-quanto) en CPU.
+    onnx          ONNX Runtime en CPU (optimum) sobre un modelo exportado y
+                  cuantizado a int8, p. ej. con
+                  'optimum-cli export onnx' + 'optimum-cli onnxruntime quantize'.
+    stub          Modelo sustituto sin pesos: responde en el formato del
+                  ejemplo a partir de la descripción. Sirve para probar el
+                  flujo completo (servidor, parseo, informe) sin Mistral-7B.
+    tiny          Modelo Mistral diminuto con pesos aleatorios
+                  (accident_tiny_model.py) cargado por TransformersBackend:
+                  ejecuta la generación real (caché del prefijo, streaming,
+                  parada, modo guiado, lotes) sin los pesos de 7B.
+
+torch, transformers y optimum se importan al cargar el motor que los usa.
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import time
+import logging
+import threading
+import traceback
+import warnings
+
+from accident_config import Config
+
+# Configuración de la GPU y advertencias (antes de importar torch)
+warnings.filterwarnings("ignore")
+os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
+os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"
+os.environ["CUDA_VISIBLE_DEVICES"] = "0"
+
+# Instrucciones y ejemplo fijos del análisis (~700 tokens). Son el prefijo de
+# todos los prompts: su caché K/V se calcula una sola vez (prepare_prefix).
+PROMPT_RULES = """
+Tu rol es ser un analista experto en seguridad laboral. Tu única tarea es realizar un análisis '5 Porqués' para un accidente, siguiendo el formato 5M.
+REGLA ABSOLUTA: Debes responder exclusivamente en español y seguir el formato del ejemplo al pie de la letra.
+
+EJEMPLO DE RESPUESTA ESTRUCTURADA:
+1. ¿Por qué el trabajador se cayó de la escalera? [Causa Directa]
+   • Mano de Obra: El trabajador no mantuvo tres puntos de contacto.
+   • Método: El procedimiento de trabajo en alturas era ambiguo.
+   • Maquinaria: La escalera tenía un peldaño dañado.
+   • Medio Ambiente: El suelo estaba resbaladizo por un derrame.
+   • Material: N/A
+2. ¿Por qué el trabajador no mantuvo tres puntos de contacto?
+   • Mano de Obra: Intentaba cargar una caja mientras subía.
+   • Método: No se prohibió explícitamente subir con objetos en las manos.
+   • Maquinaria: N/A
+   • Medio Ambiente: N/A
+   • Material: La caja era pesada y voluminosa.
+3. ¿Por qué intentaba cargar una caja mientras subía?
+   • Mano de Obra: Quería terminar la tarea más rápido.
+   • Método: La planificación del trabajo no incluyó un sistema de izado.
+   • Maquinaria: No había montacargas disponible en esa área.
+   • Medio Ambiente: N/A
+   • Material: N/A
+4. ¿Por qué la planificación no incluyó un sistema de izado?
+   • Mano de Obra: El supervisor no evaluó correctamente los riesgos.
+   • Método: El formato de permiso de trabajo no tiene un campo para equipos de izado.
+   • Maquinaria: N/A
+   • Medio Ambiente: N/A
+   • Material: N/A
+5. ¿Por qué el supervisor no evaluó correctamente los riesgos?
+   • Mano de Obra: Falta de capacitación en identificación de peligros.
+   • Método: La empresa no tiene un programa de capacitación continua.
+   • Maquinaria: N/A
+   • Medio Ambiente: N/A
+   • Material: N/A
+
+Ahora, realiza el análisis para el siguiente accidente, imitando el formato del ejemplo y siguiendo las reglas.
+- Basa tu análisis en la información proporcionada.
+- Completa los 5 niveles del porqué.
+- Para cada nivel, analiza las 5M (Mano de Obra, Método, Maquinaria, Medio Ambiente, Material). Si una categoría no aplica, indica "N/A".
+- Sé conciso y accionable."""
+
+# Un nivel de la respuesta: "N. ¿Por qué ...", hasta el siguiente nivel o el final.
+LEVEL_PATTERN = r'(\d+)\.\s*¿Por qué(.*?)(?=\n\d+\. ¿Por qué|\Z)'
+
+# La respuesta está completa cuando termina la línea 'Material' del nivel 5.
+COMPLETE_PATTERN = r'5\.\s*¿Por qué.*?•\s*Material:[^\n]*\n'
+
+CATEGORIAS_5M = ["Mano de Obra", "Método", "Maquinaria", "Medio Ambiente", "Material"]
+
+# Decodificación guiada: el texto fijo del formato (5 niveles x 5M) se inserta
+# tal cual y el modelo solo completa cada línea, con este máximo de tokens.
+TEMPLATE_SEGMENTS = [
+    segment
+    for level in range(1, 6)
+    for segment in [("\n" if level > 1 else "") + f"{level}. ¿Por qué"] + [f"\n   • {cat}:" for cat in CATEGORIAS_5M]
+]
+FIELD_MAX_TOKENS = 96
+
+GENERATION_KWARGS = {"max_new_tokens": 1024, "temperature": 0.7, "do_sample": True}
+# Modo determinista: decodificación greedy, el mismo texto para las mismas entradas.
+GREEDY_KWARGS = {"do_sample": False, "temperature": None}
+
+# Subir al cambiar PROMPT_RULES, _build_messages o el parseo: invalida la caché de análisis.
+PROMPT_VERSION = 1
+
+
+class AnalysisCancelled(Exception):
+    """El análisis se canceló; 'partial' tiene los niveles generados hasta ese momento."""
+
+    def __init__(self, partial):
+        super().__init__("Análisis cancelado por el usuario.")
+        self.partial = partial
+
+
+class _LevelProgress:
+    """
+    Sigue el texto generado y llama on_progress cada vez que se completa un
+    nivel 'Por Qué N' (cuando aparece el encabezado del siguiente, o al
+    terminar) o cuando la estimación avanza al menos un punto.
+
+    on_progress recibe {'fraction': 0..1, 'message', 'level', 'por_que'}; los
+    dos últimos solo cuando se acaba de completar un nivel.
+    """
+
+    # Longitud típica de un nivel (en caracteres) antes de tener uno completo.
+    DEFAULT_LEVEL_CHARS = 350
+
+    def __init__(self, analyzer, on_progress):
+        self.analyzer = analyzer
+        self.on_progress = on_progress
+        self.text = ""
+        self.completed = 0
+        self.last_percent = -1
+
+    def feed(self, chunk):
+        self.text += chunk
+        levels = list(re.finditer(LEVEL_PATTERN, self.text, re.DOTALL | re.IGNORECASE))
+        # El último nivel encontrado puede seguir creciendo.
+        self._emit_completed(levels[:-1])
+        if levels and self.completed < 5:
+            done = [len(m.group(0)) for m in levels[:-1]]
+            level_chars = sum(done) / len(done) if done else self.DEFAULT_LEVEL_CHARS
+            current = min(0.95, len(levels[-1].group(0)) / level_chars)
+            self._emit(min(0.99, (self.completed + current) / 5), f"Generando 'Por Qué {self.completed + 1}'...")
+
+    def finish(self):
+        self._emit_completed(list(re.finditer(LEVEL_PATTERN, self.text, re.DOTALL | re.IGNORECASE)))
+
+    def _emit_completed(self, levels):
+        for match in levels[self.completed:]:
+            self.completed += 1
+            level = int(match.group(1))
+            data = self.analyzer._parse_level_content(match.group(2).strip())
+            self._emit(min(1.0, self.completed / 5), f"'Por Qué {level}' generado.",
+                       level=level, por_que=data, force=True)
+
+    def _emit(self, fraction, message, force=False, **extra):
+        percent = int(fraction * 100)
+        if not force and percent <= self.last_percent:
+            return
+        self.last_percent = percent
+        self.on_progress({"fraction": fraction, "message": message, **extra})
+
+
+def analysis_progress(event, start=50, end=95):
+    """Convierte un evento de _LevelProgress en el mensaje NDJSON 'progress' del paso 'analysis'."""
+    progress = {
+        "type": "progress",
+        "step": "analysis",
+        "percentage": start + int((end - start) * event["fraction"]),
+        "message": event["message"],
+    }
+    if "level" in event:
+        progress["level"] = event["level"]
+        progress["por_que"] = event["por_que"]
+    return progress
+
+
+def _stopping_criteria(should_stop=None, tokenizer=None, prompt_length=None, stop_pattern=None):
+    """
+    Criterios de parada de generate(): should_stop() (cancelación) y, si se
+    indica, stop_pattern encontrado en el texto generado desde prompt_length.
+    El patrón solo se evalúa cuando el último token contiene un salto de línea.
+    """
+    from transformers import StoppingCriteria, StoppingCriteriaList
+    import torch
+
+    def done(input_ids, flag):
+        return torch.full((input_ids.shape[0],), flag, dtype=torch.bool, device=input_ids.device)
+
+    class _StopWhen(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return done(input_ids, bool(should_stop()))
+
+    class _StopOnPattern(StoppingCriteria):
+        # Una decisión por fila: en un lote cada respuesta termina por separado.
+        def __call__(self, input_ids, scores, **kwargs):
+            flags = []
+            for row in input_ids:
+                if '\n' not in tokenizer.decode(row[-1:]):
+                    flags.append(False)
+                    continue
+                text = tokenizer.decode(row[prompt_length:], skip_special_tokens=True)
+                flags.append(re.search(stop_pattern, text, re.DOTALL | re.IGNORECASE) is not None)
+            return torch.tensor(flags, dtype=torch.bool, device=input_ids.device)
+
+    criteria = []
+    if should_stop is not None:
+        criteria.append(_StopWhen())
+    if stop_pattern is not None:
+        criteria.append(_StopOnPattern())
+    return StoppingCriteriaList(criteria)
+
+
+# Pesos del motor 'transformers' en CPU (Config.MODELO['cpu_quantization']).
+CPU_QUANTIZATIONS = ('bf16', 'int8', 'int4')
+
+
+class TransformersBackend:
+    supports_prefix_cache = True
+    supports_structured_decoding = True
+    supports_cpu_quantization = True
+    needs_model_path = True
+    # Bytes por elemento de la caché K/V (float16 con CUDA, bfloat16 en CPU).
+    kv_dtype_bytes = 2
+
+    def __init__(self, model_path, cpu_quantization='bf16'):
+        self.prefix_ids = None
+        self.prefix_cache = None
+        from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+        import torch
+
+        self.torch = torch
+        # Contexto de la inferencia; los pesos de optimum-quanto no admiten inference_mode.
+        self.no_grad = torch.inference_mode
+        print("Cargando tokenizer...", file=sys.stderr)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        print(f"Usando dispositivo: {device}", file=sys.stderr)
+        if device.type == "cuda":
+            quantization_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_use_double_quant=True
+            )
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_path,
+                quantization_config=quantization_config,
+                device_map="auto",
+                torch_dtype=torch.float16,
+                trust_remote_code=True,
+                low_cpu_mem_usage=True
+            )
+        else:
+            # BitsAndBytes requiere CUDA; en CPU los pesos se cuantizan con
+            # optimum-quanto (int8/int4) o quedan en bfloat16. Las activaciones
+            # y la caché K/V siguen en bfloat16.
+            if cpu_quantization not in CPU_QUANTIZATIONS:
+                raise ValueError(f"Cuantización en CPU desconocida: {cpu_quantization}")
+            extra = {}
+            if cpu_quantization != 'bf16':
+                from transformers import QuantoConfig
+                extra["quantization_config"] = QuantoConfig(weights=cpu_quantization)
+                self.no_grad = torch.no_grad
+            print(f"Pesos en CPU: {cpu_quantization}", file=sys.stderr)
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_path,
+                torch_dtype=torch.bfloat16,
+                trust_remote_code=True,
+                low_cpu_mem_usage=True,
+                **extra
+            )
+
+    def prepare_prefix(self, messages, prefix_text):
+        """
+        Precalcula la caché K/V de la parte del prompt (ya con la plantilla de
+        chat) que termina en prefix_text. Devuelve el número de tokens.
+        """
+        from transformers import DynamicCache
+
+        rendered = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, tokenize=False)
+        # Sin los saltos de línea extremos, por si la plantilla recorta el contenido.
+        prefix_text = prefix_text.strip()
+        prefix = rendered[:rendered.index(prefix_text) + len(prefix_text)]
+        prefix_ids = self.tokenizer(prefix, add_special_tokens=False, return_tensors="pt").input_ids.to(self.model.device)
+        cache = DynamicCache()
+        with self.no_grad():
+            self.model(input_ids=prefix_ids, past_key_values=cache, use_cache=True)
+        self.prefix_ids = prefix_ids[0]
+        self.prefix_cache = cache
+        return len(self.prefix_ids)
+
+    def _cached_prefix(self, input_ids):
+        """Copia de la caché del prefijo recortada a los tokens que comparte con input_ids."""
+        if self.prefix_cache is None:
+            return None, 0
+        # El último token del prompt siempre se procesa para obtener los logits.
+        limit = min(len(self.prefix_ids), input_ids.shape[-1] - 1)
+        same = (input_ids[0, :limit] == self.prefix_ids[:limit]).long()
+        shared = int(same.cumprod(0).sum())
+        if shared == 0:
+            return None, 0
+        cache = copy.deepcopy(self.prefix_cache)
+        if shared < len(self.prefix_ids):
+            # La tokenización puede unir el final del prefijo con el texto siguiente.
+            cache.crop(shared)
+        return cache, shared
+
+    def _reuse_cache(self, cache, sequence, input_ids):
+        """Recorta la caché de sequence a los tokens que comparte con input_ids."""
+        limit = min(cache.get_seq_length(), sequence.shape[-1], input_ids.shape[-1] - 1)
+        same = (input_ids[0, :limit] == sequence[0, :limit]).long()
+        shared = int(same.cumprod(0).sum())
+        if shared == 0:
+            return None
+        cache.crop(shared)
+        return cache
+
+    def generate(self, messages, on_text=None, should_stop=None, stop_when_complete=True, generation=None):
+        """
+        Devuelve (texto_generado, {'tokens', 'ttft', 'cached_prefix_tokens'}).
+        generation sustituye valores de GENERATION_KWARGS (p. ej. GREEDY_KWARGS).
+
+        El texto se entrega a on_text(fragmento) a medida que se genera
+        (TextIteratorStreamer); si should_stop() devuelve True la generación
+        se detiene en el siguiente token. Con stop_when_complete se detiene al
+        terminar la línea 'Material' del nivel 5 (COMPLETE_PATTERN).
+        """
+        from transformers import TextIteratorStreamer
+
+        start = time.perf_counter()
+        input_ids = self.tokenizer.apply_chat_template(
+            messages, add_generation_prompt=True, return_tensors="pt", return_dict=False).to(self.model.device)
+        cache, shared = self._cached_prefix(input_ids)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        kwargs = dict(input_ids=input_ids, past_key_values=cache, streamer=streamer,
+                      pad_token_id=self.tokenizer.eos_token_id, **{**GENERATION_KWARGS, **(generation or {})})
+        kwargs["stopping_criteria"] = _stopping_criteria(
+            should_stop, self.tokenizer, input_ids.shape[-1], COMPLETE_PATTERN if stop_when_complete else None)
+
+        result = {}
+
+        def run():
+            try:
+                with self.no_grad():
+                    # Con past_key_values, generate() solo hace el prefill de los tokens que no están en la caché.
+                    result["outputs"] = self.model.generate(**kwargs)
+            except Exception as e:
+                result["error"] = e
+                streamer.end()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        first_text_at = None
+        for chunk in streamer:
+            if chunk and first_text_at is None:
+                first_text_at = time.perf_counter()
+            if on_text is not None:
+                on_text(chunk)
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+
+        new_tokens = result["outputs"][0][input_ids.shape[-1]:]
+        stats = {
+            "tokens": len(new_tokens),
+            "ttft": first_text_at - start if first_text_at else None,
+            "cached_prefix_tokens": shared,
+        }
+        return self.tokenizer.decode(new_tokens, skip_special_tokens=True), stats
+
+    def generate_structured(self, messages, segments, on_text=None, should_stop=None, generation=None):
+        """
+        Decodificación guiada por plantilla: inserta cada texto fijo de
+        segments y deja que el modelo complete la línea (hasta el salto de
+        línea o FIELD_MAX_TOKENS). La salida siempre tiene la estructura de la
+        plantilla. La caché K/V se conserva de un segmento al siguiente.
+
+        Devuelve lo mismo que generate(); 'tokens' cuenta solo los generados.
+        """
+        start = time.perf_counter()
+        prompt = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, tokenize=False)
+        kwargs = {**GENERATION_KWARGS, **(generation or {}), "max_new_tokens": FIELD_MAX_TOKENS}
+        text = ""
+        sequence = cache = None
+        shared = generated = 0
+        first_text_at = None
+        for literal in segments:
+            if should_stop is not None and should_stop():
+                break
+            # Se retokeniza todo el texto: la caché solo se reutiliza hasta el primer token distinto.
+            input_ids = self.tokenizer(prompt + text + literal, add_special_tokens=False, return_tensors="pt").input_ids.to(self.model.device)
+            if sequence is None:
+                cache, shared = self._cached_prefix(input_ids)
+            else:
+                cache = self._reuse_cache(cache, sequence, input_ids)
+            with self.no_grad():
+                outputs = self.model.generate(
+                    input_ids=input_ids,
+                    past_key_values=cache,
+                    stopping_criteria=_stopping_criteria(should_stop, self.tokenizer, input_ids.shape[-1], r'\n'),
+                    return_dict_in_generate=True,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    **kwargs,
+                )
+            sequence, cache = outputs.sequences, outputs.past_key_values
+            new_tokens = sequence[0, input_ids.shape[-1]:]
+            generated += len(new_tokens)
+            field = self.tokenizer.decode(new_tokens, skip_special_tokens=True).split("\n")[0].rstrip()
+            piece = literal + (field if field.strip() else " N/A")
+            text += piece
+            if first_text_at is None:
+                first_text_at = time.perf_counter()
+            if on_text is not None:
+                on_text(piece)
+
+        stats = {
+            "tokens": generated,
+            "ttft": first_text_at - start if first_text_at else None,
+            "cached_prefix_tokens": shared,
+        }
+        return text + "\n", stats
+
+
+    def prompt_tokens(self, messages):
+        return len(self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, return_dict=False))
+
+    def kv_bytes_per_token(self):
+        """Memoria de la caché K/V por token de una secuencia (claves y valores de todas las capas)."""
+        config = self.model.config
+        kv_heads = getattr(config, "num_key_value_heads", None) or config.num_attention_heads
+        head_dim = getattr(config, "head_dim", None) or config.hidden_size // config.num_attention_heads
+        return 2 * config.num_hidden_layers * kv_heads * head_dim * self.kv_dtype_bytes
+
+    def generate_batch(self, messages_list, should_stop=None, stop_when_complete=True, generation=None):
+        """
+        Genera varias respuestas en una sola llamada a generate() con relleno a
+        la izquierda. Devuelve una lista de (texto, stats) en el mismo orden.
+        Cada fila se detiene por separado al completar el nivel 5; el lote
+        termina cuando terminan todas. No usa la caché del prefijo: con
+        relleno a la izquierda el prefijo no ocupa las mismas posiciones.
+        """
+        start = time.perf_counter()
+        prompts = [self.tokenizer.apply_chat_template(m, add_generation_prompt=True, tokenize=False) for m in messages_list]
+        self.tokenizer.padding_side = "left"
+        # La plantilla de chat ya incluye el token BOS.
+        batch = self.tokenizer(prompts, add_special_tokens=False, padding=True, return_tensors="pt").to(self.model.device)
+        prompt_length = batch.input_ids.shape[-1]
+        with self.no_grad():
+            sequences = self.model.generate(
+                **batch,
+                stopping_criteria=_stopping_criteria(
+                    should_stop, self.tokenizer, prompt_length, COMPLETE_PATTERN if stop_when_complete else None),
+                pad_token_id=self.tokenizer.pad_token_id,
+                **{**GENERATION_KWARGS, **(generation or {})},
+            )
+        seconds = time.perf_counter() - start
+        results = []
+        for row in sequences[:, prompt_length:]:
+            tokens = int((row != self.tokenizer.pad_token_id).sum())
+            results.append((self.tokenizer.decode(row, skip_special_tokens=True),
+                            {"tokens": tokens, "ttft": None, "cached_prefix_tokens": 0, "batch_seconds": seconds}))
+        return results
+
+
+class OnnxBackend(TransformersBackend):
+    # ORTModelForCausalLM gestiona su propia caché K/V; no acepta una DynamicCache,
+    # y sin ella cada segmento de la decodificación guiada repetiría el prefill.
+    supports_prefix_cache = False
+    supports_structured_decoding = False
+    # La cuantización int8 es la del modelo exportado.
+    supports_cpu_quantization = False
+    # Los modelos exportados con optimum guardan la caché K/V en float32.
+    kv_dtype_bytes = 4
+
+    def __init__(self, model_path, cpu_quantization=None):
+        self.prefix_ids = None
+        self.prefix_cache = None
+        from optimum.onnxruntime import ORTModelForCausalLM
+        from transformers import AutoTokenizer
+        import torch
+
+        self.torch = torch
+        self.no_grad = torch.inference_mode
+        print("Cargando tokenizer...", file=sys.stderr)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.tokenizer.pad_token = self.tokenizer.eos_token
+        print("Usando ONNX Runtime (CPU).", file=sys.stderr)
+        self.model = ORTModelForCausalLM.from_pretrained(model_path, provider="CPUExecutionProvider", use_cache=True)
+
+
+class TinyBackend(TransformersBackend):
+    """Modelo diminuto de pesos aleatorios (accident_tiny_model.py); se construye en la primera carga."""
+    needs_model_path = False
+
+    def __init__(self, model_path=None, cpu_quantization='bf16'):
+        from accident_tiny_model import build_tiny_model
+
+        model_path = build_tiny_model([PROMPT_RULES, *TEMPLATE_SEGMENTS], model_path)
+        super().__init__(model_path, cpu_quantization)
+
+
+class StubBackend:
+    """Sustituto sin pesos: arma una respuesta con el formato que espera el parseo."""
+    supports_prefix_cache = False
+    supports_structured_decoding = False
+    supports_cpu_quantization = False
+    needs_model_path = False
+
+    def __init__(self, model_path=None, cpu_quantization=None):
+        pass
+
+    def generate(self, messages, on_text=None, should_stop=None, stop_when_complete=True, generation=None):
+        prompt = messages[-1]["content"]
+        match = re.search(r'\*\*Descripción del accidente:\*\*\n(.*?)(?:\n\n\*\*|\Z)', prompt, re.DOTALL)
+        hecho = (match.group(1).strip() if match else "ocurrió el accidente").rstrip('.')
+        hecho = hecho[:1].lower() + hecho[1:]
+        lines = []
+        pregunta = hecho
+        for level in range(1, 6):
+            lines.append(f"{level}. ¿Por qué {pregunta}?" + (" [Causa Directa]" if level == 1 else ""))
+            lines.append(f"   • Mano de Obra: Causa de mano de obra del nivel {level}.")
+            lines.append(f"   • Método: Causa de método del nivel {level}.")
+            lines.append("   • Maquinaria: N/A")
+            lines.append("   • Medio Ambiente: N/A")
+            lines.append("   • Material: N/A")
+            pregunta = f"se presentó la causa del nivel {level}"
+        text = ""
+        for line in lines:
+            if should_stop is not None and should_stop():
+                break
+            text += line + "\n"
+            if on_text is not None:
+                on_text(line + "\n")
+        return text, {"tokens": len(text.split()), "ttft": None, "cached_prefix_tokens": 0}
+
+    def prompt_tokens(self, messages):
+        return len(messages[-1]["content"].split())
+
+    def kv_bytes_per_token(self):
+        return 0
+
+    def generate_batch(self, messages_list, should_stop=None, stop_when_complete=True, generation=None):
+        return [self.generate(messages, should_stop=should_stop) for messages in messages_list]
+
+
+# Nombre -> clase del motor (se instancia con la ruta del modelo y la cuantización en CPU).
+BACKENDS = {
+    'transformers': TransformersBackend,
+    'onnx': OnnxBackend,
+    'tiny': TinyBackend,
+    'stub': StubBackend,
+}
+
+
+def generation_params(backend_name, model_path, structured=True, early_stop=True, deterministic=False,
+                      cpu_quantization='bf16'):
+    """Todo lo que, además del prompt, determina la respuesta (forma parte de la clave de caché)."""
+    backend = BACKENDS[backend_name]
+    return {
+        "prompt_version": PROMPT_VERSION,
+        "backend": backend_name,
+        "model": os.path.abspath(model_path) if model_path and backend.needs_model_path else None,
+        "cpu_quantization": cpu_quantization if backend.supports_cpu_quantization else None,
+        "mode": "guiado" if structured and backend.supports_structured_decoding else "libre",
+        "early_stop": early_stop,
+        "generation": {**GENERATION_KWARGS, **(GREEDY_KWARGS if deterministic else {})},
+    }
+
+
+def plan_batches(prompt_lengths, max_new_tokens, bytes_per_token, budget_bytes, max_batch_size):
+    """
+    Agrupa las solicitudes (por índice) en lotes para generate_batch.
+
+    Se ordenan de mayor a menor longitud de prompt para que cada lote tenga
+    poco relleno. Un lote crece mientras su caché K/V en el peor caso
+    (filas x (prompt más largo + max_new_tokens) x bytes_per_token) quepa en
+    budget_bytes y no supere max_batch_size; así se generan tantas filas en
+    paralelo como permite la memoria. Una solicitud que por sí sola excede
+    el presupuesto va en un lote propio.
+    """
+    order = sorted(range(len(prompt_lengths)), key=lambda i: prompt_lengths[i], reverse=True)
+    batches = []
+    current = []
+    for index in order:
+        if current:
+            # El primero del lote es el prompt más largo: fija el ancho con relleno.
+            width = prompt_lengths[current[0]] + max_new_tokens
+            if len(current) >= max_batch_size or (len(current) + 1) * width * bytes_per_token > budget_bytes:
+                batches.append(current)
+                current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def find_cached_analysis(descripcion_accidente, contexto_adicional=""):
+    """
+    Análisis en caché para la configuración por defecto de AccidentAnalyzer,
+    sin cargar el modelo. None si no hay entrada.
+    """
+    from analysis_cache import analysis_key, get_analysis_cache
+
+    model_config = Config.get_model_config()
+    if model_config["backend"] not in BACKENDS:
+        return None
+    params = generation_params(model_config["backend"], model_config["path"], deterministic=model_config["deterministic"],
+                               cpu_quantization=model_config["cpu_quantization"])
+    cached = get_analysis_cache().get(analysis_key(descripcion_accidente, contexto_adicional, params))
+    return cached["analysis"] if cached else None
+
+
+class AccidentAnalyzer:
+    """Genera la metodología '5 Por Qué' usando un LLM (Mistral-7B-Instruct-v0.3)."""
+    def __init__(self, backend=None, model_path=None, prefix_cache=True, structured=True, early_stop=True,
+                 deterministic=None, result_cache=True, batch_memory_mb=None, max_batch_size=None,
+                 cpu_quantization=None):
+        model_config = Config.get_model_config()
+        self.backend_name = backend or model_config["backend"]
+        if self.backend_name not in BACKENDS:
+            raise ValueError(f"Motor de inferencia desconocido: {self.backend_name}")
+        backend_class = BACKENDS[self.backend_name]
+        # 'stub' y 'tiny' no usan la ruta configurada (la de los pesos de 7B).
+        self.model_path = model_path or (model_config["path"] if backend_class.needs_model_path else None)
+        if backend_class.needs_model_path and not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"No se encontró el modelo en la ruta: {self.model_path}")
+        self.cpu_quantization = cpu_quantization or model_config["cpu_quantization"]
+        if self.cpu_quantization not in CPU_QUANTIZATIONS:
+            raise ValueError(f"Cuantización en CPU desconocida: {self.cpu_quantization}")
+        # structured: decodificación guiada por TEMPLATE_SEGMENTS si el motor la admite.
+        # early_stop: en generación libre, parar al completar el nivel 5.
+        self.structured = structured
+        self.early_stop = early_stop
+        # deterministic: greedy (GREEDY_KWARGS) en lugar de muestreo; por defecto, el configurado.
+        self.deterministic = model_config["deterministic"] if deterministic is None else deterministic
+        # Límites de analyze_batch (ver plan_batches).
+        self.batch_memory_mb = batch_memory_mb or model_config["batch_memory_mb"]
+        self.max_batch_size = max_batch_size or model_config["max_batch_size"]
+        # Caché persistente de análisis ya generados (analysis_cache.py).
+        self.result_cache = None
+        if result_cache:
+            from analysis_cache import get_analysis_cache
+            self.result_cache = get_analysis_cache()
+        # Estadísticas de la última generación: {'tokens', 'seconds', 'mode', ...}.
+        self.last_generation = None
+        # Estadísticas del último analyze_batch: {'batches', 'cached', 'tokens', 'seconds', 'tokens_per_second'}.
+        self.last_batch = None
+        try:
+            self.backend = backend_class(self.model_path, self.cpu_quantization)
+            print(f" Modelo cargado exitosamente ({self.backend_name}).", file=sys.stderr)
+        except Exception as e:
+            raise RuntimeError(f"No se pudo cargar el modelo: {e}")
+        if prefix_cache and self.backend.supports_prefix_cache:
+            try:
+                # El marcador solo sirve para ubicar PROMPT_RULES dentro de la plantilla de chat.
+                tokens = self.backend.prepare_prefix(self._build_messages("{descripcion}"), PROMPT_RULES)
+                print(f"Prefijo del prompt en caché: {tokens} tokens.", file=sys.stderr)
+            except Exception as e:
+                logging.warning(f"No se pudo precalcular la caché del prefijo; cada análisis hará el prefill completo: {e}")
+
+    def generation_params(self):
+        return generation_params(self.backend_name, self.model_path, self.structured, self.early_stop, self.deterministic,
+                                 self.cpu_quantization)
+
+    def analyze_5whys(self, descripcion_accidente: str, contexto_adicional: str = "", on_progress=None,
+                      cancel_event=None, regenerate=False) -> dict:
+        """
+        on_progress(evento) recibe el avance de la generación (ver _LevelProgress),
+        incluido cada 'Por Qué N' en cuanto se completa. Si cancel_event
+        (threading.Event) se activa, la generación se detiene y se lanza
+        AnalysisCancelled con los niveles ya generados.
+
+        Si hay caché de resultados, un análisis ya generado con las mismas
+        entradas se devuelve sin llamar al modelo (last_generation['mode'] es
+        'cache'); regenerate=True la ignora y reemplaza la entrada.
+        """
+        if not descripcion_accidente or descripcion_accidente.strip() == "N/A":
+            logging.warning("No se proporcionó descripción del accidente para el análisis. Saltando.")
+            return self._generate_fallback_analysis()
+
+        cache_key = None
+        if self.result_cache is not None:
+            from analysis_cache import analysis_key
+            cache_key = analysis_key(descripcion_accidente, contexto_adicional, self.generation_params())
+            cached = None if regenerate else self.result_cache.get(cache_key)
+            if cached:
+                logging.info("Análisis recuperado de la caché.")
+                self.last_generation = {"seconds": 0.0, "mode": "cache", "tokens": 0, "ttft": None}
+                if on_progress:
+                    for level in range(1, 6):
+                        on_progress({"fraction": level / 5, "message": f"'Por Qué {level}' recuperado de la caché.",
+                                     "level": level, "por_que": cached["analysis"][f"Por Qué {level}"]})
+                return cached["analysis"]
+
+        messages = self._build_messages(descripcion_accidente, contexto_adicional)
+        
+        logging.info(f"Enviando el siguiente prompt al modelo:\n{messages[-1]['content']}")
+
+        progress = _LevelProgress(self, on_progress) if on_progress else None
+        try:
+            start = time.perf_counter()
+            on_text = progress.feed if progress else None
+            should_stop = cancel_event.is_set if cancel_event else None
+            generation = GREEDY_KWARGS if self.deterministic else None
+            if self.structured and self.backend.supports_structured_decoding:
+                mode = "guiado"
+                analysis, stats = self.backend.generate_structured(messages, TEMPLATE_SEGMENTS, on_text, should_stop,
+                                                                   generation=generation)
+            else:
+                mode = "libre"
+                analysis, stats = self.backend.generate(messages, on_text, should_stop,
+                                                        stop_when_complete=self.early_stop, generation=generation)
+            seconds = time.perf_counter() - start
+            if cancel_event is not None and cancel_event.is_set():
+                logging.info("Análisis cancelado; se devuelven los niveles completos.")
+                # El último nivel quedó a medias: se descarta.
+                levels = list(re.finditer(LEVEL_PATTERN, analysis, re.DOTALL | re.IGNORECASE))
+                raise AnalysisCancelled(self._parse_structured_analysis(analysis[:levels[-1].start()] if levels else ""))
+            if progress:
+                progress.finish()
+            self.last_generation = {"seconds": seconds, "mode": mode, **stats}
+            if stats.get("ttft") is not None:
+                logging.info(f"Primer token en {stats['ttft']:.2f} s ({stats.get('cached_prefix_tokens', 0)} tokens de prefijo en caché).")
+            
+            logging.info(f"Respuesta cruda del modelo:\n---\n{analysis}\n---")
+
+            parsed_analysis = self._parse_structured_analysis(analysis)
+            logging.info(f"Análisis parseado: {json.dumps(parsed_analysis, indent=2, ensure_ascii=False)}")
+
+            # Un análisis con niveles sin generar no se guarda: el siguiente intento vuelve a llamar al modelo.
+            if cache_key and all(level["causa"] != "Análisis no generado" for level in parsed_analysis.values()):
+                self.result_cache.put(cache_key, parsed_analysis, {"seconds": seconds, "mode": mode, "tokens": stats.get("tokens")})
+            
+            return parsed_analysis
+        except AnalysisCancelled:
+            raise
+        except Exception as e:
+            logging.error(f"Error en análisis '5 Por Qué': {e}\n{traceback.format_exc()}")
+            return self._generate_fallback_analysis()
+
+    def analyze_batch(self, accidents, on_progress=None, cancel_event=None, regenerate=False) -> list:
+        """
+        Analiza varios accidentes agrupándolos en lotes (plan_batches) y
+        devuelve sus análisis parseados en el mismo orden.
+
+        accidents es una lista de descripciones o de pares (descripción,
+        contexto). Los análisis en caché no pasan por el modelo. Los lotes
+        usan generación libre con parada temprana (la decodificación guiada
+        es secuencial por campo). on_progress recibe {'fraction', 'message',
+        'index'} al terminar cada accidente. Si cancel_event se activa, el
+        lote en curso se descarta y se lanza AnalysisCancelled con la lista
+        de análisis (None en los pendientes).
+        """
+        items = [(accident, "") if isinstance(accident, str) else tuple(accident) for accident in accidents]
+        results = [None] * len(items)
+        cached = [False] * len(items)
+        params = generation_params(self.backend_name, self.model_path, False, self.early_stop, self.deterministic,
+                                   self.cpu_quantization)
+        completed = 0
+
+        def report(index, message):
+            nonlocal completed
+            completed += 1
+            if on_progress:
+                on_progress({"fraction": completed / len(items), "message": message, "index": index})
+
+        pending = []  # (índice, clave de caché, mensajes)
+        for index, (descripcion, contexto) in enumerate(items):
+            if not descripcion or descripcion.strip() == "N/A":
+                results[index] = self._generate_fallback_analysis()
+                report(index, f"Accidente {index + 1}: sin descripción.")
+                continue
+            key = None
+            if self.result_cache is not None:
+                from analysis_cache import analysis_key
+                key = analysis_key(descripcion, contexto, params)
+                hit = None if regenerate else self.result_cache.get(key)
+                if hit:
+                    results[index], cached[index] = hit["analysis"], True
+                    report(index, f"Accidente {index + 1}: recuperado de la caché.")
+                    continue
+            pending.append((index, key, self._build_messages(descripcion, contexto)))
+
+        batches = plan_batches(
+            [self.backend.prompt_tokens(messages) for _, _, messages in pending],
+            GENERATION_KWARGS["max_new_tokens"],
+            self.backend.kv_bytes_per_token(),
+            self.batch_memory_mb * 1024 * 1024,
+            self.max_batch_size,
+        )
+        logging.info(f"analyze_batch: {len(pending)} accidentes por generar en lotes de {[len(b) for b in batches]}.")
+
+        generation = GREEDY_KWARGS if self.deterministic else None
+        should_stop = cancel_event.is_set if cancel_event else None
+        tokens = 0
+        start = time.perf_counter()
+        for batch in batches:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            try:
+                outputs = self.backend.generate_batch([pending[j][2] for j in batch], should_stop,
+                                                      self.early_stop, generation)
+            except Exception as e:
+                logging.error(f"Error en un lote de análisis '5 Por Qué': {e}\n{traceback.format_exc()}")
+                outputs = [None] * len(batch)
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            for j, output in zip(batch, outputs):
+                index, key, _ = pending[j]
+                if output is None:
+                    results[index] = self._generate_fallback_analysis()
+                else:
+                    text, stats = output
+                    tokens += stats["tokens"]
+                    results[index] = self._parse_structured_analysis(text)
+                    if key and all(level["causa"] != "Análisis no generado" for level in results[index].values()):
+                        self.result_cache.put(key, results[index], {"mode": "lote", "tokens": stats["tokens"]})
+                report(index, f"Accidente {index + 1}: análisis generado.")
+        seconds = time.perf_counter() - start
+
+        self.last_batch = {
+            "batches": [len(batch) for batch in batches],
+            "cached": cached,
+            "tokens": tokens,
+            "seconds": seconds,
+            "tokens_per_second": tokens / seconds if seconds > 0 else 0.0,
+        }
+        if cancel_event is not None and cancel_event.is_set():
+            raise AnalysisCancelled(results)
+        return results
+
+    @staticmethod
+    def _build_messages(descripcion_accidente, contexto_adicional=""):
+        descripcion_str = f"**Descripción del accidente:**\n{descripcion_accidente}"
+        contexto_str = f"\n\n**Contexto Adicional:**\n{contexto_adicional}" if contexto_adicional and "Añade aquí" not in contexto_adicional else ""
+        final_user_prompt = f"{PROMPT_RULES}\n\n{descripcion_str}{contexto_str}\n\n**Análisis de 5 Porqués:**"
+        return [{"role": "user", "content": final_user_prompt}]
+
+    def _parse_structured_analysis(self, text: str) -> dict:
+        logging.info(f"Iniciando parseo del siguiente texto:\n---\n{text}\n---")
+        causas = {}
+        matches = re.finditer(LEVEL_PATTERN, text, re.DOTALL | re.IGNORECASE)
+        
+        found_matches = False
+        for match in matches:
+            found_matches = True
+            level = int(match.group(1))
+            if 1 <= level <= 5:
+                level_content = match.group(2).strip()
+                logging.info(f"Encontrado 'Por Qué {level}': Contenido='{level_content[:100]}...' صلصل")
+                causas[f"Por Qué {level}"] = self._parse_level_content(level_content)
+        
+        if not found_matches:
+            logging.warning("No se encontraron coincidencias para el patrón de 'Por Qué' en la respuesta del modelo.")
+
+        for i in range(1, 6):
+            if f"Por Qué {i}" not in causas:
+                causas[f"Por Qué {i}"] = {"causa": "Análisis no generado", "Mano de Obra": "N/A", "Método": "N/A", "Maquinaria": "N/A", "Medio Ambiente": "N/A", "Material": "N/A"}
+        
+        logging.info(f"Resultado final del parseo: {json.dumps(causas, indent=2, ensure_ascii=False)}")
+        return causas
+
+    def _parse_level_content(self, content: str) -> dict:
+        lines = content.split('\n')
+        causa_principal = lines[0].strip()
+        level_data = {"causa": causa_principal, "Mano de Obra": "N/A", "Método": "N/A", "Maquinaria": "N/A", "Medio Ambiente": "N/A", "Material": "N/A"}
+        category_pattern = r'•\s*(Mano de Obra|Método|Maquinaria|Medio Ambiente|Material):\s*(.*?)(?=\n\s*•|\Z)'
+        for match in re.finditer(category_pattern, content, re.DOTALL | re.IGNORECASE):
+            category_map = {"mano de obra": "Mano de Obra", "método": "Método", "maquinaria": "Maquinaria", "medio ambiente": "Medio Ambiente", "material": "Material"}
+            category = next((v for k, v in category_map.items() if k in match.group(1).lower()), None)
+            if category: level_data[category] = match.group(2).strip()
+        return level_data
+
+    def _generate_fallback_analysis(self) -> dict:
+        return {f"Por Qué {i}": {"causa": "Análisis no disponible", "Mano de Obra": "N/A", "Método": "N/A", "Maquinaria": "N/A", "Medio Ambiente": "N/A", "Material": "N/A"} for i in range(1, 6)}
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio residente del modelo de análisis de accidentes.
+
+accident_processor.py analyze crea un AccidentAnalyzer por ejecución, lo que
+vuelve a cargar el tokenizer y los pesos de Mistral-7B (4 bits) en cada
+investigación. Este proceso se mantiene vivo, carga el modelo una sola vez y
+atiende las solicitudes en orden desde una cola. Si pasa 'idle_timeout'
+segundos sin uso, descarga el modelo para liberar memoria (el proceso sigue
+vivo y lo vuelve a cargar con la siguiente solicitud).
+
+Protocolo (una línea JSON por mensaje, como sidecar.py):
+
+    Entrada:
+        {"id": 1, "command": "load"}       carga el modelo; responde al quedar listo
+        {"id": 2, "command": "analyze", "descripcion": "...", "contexto": "...",
+         "regenerate": false}                 regenerate ignora la caché de análisis
+        {"id": 3, "command": "status"}     estado actual, sin esperar a la cola
+        {"id": 5, "command": "cancel", "target": 2}
+                                           cancela el análisis 2 (o el que esté en
+                                           curso); responde de inmediato
+        {"id": 4, "command": "unload"}
+        {"command": "shutdown"}            (o el cierre de stdin) termina el proceso
+
+    Salida:
+        {"type": "ready", "pid": ...}                  el servicio acepta solicitudes
+        {"type": "status", "state": ...}               cambio de estado del modelo
+        {"type": "log", "level": ..., "message": ...}
+        {"type": "progress", "id": ..., "step": "analysis", "percentage": ...,
+         "message": ..., "level": N, "por_que": {...}}  avance de un 'analyze';
+                                           level/por_que al completarse cada nivel
+        {"type": "result", "id": ..., "payload": {...}}
+
+Estados del modelo: 'unloaded', 'loading', 'ready', 'error'.
+
+Uso:
+    python accident_model_server.py [--idle-timeout SEGUNDOS]
+
+El tiempo de inactividad por defecto es SGSST_MODEL_IDLE_TIMEOUT o 600 s
+(0 desactiva la descarga automática).
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+import traceback
+
+DEFAULT_IDLE_TIMEOUT = 600
+
+_output_lock = threading.Lock()
+
+
+def emit(message):
+    with _output_lock:
+        print(json.dumps(message, ensure_ascii=False), flush=True)
+
+
+def log(message, level='INFO'):
+    emit({'type': 'log', 'level': level, 'message': message})
+
+
+class ModelServer:
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.state = 'unloaded'
+        self.error = None
+        self.analyzer = None
+        self.last_used = time.monotonic()
+        self.jobs = queue.Queue()
+        self._current_id = None
+        self._cancel_event = threading.Event()
+        # Solicitudes en cola y las canceladas antes de empezar. Con _lock,
+        # cancel() (hilo de stdin) y _run() ven el mismo estado.
+        self._queued_ids = set()
+        self._cancelled_ids = set()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self.jobs.put(None)
+        self._worker.join()
+
+    def submit(self, request_id, command, request):
+        # El estado pasa a 'loading' en cuanto se pide el modelo, aunque la
+        # cola aún no haya llegado a esta solicitud.
+        if command in ('load', 'analyze') and self.analyzer is None and self.state != 'loading':
+            self._set_state('loading')
+        with self._lock:
+            self._queued_ids.add(request_id)
+        self.jobs.put((request_id, command, request))
+
+    def status(self):
+        return {'success': True, 'state': self.state, 'error': self.error, 'idle_timeout': self.idle_timeout}
+
+    def _set_state(self, state, error=None):
+        self.state = state
+        self.error = error
+        emit({'type': 'status', 'state': state, 'error': error})
+
+    def _run(self):
+        # Un único hilo usa el modelo: las solicitudes se atienden en orden de llegada.
+        while True:
+            try:
+                job = self.jobs.get(timeout=self._poll_interval())
+            except queue.Empty:
+                self._unload_if_idle()
+                continue
+            if job is None:
+                break
+            request_id, command, request = job
+            with self._lock:
+                self._queued_ids.discard(request_id)
+                cancelled = request_id in self._cancelled_ids
+                self._cancelled_ids.discard(request_id)
+                if not cancelled:
+                    # Primero se limpia el evento y después se publica la solicitud en
+                    # curso: una cancelación que llegue ya la encuentra y no se pierde.
+                    self._cancel_event.clear()
+                    self._current_id = request_id
+            if cancelled:
+                emit({'type': 'result', 'id': request_id, 'payload': {
+                    'success': False, 'cancelled': True, 'error': "Solicitud cancelada antes de empezar."}})
+                continue
+            try:
+                payload = getattr(self, f'_do_{command}')(request)
+            except Exception as e:
+                logging.error(f"Error en '{command}': {e}\n{traceback.format_exc()}")
+                payload = {'success': False, 'error': str(e), 'traceback': traceback.format_exc()}
+            finally:
+                with self._lock:
+                    self._current_id = None
+            self.last_used = time.monotonic()
+            emit({'type': 'result', 'id': request_id, 'payload': payload})
+
+    def _poll_interval(self):
+        if not self.idle_timeout or self.analyzer is None:
+            return None
+        return max(1.0, min(30.0, self.idle_timeout / 4))
+
+    def _unload_if_idle(self):
+        if self.analyzer is not None and time.monotonic() - self.last_used >= self.idle_timeout:
+            log(f"Modelo sin uso durante {self.idle_timeout} s; se descarga para liberar memoria.")
+            self._do_unload({})
+
+    def _ensure_loaded(self):
+        if self.analyzer is not None:
+            return
+        if self.state != 'loading':
+            self._set_state('loading')
+        start = time.perf_counter()
+        try:
+            # accident_llm importa torch y transformers; solo se paga al cargar el modelo.
+            from accident_llm import AccidentAnalyzer
+            self.analyzer = AccidentAnalyzer()
+        except Exception as e:
+            self._set_state('error', str(e))
+            raise
+        log(f"Modelo cargado en {time.perf_counter() - start:.1f} s.")
+        self._set_state('ready')
+
+    def _do_load(self, request):
+        self._ensure_loaded()
+        return self.status()
+
+    def _do_analyze(self, request):
+        from accident_llm import AnalysisCancelled, analysis_progress
+
+        self._ensure_loaded()
+        request_id = request.get('id')
+        try:
+            analysis = self.analyzer.analyze_5whys(
+                request.get('descripcion', ''),
+                request.get('contexto', ''),
+                on_progress=lambda event: emit({**analysis_progress(event), 'id': request_id}),
+                cancel_event=self._cancel_event,
+                regenerate=bool(request.get('regenerate')),
+            )
+        except AnalysisCancelled as e:
+            return {'success': False, 'cancelled': True, 'error': str(e), 'analysis': e.partial}
+        cached = (self.analyzer.last_generation or {}).get('mode') == 'cache'
+        return {'success': True, 'analysis': analysis, 'cached': cached}
+
+    def cancel(self, target=None):
+        """
+        Cancela la solicitud 'target' (o la que está en curso si no se indica).
+        Una solicitud en cola se descarta al llegar su turno. False si no hay
+        nada que cancelar (la solicitud ya terminó o no existe).
+        """
+        with self._lock:
+            if target is None or target == self._current_id:
+                if self._current_id is None:
+                    return False
+                self._cancel_event.set()
+                return True
+            if target not in self._queued_ids:
+                return False
+            self._cancelled_ids.add(target)
+            return True
+
+    def _do_unload(self, request):
+        if self.analyzer is not None:
+            self.analyzer = None
+            gc.collect()
+            torch = sys.modules.get('torch')
+            if torch is not None and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            self._set_state('unloaded')
+        return self.status()
+
+
+def serve(idle_timeout):
+    sys.stdin.reconfigure(encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    server = ModelServer(idle_timeout)
+    server.start()
+    emit({'type': 'ready', 'pid': os.getpid()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            command = request.get('command')
+            if command == 'shutdown':
+                break
+            if command == 'status':
+                emit({'type': 'result', 'id': request_id, 'payload': server.status()})
+            elif command == 'cancel':
+                cancelled = server.cancel(request.get('target'))
+                emit({'type': 'result', 'id': request_id, 'payload': {'success': True, 'cancelled': cancelled}})
+            elif command in ('load', 'analyze', 'unload'):
+                server.submit(request_id, command, request)
+            else:
+                raise ValueError(f"Comando desconocido: {command}")
+        except Exception as e:
+            emit({'type': 'result', 'id': request_id, 'payload': {
+                'success': False,
+                'error': f"Solicitud inválida: {str(e)}",
+                'traceback': traceback.format_exc()
+            }})
+
+    server.stop()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(sys.stderr)])
+    parser = argparse.ArgumentParser(description="Servicio residente del modelo de análisis de accidentes.")
+    parser.add_argument("--idle-timeout", type=float,
+                        default=float(os.environ.get('SGSST_MODEL_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT)),
+                        help="Segundos sin uso antes de descargar el modelo (0 = nunca).")
+    args = parser.parse_args()
+    serve(args.idle_timeout)
+
+
+if __name__ == "__main__":
+    main()
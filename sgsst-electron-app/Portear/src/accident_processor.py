@@ -2,11 +2,14 @@
 # -*- coding: utf-8 -*-
 """
 Módulo para procesar accidentes desde la interfaz web
-Mantiene toda la funcionalidad existente de invest_APP_V.3.py
+Mantiene toda la funcionalidad existente de invest_APP_V.3.py; cada acción
+importa solo su módulo (accident_extraction o accident_llm).
 """
 
 import sys
 import json
+import signal
+import threading
 import traceback
 from pathlib import Path
 import logging
@@ -15,16 +18,18 @@ import argparse
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def emit(message):
+    print(json.dumps(message, ensure_ascii=False))
+    sys.stdout.flush()
+
 def send_progress(step, percentage, message):
     """Sends a progress update to stdout."""
-    progress = {
+    emit({
         "type": "progress",
         "step": step,
         "percentage": percentage,
         "message": message
-    }
-    print(json.dumps(progress, ensure_ascii=False))
-    sys.stdout.flush()
+    })
 
 def extract_data_from_pdf(pdf_path):
     """
@@ -32,54 +37,134 @@ def extract_data_from_pdf(pdf_path):
     """
     try:
         sys.path.append(str(Path(__file__).parent))
-        from Invest_APP_V_3 import PdfProcessor
+        from extraction_cache import get_cache
+
+        # Un FURAT ya procesado no necesita importar el extractor ni leer el PDF otra vez.
+        cached = get_cache().get(pdf_path, "furat")
+        if cached:
+            send_progress("finished", 100, "Datos recuperados de la caché de extracción.")
+            return {"success": True, "data": cached["data"], "cached": True}
+
+        # Solo fitz y las reglas: la interfaz y el modelo no se cargan para extraer.
+        from accident_extraction import PdfProcessor
 
         send_progress("setup", 20, "Inicializando extractor de PDF...")
         pdf_processor = PdfProcessor()
 
         send_progress("extraction", 50, f"Extrayendo datos del PDF: {Path(pdf_path).name}")
         extracted_data = pdf_processor.extract_pdf_data(pdf_path)
+        get_cache().put(pdf_path, "furat", extracted_data, "furat")
 
         send_progress("finished", 100, "Extracción completada.")
-        return {"success": True, "data": extracted_data}
+        return {"success": True, "data": extracted_data, "cached": False}
 
     except Exception as e:
         logging.error(f"Error al extraer datos del PDF: {str(e)}")
         logging.error(traceback.format_exc())
         return {"success": False, "error": str(e), "traceback": traceback.format_exc()}
 
-def analyze_accident(extracted_data, contexto_adicional=""):
+def analyze_accident(extracted_data, contexto_adicional="", regenerate=False):
     """
     Analiza los datos de un accidente para determinar las causas.
+    Un análisis ya generado con las mismas entradas sale de la caché de
+    análisis salvo que se pida regenerate.
     """
     try:
         sys.path.append(str(Path(__file__).parent))
-        from Invest_APP_V_3 import AccidentAnalyzer
+        from accident_llm import AccidentAnalyzer, AnalysisCancelled, analysis_progress, find_cached_analysis
+
+        descripcion = extracted_data.get("Descripcion del Accidente", "")
+        # Un análisis ya generado no necesita cargar el modelo.
+        cached = None if regenerate else find_cached_analysis(descripcion, contexto_adicional)
+        if cached:
+            send_progress("finished", 100, "Análisis recuperado de la caché.")
+            return {"success": True, "analysis": cached, "cached": True}
 
         send_progress("setup", 10, "Inicializando analizador de IA...")
         analyzer = AccidentAnalyzer()
 
         send_progress("analysis", 50, "Analizando causas con IA...")
-        descripcion = extracted_data.get("Descripcion del Accidente", "")
-        analysis = analyzer.analyze_5whys(descripcion, contexto_adicional)
+        # Ctrl+C (o SIGINT desde el proceso padre) detiene la generación y devuelve lo generado.
+        cancel_event = threading.Event()
+        signal.signal(signal.SIGINT, lambda signum, frame: cancel_event.set())
+        try:
+            analysis = analyzer.analyze_5whys(
+                descripcion,
+                contexto_adicional,
+                on_progress=lambda event: emit(analysis_progress(event)),
+                cancel_event=cancel_event,
+                regenerate=regenerate,
+            )
+        except AnalysisCancelled as e:
+            send_progress("cancelled", 100, "Análisis cancelado.")
+            return {"success": False, "cancelled": True, "error": str(e), "analysis": e.partial}
 
         send_progress("finished", 100, "Análisis completado.")
-        return {"success": True, "analysis": analysis}
+        return {"success": True, "analysis": analysis, "cached": False}
 
     except Exception as e:
         logging.error(f"Error al analizar el accidente: {str(e)}")
         logging.error(traceback.format_exc())
         return {"success": False, "error": str(e), "traceback": traceback.format_exc()}
 
+def analyze_accidents_batch(accidents, regenerate=False):
+    """
+    Analiza varios accidentes con AccidentAnalyzer.analyze_batch (lotes en
+    una sola llamada al modelo). Cada elemento de accidents son los datos
+    extraídos de un FURAT; la clave opcional "contexto" es su contexto adicional.
+    """
+    try:
+        sys.path.append(str(Path(__file__).parent))
+        from accident_llm import AccidentAnalyzer, AnalysisCancelled
+
+        send_progress("setup", 10, "Inicializando analizador de IA...")
+        analyzer = AccidentAnalyzer()
+
+        send_progress("analysis", 15, f"Analizando {len(accidents)} accidentes con IA...")
+        cancel_event = threading.Event()
+        signal.signal(signal.SIGINT, lambda signum, frame: cancel_event.set())
+        on_progress = lambda event: emit({
+            "type": "progress",
+            "step": "analysis",
+            "percentage": 15 + int(80 * event["fraction"]),
+            "message": event["message"],
+            "index": event["index"],
+        })
+        pairs = [(data.get("Descripcion del Accidente", ""), data.get("contexto", "")) for data in accidents]
+        try:
+            analyses = analyzer.analyze_batch(pairs, on_progress=on_progress, cancel_event=cancel_event,
+                                              regenerate=regenerate)
+            cancelled = False
+        except AnalysisCancelled as e:
+            analyses, cancelled = e.partial, True
+
+        cached = analyzer.last_batch["cached"]
+        results = [
+            {"success": False, "cancelled": True} if analysis is None
+            else {"success": True, "analysis": analysis, "cached": cached[i]}
+            for i, analysis in enumerate(analyses)
+        ]
+        send_progress("cancelled" if cancelled else "finished", 100,
+                      "Análisis cancelado." if cancelled else "Análisis completado.")
+        return {"success": not cancelled, "cancelled": cancelled, "results": results, "stats": analyzer.last_batch}
+
+    except Exception as e:
+        logging.error(f"Error al analizar el lote de accidentes: {str(e)}")
+        logging.error(traceback.format_exc())
+        return {"success": False, "error": str(e), "traceback": traceback.format_exc()}
+
 def main():
     """
     Punto de entrada CLI para el procesamiento de accidentes.
     """
     parser = argparse.ArgumentParser(description="Procesador de accidentes.")
-    parser.add_argument("action", choices=["extract", "analyze"], help="La acción a realizar.")
+    parser.add_argument("action", choices=["extract", "analyze", "analyze-batch"], help="La acción a realizar.")
     parser.add_argument("--pdf_path", help="Ruta al archivo PDF para la acción 'extract'.")
-    parser.add_argument("--json_data", help="String JSON con datos extraídos para la acción 'analyze'.")
+    parser.add_argument("--json_data", help="String JSON con datos extraídos para la acción 'analyze' "
+                                            "(una lista de ellos para 'analyze-batch').")
+    parser.add_argument("--json_file", help="Archivo JSON con la lista de datos extraídos para 'analyze-batch'.")
     parser.add_argument("--contexto", default="", help="Contexto adicional para el análisis.")
+    parser.add_argument("--regenerate", action="store_true", help="Ignora la caché de análisis y vuelve a generar.")
 
     args = parser.parse_args()
 
@@ -94,7 +179,19 @@ def main():
             if not args.json_data:
                 raise ValueError("La acción 'analyze' requiere --json_data.")
             extracted_data = json.loads(args.json_data)
-            result = analyze_accident(extracted_data, args.contexto)
+            result = analyze_accident(extracted_data, args.contexto, args.regenerate)
+
+        elif args.action == "analyze-batch":
+            if args.json_file:
+                with open(args.json_file, encoding="utf-8") as f:
+                    accidents = json.load(f)
+            elif args.json_data:
+                accidents = json.loads(args.json_data)
+            else:
+                raise ValueError("La acción 'analyze-batch' requiere --json_file o --json_data.")
+            if not isinstance(accidents, list):
+                raise ValueError("'analyze-batch' espera una lista de datos extraídos.")
+            result = analyze_accidents_batch(accidents, args.regenerate)
 
     except Exception as e:
         result = {"success": False, "error": str(e), "traceback": traceback.format_exc()}
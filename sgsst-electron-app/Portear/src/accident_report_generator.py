@@ -217,6 +217,78 @@ def guardar_documento_seguro(doc, preferred_dir, filename):
 
 
 
+def generate_report(data, progress=send_progress):
+    """
+    Genera el informe GI-FO-020 con data = {'combinedData', 'empresa'} y
+    devuelve el resultado {'success', 'documentPath', 'message'}. Los errores
+    se propagan; progress(step, percentage, message) recibe el avance.
+    """
+    if 'combinedData' not in data:
+        raise ValueError("No se encontraron 'combinedData' en el archivo JSON")
+    combined_data = data['combinedData']
+    empresa = data.get('empresa', 'TEMPOACTIVA').upper()
+    logging.info(f"Procesando para empresa: {empresa}")
+    empresa_config = Config.RUTAS.get(empresa)
+    if not empresa_config:
+        raise ValueError(f"No se encontró configuración para la empresa: {empresa}")
+    template_path = Path(empresa_config.get('plantilla'))
+    preferred_output_dir = empresa_config.get('investigaciones')
+    if not template_path.exists():
+        raise FileNotFoundError(f"Plantilla no encontrada en: {template_path}")
+    if not preferred_output_dir:
+        raise ValueError(f"No se encontró configuración de carpeta de salida para la empresa: {empresa}")
+    progress("rendering", 50, "Renderizando plantilla...")
+    normalized_data = preparar_datos_para_plantilla(combined_data)
+    logging.info(f"Datos preparados para docxtpl con {len(normalized_data)} campos")
+    doc = DocxTemplate(template_path)
+    doc.render(normalized_data)
+    logging.info("Plantilla renderizada exitosamente")
+    progress("saving", 80, "Preparando para guardar informe...")
+    # --- Nueva lógica para generar nombre de archivo corto y seguro ---
+    nombre_completo = normalized_data.get('nombre_completo', 'sin_nombre')
+    
+    # Procesamiento inteligente del nombre para acortarlo
+    name_parts = [part.strip() for part in nombre_completo.split('\n') if part.strip()]
+    if len(name_parts) > 1:
+        # Asume formatos como "SEGUNDO APELLIDO\nAPELLIDO1 APELLIDO2\nNOMBRES" y toma los últimos elementos
+        nombre_base = "_".join(name_parts[-2:])
+    else:
+        # Fallback para nombres en una sola línea
+        nombre_base = nombre_completo
+    
+    # Sanitización final del nombre
+    nombre_sanitizado = re.sub(r'[^\w\s.-]', '', nombre_base).replace(' ', '_').replace('__', '_')
+    
+    fecha = datetime.now().strftime('%Y%m%d')
+    
+    # Lógica para añadir contador si el archivo ya existe
+    base_filename = f"GI-FO-020_INVESTIGACION_{nombre_sanitizado}_{fecha}"
+    output_filename = f"{base_filename}.docx"
+    
+    # Para la comprobación, usamos una ruta normalizada que Path.exists() pueda manejar
+    # La función de guardado se encargará del prefijo \\?\ si es necesario
+    check_path = Path(os.path.normpath(preferred_output_dir))
+    
+    output_path_check = check_path / output_filename
+    counter = 1
+    while output_path_check.exists():
+        counter += 1
+        output_filename = f"{base_filename}_{counter}.docx"
+        output_path_check = check_path / output_filename
+        
+    logging.info(f"Nombre de archivo final (corto y seguro): {output_filename}")
+    
+    final_path = guardar_documento_seguro(doc, preferred_output_dir, output_filename)
+    progress("finished", 100, f"Informe guardado en: {final_path}")
+    logging.info(f"Informe generado exitosamente: {final_path}")
+    result = {
+        "success": True,
+        "documentPath": final_path,
+        "message": "Informe generado correctamente."
+    }
+    return result
+
+
 def main():
     try:
         if len(sys.argv) < 2:
@@ -225,69 +297,7 @@ def main():
         send_progress("setup", 10, "Cargando datos...")
         with open(data_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
-        if 'combinedData' not in data:
-            raise ValueError("No se encontraron 'combinedData' en el archivo JSON")
-        combined_data = data['combinedData']
-        empresa = data.get('empresa', 'TEMPOACTIVA').upper()
-        logging.info(f"Procesando para empresa: {empresa}")
-        empresa_config = Config.RUTAS.get(empresa)
-        if not empresa_config:
-            raise ValueError(f"No se encontró configuración para la empresa: {empresa}")
-        template_path = Path(empresa_config.get('plantilla'))
-        preferred_output_dir = empresa_config.get('investigaciones')
-        if not template_path.exists():
-            raise FileNotFoundError(f"Plantilla no encontrada en: {template_path}")
-        if not preferred_output_dir:
-            raise ValueError(f"No se encontró configuración de carpeta de salida para la empresa: {empresa}")
-        send_progress("rendering", 50, "Renderizando plantilla...")
-        normalized_data = preparar_datos_para_plantilla(combined_data)
-        logging.info(f"Datos preparados para docxtpl con {len(normalized_data)} campos")
-        doc = DocxTemplate(template_path)
-        doc.render(normalized_data)
-        logging.info("Plantilla renderizada exitosamente")
-        send_progress("saving", 80, "Preparando para guardar informe...")
-        # --- Nueva lógica para generar nombre de archivo corto y seguro ---
-        nombre_completo = normalized_data.get('nombre_completo', 'sin_nombre')
-        
-        # Procesamiento inteligente del nombre para acortarlo
-        name_parts = [part.strip() for part in nombre_completo.split('\n') if part.strip()]
-        if len(name_parts) > 1:
-            # Asume formatos como "SEGUNDO APELLIDO\nAPELLIDO1 APELLIDO2\nNOMBRES" y toma los últimos elementos
-            nombre_base = "_".join(name_parts[-2:])
-        else:
-            # Fallback para nombres en una sola línea
-            nombre_base = nombre_completo
-        
-        # Sanitización final del nombre
-        nombre_sanitizado = re.sub(r'[^\w\s.-]', '', nombre_base).replace(' ', '_').replace('__', '_')
-        
-        fecha = datetime.now().strftime('%Y%m%d')
-        
-        # Lógica para añadir contador si el archivo ya existe
-        base_filename = f"GI-FO-020_INVESTIGACION_{nombre_sanitizado}_{fecha}"
-        output_filename = f"{base_filename}.docx"
-        
-        # Para la comprobación, usamos una ruta normalizada que Path.exists() pueda manejar
-        # La función de guardado se encargará del prefijo \\?\ si es necesario
-        check_path = Path(os.path.normpath(preferred_output_dir))
-        
-        output_path_check = check_path / output_filename
-        counter = 1
-        while output_path_check.exists():
-            counter += 1
-            output_filename = f"{base_filename}_{counter}.docx"
-            output_path_check = check_path / output_filename
-            
-        logging.info(f"Nombre de archivo final (corto y seguro): {output_filename}")
-        
-        final_path = guardar_documento_seguro(doc, preferred_output_dir, output_filename)
-        send_progress("finished", 100, f"Informe guardado en: {final_path}")
-        logging.info(f"Informe generado exitosamente: {final_path}")
-        result = {
-            "success": True,
-            "documentPath": final_path,
-            "message": "Informe generado correctamente."
-        }
+        result = generate_report(data)
         print(json.dumps(result, ensure_ascii=False))
         sys.stdout.flush()
     except Exception as e:
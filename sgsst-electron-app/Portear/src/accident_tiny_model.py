@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo causal diminuto con pesos aleatorios para el motor 'tiny' de accident_llm.
+
+Tiene la arquitectura de Mistral (2 capas, 128 dimensiones, atención con
+grupos de claves) y un tokenizer BPE de bytes entrenado sobre el texto del
+prompt, con una plantilla de chat [INST] ... [/INST] como la de
+Mistral-7B-Instruct. No produce análisis con sentido, pero recorre el mismo
+camino que el modelo real en TransformersBackend: plantilla de chat, caché
+K/V del prefijo, streaming, criterios de parada, decodificación guiada y
+generación por lotes. Así los benchmarks y las pruebas del flujo pueden
+ejecutar generate() sin los pesos de 7B.
+
+Se construye una sola vez (la semilla es fija: siempre los mismos pesos) en
+SGSST_CACHE_DIR/tiny-llm-v<VERSION>, o en la ruta indicada.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from extraction_cache import default_cache_dir
+
+SEED = 1234
+# Subir al cambiar el tokenizer o la configuración: se construye de nuevo.
+VERSION = 2
+VOCAB_SIZE = 1024
+
+CHAT_TEMPLATE = (
+    "{{ bos_token }}{% for message in messages %}"
+    "{% if message['role'] == 'user' %}[INST] {{ message['content'] }} [/INST]"
+    "{% else %}{{ message['content'] }}{{ eos_token }}{% endif %}"
+    "{% endfor %}"
+)
+
+
+def default_tiny_model_dir():
+    return default_cache_dir() / f'tiny-llm-v{VERSION}'
+
+
+def _build_tokenizer(corpus):
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=VOCAB_SIZE,
+        special_tokens=["<unk>", "<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        show_progress=False,
+    )
+    tokenizer.train_from_iterator(corpus, trainer=trainer)
+    # Como el tokenizer de Mistral, sin token_type_ids (generate() los rechaza).
+    wrapped = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>", unk_token="<unk>",
+                                      model_input_names=["input_ids", "attention_mask"])
+    wrapped.chat_template = CHAT_TEMPLATE
+    return wrapped
+
+
+def _build_model(tokenizer):
+    import torch
+    from transformers import MistralConfig, MistralForCausalLM
+
+    config = MistralConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=128,
+        intermediate_size=256,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=8192,
+        sliding_window=None,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.eos_token_id,
+    )
+    # Semilla local: no altera el generador global del proceso.
+    with torch.random.fork_rng():
+        torch.manual_seed(SEED)
+        return MistralForCausalLM(config)
+
+
+def build_tiny_model(corpus, path=None):
+    """
+    Ruta del modelo diminuto; lo construye si aún no existe. corpus es la
+    lista de textos con los que se entrena el tokenizer.
+    """
+    path = Path(path) if path else default_tiny_model_dir()
+    if (path / 'config.json').exists():
+        return str(path)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Se escribe en un directorio temporal y se renombra: otro proceso nunca
+    # ve un modelo a medio guardar.
+    staging = Path(tempfile.mkdtemp(prefix='.tiny-llm-', dir=path.parent))
+    try:
+        tokenizer = _build_tokenizer(corpus)
+        tokenizer.save_pretrained(staging)
+        _build_model(tokenizer).save_pretrained(staging)
+        try:
+            os.replace(staging, path)
+        except OSError:
+            # Otro proceso lo construyó primero.
+            if not (path / 'config.json').exists():
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return str(path)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Caché persistente (SQLite) de análisis '5 Por Qué'.
+
+Mientras se ajusta el informe, el investigador vuelve a pulsar "Analizar"
+sobre la misma descripción del FURAT y cada vez se pagaba una generación
+completa del LLM. La caché guarda el análisis ya parseado y lo devuelve al
+instante cuando coinciden todas las entradas que determinan la respuesta:
+
+    * descripción y contexto adicional normalizados (Unicode NFC y espacios
+      colapsados; el texto de ejemplo del contexto cuenta como vacío),
+    * versión del prompt (PROMPT_VERSION de accident_llm),
+    * motor, modelo y parámetros de generación (incluido el modo guiado y el
+      modo determinista).
+
+Con muestreo (temperature > 0) dos generaciones no dan el mismo resultado; el
+modo determinista (greedy) de AccidentAnalyzer hace que el análisis en caché
+sea el mismo que se obtendría al regenerarlo.
+
+El tamaño total está acotado (SGSST_ANALYSIS_CACHE_MAX_MB, 16 MB por defecto);
+al superarlo se eliminan las entradas usadas hace más tiempo (LRU). La base
+vive junto a la de extracciones (SGSST_CACHE_DIR). Un fallo de la caché nunca
+interrumpe el análisis.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import unicodedata
+from pathlib import Path
+
+from extraction_cache import default_cache_dir
+
+DEFAULT_MAX_MB = 16
+
+# Texto que la interfaz deja en el contexto adicional cuando el usuario no escribe nada.
+CONTEXT_PLACEHOLDER = "Añade aquí"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    meta TEXT,
+    size_bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_last_used ON analyses (last_used);
+"""
+
+
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+def normalize_context(contexto):
+    contexto = normalize_text(contexto)
+    return '' if CONTEXT_PLACEHOLDER in contexto else contexto
+
+
+def analysis_key(descripcion, contexto, params):
+    """SHA-256 de las entradas normalizadas y de params (dict serializable a JSON)."""
+    material = json.dumps({
+        'descripcion': normalize_text(descripcion),
+        'contexto': normalize_context(contexto),
+        'params': params,
+    }, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, path=None, max_bytes=None):
+        self.path = Path(path) if path else default_cache_dir() / 'analyses.sqlite3'
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('SGSST_ANALYSIS_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # El servicio del modelo y accident_processor.py pueden compartir la base.
+            conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, key):
+        """Devuelve {'analysis', 'meta', 'created'} o None si no hay entrada."""
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT data, meta, created FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with conn:
+                conn.execute("UPDATE analyses SET last_used = ? WHERE key = ?", (time.time(), key))
+            return {
+                'analysis': json.loads(row[0]),
+                'meta': json.loads(row[1]) if row[1] else {},
+                'created': row[2],
+            }
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logging.warning(f"Caché de análisis no disponible: {e}")
+            return None
+
+    def put(self, key, analysis, meta=None):
+        try:
+            data_json = json.dumps(analysis, ensure_ascii=False)
+            meta_json = json.dumps(meta, ensure_ascii=False, default=str) if meta else None
+            size_bytes = len(data_json) + len(meta_json or "")
+            now = time.time()
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO analyses (key, data, meta, size_bytes, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, data_json, meta_json, size_bytes, now, now),
+                )
+                self._evict(conn)
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logging.warning(f"No se pudo guardar el análisis en caché: {e}")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size_bytes in conn.execute("SELECT key, size_bytes FROM analyses ORDER BY last_used ASC"):
+            victims.append((key,))
+            excess -= size_bytes
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM analyses WHERE key = ?", victims)
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM analyses")
+
+
+_default_cache = None
+
+
+def get_analysis_cache():
+    """Caché compartida por el proceso (se abre la base en el primer uso)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache()
+    return _default_cache
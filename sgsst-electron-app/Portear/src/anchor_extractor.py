@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Extractor de campos indexado por anclas.
+
+Las reglas de extracción genéricas ejecutaban un re.search independiente por
+campo. Los campos de sección (.*? perezoso con re.DOTALL hasta una parada,
+p. ej. RECOMENDACIONES LABORALES ... hasta MANEJO EPS/ARL o \\Z) evaluaban las
+paradas carácter a carácter y, si la parada no existía, avanzaban sobre todo
+el resto del documento en cada intento.
+
+AnchorExtractor resuelve esos campos con un índice de anclas:
+
+  * Las etiquetas y las paradas se localizan con búsquedas incrementales que
+    nunca vuelven a recorrer un tramo ya examinado (_AnchorIndex).
+  * El valor de una sección es el texto entre el fin de su etiqueta y la
+    primera parada posterior, sin retroceso.
+  * Los campos de valor acotado (sin 'until') se resuelven con su expresión
+    precompilada, que ya termina en la primera coincidencia.
+
+Formato de cada regla (las claves adicionales, como 'processor', se ignoran):
+
+    'pattern'  Expresión regular original del campo (referencia y respaldo).
+    'label'    (sección) Expresión con la que empieza cualquier coincidencia
+               de 'pattern'.
+    'until'    (sección) Lista de paradas. 'pattern' debe tener la forma
+               label + lead + (.*?) + (?=[\\s*](?:until|end)).
+    'lead'     (sección) Separador tras la etiqueta. Por defecto r'[:\\s]*'.
+    'skip_ws'  (sección) True si la parada va precedida de \\s* en 'pattern'.
+    'end'      (sección) '$', r'\\Z' o None si el patrón no admite el final
+               del texto como parada.
+
+El resultado de extract() es {campo: valor_del_primer_grupo | None}, idéntico
+al que producía re.search con las reglas originales.
+"""
+
+import re
+from bisect import bisect_left
+
+DEFAULT_FLAGS = re.IGNORECASE | re.DOTALL
+
+
+class _AnchorIndex:
+    """
+    Posiciones de una ancla en el texto, descubiertas de forma incremental.
+
+    Cada búsqueda continúa desde la última posición examinada (incluyendo
+    coincidencias solapadas), de modo que ningún tramo se recorre dos veces
+    para la misma ancla. El índice cubre el intervalo [base, frontier).
+    """
+
+    def __init__(self, finder, text):
+        self._finder = finder
+        self._text = text
+        self.positions = []
+        self._base = 0
+        self._frontier = 0
+
+    def _advance(self):
+        if self._frontier > len(self._text):
+            return False
+        match = self._finder.search(self._text, self._frontier)
+        if match is None:
+            self._frontier = len(self._text) + 1
+            return False
+        self.positions.append(match.start())
+        self._frontier = match.start() + 1
+        return True
+
+    def __iter__(self):
+        i = 0
+        while i < len(self.positions) or self._advance():
+            yield self.positions[i]
+            i += 1
+
+    def first_at_or_after(self, pos):
+        if pos < self._base:
+            match = self._finder.search(self._text, pos)
+            return match.start() if match else None
+        if pos > self._frontier:
+            # No hace falta indexar el tramo anterior: se reinicia desde pos.
+            self.positions = []
+            self._base = self._frontier = pos
+        i = bisect_left(self.positions, pos)
+        if i < len(self.positions):
+            return self.positions[i]
+        while self._advance():
+            if self.positions[-1] >= pos:
+                return self.positions[-1]
+        return None
+
+
+class AnchorExtractor:
+    def __init__(self, rules, flags=DEFAULT_FLAGS):
+        self.flags = flags
+        self._anchors = {}
+        self._fields = {}
+
+        for key, rule in rules.items():
+            pattern = re.compile(rule['pattern'], flags)
+            if 'until' not in rule:
+                self._fields[key] = {'mode': 'value', 'pattern': pattern}
+                continue
+            if not flags & re.DOTALL:
+                raise ValueError(f"El campo de sección '{key}' requiere re.DOTALL")
+            self._fields[key] = {
+                'mode': 'section',
+                'pattern': pattern,
+                'anchor': self._register_anchor(rule['label']),
+                'label': re.compile(rule['label'], flags),
+                'lead': re.compile(rule.get('lead', r'[:\s]*'), flags),
+                # Todas las paradas del campo forman una sola ancla: la primera
+                # coincidencia a partir del inicio del valor es la parada más cercana.
+                'stops': self._register_anchor('|'.join(f'(?:{stop})' for stop in rule['until'])),
+                'skip_ws': rule.get('skip_ws', False),
+                'end': rule.get('end'),
+            }
+
+    def _register_anchor(self, regex):
+        if regex not in self._anchors:
+            self._anchors[regex] = re.compile(f'(?:{regex})', self.flags)
+        return regex
+
+    def extract(self, text):
+        index = {}
+        data = {}
+        for key, field in self._fields.items():
+            if field['mode'] == 'value':
+                match = field['pattern'].search(text)
+                data[key] = next((g for g in match.groups() if g is not None), "") if match else None
+            else:
+                data[key] = self._resolve_section(text, index, field)
+        return data
+
+    def _anchor_index(self, text, index, anchor):
+        if anchor not in index:
+            index[anchor] = _AnchorIndex(self._anchors[anchor], text)
+        return index[anchor]
+
+    def _resolve_section(self, text, index, field):
+        for pos in self._anchor_index(text, index, field['anchor']):
+            value = self._slice_section(text, index, field, pos)
+            if value is not None:
+                return value
+        return None
+
+    def _slice_section(self, text, index, field, pos):
+        start = field['lead'].match(text, field['label'].match(text, pos).end()).end()
+
+        stop = self._anchor_index(text, index, field['stops']).first_at_or_after(start)
+
+        end = field['end']
+        if end == r'\Z':
+            stop = len(text) if stop is None else stop
+        elif end == '$':
+            # '$' coincide al final del texto y justo antes de un '\n' final.
+            text_end = len(text) - 1 if text.endswith('\n') and len(text) - 1 >= start else len(text)
+            stop = text_end if stop is None else min(stop, text_end)
+        elif stop is None:
+            # Sin parada ni final admitido: se delega en la expresión original,
+            # que puede retroceder sobre la etiqueta antes de fallar.
+            match = field['pattern'].match(text, pos)
+            return next((g for g in match.groups() if g is not None), "") if match else None
+
+        if field['skip_ws']:
+            while stop > start and text[stop - 1].isspace():
+                stop -= 1
+        return text[start:stop]
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Envío de correos con la sesión SMTP reutilizada por cuenta remitente.
+
+EmailSender.enviar_correo abría una conexión nueva con smtp.gmail.com por
+cada mensaje: conexión TCP, STARTTLS, login y quit. Enviar 50 remisiones
+repetía 50 veces ese saludo, y Gmail limita a las cuentas que abren muchas
+sesiones seguidas.
+
+SmtpSession mantiene abierta una sesión autenticada por cuenta y la vuelve a
+abrir si el servidor la cerró (por inactividad o tras un 421), sin que quien
+envía lo note. BulkMailer reparte los mensajes de una cola entre las
+sesiones, respeta un límite de mensajes por minuto por cuenta y reintenta
+los fallos transitorios con espera exponencial. Los rechazos definitivos
+(credenciales inválidas, destinatario inexistente, respuestas 5xx) no se
+reintentan.
+
+El servidor se toma de SGSST_SMTP_HOST, SGSST_SMTP_PORT y SGSST_SMTP_STARTTLS
+(smtp.gmail.com, 587 y STARTTLS por defecto); así los envíos se pueden
+probar contra un servidor SMTP local. SGSST_SMTP_RATE_PER_MIN fija el límite
+por cuenta.
+"""
+
+import os
+import time
+import smtplib
+import logging
+import threading
+from dataclasses import dataclass
+
+DEFAULT_HOST = 'smtp.gmail.com'
+DEFAULT_PORT = 587
+DEFAULT_TIMEOUT = 30
+DEFAULT_RATE_PER_MINUTE = 20
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF = 2.0
+MAX_BACKOFF = 120.0
+
+# Pasado este tiempo sin uso se comprueba la sesión con NOOP antes de enviar.
+IDLE_CHECK_SECONDS = 60
+
+
+@dataclass
+class SmtpSettings:
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_PORT
+    starttls: bool = True
+    timeout: float = DEFAULT_TIMEOUT
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.environ.get('SGSST_SMTP_HOST') or DEFAULT_HOST,
+            port=int(os.environ.get('SGSST_SMTP_PORT') or DEFAULT_PORT),
+            starttls=os.environ.get('SGSST_SMTP_STARTTLS', '1').lower() not in ('0', 'false', 'no'),
+            timeout=float(os.environ.get('SGSST_SMTP_TIMEOUT') or DEFAULT_TIMEOUT),
+        )
+
+
+def is_transient(error):
+    """True si vale la pena reintentar el envío que falló con error."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        # 4xx es temporal (incluido 421 por exceso de mensajes); 5xx es definitivo.
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # Errores de red: conexión rechazada o cortada, tiempo de espera, DNS.
+    return isinstance(error, OSError)
+
+
+class RateLimiter:
+    """Espacia los envíos de una cuenta: como máximo per_minute por minuto."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def available_at(self):
+        return self.next_slot
+
+    def reserve(self):
+        """Reserva el siguiente turno y devuelve los segundos que faltan para él."""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+            return slot - now
+
+
+class SmtpSession:
+    def __init__(self, email, password, settings=None):
+        self.email = email
+        self.password = password
+        self.settings = settings or SmtpSettings.from_env()
+        self.smtp = None
+        self.last_used = 0.0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        settings = self.settings
+        smtp = smtplib.SMTP(settings.host, settings.port, timeout=settings.timeout)
+        try:
+            smtp.ehlo()
+            if settings.starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            smtp.login(self.email, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        self.connections += 1
+        logging.info(f"Sesión SMTP abierta para {self.email} en {settings.host}:{settings.port}")
+
+    def _alive(self):
+        if self.smtp is None:
+            return False
+        if time.monotonic() - self.last_used < IDLE_CHECK_SECONDS:
+            return True
+        try:
+            return self.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, message, to_addrs):
+        """
+        Envía message (email.message.Message) a to_addrs. Si la sesión se
+        había cerrado se abre otra y se repite el envío una vez.
+        """
+        with self.lock:
+            for attempt in (1, 2):
+                if not self._alive():
+                    self.close()
+                    self._connect()
+                try:
+                    self.smtp.send_message(message, self.email, to_addrs)
+                    self.last_used = time.monotonic()
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    self.close()
+                    if attempt == 2:
+                        raise
+                    logging.info(f"El servidor cerró la sesión de {self.email}; reconectando.")
+                except smtplib.SMTPResponseException as e:
+                    # 421: el servidor va a cerrar la conexión (p. ej. demasiados mensajes).
+                    if e.smtp_code == 421:
+                        self.close()
+                    raise
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                self.smtp.close()
+            self.smtp = None
+
+
+@dataclass
+class _Job:
+    position: int
+    credentials: dict
+    message: object
+    to_addrs: list
+    key: object = None
+    attempts: int = 0
+    ready_at: float = 0.0
+    error: str = None
+    transient: bool = False
+    sent: bool = False
+
+
+class BulkMailer:
+    """
+    Cola de envíos con una sesión por cuenta. credentials es el dict de
+    Config.CREDENCIALES ({'email', 'password'}).
+    """
+
+    def __init__(self, settings=None, rate_per_minute=None, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 backoff=DEFAULT_BACKOFF, max_backoff=MAX_BACKOFF):
+        self.settings = settings or SmtpSettings.from_env()
+        if rate_per_minute is None:
+            rate_per_minute = float(os.environ.get('SGSST_SMTP_RATE_PER_MIN') or DEFAULT_RATE_PER_MINUTE)
+        self.rate_per_minute = rate_per_minute
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sessions = {}
+        self.limiters = {}
+        self.queue = []
+        self._lock = threading.Lock()
+
+    def session(self, credentials):
+        with self._lock:
+            email = credentials['email']
+            if email not in self.sessions:
+                self.sessions[email] = SmtpSession(email, credentials['password'], self.settings)
+                self.limiters[email] = RateLimiter(self.rate_per_minute)
+            return self.sessions[email]
+
+    def _retry_delay(self, attempts):
+        return min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+
+    def _attempt(self, session, message, to_addrs):
+        wait = self.limiters[session.email].reserve()
+        if wait > 0:
+            time.sleep(wait)
+        session.send(message, to_addrs)
+
+    def _ready_at(self, job):
+        session = self.session(job.credentials)
+        return max(job.ready_at, self.limiters[session.email].available_at())
+
+    def send(self, credentials, message, to_addrs):
+        """
+        Envía un mensaje enseguida, con los reintentos de la cola. Si no se
+        pudo enviar propaga el último error.
+        """
+        session = self.session(credentials)
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self._attempt(session, message, to_addrs)
+                return
+            except Exception as e:
+                if attempt == self.max_attempts or not is_transient(e):
+                    raise
+                delay = self._retry_delay(attempt)
+                logging.warning(f"Fallo transitorio al enviar a {to_addrs}: {e}. Reintento en {delay:.1f} s.")
+                time.sleep(delay)
+
+    def enqueue(self, credentials, message, to_addrs, key=None):
+        """Encola un mensaje para run(); key identifica el envío en el informe."""
+        self.queue.append(_Job(len(self.queue), credentials, message, to_addrs, key))
+
+    def run(self):
+        """
+        Envía todos los mensajes encolados. Devuelve {'sent', 'failed',
+        'seconds', 'messages_per_second', 'results'}, con un resultado por
+        mensaje en el orden de enqueue(): {'key', 'success', 'attempts',
+        'error', 'transient'}. transient indica si el último fallo se podría
+        reintentar más tarde.
+        """
+        jobs, self.queue = self.queue, []
+        pending = list(jobs)
+        start = time.monotonic()
+        while pending:
+            # El mensaje que primero puede salir: sin reintento pendiente y con cupo en su cuenta.
+            job = min(pending, key=lambda j: (self._ready_at(j), j.position))
+            wait = job.ready_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            job.attempts += 1
+            try:
+                self._attempt(self.session(job.credentials), job.message, job.to_addrs)
+                job.sent, job.error = True, None
+                pending.remove(job)
+            except Exception as e:
+                job.error, job.transient = str(e), is_transient(e)
+                if job.attempts >= self.max_attempts or not is_transient(e):
+                    logging.error(f"No se pudo enviar a {job.to_addrs}: {e}")
+                    pending.remove(job)
+                else:
+                    delay = self._retry_delay(job.attempts)
+                    job.ready_at = time.monotonic() + delay
+                    logging.warning(f"Fallo transitorio al enviar a {job.to_addrs}: {e}. Reintento en {delay:.1f} s.")
+
+        seconds = time.monotonic() - start
+        sent = sum(job.sent for job in jobs)
+        if jobs:
+            logging.info(f"Correos enviados: {sent} de {len(jobs)} en {seconds:.1f} s "
+                         f"({sent / seconds if seconds else 0:.1f} mensajes/s).")
+        return {
+            'sent': sent,
+            'failed': len(jobs) - sent,
+            'seconds': seconds,
+            'messages_per_second': sent / seconds if seconds else 0.0,
+            'results': [{'key': job.key, 'success': job.sent, 'attempts': job.attempts, 'error': job.error,
+                         'transient': job.transient and not job.sent} for job in jobs],
+        }
+
+    def close(self):
+        with self._lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+            self.limiters.clear()
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer():
+    """Mailer compartido por el proceso: el sidecar y la interfaz reutilizan sus sesiones."""
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            _mailer = BulkMailer()
+        return _mailer
@@ -7,54 +7,60 @@ def log_message(message, level="INFO"):
     """Generates a JSON-formatted log message."""
     print(json.dumps({"type": "log", "message": message, "level": level}))
 
-def main(temp_data_path, output_path):
+def generate_acta(changes, output_path):
     """
-    Loads an Excel template, applies changes from a JSON file,
-    and saves the result to a new file, preserving styles.
+    Loads the Excel template, applies the cell changes and saves the result
+    to output_path, preserving styles. Returns the result payload; errors
+    are raised to the caller.
     """
-    try:
-        log_message("Iniciando generación de acta de Comité de Convivencia...")
+    log_message("Iniciando generación de acta de Comité de Convivencia...")
+    log_message(f"Cambios a aplicar: {len(changes)}")
 
-        # 1. Cargar datos del JSON temporal
-        with open(temp_data_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        changes = data.get('changes', [])
-        log_message(f"Cambios a aplicar: {len(changes)}")
+    # 2. Ruta a la plantilla
+    template_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'utils', 'GI-FO-029 ACTA DE REUNION CONVIVENCIA Mayo.xlsx')
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Plantilla no encontrada en: {template_path}")
 
-        # 2. Ruta a la plantilla
-        template_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'utils', 'GI-FO-029 ACTA DE REUNION CONVIVENCIA Mayo.xlsx')
-        if not os.path.exists(template_path):
-            raise FileNotFoundError(f"Plantilla no encontrada en: {template_path}")
+    log_message(f"Cargando plantilla desde: {template_path}")
 
-        log_message(f"Cargando plantilla desde: {template_path}")
+    # 3. Cargar la plantilla con openpyxl
+    wb = load_workbook(template_path)
+    ws = wb.active
 
-        # 3. Cargar la plantilla con openpyxl
-        wb = load_workbook(template_path)
-        ws = wb.active
-
-        # 4. Aplicar cambios a las celdas
-        for change in changes:
-            # openpyxl es 1-indexed, la UI (y JS) es 0-indexed. Se suma 1.
-            row = change.get('row') + 1
-            col = change.get('col') + 1
-            value = change.get('value')
-            
-            if row is not None and col is not None:
-                ws.cell(row=row, column=col, value=value)
+    # 4. Aplicar cambios a las celdas
+    for change in changes:
+        # openpyxl es 1-indexed, la UI (y JS) es 0-indexed. Se suma 1.
+        row = change.get('row') + 1
+        col = change.get('col') + 1
+        value = change.get('value')
         
-        log_message("Todos los cambios han sido aplicados a la plantilla en memoria.")
+        if row is not None and col is not None:
+            ws.cell(row=row, column=col, value=value)
+    
+    log_message("Todos los cambios han sido aplicados a la plantilla en memoria.")
 
-        # 5. Guardar el nuevo archivo en la ruta de salida especificada por el usuario
-        wb.save(output_path)
-        log_message(f"Acta generada exitosamente en: {output_path}")
+    # 5. Guardar el nuevo archivo en la ruta de salida especificada por el usuario
+    wb.save(output_path)
+    log_message(f"Acta generada exitosamente en: {output_path}")
 
-        # 6. Devolver resultado de éxito
+    # 6. Devolver resultado de éxito
+    return {
+        "success": True,
+        "documentPath": output_path
+    }
+
+def main(temp_data_path, output_path):
+    """
+    Loads the changes from a JSON file and generates the acta (generate_acta).
+    """
+    try:
+        # 1. Cargar datos del JSON temporal
+        with open(temp_data_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        payload = generate_acta(data.get('changes', []), output_path)
         print(json.dumps({
             "type": "result",
-            "payload": {
-                "success": True,
-                "documentPath": output_path
-            }
+            "payload": payload
         }))
 
     except Exception as e:
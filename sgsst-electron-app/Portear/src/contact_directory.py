@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Directorio de contactos del personal (cédula -> celular y correo).
+
+EmailSender.obtener_contacto y RemisionesApp._get_contact_info leían con
+pd.read_excel todo el libro de personal (Base de Datos Personal Temporales o
+la base de ASEL) en cada envío de correo o WhatsApp, buscaban las columnas
+por su nombre y comparaban la cédula contra todas las filas.
+
+ContactDirectory toma únicamente las columnas de cédula, celular y correo y
+arma un dict por cédula normalizada. Las búsquedas son por clave. El libro
+solo se vuelve a leer cuando cambia su fecha de modificación o su tamaño.
+
+La lectura no pasa por pandas ni por openpyxl: read_columns recorre el XML
+de la hoja por bloques y solo convierte las celdas de las columnas pedidas.
+Con openpyxl en solo lectura una base de 100.000 filas y 23 columnas tardaba
+más de 30 s, porque se crean todas las celdas de todas las filas.
+
+Los directorios se comparten en el proceso (get_directory), así que la
+interfaz lee cada libro una sola vez. remision_utils, que corre en procesos
+de corta vida, consulta contact_index, que guarda los contactos en disco.
+"""
+
+import re
+import html
+import logging
+import zipfile
+import threading
+import posixpath
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Hoja de cada base de personal; las temporales usan 'COMPLETO'.
+CONTACT_SHEETS = {"ASEL": "FORMATO"}
+DEFAULT_SHEET = "COMPLETO"
+
+# Filas del inicio en las que se buscan los encabezados.
+HEADER_SEARCH_ROWS = 10
+
+# Bytes del XML de la hoja que se procesan de una vez.
+READ_CHUNK = 8 * 1024 * 1024
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+_ROW_RE = re.compile(rb'<row\b[^>]*?(?:/>|>(.*?)</row>)', re.S)
+_CELL_RE = re.compile(rb'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_REF_RE = re.compile(rb'\br="([A-Z]+)(\d+)"')
+_TYPE_RE = re.compile(rb'\bt="(\w+)"')
+_VALUE_RE = re.compile(rb'<v>(.*?)</v>', re.S)
+_TEXT_RE = re.compile(rb'<t\b[^>]*>(.*?)</t>', re.S)
+_PHONETIC_RE = re.compile(rb'<rPh\b.*?</rPh>', re.S)
+_SI_RE = re.compile(rb'<si>(.*?)</si>', re.S)
+
+
+def sheet_for_empresa(empresa):
+    return CONTACT_SHEETS.get((empresa or '').upper(), DEFAULT_SHEET)
+
+
+def normalize_cedula(value):
+    """Cédula sin espacios, puntos de miles ni el '.0' de las celdas numéricas."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = re.sub(r'\.0$', '', str(value).strip())
+    return re.sub(r'[\s.,-]', '', text).upper()
+
+
+def cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text if text and text.lower() != 'nan' else None
+
+
+def _is_cedula_header(name):
+    return 'CEDULA' in name or 'CÉDULA' in name or 'IDENTIFICACIÓN' in name or 'IDENTIFICACION' in name
+
+
+def _is_phone_header(name):
+    return 'CELULAR' in name or 'TELÉFONO' in name or 'TELEFONO' in name
+
+
+def _is_email_header(name):
+    return 'CORREO' in name or 'EMAIL' in name
+
+
+def _column_index(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+def _column_letters(index):
+    letters, index = '', index + 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def _text(raw):
+    # Un parser XML convierte los saltos de línea \r\n en \n; aquí se hace a mano.
+    return html.unescape(raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n'))
+
+
+def _rich_text(raw):
+    return ''.join(_text(t) for t in _TEXT_RE.findall(_PHONETIC_RE.sub(b'', raw)))
+
+
+def _sheet_part(archive, sheet):
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    rel_id = next((node.get(_REL_ID) for node in workbook.iter(f'{_MAIN_NS}sheet') if node.get('name') == sheet), None)
+    if rel_id is None:
+        raise ValueError(f"La hoja '{sheet}' no existe")
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    target = next(node.get('Target') for node in rels if node.get('Id') == rel_id)
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+
+def _shared_strings(archive):
+    try:
+        data = archive.read('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    return [_rich_text(si) for si in _SI_RE.findall(data)]
+
+
+def _cell_value(attrs, inner, shared):
+    if inner is None:
+        return None
+    kind = _TYPE_RE.search(attrs)
+    kind = kind.group(1) if kind else b'n'
+    if kind == b'inlineStr':
+        return _rich_text(inner)
+    value = _VALUE_RE.search(inner)
+    if value is None:
+        return None
+    raw = value.group(1)
+    if kind == b's':
+        return shared[int(raw)]
+    if kind == b'n':
+        number = float(raw)
+        return int(number) if number.is_integer() else number
+    return _text(raw)
+
+
+def _sheet_chunks(archive, part):
+    """Fragmentos del XML de la hoja cortados al final de una fila."""
+    with archive.open(part) as stream:
+        pending = b''
+        while True:
+            chunk = stream.read(READ_CHUNK)
+            if not chunk:
+                break
+            pending += chunk
+            cut = pending.rfind(b'</row>')
+            if cut == -1:
+                continue
+            cut += len(b'</row>')
+            yield pending[:cut]
+            pending = pending[cut:]
+        if pending:
+            yield pending
+
+
+def read_columns(path, sheet, find_columns):
+    """
+    Lee solo algunas columnas de una hoja de un .xlsx.
+
+    find_columns(encabezados) recibe los valores de cada una de las primeras
+    filas y devuelve {nombre: índice de columna} cuando reconoce los
+    encabezados (o None). Devuelve (columnas, filas), donde filas es una
+    lista de (número de fila, {nombre: valor}) de las filas siguientes.
+    """
+    with zipfile.ZipFile(path) as archive:
+        part = _sheet_part(archive, sheet)
+        shared = _shared_strings(archive)
+        columns, header_row, cell_re, letters = None, None, None, None
+        rows, examined = [], 0
+        for chunk in _sheet_chunks(archive, part):
+            if columns is None:
+                for row in _ROW_RE.finditer(chunk):
+                    values, row_number = {}, None
+                    for attrs, inner in _CELL_RE.findall(row.group(1) or b''):
+                        ref = _REF_RE.search(attrs)
+                        if ref:
+                            row_number = int(ref.group(2))
+                            values[_column_index(ref.group(1).decode())] = _cell_value(attrs, inner, shared)
+                    header = [values.get(i) for i in range(max(values) + 1)] if values else []
+                    columns = find_columns(header)
+                    if columns:
+                        header_row = row_number
+                        break
+                    examined += 1
+                    if examined >= HEADER_SEARCH_ROWS:
+                        return None, []
+                if columns is None:
+                    continue
+                letters = {_column_letters(index).encode(): name for name, index in columns.items() if index is not None}
+                names = b'|'.join(letters)
+                cell_re = re.compile(rb'<c\b([^>]*?\br="(' + names + rb')(\d+)"[^>]*?)(?:/>|>(.*?)</c>)', re.S)
+
+            current_row, current = None, None
+            for attrs, column, row_number, inner in cell_re.findall(chunk):
+                row_number = int(row_number)
+                if row_number <= header_row:
+                    continue
+                if row_number != current_row:
+                    current_row, current = row_number, {}
+                    rows.append((row_number, current))
+                current[letters[column]] = _cell_value(attrs, inner, shared)
+        return columns, rows
+
+
+class ContactDirectory:
+    def __init__(self, path, sheet=DEFAULT_SHEET):
+        self.path = Path(path)
+        self.sheet = sheet
+        self.contacts = {}
+        self.columns = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _current_stamp(self):
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _ensure_loaded(self):
+        stamp = self._current_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._load()
+                    self._stamp = stamp
+
+    def _load(self):
+        logging.info(f"Cargando contactos de {self.path.name} (hoja {self.sheet})")
+        columns, rows = read_columns(self.path, self.sheet, self._find_columns)
+        if not columns:
+            raise ValueError(f"Columnas críticas (cédula, celular) no encontradas en {self.path.name}")
+        contacts = {}
+        for row_number, values in rows:
+            cedula = normalize_cedula(values.get('cedula'))
+            # Si la cédula se repite se conserva la primera fila, como antes con pandas.
+            if not cedula or cedula in contacts:
+                continue
+            contacts[cedula] = {
+                'telefono': cell_text(values.get('celular')),
+                'email': cell_text(values.get('correo')),
+                'row': row_number,
+            }
+        self.columns = columns
+        self.contacts = contacts
+        logging.info(f"{len(contacts)} contactos cargados de {self.path.name}")
+
+    @staticmethod
+    def _find_columns(header):
+        names = [str(value).strip().upper() if value is not None else '' for value in header]
+        cedula = next((i for i, name in enumerate(names) if _is_cedula_header(name)), None)
+        celular = next((i for i, name in enumerate(names) if _is_phone_header(name)), None)
+        if cedula is None or celular is None:
+            return None
+        correo = next((i for i, name in enumerate(names) if _is_email_header(name)), None)
+        return {'cedula': cedula, 'celular': celular, 'correo': correo}
+
+    def lookup(self, cedula):
+        """{'telefono', 'email', 'row'} de la cédula, o None si no está."""
+        self._ensure_loaded()
+        return self.contacts.get(normalize_cedula(cedula))
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self.contacts)
+
+
+_directories = {}
+_directories_lock = threading.Lock()
+
+
+def get_directory(path, sheet=DEFAULT_SHEET):
+    """Directorio compartido por el proceso para ese libro y hoja."""
+    key = (str(Path(path)), sheet)
+    with _directories_lock:
+        if key not in _directories:
+            _directories[key] = ContactDirectory(path, sheet)
+        return _directories[key]
+
+
+def find_contact(path, sheet, cedula):
+    """(teléfono, email) de la cédula en el libro de personal, o (None, None)."""
+    contact = get_directory(path, sheet).lookup(cedula)
+    if contact is None:
+        return None, None
+    return contact['telefono'], contact['email']
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Índice persistente (SQLite) de contactos de todas las bases de personal.
+
+ContactDirectory evita releer el libro dentro de un mismo proceso, pero cada
+`remision_utils.py --send-email` lanzado por Electron es un proceso nuevo y
+volvía a leer la base de personal (varios MB en Google Drive) para buscar
+una sola cédula.
+
+ContactIndex guarda en disco, por cada libro y hoja de Config.BASES_DATOS,
+la cédula normalizada, el celular con indicativo (+57), el correo y la fila
+de origen. Las empresas que comparten libro (TEMPOACTIVA, TEMPOSUM y ASEPLUS
+usan la misma base de temporales) comparten también sus filas en el índice.
+
+Antes de cada consulta se compara la fecha de modificación y el tamaño de
+cada libro con los registrados; solo se vuelven a leer los libros que
+cambiaron y solo se reemplazan sus filas. Si un libro no está disponible
+(Google Drive sin conexión) se siguen usando los contactos ya indexados.
+
+La base vive en el directorio de la caché de extracciones (SGSST_CACHE_DIR o
+~/.sgsst/cache). Las búsquedas solo usan sqlite3: no cargan pandas.
+"""
+
+import re
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+from extraction_cache import default_cache_dir
+from contact_directory import ContactDirectory, read_columns, normalize_cedula, sheet_for_empresa, cell_text
+
+COUNTRY_CODE = '57'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    stamp TEXT,
+    contacts INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (path, sheet)
+);
+CREATE TABLE IF NOT EXISTS source_empresas (
+    empresa TEXT NOT NULL,
+    source_id INTEGER NOT NULL,
+    PRIMARY KEY (empresa, source_id)
+);
+CREATE TABLE IF NOT EXISTS contacts (
+    cedula TEXT NOT NULL,
+    source_id INTEGER NOT NULL,
+    telefono TEXT,
+    email TEXT,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (cedula, source_id, row)
+);
+"""
+
+# Separadores entre varios números o correos escritos en la misma celda.
+_MULTI_VALUE_RE = re.compile(r'\s*[/;,]\s*|\s+[yo]\s+', re.I)
+
+
+def normalize_phone(value):
+    """
+    Celular en formato internacional (+573001234567). Si la celda trae varios
+    números se toma el primero; los que no parecen colombianos se dejan con
+    sus dígitos tal cual.
+    """
+    text = cell_text(value)
+    if not text:
+        return None
+    text = next((part for part in _MULTI_VALUE_RE.split(text) if part), '')
+    digits = re.sub(r'\D', '', text)
+    if not digits:
+        return None
+    if text.startswith('+'):
+        return f"+{digits}"
+    if len(digits) == 12 and digits.startswith(COUNTRY_CODE):
+        return f"+{digits}"
+    if len(digits) == 10 and digits[0] in '36':
+        # Celulares (3xx) y fijos con el nuevo marcado nacional (60x).
+        return f"+{COUNTRY_CODE}{digits}"
+    return digits
+
+
+def normalize_email(value):
+    text = cell_text(value)
+    if not text:
+        return None
+    text = next((part for part in _MULTI_VALUE_RE.split(text) if '@' in part), '')
+    return text.lower() or None
+
+
+def contact_sources(bases):
+    """
+    Agrupa {empresa: ruta} (Config.BASES_DATOS) por libro y hoja. Devuelve
+    [(ruta, hoja, [empresas])] en el orden de aparición.
+    """
+    sources = {}
+    for empresa, path in bases.items():
+        if not path:
+            continue
+        key = (str(Path(path)), sheet_for_empresa(empresa))
+        sources.setdefault(key, []).append(empresa.upper())
+    return [(path, sheet, empresas) for (path, sheet), empresas in sources.items()]
+
+
+def _source_stamp(path):
+    stat = Path(path).stat()
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+_MATCH_COLUMNS = ("c.cedula, c.telefono, c.email, s.path, s.sheet, c.row, "
+                  "(SELECT group_concat(e.empresa) FROM source_empresas e WHERE e.source_id = s.id)")
+
+
+def _match(row):
+    return {'cedula': row[0], 'telefono': row[1], 'email': row[2], 'source': row[3], 'sheet': row[4],
+            'row': row[5], 'empresas': sorted(row[6].split(',')) if row[6] else []}
+
+
+class ContactIndex:
+    def __init__(self, path=None):
+        self.path = Path(path) if path else default_cache_dir() / 'contacts.sqlite3'
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # El sidecar, la CLI y la interfaz comparten la base.
+            conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def refresh(self, sources):
+        """
+        Vuelve a indexar los libros de sources ([(ruta, hoja, [empresas])])
+        que cambiaron desde la última vez. Devuelve cuántos se reindexaron.
+        """
+        rebuilt = 0
+        with self._lock:
+            conn = self._connection()
+            for path, sheet, empresas in sources:
+                source_id, stamp = self._source(conn, path, sheet, empresas)
+                try:
+                    current = _source_stamp(path)
+                except OSError:
+                    logging.warning(f"Base de personal no disponible: {path}. Se usan los contactos indexados.")
+                    continue
+                if current == stamp:
+                    continue
+                try:
+                    contacts = self._read_source(path, sheet)
+                except Exception as e:
+                    # Se reintenta en la próxima consulta (p. ej. Google Drive sincronizando).
+                    logging.error(f"No se pudo indexar {Path(path).name}: {e}")
+                    continue
+                self._replace_source(conn, source_id, path, current, contacts)
+                rebuilt += 1
+        return rebuilt
+
+    def _source(self, conn, path, sheet, empresas):
+        row = conn.execute("SELECT id, stamp FROM sources WHERE path = ? AND sheet = ?", (path, sheet)).fetchone()
+        if row is not None:
+            registered = {r[0] for r in conn.execute(
+                "SELECT empresa FROM source_empresas WHERE source_id = ?", (row[0],))}
+            if registered == set(empresas):
+                return row
+        # Libro nuevo o cambio de empresas en Config.BASES_DATOS.
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO sources (path, sheet) VALUES (?, ?)", (path, sheet))
+            source_id, stamp = conn.execute(
+                "SELECT id, stamp FROM sources WHERE path = ? AND sheet = ?", (path, sheet)).fetchone()
+            conn.execute("DELETE FROM source_empresas WHERE source_id = ?", (source_id,))
+            conn.executemany("INSERT INTO source_empresas (empresa, source_id) VALUES (?, ?)",
+                             [(empresa, source_id) for empresa in set(empresas)])
+        return source_id, stamp
+
+    def _read_source(self, path, sheet):
+        logging.info(f"Indexando contactos de {Path(path).name} (hoja {sheet})")
+        columns, rows = read_columns(path, sheet, ContactDirectory._find_columns)
+        if not columns:
+            logging.warning(f"Columnas críticas (cédula, celular) no encontradas en {Path(path).name}")
+            return []
+        contacts = []
+        for row_number, values in rows:
+            cedula = normalize_cedula(values.get('cedula'))
+            if cedula:
+                contacts.append((cedula, normalize_phone(values.get('celular')),
+                                 normalize_email(values.get('correo')), row_number))
+        return contacts
+
+    def _replace_source(self, conn, source_id, path, stamp, contacts):
+        with conn:
+            conn.execute("DELETE FROM contacts WHERE source_id = ?", (source_id,))
+            conn.executemany(
+                "INSERT INTO contacts (cedula, source_id, telefono, email, row) VALUES (?, ?, ?, ?, ?)",
+                [(cedula, source_id, telefono, email, row) for cedula, telefono, email, row in contacts])
+            count = conn.execute("SELECT COUNT(*) FROM contacts WHERE source_id = ?", (source_id,)).fetchone()[0]
+            conn.execute("UPDATE sources SET stamp = ?, contacts = ? WHERE id = ?", (stamp, count, source_id))
+        logging.info(f"{count} contactos indexados de {Path(path).name}")
+
+    def lookup(self, cedula, empresa=None):
+        """
+        Filas de la cédula en las bases de personal, en orden de libro y de
+        fila: [{'cedula', 'telefono', 'email', 'empresas', 'source', 'sheet',
+        'row'}]. Con empresa solo se buscan los libros de esa empresa.
+        """
+        query = (f"SELECT {_MATCH_COLUMNS} FROM contacts c JOIN sources s ON s.id = c.source_id "
+                 "WHERE c.cedula = ?")
+        params = [normalize_cedula(cedula)]
+        if empresa:
+            query += " AND c.source_id IN (SELECT source_id FROM source_empresas WHERE empresa = ?)"
+            params.append(empresa.upper())
+        with self._lock:
+            rows = self._connection().execute(query + " ORDER BY s.id, c.row", params).fetchall()
+        return [_match(row) for row in rows]
+
+    def resolve(self, queries):
+        """
+        Resuelve varias cédulas con una sola consulta. queries es una lista de
+        (cédula, empresa o None). Devuelve, en el mismo orden, un resultado
+        por consulta con 'status':
+
+            found       una sola persona: 'telefono', 'email' y el origen
+            not_found   la cédula no está en las bases (de esa empresa)
+            ambiguous   aparece en varios libros (varias empresas) o en
+                        varias filas con datos de contacto distintos; las
+                        filas van en 'matches'
+        """
+        wanted = [(position, normalize_cedula(cedula), empresa.upper() if empresa else None)
+                  for position, (cedula, empresa) in enumerate(queries)]
+        matches = [[] for _ in wanted]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted "
+                         "(position INTEGER PRIMARY KEY, cedula TEXT NOT NULL, empresa TEXT)")
+            conn.execute("DELETE FROM wanted")
+            conn.executemany("INSERT INTO wanted (position, cedula, empresa) VALUES (?, ?, ?)", wanted)
+            rows = conn.execute(
+                f"SELECT w.position, {_MATCH_COLUMNS} FROM wanted w "
+                "JOIN contacts c ON c.cedula = w.cedula JOIN sources s ON s.id = c.source_id "
+                "WHERE w.empresa IS NULL OR EXISTS (SELECT 1 FROM source_empresas e "
+                "WHERE e.source_id = c.source_id AND e.empresa = w.empresa) "
+                "ORDER BY w.position, s.id, c.row").fetchall()
+            conn.execute("DELETE FROM wanted")
+            conn.commit()
+        for row in rows:
+            matches[row[0]].append(_match(row[1:]))
+
+        results = []
+        for (_, cedula, empresa), found in zip(wanted, matches):
+            result = {'cedula': cedula, 'empresa': empresa}
+            contacts = {(match['telefono'], match['email']) for match in found}
+            if not found:
+                result['status'] = 'not_found'
+            elif len({match['source'] for match in found}) > 1 or len(contacts) > 1:
+                result.update(status='ambiguous', matches=found)
+            else:
+                result.update(found[0], status='found')
+            results.append(result)
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(bases):
+    """Índice compartido por el proceso, actualizado con los libros de bases."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ContactIndex()
+    _index.refresh(contact_sources(bases))
+    return _index
+
+
+def find_contact(bases, empresa, cedula):
+    """(teléfono, email) de la cédula en la base de personal de la empresa, o (None, None)."""
+    matches = get_index(bases).lookup(cedula, empresa)
+    if not matches:
+        return None, None
+    # Si la cédula se repite se conserva la primera fila, como en ContactDirectory.
+    return matches[0]['telefono'], matches[0]['email']
+
+
+def resolve_contacts(bases, queries):
+    """ContactIndex.resolve sobre el índice compartido, actualizado con bases."""
+    return get_index(bases).resolve(queries)
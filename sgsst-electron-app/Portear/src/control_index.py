@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Índice persistente (SQLite) de los archivos de control de remisiones.
+
+Para decidir entre actualizar o añadir una fila, ControlWorkbook recorría
+todas las filas del GI-FO-012 y normalizaba la cédula y la fecha de atención
+de cada una. El índice guarda, junto a cada libro, la fila y el Item de cada
+(cédula, fecha de atención), el Item máximo y la última fila ocupada. Así la
+búsqueda de duplicados y el siguiente Item son consultas por clave.
+
+El índice se valida con la fecha de modificación y el tamaño del libro
+registrados en la última escritura de la aplicación. Si el libro se editó
+fuera de la aplicación (Excel, otra copia sincronizada por Google Drive),
+no coinciden y ControlWorkbook lo reconstruye a partir de las filas.
+
+El archivo vive en la misma carpeta que el libro
+(.<nombre del libro>.index.sqlite3). Si no se puede crear allí, se usa un
+índice en memoria y el libro se recorre como antes.
+"""
+
+import logging
+import sqlite3
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    cedula TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    item INTEGER,
+    PRIMARY KEY (cedula, fecha)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+def index_path_for(workbook_path):
+    workbook_path = Path(workbook_path)
+    return workbook_path.with_name(f".{workbook_path.name}.index.sqlite3")
+
+
+def _fecha_key(fecha):
+    return fecha.isoformat() if fecha else ''
+
+
+class ControlIndex:
+    def __init__(self, workbook_path, path=None):
+        self.workbook_path = Path(workbook_path)
+        self.path = path if path is not None else index_path_for(self.workbook_path)
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            try:
+                # Sin WAL: la carpeta puede estar sincronizada por Google Drive.
+                conn = sqlite3.connect(str(self.path), timeout=10)
+                conn.executescript(_SCHEMA)
+            except (sqlite3.Error, OSError) as e:
+                logging.warning(f"Índice del control no disponible en {self.path}: {e}. Se usa un índice en memoria.")
+                self.path = ':memory:'
+                conn = sqlite3.connect(':memory:')
+                conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _meta(self, key, default=None):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._connection().execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _workbook_stamp(self):
+        stat = self.workbook_path.stat()
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def is_valid(self):
+        """True si el índice corresponde a la versión actual del libro."""
+        try:
+            return self.workbook_path.exists() and self._meta('workbook') == self._workbook_stamp()
+        except (sqlite3.Error, OSError):
+            return False
+
+    @property
+    def max_item(self):
+        return self._meta('max_item', 0)
+
+    @property
+    def last_row(self):
+        return self._meta('last_row')
+
+    def lookup(self, cedula, fecha=None):
+        """Fila del registro (cédula, fecha); sin fecha, la primera fila de la cédula."""
+        conn = self._connection()
+        if fecha is None:
+            row = conn.execute("SELECT MIN(row) FROM records WHERE cedula = ?", (cedula,)).fetchone()
+        else:
+            row = conn.execute("SELECT row FROM records WHERE cedula = ? AND fecha = ?",
+                               (cedula, _fecha_key(fecha))).fetchone()
+        return row[0] if row else None
+
+    def rebuild(self, entries, first_free_row):
+        """
+        Reemplaza el índice con entries: (fila, cédula, fecha, item) en orden
+        de fila. first_free_row - 1 es la última fila si no hay registros.
+        """
+        conn = self._connection()
+        conn.execute("DELETE FROM records")
+        conn.execute("DELETE FROM meta")
+        last_row, max_item = first_free_row - 1, 0
+        records = []
+        for row, cedula, fecha, item in entries:
+            last_row = max(last_row, row)
+            if item is not None:
+                max_item = max(max_item, item)
+            if cedula:
+                records.append((cedula, _fecha_key(fecha), row, item))
+        conn.executemany("INSERT OR IGNORE INTO records (cedula, fecha, row, item) VALUES (?, ?, ?, ?)", records)
+        self._set_meta('max_item', max_item)
+        self._set_meta('last_row', last_row)
+
+    def add(self, row, cedula, fecha, item):
+        """Registra una fila ocupada; si la clave ya existe se conserva la primera fila."""
+        if row > (self.last_row or 0):
+            self._set_meta('last_row', row)
+        if item is not None and item > self.max_item:
+            self._set_meta('max_item', item)
+        if cedula:
+            self._connection().execute(
+                "INSERT OR IGNORE INTO records (cedula, fecha, row, item) VALUES (?, ?, ?, ?)",
+                (cedula, _fecha_key(fecha), row, item))
+
+    def commit(self):
+        """Confirma los cambios y los asocia a la versión del libro recién guardada."""
+        try:
+            self._set_meta('workbook', self._workbook_stamp())
+            self._connection().commit()
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"No se pudo guardar el índice del control: {e}")
+
+    def rollback(self):
+        if self._conn is not None:
+            self._conn.rollback()
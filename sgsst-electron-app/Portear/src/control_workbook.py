@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Escritura en el lugar del archivo de control de remisiones (GI-FO-012).
+
+ExcelHandler.update_control_file leía todo el libro con pandas y lo volvía a
+escribir entero con pd.ExcelWriter por cada remisión. Eso perdía el
+encabezado de la plantilla (filas 1 a 6), los estilos y los anchos de
+columna, y convertía las fechas y cédulas a los tipos que pandas infería.
+
+ControlWorkbook abre el libro con openpyxl, localiza la fila del registro
+(la misma cédula y fecha de atención, o la siguiente fila libre) y escribe
+solo esas celdas. Las filas nuevas copian el estilo de la fila anterior. El
+resto del libro se guarda tal como estaba.
+
+Un ControlWorkbook abierto admite varias escrituras antes de save(): cada
+upsert cuesta lo mismo sin importar cuántas filas tenga el control. La fila
+de cada (cédula, fecha) y el Item máximo salen de ControlIndex, el índice
+persistente junto al libro; las filas solo se recorren para reconstruirlo.
+"""
+
+import re
+import time
+import logging
+from copy import copy
+from pathlib import Path
+from datetime import date, datetime
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from control_index import ControlIndex
+
+# Fila de encabezados de la plantilla (header_row=6 en pandas, base 0).
+HEADER_ROW = 7
+FIRST_DATA_ROW = HEADER_ROW + 1
+
+CEDULA_COLUMN = 'No. Identificación'
+FECHA_COLUMN = 'Fecha de Atención'
+ITEM_COLUMN = 'Item'
+NOMBRE_COLUMN = 'Nombre Completo'
+
+# Reintentos de guardado mientras Google Drive o Excel tienen el archivo abierto.
+SAVE_RETRIES = 5
+SAVE_RETRY_DELAY = 0.5
+
+# Formatos de fecha vistos en el control y en los certificados.
+_DATE_FORMATS = ('%Y/%m/%d', '%d/%m/%Y', '%d %m %Y', '%Y-%m-%d', '%d-%m-%Y')
+
+
+def normalize_cedula(value):
+    """Cédula como texto, sin el '.0' que deja Excel en los números."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return re.sub(r'\.0$', '', str(value)).strip()
+
+
+def normalize_fecha(value):
+    """Fecha de atención como date (o None si no se reconoce)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if hasattr(value, 'to_pydatetime'):  # pandas.Timestamp
+        return value.to_pydatetime().date()
+    text = str(value).strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _item_number(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class ControlWorkbook:
+    def __init__(self, path, columns, use_index=True):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.workbook = None
+        self.sheet = None
+        self.column_index = {}
+        # (cédula, fecha) -> fila e Item, para localizar el registro.
+        self.index = ControlIndex(self.path, path=None if use_index else ':memory:')
+        self.modified = False
+
+    def load(self):
+        if self.path.exists():
+            index_valid = self.index.is_valid()
+            self.workbook = load_workbook(self.path)
+            self.sheet = self.workbook.active
+        else:
+            logging.info(f"Archivo de control no existe. Creando nuevo en: {self.path}")
+            self.workbook = Workbook()
+            self.sheet = self.workbook.active
+            for col, name in enumerate(self.columns, start=1):
+                cell = self.sheet.cell(row=HEADER_ROW, column=col, value=name)
+                cell.font = Font(bold=True)
+            self.modified = True
+            index_valid = False
+        self._locate_columns()
+        if not index_valid:
+            self._rebuild_index()
+        return self
+
+    def _locate_columns(self):
+        header = next(self.sheet.iter_rows(min_row=HEADER_ROW, max_row=HEADER_ROW, values_only=True), ())
+        found = {str(name).strip(): col for col, name in enumerate(header, start=1) if name is not None}
+        if CEDULA_COLUMN in found:
+            self.column_index = {name: found[name] for name in self.columns if name in found}
+        else:
+            # Sin encabezados reconocibles se asume el orden de COLUMNAS_CONTROL.
+            logging.warning(f"Encabezados no encontrados en la fila {HEADER_ROW} de {self.path.name}; se usa el orden estándar.")
+            self.column_index = {name: col for col, name in enumerate(self.columns, start=1)}
+
+    def _rebuild_index(self):
+        if self.path.exists():
+            logging.info(f"Reconstruyendo el índice de {self.path.name}.")
+        key_columns = [self.column_index.get(name) for name in (ITEM_COLUMN, CEDULA_COLUMN, FECHA_COLUMN, NOMBRE_COLUMN)]
+        max_col = max(col for col in key_columns if col)
+        entries = []
+        for row_number, values in enumerate(
+                self.sheet.iter_rows(min_row=FIRST_DATA_ROW, max_col=max_col, values_only=True),
+                start=FIRST_DATA_ROW):
+            item, cedula, fecha, nombre = (values[col - 1] if col else None for col in key_columns)
+            if item in (None, '') and cedula in (None, '') and nombre in (None, ''):
+                continue
+            entries.append((row_number, normalize_cedula(cedula), normalize_fecha(fecha), _item_number(item)))
+        self.index.rebuild(entries, FIRST_DATA_ROW)
+        if self.path.exists():
+            self.index.commit()
+
+    def find_row(self, cedula, fecha=None):
+        """Fila del registro con esa cédula y fecha (solo cédula si no hay fecha)."""
+        return self.index.lookup(normalize_cedula(cedula), normalize_fecha(fecha) if fecha is not None else None)
+
+    def upsert(self, cedula, fecha, row_values, update_values):
+        """
+        Actualiza el registro existente con update_values o añade una fila
+        nueva con row_values (el Item se asigna aquí). Devuelve (fila, acción).
+        """
+        cedula = normalize_cedula(cedula)
+        fecha = normalize_fecha(fecha)
+        row_number = self.find_row(cedula, fecha)
+        if row_number is not None:
+            self._write_cells(row_number, update_values)
+            action = "actualizado"
+        else:
+            row_number = self.index.last_row + 1
+            item = self.index.max_item + 1
+            self._copy_row_style(row_number)
+            self._write_cells(row_number, {**row_values, ITEM_COLUMN: item})
+            self.index.add(row_number, cedula, fecha, item)
+            action = f"añadido en la fila {row_number}"
+        self.modified = True
+        return row_number, action
+
+    def _write_cells(self, row_number, values):
+        for name, value in values.items():
+            col = self.column_index.get(name)
+            if col is not None:
+                self.sheet.cell(row=row_number, column=col, value=self._cell_value(name, value))
+
+    def _cell_value(self, name, value):
+        if value is None or value == '':
+            return None
+        if name == CEDULA_COLUMN:
+            # La plantilla guarda las cédulas como número.
+            cedula = normalize_cedula(value)
+            return int(cedula) if cedula.isdigit() and not cedula.startswith('0') else cedula
+        if name == FECHA_COLUMN:
+            fecha = normalize_fecha(value)
+            return datetime.combine(fecha, datetime.min.time()) if fecha else str(value)
+        if name == 'Edad':
+            return _item_number(value)
+        return value
+
+    def _copy_row_style(self, row_number):
+        source = row_number - 1
+        if source < FIRST_DATA_ROW:
+            return
+        for col in self.column_index.values():
+            above = self.sheet.cell(row=source, column=col)
+            if above.has_style:
+                cell = self.sheet.cell(row=row_number, column=col)
+                cell._style = copy(above._style)
+        height = self.sheet.row_dimensions[source].height
+        if height is not None:
+            self.sheet.row_dimensions[row_number].height = height
+
+    def save(self):
+        if self.modified:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                for attempt in range(SAVE_RETRIES):
+                    try:
+                        self.workbook.save(self.path)
+                        break
+                    except PermissionError:
+                        if attempt == SAVE_RETRIES - 1:
+                            raise
+                        logging.warning(f"{self.path.name} está en uso; reintentando el guardado.")
+                        time.sleep(SAVE_RETRY_DELAY * (attempt + 1))
+            except Exception:
+                self.index.rollback()
+                raise
+            self.index.commit()
+            self.modified = False
+        return str(self.path)
+
+    def close(self):
+        self.index.close()
+        if self.workbook is not None:
+            self.workbook.close()
+            self.workbook = None
+            self.sheet = None
+
+
+def serialize_upsert(cedula, fecha, row_values, update_values):
+    """Registro de upsert como dict JSON (para la cola de workbook_lock)."""
+    fecha = normalize_fecha(fecha)
+    return {
+        'cedula': normalize_cedula(cedula),
+        'fecha': fecha.isoformat() if fecha else None,
+        'row_values': row_values,
+        'update_values': update_values,
+    }
+
+
+def apply_upsert_batches(path, columns, batches):
+    """
+    Aplica lotes de registros serializados con una sola apertura y un solo
+    guardado del libro. Devuelve, por lote, {'success', 'row', 'action'} de
+    cada registro.
+    """
+    workbook = ControlWorkbook(path, columns).load()
+    try:
+        results = []
+        for batch in batches:
+            batch_results = []
+            for record in batch:
+                row_number, action = workbook.upsert(
+                    record['cedula'], record['fecha'], record['row_values'], record['update_values'])
+                batch_results.append({'success': True, 'row': row_number, 'action': action})
+            results.append(batch_results)
+        workbook.save()
+        return results
+    finally:
+        workbook.close()
@@ -6,31 +6,40 @@ from pathlib import Path
 import tempfile
 from contextlib import redirect_stderr
 
-def main(doc_path_str):
-    try:
-        # Usar rutas absolutas para mayor compatibilidad con COM
-        doc_path = Path(doc_path_str).resolve()
-        file_suffix = doc_path.suffix.lower()
+def convert(doc_path_str):
+    """Convierte un .doc/.docx a un PDF temporal y devuelve su ruta. Lanza una excepción si falla."""
+    # Usar rutas absolutas para mayor compatibilidad con COM
+    doc_path = Path(doc_path_str).resolve()
+    file_suffix = doc_path.suffix.lower()
 
-        # 1. Validar que el archivo existe y es un formato compatible
-        if not doc_path.exists() or not doc_path.is_file():
-            raise FileNotFoundError(f"El archivo no se encuentra: {doc_path}")
-            
-        if file_suffix not in ['.doc', '.docx']:
-            raise ValueError(f"Formato '{file_suffix}' no compatible. Solo se admiten .doc y .docx.")
+    # 1. Validar que el archivo existe y es un formato compatible
+    if not doc_path.exists() or not doc_path.is_file():
+        raise FileNotFoundError(f"El archivo no se encuentra: {doc_path}")
+        
+    if file_suffix not in ['.doc', '.docx']:
+        raise ValueError(f"Formato '{file_suffix}' no compatible. Solo se admiten .doc y .docx.")
 
-        # 2. Crear ruta para el PDF temporal
-        temp_dir = Path(tempfile.gettempdir())
-        pdf_path = (temp_dir / f"{doc_path.stem}_{os.urandom(4).hex()}.pdf").resolve()
+    # 2. Crear ruta para el PDF temporal
+    temp_dir = Path(tempfile.gettempdir())
+    pdf_path = (temp_dir / f"{doc_path.stem}_{os.urandom(4).hex()}.pdf").resolve()
+
+    # En sidecar.py la conversión corre en un hilo de trabajo, y COM (docx2pdf
+    # y Word) debe inicializarse en cada hilo que lo usa.
+    try:
+        import pythoncom
+        pythoncom.CoInitialize()
+    except ImportError:
+        pythoncom = None
 
+    try:
         # 3. Realizar la conversión según el tipo de archivo
         
         # Para .docx, usamos la librería directa (método rápido)
         if file_suffix == '.docx':
-            from docx2pdf import convert
+            from docx2pdf import convert as docx2pdf_convert
             # Suprimir la barra de progreso que imprime la librería
             with open(os.devnull, 'w') as f, redirect_stderr(f):
-                convert(str(doc_path), str(pdf_path))
+                docx2pdf_convert(str(doc_path), str(pdf_path))
         
         # Para .doc, usamos automatización COM con MS Word (requiere Word instalado)
         elif file_suffix == '.doc':
@@ -50,12 +59,21 @@ def main(doc_path_str):
             finally:
                 if word:
                     word.Quit()
+    finally:
+        if pythoncom is not None:
+            pythoncom.CoUninitialize()
+
+    if not pdf_path.exists():
+        raise Exception("La conversión falló y el archivo PDF no fue creado.")
+
+    return str(pdf_path)
 
-        if not pdf_path.exists():
-            raise Exception("La conversión falló y el archivo PDF no fue creado.")
+def main(doc_path_str):
+    try:
+        pdf_path = convert(doc_path_str)
 
         # 4. Devolver la ruta del PDF
-        print(json.dumps({"success": True, "pdf_path": str(pdf_path)}))
+        print(json.dumps({"success": True, "pdf_path": pdf_path}))
 
     except Exception as e:
         # 5. Devolver un error JSON claro
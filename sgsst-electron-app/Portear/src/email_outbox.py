@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+Bandeja de salida persistente (SQLite) de los correos de remisiones.
+
+send_remision_by_email esperaba a que Gmail aceptara el mensaje y la llamada
+IPC de Electron quedaba bloqueada mientras tanto; si la red fallaba, el
+correo se perdía con un simple success: False.
+
+Ahora el envío se registra en la bandeja y la llamada vuelve enseguida. Un
+proceso aparte (python email_outbox.py --worker) envía los mensajes
+pendientes con la sesión SMTP reutilizada de bulk_mailer. Los fallos
+transitorios se reintentan con espera exponencial, guardada en la base, así
+que sobreviven a un cierre de la aplicación. Los rechazos definitivos
+quedan como 'failed' con su error.
+
+Cada envío se identifica por la cédula y el SHA-256 del documento. Volver a
+enviar la misma remisión a la misma persona no crea otro mensaje: se
+devuelve el registro existente y solo se reintenta si había fallado. El
+Message-ID del correo se deriva de esa clave, de modo que un reintento
+tras un corte a mitad de envío tampoco aparece duplicado en Gmail.
+
+Electron borra su copia temporal del documento al terminar la llamada, por
+eso la bandeja guarda su propia copia (outbox_files/) hasta que se envía.
+
+Solo corre un worker a la vez (bloqueo .outbox.sqlite3.lock, ver
+workbook_lock). El worker lo renueva mientras lo tiene, también durante las
+esperas de un reintento, y otro proceso solo lo toma si el worker murió.
+ensure_worker() lo arranca si hay mensajes pendientes y no hay uno activo
+(al encolar y al consultar el estado), y el worker termina cuando ya no
+quedan mensajes pendientes o si pierde el bloqueo.
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+from extraction_cache import default_cache_dir
+from workbook_lock import WorkbookLock
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_BACKOFF = 30.0
+MAX_BACKOFF = 3600.0
+
+# Un envío 'sending' cuyo worker murió se vuelve a tomar pasado este tiempo.
+LEASE_SECONDS = 300
+# Mensajes que el worker toma de una vez.
+CLAIM_BATCH = 20
+# Espera máxima entre revisiones de la bandeja mientras hay reintentos pendientes.
+POLL_SECONDS = 5.0
+
+_HASH_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    empresa TEXT NOT NULL,
+    cedula TEXT NOT NULL,
+    destinatario TEXT NOT NULL,
+    nombre TEXT,
+    fecha_atencion TEXT,
+    attachment TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    doc_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    sent REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt);
+CREATE INDEX IF NOT EXISTS idx_outbox_cedula ON outbox (cedula);
+"""
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def idempotency_key(cedula, doc_hash):
+    return hashlib.sha256(f"{cedula}:{doc_hash}".encode('utf-8')).hexdigest()
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+class EmailOutbox:
+    def __init__(self, path=None, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF,
+                 max_backoff=MAX_BACKOFF):
+        self.path = Path(path) if path else default_cache_dir() / 'outbox.sqlite3'
+        self.files_dir = self.path.with_name('outbox_files')
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # La aplicación encola y el worker envía: dos procesos sobre la misma base.
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _store_attachment(self, doc_path, doc_hash):
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        stored = self.files_dir / f"{doc_hash}{Path(doc_path).suffix}"
+        if not stored.exists():
+            tmp = stored.with_name(f"{stored.name}.{os.getpid()}.tmp")
+            shutil.copyfile(doc_path, tmp)
+            os.replace(tmp, stored)
+        return stored
+
+    def enqueue(self, empresa, cedula, destinatario, doc_path, nombre=None, fecha_atencion=None, filename=None):
+        """
+        Registra el envío de doc_path a destinatario y devuelve el registro
+        (ver status()). 'duplicate' es True si ese documento ya estaba en la
+        bandeja para esa cédula; en ese caso solo se reintenta si había
+        fallado.
+        """
+        doc_hash = file_hash(doc_path)
+        key = idempotency_key(cedula, doc_hash)
+        filename = filename or Path(doc_path).name
+        now = time.time()
+        conn = self._connection()
+        existing = conn.execute("SELECT * FROM outbox WHERE key = ?", (key,)).fetchone()
+        if existing is not None and existing['status'] != FAILED:
+            logging.info(f"La remisión ya está en la bandeja de salida ({existing['status']}); no se duplica.")
+            return {**self._entry(existing), 'duplicate': True}
+
+        stored = self._store_attachment(doc_path, doc_hash)
+        if existing is not None:
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = 0, next_attempt = ?, lease_until = NULL, last_error = NULL, "
+                "destinatario = ?, empresa = ?, attachment = ?, filename = ?, updated = ? WHERE id = ? AND status = ?",
+                (PENDING, now, destinatario, empresa, str(stored), filename, now, existing['id'], FAILED))
+        else:
+            conn.execute(
+                "INSERT OR IGNORE INTO outbox (key, empresa, cedula, destinatario, nombre, fecha_atencion, attachment, "
+                "filename, doc_hash, status, next_attempt, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, empresa, cedula, destinatario, nombre, fecha_atencion, str(stored), filename, doc_hash,
+                 PENDING, now, now, now))
+        row = conn.execute("SELECT * FROM outbox WHERE key = ?", (key,)).fetchone()
+        logging.info(f"Correo para {destinatario} registrado en la bandeja de salida (id {row['id']}).")
+        return {**self._entry(row), 'duplicate': existing is not None}
+
+    @staticmethod
+    def _entry(row):
+        return {
+            'id': row['id'],
+            'key': row['key'],
+            'empresa': row['empresa'],
+            'cedula': row['cedula'],
+            'nombre': row['nombre'],
+            'destinatario': row['destinatario'],
+            'filename': row['filename'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'nextAttempt': _timestamp(row['next_attempt']) if row['status'] == PENDING else None,
+            'lastError': row['last_error'],
+            'created': _timestamp(row['created']),
+            'sent': _timestamp(row['sent']),
+        }
+
+    def status(self, ids=None, cedula=None, limit=50):
+        """Registros de la bandeja (por id, por cédula o los más recientes)."""
+        query, params = "SELECT * FROM outbox", []
+        if ids:
+            query += f" WHERE id IN ({','.join('?' * len(ids))})"
+            params = [int(i) for i in ids]
+        elif cedula:
+            query += " WHERE cedula = ?"
+            params = [cedula]
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(int(limit))
+        return [self._entry(row) for row in self._connection().execute(query, params)]
+
+    def counts(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+        return {status: count for status, count in rows}
+
+    def has_work(self):
+        row = self._connection().execute(
+            "SELECT 1 FROM outbox WHERE status IN (?, ?) LIMIT 1", (PENDING, SENDING)).fetchone()
+        return row is not None
+
+    def next_due(self):
+        """Momento (time.time()) del próximo envío o reintento, o None si no hay."""
+        row = self._connection().execute(
+            "SELECT MIN(CASE status WHEN ? THEN next_attempt ELSE lease_until END) FROM outbox "
+            "WHERE status IN (?, ?)", (PENDING, PENDING, SENDING)).fetchone()
+        return row[0]
+
+    def claim(self, limit=CLAIM_BATCH):
+        """Toma los envíos que ya tocan (y los de un worker que murió) y los marca 'sending'."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE (status = ? AND next_attempt <= ?) OR (status = ? AND lease_until < ?) "
+                "ORDER BY next_attempt, id LIMIT ?", (PENDING, now, SENDING, now, limit)).fetchall()
+            conn.executemany("UPDATE outbox SET status = ?, lease_until = ?, updated = ? WHERE id = ?",
+                             [(SENDING, now + LEASE_SECONDS, now, row['id']) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def mark_sent(self, entry_id):
+        now = time.time()
+        conn = self._connection()
+        conn.execute("UPDATE outbox SET status = ?, attempts = attempts + 1, lease_until = NULL, last_error = NULL, "
+                     "sent = ?, updated = ? WHERE id = ?", (SENT, now, now, entry_id))
+        self._release_attachment(entry_id)
+
+    def mark_failed(self, entry_id, error, transient):
+        """Registra un intento fallido; si era transitorio y quedan intentos, programa el siguiente."""
+        now = time.time()
+        conn = self._connection()
+        attempts = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()[0] + 1
+        if transient and attempts < self.max_attempts:
+            delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+            conn.execute("UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, lease_until = NULL, "
+                         "last_error = ?, updated = ? WHERE id = ?",
+                         (PENDING, attempts, now + delay, error, now, entry_id))
+            logging.warning(f"Envío {entry_id} falló ({error}); reintento {attempts + 1} en {delay:.0f} s.")
+        else:
+            conn.execute("UPDATE outbox SET status = ?, attempts = ?, lease_until = NULL, last_error = ?, "
+                         "updated = ? WHERE id = ?", (FAILED, attempts, error, now, entry_id))
+            logging.error(f"Envío {entry_id} descartado tras {attempts} intentos: {error}")
+
+    def _release_attachment(self, entry_id):
+        conn = self._connection()
+        attachment = conn.execute("SELECT attachment FROM outbox WHERE id = ?", (entry_id,)).fetchone()[0]
+        in_use = conn.execute("SELECT 1 FROM outbox WHERE attachment = ? AND status != ? LIMIT 1",
+                              (attachment, SENT)).fetchone()
+        if in_use is None:
+            try:
+                Path(attachment).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _build_message(row, senders):
+    from remision_utils import EmailSender
+
+    empresa = row['empresa']
+    if empresa not in senders:
+        senders[empresa] = EmailSender(empresa)
+    sender = senders[empresa]
+    msg = sender.construir_mensaje(row['destinatario'], row['nombre'] or 'Trabajador', row['fecha_atencion'],
+                                   row['attachment'])
+    # El nombre del adjunto es el del documento original, no el de la copia de la bandeja.
+    for part in msg.get_payload():
+        if part.get_filename():
+            part.replace_header('Content-Disposition', f"attachment; filename= {row['filename']}")
+    # Mismo Message-ID en cada reintento: Gmail no muestra dos veces el mismo mensaje.
+    domain = sender.credenciales['email'].rsplit('@', 1)[-1]
+    msg['Message-ID'] = f"<{row['key'][:40]}@{domain}>"
+    return sender.credenciales, msg
+
+
+def deliver(outbox, mailer, rows, senders):
+    """Envía los registros tomados con claim() y guarda el resultado de cada uno."""
+    for row in rows:
+        try:
+            credentials, msg = _build_message(row, senders)
+        except Exception as e:
+            # Sin credenciales o sin adjunto: no se arregla reintentando.
+            outbox.mark_failed(row['id'], str(e), transient=False)
+            continue
+        mailer.enqueue(credentials, msg, row['destinatario'], key=row['id'])
+    report = mailer.run()
+    for result in report['results']:
+        if result['success']:
+            outbox.mark_sent(result['key'])
+        else:
+            outbox.mark_failed(result['key'], result['error'], result['transient'])
+    return report
+
+
+def run_worker(outbox=None, mailer=None):
+    """
+    Envía los mensajes de la bandeja hasta que no quede ninguno pendiente.
+    Devuelve False si ya había otro worker activo.
+    """
+    from bulk_mailer import BulkMailer
+
+    outbox = outbox or EmailOutbox()
+    # Los reintentos los programa la bandeja, no el mailer.
+    mailer = mailer or BulkMailer(max_attempts=1)
+    lock = WorkbookLock(outbox.path)
+    senders = {}
+    started = False
+    try:
+        while lock.try_acquire():
+            started = True
+            try:
+                logging.info(f"Worker de la bandeja de salida activo (pid {os.getpid()}).")
+                while outbox.has_work():
+                    # Sin el bloqueo habría dos workers enviando (y el doble del límite de envío).
+                    if not lock.refresh():
+                        logging.warning("El worker perdió el bloqueo de la bandeja; termina.")
+                        return started
+                    rows = outbox.claim()
+                    if rows:
+                        deliver(outbox, mailer, rows, senders)
+                        continue
+                    due = outbox.next_due()
+                    time.sleep(max(0.0, min(due - time.time(), POLL_SECONDS)) if due else POLL_SECONDS)
+            finally:
+                lock.release()
+            # Un envío registrado justo antes de soltar el bloqueo no arrancó otro worker.
+            if not outbox.has_work():
+                break
+    finally:
+        mailer.close()
+    if started:
+        logging.info(f"Bandeja de salida vacía: {outbox.counts()}")
+    return started
+
+
+_worker_process = None
+
+
+def ensure_worker(outbox=None):
+    """Arranca el worker en segundo plano si hay envíos pendientes y no hay uno activo."""
+    global _worker_process
+    outbox = outbox or EmailOutbox()
+    if not outbox.has_work():
+        return False
+    # El worker lanzado hace un momento puede no haber tomado el bloqueo todavía.
+    if _worker_process is not None and _worker_process.poll() is None:
+        return False
+    lock = WorkbookLock(outbox.path)
+    if not lock.try_acquire():
+        return False
+    lock.release()
+    args = [sys.executable, str(Path(__file__).resolve()), '--worker', '--path', str(outbox.path)]
+    options = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL,
+               'cwd': str(Path(__file__).resolve().parent), 'close_fds': True}
+    if sys.platform == 'win32':
+        # Sin consola y fuera del grupo de Electron: sigue enviando si se cierra la aplicación.
+        options['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options['start_new_session'] = True
+    _worker_process = subprocess.Popen(args, **options)
+    logging.info("Worker de la bandeja de salida iniciado.")
+    return True
+
+
+_local = threading.local()
+
+
+def get_outbox():
+    """Bandeja del hilo actual (el sidecar atiende solicitudes en varios hilos)."""
+    if getattr(_local, 'outbox', None) is None:
+        _local.outbox = EmailOutbox()
+    return _local.outbox
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandeja de salida de correos de remisiones.")
+    parser.add_argument('--worker', action='store_true', help="Envía los mensajes pendientes y termina.")
+    parser.add_argument('--status', action='store_true', help="Muestra los últimos registros.")
+    parser.add_argument('--path', help="Base de la bandeja (por defecto en SGSST_CACHE_DIR).")
+    args = parser.parse_args()
+
+    outbox = EmailOutbox(args.path)
+    if args.worker:
+        logging.basicConfig(
+            filename=str(outbox.path.with_name('outbox_worker.log')), level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+        run_worker(outbox)
+    else:
+        import json
+        print(json.dumps({'counts': outbox.counts(), 'messages': outbox.status()}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
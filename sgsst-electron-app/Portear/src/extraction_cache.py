@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Caché persistente (SQLite) de extracciones de PDF.
+
+Durante la revisión de un certificado el mismo PDF se procesa varias veces
+(extraer, generar la remisión, enviar correo y WhatsApp). La caché guarda los
+campos normalizados, el formato detectado y, si se pide, el texto completo de
+cada extracción, de modo que los pasos siguientes no vuelvan a leer el PDF.
+
+Claves:
+    * Contenido: SHA-256 del archivo. Para no volver a leer archivos sin
+      cambios, la tabla 'files' recuerda el hash por ruta junto con su
+      (tamaño, mtime); solo se recalcula si alguno de los dos cambia.
+    * Versión: espacio de nombres del consumidor (process_pdf_cli,
+      remision_utils, furat...) + EXTRACTOR_VERSION + REGISTRY.version, de
+      modo que cualquier cambio en extraction_rules.json invalida las entradas.
+
+El tamaño total está acotado (SGSST_CACHE_MAX_MB, 64 MB por defecto); al
+superarlo se eliminan las entradas usadas hace más tiempo (LRU). La base vive
+en SGSST_CACHE_DIR (main.js la apunta al directorio de datos de la app) o en
+~/.sgsst/cache. Un fallo de la caché nunca interrumpe la extracción.
+
+Cada hilo usa su propia conexión (el sidecar atiende solicitudes en varios
+hilos y una conexión de sqlite3 solo sirve en el hilo que la abrió).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from extraction_rules import REGISTRY
+
+# Subir cuando cambie el código de extracción de forma que altere los resultados.
+# 2: pdfplumber vuelve a ser el primer motor; se descartan los datos leídos con
+#    PyMuPDF o pypdfium2 que pasaban la validación con valores de encabezado.
+EXTRACTOR_VERSION = 2
+
+DEFAULT_MAX_MB = 64
+_HASH_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extractions (
+    sha256 TEXT NOT NULL,
+    version TEXT NOT NULL,
+    format TEXT,
+    data TEXT NOT NULL,
+    text TEXT,
+    meta TEXT,
+    size_bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (sha256, version)
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions (last_used);
+"""
+
+
+def default_cache_dir():
+    return Path(os.environ.get('SGSST_CACHE_DIR') or Path.home() / '.sgsst' / 'cache')
+
+
+class ExtractionCache:
+    def __init__(self, path=None, max_bytes=None):
+        self.path = Path(path) if path else default_cache_dir() / 'extractions.sqlite3'
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('SGSST_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Varios procesos (sidecar, lotes, GUI) comparten la base.
+            conn = sqlite3.connect(str(self.path), timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Cierra la conexión del hilo actual."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def version_key(namespace):
+        return f"{namespace}:{EXTRACTOR_VERSION}:{REGISTRY.version}"
+
+    def file_hash(self, pdf_path):
+        """SHA-256 del archivo, reutilizando el último si (tamaño, mtime) no cambiaron."""
+        pdf_path = Path(pdf_path).resolve()
+        stat = pdf_path.stat()
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT sha256 FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (str(pdf_path), stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (str(pdf_path), stat.st_size, stat.st_mtime_ns, sha256),
+            )
+        return sha256
+
+    def get(self, pdf_path, namespace, need_text=False):
+        """
+        Devuelve {'data', 'format', 'text', 'meta'} o None si no hay entrada
+        (o si need_text=True y la entrada se guardó sin texto).
+        """
+        try:
+            sha256 = self.file_hash(pdf_path)
+            conn = self._connection()
+            version = self.version_key(namespace)
+            row = conn.execute(
+                "SELECT format, data, text, meta FROM extractions WHERE sha256 = ? AND version = ?",
+                (sha256, version),
+            ).fetchone()
+            if row is None or (need_text and row[2] is None):
+                return None
+            with conn:
+                conn.execute(
+                    "UPDATE extractions SET last_used = ? WHERE sha256 = ? AND version = ?",
+                    (time.time(), sha256, version),
+                )
+            return {
+                'format': row[0],
+                'data': json.loads(row[1]),
+                'text': row[2],
+                'meta': json.loads(row[3]) if row[3] else {},
+            }
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logging.warning(f"Caché de extracción no disponible ({pdf_path}): {e}")
+            return None
+
+    def put(self, pdf_path, namespace, data, pdf_format=None, text=None, meta=None):
+        try:
+            sha256 = self.file_hash(pdf_path)
+            data_json = json.dumps(data, ensure_ascii=False, default=str)
+            meta_json = json.dumps(meta, ensure_ascii=False) if meta else None
+            size_bytes = len(data_json) + len(text or "") + len(meta_json or "")
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO extractions (sha256, version, format, data, text, meta, size_bytes, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sha256, self.version_key(namespace), pdf_format, data_json, text, meta_json, size_bytes, time.time()),
+                )
+                self._evict(conn)
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logging.warning(f"No se pudo guardar la extracción en caché ({pdf_path}): {e}")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for sha256, version, size_bytes in conn.execute(
+            "SELECT sha256, version, size_bytes FROM extractions ORDER BY last_used ASC"
+        ):
+            victims.append((sha256, version))
+            excess -= size_bytes
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM extractions WHERE sha256 = ? AND version = ?", victims)
+        conn.execute("DELETE FROM files WHERE sha256 NOT IN (SELECT sha256 FROM extractions)")
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM extractions")
+            conn.execute("DELETE FROM files")
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Caché compartida por el proceso (se abre la base en el primer uso)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ExtractionCache()
+    return _default_cache
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de reglas de extracción por formato de PDF.
+
+Las reglas viven en extraction_rules.json (tabla declarativa) y se compilan una
+sola vez al importar este módulo; todos los documentos que procese el mismo
+proceso (sidecar, lotes, GUI) reutilizan el conjunto compilado.
+
+Cada formato del JSON admite:
+
+    "detect"  {"any": [...]} o {"all": [...]}: marcadores de texto con los que
+              REGISTRY.detect() reconoce el formato (usado por process_pdf_cli).
+    "flags"   Banderas de re por defecto para sus campos.
+    "required" Campos obligatorios: cuando todos están resueltos en un prefijo
+              del documento, la lectura por páginas puede detenerse
+              (FormatRules.resolved, pdf_text.read_pdf_text). Con ellos se
+              valida también el texto de los motores rápidos
+              (FormatRules.invalid_fields).
+    "groups"  "first" (primer grupo no vacío, por defecto) o "tuple" (todos los
+              grupos si hay más de uno, como en el FURAT).
+    "fields"  {campo: regla}. Cada regla tiene "pattern" o "patterns" (lista de
+              alternativas en orden), y opcionalmente "flags", "occurrence"
+              ("first"/"last"), "processor" (nombre o lista de nombres) y las
+              anclas de sección de AnchorExtractor ("label", "until", ...).
+
+Para añadir el diseño de una clínica nueva basta con agregar un formato con
+"detect" y sus "fields" al JSON; no hace falta tocar el código.
+"""
+
+import re
+import json
+import hashlib
+from pathlib import Path
+
+from anchor_extractor import AnchorExtractor
+
+RULES_PATH = Path(__file__).with_name('extraction_rules.json')
+
+# Carácter ajeno a los PDFs que se añade al prefijo leído para que '$' y '\Z'
+# no coincidan en el corte entre páginas.
+_PREFIX_SENTINEL = '\uffff'
+
+# Procesadores disponibles por nombre. Los que dependen de cada aplicación
+# (format_date, afiliacion, cargo...) se pasan en extract(processors=...).
+PROCESSORS = {
+    'strip': lambda x: x.strip(),
+    'strip_upper': lambda x: x.strip().upper() if x else "",
+    'strip_upper_or_ninguno': lambda x: x.strip().upper() if x else "NINGUNO",
+    'strip_or_na': lambda x: x.strip() if x else "N/A",
+    'strip_newlines': lambda x: x.strip().replace('\n', ' ') if x else '',
+    'lines_upper': lambda x: x.strip().replace('\n', ' ').strip().upper() if x else "",
+    'capitalize': lambda x: x.strip().capitalize() if x else "",
+    'digits': lambda x: re.sub(r'[^\d]', '', x.strip()) if x else "",
+    'int': lambda x: int(x.strip()) if x and x.strip().isdigit() else "",
+    'join_upper': lambda x: " ".join(x).strip().upper() if isinstance(x, tuple) else x.strip().upper(),
+    'upper_sin_restricciones': lambda x: x.strip().upper() if x and not x.strip().startswith('RESTRICCIONES') else "NINGUNO",
+    'upper_sin_motivo': lambda x: x.strip().upper() if x and not x.strip().startswith('MOTIVO') else "NINGUNO",
+}
+
+
+# Encabezados de los certificados. Un motor de texto que ordena la página de
+# otra manera puede dejar uno de ellos donde las reglas esperan el valor
+# (p. ej. 'APELLIDOS Y NOMBRES TIPO NÚMERO' como nombre del trabajador).
+_LABEL_RE = re.compile(
+    r'APELLIDOS|NOMBRES|N[ÚU]MERO|DOCUMENTO|IDENTIFICACI[ÓO]N|FECHA\s+Y\s+CIUDAD|DATOS\s+DE|'
+    r'D[ÍI]A\s+MES|PACIENTE:|SEXO:', re.IGNORECASE)
+
+# Forma del valor de los campos obligatorios, según el nombre del campo.
+_VALUE_SHAPES = (
+    (re.compile(r'Identificaci', re.IGNORECASE), re.compile(r'(?:CC|CE|TI|PT)?[\s.:]*\d[\d.\s]{4,14}', re.IGNORECASE)),
+    (re.compile(r'^Fecha', re.IGNORECASE), re.compile(r'\d{1,4}[/\-\s]+\d{1,2}[/\-\s]+\d{2,4}')),
+    (re.compile(r'^Nombre', re.IGNORECASE), re.compile(r"[^\W\d_]+(?:[\s.'-]+[^\W\d_]+)+")),
+)
+
+_MISSING_VALUES = ("", "NO_DISPONIBLE", "N/A")
+
+
+def _value_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, tuple):
+        return " ".join(part for part in value if part).strip()
+    return str(value).strip()
+
+
+def _parse_flags(names):
+    flags = 0
+    for name in names or []:
+        flags |= getattr(re, name)
+    return flags
+
+
+class FormatRules:
+    def __init__(self, name, spec):
+        self.name = name
+        self.fields = spec['fields']
+        self.flags = _parse_flags(spec.get('flags'))
+        self.detect_markers = spec.get('detect')
+        self.tuple_groups = spec.get('groups') == 'tuple'
+        self.required = spec.get('required', [])
+
+        self._patterns = {}
+        for key, field in self.fields.items():
+            flags = _parse_flags(field['flags']) if 'flags' in field else self.flags
+            patterns = field['patterns'] if 'patterns' in field else [field['pattern']]
+            self._patterns[key] = [re.compile(pattern, flags) for pattern in patterns]
+
+        # Los campos de un solo patrón con las banderas del formato se resuelven
+        # juntos con AnchorExtractor; el resto se busca patrón a patrón.
+        anchored = {
+            key: field for key, field in self.fields.items()
+            if 'pattern' in field and 'flags' not in field and field.get('occurrence', 'first') == 'first'
+        }
+        self._extractor = AnchorExtractor(anchored, self.flags) if anchored and not self.tuple_groups else None
+
+    def pattern(self, key):
+        """Expresión compilada (la primera, si hay alternativas) de un campo."""
+        return self._patterns[key][0]
+
+    def patterns(self, key):
+        return self._patterns[key]
+
+    def matches(self, text):
+        if not self.detect_markers:
+            return False
+        if 'all' in self.detect_markers:
+            return all(marker in text for marker in self.detect_markers['all'])
+        return any(marker in text for marker in self.detect_markers.get('any', []))
+
+    def resolved(self, text):
+        """
+        True si todos los campos 'required' tienen en text una coincidencia que
+        ya no puede cambiar al leer más páginas: la de su primer patrón, que
+        termina antes del final del prefijo y no depende de '$' o '\\Z' en el
+        corte. Los campos de última ocurrencia nunca se consideran resueltos.
+        """
+        if not self.required:
+            return False
+        probe = text + _PREFIX_SENTINEL
+        for key in self.required:
+            if self.fields[key].get('occurrence') == 'last':
+                return False
+            match = self._patterns[key][0].search(probe)
+            if not match or match.end() >= len(text):
+                return False
+        return True
+
+    def invalid_fields(self, data):
+        """
+        Campos 'required' de data que faltan o cuyo valor no tiene la forma
+        esperada: cédula con dígitos, fecha con día, mes y año, nombre con al
+        menos dos palabras y ningún valor con texto de encabezados del
+        certificado. Lista vacía si todos son válidos.
+        """
+        invalid = []
+        for key in self.required:
+            value = _value_text(data.get(key))
+            shape = next((shape for name, shape in _VALUE_SHAPES if name.search(key)), None)
+            if (value.upper() in _MISSING_VALUES or _LABEL_RE.search(value)
+                    or (shape is not None and not shape.fullmatch(value))):
+                invalid.append(key)
+        return invalid
+
+    def extract(self, text, processors=None):
+        """
+        Devuelve {campo: valor} en el orden de la tabla. Los campos sin
+        coincidencia quedan en None; a los encontrados se les aplica su
+        procesador, si lo tienen.
+        """
+        anchored = self._extractor.extract(text) if self._extractor else {}
+        data = {}
+        for key, field in self.fields.items():
+            value = anchored[key] if key in anchored else self._search(key, field, text)
+            if value is not None and 'processor' in field:
+                value = self._process(field['processor'], value, processors)
+            data[key] = value
+        return data
+
+    def _search(self, key, field, text):
+        for pattern in self._patterns[key]:
+            if field.get('occurrence') == 'last':
+                match = None
+                for match in pattern.finditer(text):
+                    pass
+            else:
+                match = pattern.search(text)
+            if match:
+                groups = match.groups()
+                if self.tuple_groups:
+                    return groups if len(groups) > 1 else (groups[0] or "")
+                return next((g for g in groups if g is not None), "")
+        return None
+
+    def _process(self, names, value, processors):
+        for name in [names] if isinstance(names, str) else names:
+            processor = (processors or {}).get(name) or PROCESSORS.get(name)
+            if processor is None:
+                raise ValueError(f"Procesador desconocido '{name}' en el formato '{self.name}'")
+            value = processor(value)
+        return value
+
+
+class ExtractionRegistry:
+    def __init__(self, document, version):
+        self.version = version
+        self.formats = {name: FormatRules(name, spec) for name, spec in document['formats'].items()}
+
+    @classmethod
+    def load(cls, path=RULES_PATH):
+        raw = Path(path).read_bytes()
+        document = json.loads(raw.decode('utf-8'))
+        # La versión cambia con cualquier edición de la tabla (útil para cachés).
+        version = f"{document.get('version', 1)}-{hashlib.sha1(raw).hexdigest()[:12]}"
+        return cls(document, version)
+
+    def get(self, name):
+        try:
+            return self.formats[name]
+        except KeyError:
+            raise ValueError(f"Formato de extracción desconocido: {name}")
+
+    def detect(self, text):
+        """Primer formato (en el orden del JSON) cuyos marcadores 'detect' aparecen en el texto."""
+        for name, rules in self.formats.items():
+            if rules.matches(text):
+                return name
+        return None
+
+
+REGISTRY = ExtractionRegistry.load()
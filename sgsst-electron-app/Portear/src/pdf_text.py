@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura de texto de PDFs página a página.
+
+Los certificados de algunas clínicas llegan con 20-40 páginas de anexos de
+laboratorio detrás de una sola página útil. iter_page_texts() entrega el texto
+de cada página a medida que se extrae y libera los recursos de la página en
+cuanto se ha leído, de modo que la memoria no crece con el tamaño del archivo.
+read_pdf_text() acumula esas páginas y deja de leer en cuanto la condición
+'until' se cumple sobre el texto ya leído (normalmente, que los campos
+obligatorios del formato estén resueltos; ver FormatRules.resolved).
+
+Motores de texto (BACKENDS):
+
+    pdfplumber  Motor de referencia: las reglas de extracción están escritas
+                sobre su texto.
+    pymupdf     PyMuPDF, el que ya usa accident_extraction para el FURAT.
+    pypdfium2   PDFium.
+
+PyMuPDF y pypdfium2 leen 3 a 10 veces más rápido, pero ordenan de otra forma
+las celdas de algunos certificados (en el de Vemedic el nombre sale como
+'APELLIDOS Y NOMBRES TIPO NÚMERO'). Por eso extract_with_fallback() usa
+primero pdfplumber y solo recurre a los otros si pdfplumber no está
+instalado o no puede leer el archivo. Un motor rápido se adelanta a
+pdfplumber únicamente si se incluye en SGSST_PDF_FAST_BACKENDS (p. ej.
+"pypdfium2"), lo que solo debe hacerse cuando bench_pdf_backends.py muestre
+que extrae los mismos campos que pdfplumber en todos los certificados de
+muestra. Aun así, su resultado se descarta si no supera la validación de
+campos del consumidor.
+"""
+
+import os
+import importlib.util
+import unicodedata
+from contextlib import closing
+
+
+def _pymupdf_pages(pdf_path):
+    # 'fitz' está obsoleto y avisa por stdout, donde se mezclaría con las líneas NDJSON.
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as doc:
+        total = doc.page_count
+        for number, page in enumerate(doc, start=1):
+            yield number, total, page.get_text()
+
+
+def _pypdfium2_pages(pdf_path):
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        total = len(pdf)
+        for index in range(total):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            # PDFium separa las líneas con \r\n.
+            text = textpage.get_text_range().replace('\r\n', '\n').replace('\r', '\n')
+            textpage.close()
+            page.close()
+            yield index + 1, total, text
+    finally:
+        pdf.close()
+
+
+def _pdfplumber_pages(pdf_path):
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        total = len(pdf.pages)
+        for number, page in enumerate(pdf.pages, start=1):
+            text = page.extract_text() or ""
+            # Los caracteres, líneas y rectángulos de la página ya no se necesitan.
+            page.flush_cache()
+            yield number, total, text
+
+
+# Orden de la cascada: el motor de referencia y, si no puede leer el PDF, los demás.
+BACKENDS = {
+    'pdfplumber': ('pdfplumber', _pdfplumber_pages),
+    'pymupdf': ('pymupdf', _pymupdf_pages),
+    'pypdfium2': ('pypdfium2', _pypdfium2_pages),
+}
+DEFAULT_BACKEND = 'pdfplumber'
+
+
+def promoted_backends():
+    """Motores rápidos que se prueban antes de pdfplumber (SGSST_PDF_FAST_BACKENDS)."""
+    names = [name.strip().lower() for name in os.environ.get('SGSST_PDF_FAST_BACKENDS', '').split(',')]
+    return [name for name in names if name in BACKENDS and name != DEFAULT_BACKEND]
+
+
+def available_backends():
+    """Motores instalados, en el orden de la cascada (los promovidos primero)."""
+    order = promoted_backends() + [name for name in BACKENDS if name not in promoted_backends()]
+    found = [name for name in order if importlib.util.find_spec(BACKENDS[name][0])]
+    return found or [DEFAULT_BACKEND]
+
+
+def iter_page_texts(pdf_path, backend=DEFAULT_BACKEND):
+    """Genera (número_de_página, total_de_páginas, texto) para cada página."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Motor de texto desconocido: {backend}")
+    return BACKENDS[backend][1](pdf_path)
+
+
+def read_pdf_text(pdf_path, until=None, page_suffix="", backend=DEFAULT_BACKEND):
+    """
+    Lee el PDF y devuelve (texto, páginas_leídas, páginas_totales).
+
+    until(texto) se evalúa tras cada página con el texto acumulado en NFC; si
+    devuelve True no se leen más páginas. page_suffix se añade al texto de
+    cada página (p. ej. "\\n" para separar páginas).
+    """
+    text = ""
+    pages_read = total = 0
+    # closing() cierra el PDF aunque se corte la lectura antes de la última página.
+    with closing(iter_page_texts(pdf_path, backend)) as pages:
+        for pages_read, total, page_text in pages:
+            text += page_text + page_suffix
+            if until is not None and pages_read < total and until(unicodedata.normalize('NFC', text)):
+                break
+    return text, pages_read, total
+
+
+def extract_with_fallback(pdf_path, extract, validate=None, until=None, page_suffix="", backends=None,
+                          on_fallback=None, reference=DEFAULT_BACKEND):
+    """
+    Lee el PDF con cada motor de 'backends' (por defecto available_backends())
+    y aplica extract(texto). El resultado del motor de referencia se acepta
+    tal cual; el de los demás solo si validate(resultado) devuelve True. Si la
+    lectura o extract fallan, o la validación no se supera, se pasa al
+    siguiente motor tras llamar a on_fallback(motor, error).
+
+    Si ningún motor supera la validación se devuelve el primer resultado
+    obtenido; si ninguno pudo leer el PDF se propaga el último error.
+
+    Devuelve (resultado, texto, {'backend', 'pages_read', 'pages_total'}).
+    """
+    backends = list(backends or available_backends())
+    rejected = None
+    for position, backend in enumerate(backends, start=1):
+        try:
+            text, pages_read, pages_total = read_pdf_text(pdf_path, until, page_suffix, backend)
+            result = extract(text)
+        except Exception as e:
+            if position == len(backends) and rejected is None:
+                raise
+            if on_fallback is not None:
+                on_fallback(backend, e)
+            continue
+        info = {'backend': backend, 'pages_read': pages_read, 'pages_total': pages_total}
+        if backend == reference or validate is None or validate(result):
+            return result, text, info
+        if rejected is None:
+            rejected = (result, text, info)
+        if on_fallback is not None:
+            on_fallback(backend, ValueError("el texto no supera la validación de campos obligatorios"))
+    return rejected
@@ -1,26 +1,35 @@
 # -*- coding: utf-8 -*-
+import os
 import sys
+import glob
 import json
+import time
+import argparse
 import traceback
-import re
 import unicodedata
-import pdfplumber
 from datetime import datetime
 import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from extraction_rules import REGISTRY
+from pdf_text import read_pdf_text, extract_with_fallback
+from extraction_cache import get_cache
 
 # --- Clases y Lógica de Extracción ---
 
+
 class PdfProcessor:
     def extract_pdf_data(self, pdf_path, full_text=None):
         try:
-            if full_text:
+            if full_text is not None:
                 text = full_text
             else:
-                with pdfplumber.open(pdf_path) as pdf:
-                    text = "".join(page.extract_text() or "" for page in pdf.pages)
+                text, _, _ = read_pdf_text(pdf_path, until=_required_fields_resolved)
             
             text = unicodedata.normalize('NFC', text)
             pdf_format = self._detect_pdf_format(text)
+            self.last_format = pdf_format
             log(f"Formato de PDF detectado: {pdf_format}")
             data = self._extract_data_based_on_format(text, pdf_format)
             data = self._post_process_data(data)
@@ -37,84 +46,24 @@ class PdfProcessor:
             raise
 
     def _detect_pdf_format(self, text):
-        # Se cambia el detector para que busque un identificador más fiable del formato.
-        if "www.biofile.com.co" in text:
-            return "vemedic"
-        if "DOCUMENTO : CC" in text.upper() and "PACIENTE:" in text.upper():
-            return "formato_generico"
-        return "formato_generico"
+        # Los formatos con marcadores 'detect' en extraction_rules.json (p. ej. vemedic,
+        # identificado por www.biofile.com.co) tienen prioridad sobre el genérico.
+        return REGISTRY.detect(text) or "formato_generico"
 
 
     def _extract_data_based_on_format(self, text, pdf_format):
-        if pdf_format == "vemedic":
-            return self._extract_formato_vemedic(text)
-        else:
-            return self._extract_formato_generico(text)
-
-
-    def _extract_formato_vemedic(self, text):
-        # Reglas de extracción mejoradas para el formato Vemedic (biofile)
-        extraction_rules = {
-            'Nombre_Completo': r'Genero Edad Documento de Identificaci[óo]n\n([^\n]+)',
-            'No. Identificacion': r'CC\s+([\d]+)',
-            'Edad': r'(\d+)\s*AÑOS',
-            'Sexo': r'\n(FEMENINO|MASCULINO)',
-            'Afiliacion': r'DATOS DE LA EMPRESA[^\n]*\n([^\n]+)',
-            'Cargo': r'Cargo\n([^\n]+)',
-            'Fecha de AtenciÃ³n': r'FECHA Y CIUDAD DE REALIZACI[ÓO]N DEL EX[ÁA]MEN[\s\S]*?(\d{2}\s+\d{2}\s+\d{4})',
-            'Recomendaciones_Laborales': r'RECOMENDACIONES OCUPACIONALES\s*([^\n]+)',
-            'Restricciones_Laborales': r'RESTRICCIONES LABORALES\s*([^\n]+)',
-            'Concepto_Medico': r'CONCEPTO DE APTITUD OCUPACIONAL\s*([^\n]+)',
-            'Evaluacion_Ocupacional': r'TIPO DE EX[ÁA]MEN M[ÉE]DICO OCUPACIONAL\s*([^\n]+)',
-        }
+        rules = REGISTRY.get(pdf_format)
+        extracted = rules.extract(text)
+        # Campos obligatorios ausentes o con forma inesperada (ver _required_fields_valid).
+        self.last_invalid = rules.invalid_fields(extracted)
 
-        data = {}  # Inicializamos el diccionario antes del bucle
-        
-        for key, pattern in extraction_rules.items():
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL | re.UNICODE)
-            value = ""
-            if match:
-                value = next((g for g in match.groups() if g is not None), "")
-            
+        data = {}
+        for key, value in extracted.items():
             # Asegurar que value sea string antes de aplicar strip()
             if isinstance(value, str):
                 data[key] = value.strip()
             else:
                 data[key] = str(value).strip() if value else ""
-
-        return data
-
-
-
-    def _extract_formato_generico(self, text):
-        extraction_rules = {
-            'Nombre_Completo': r'(?:Nombre\s*Completo[:\s]*|PACIENTE[:\s]*)([A-ZÁÉÍÓÚÑ\s]+?)(?:\n|Fecha Nac|SEXO:|$)',
-            'No. Identificacion': r'(?:No\.\s*Identificacion[:\s]*CC\s*-\s*|DOCUMENTO\s*:\s*CC\s+)(\d+)',
-            'Fecha_Nac': r'Fecha\s*(?:de)?\s*Nac(?:imiento)?[:\s]*([\d/-]+)',
-            'Edad': r'Edad[:\s]*(\d+)',
-            'Sexo': r'(?:Sexo|G[ée]nero)[:\s]*([A-Za-zÁ-Úá-ú]+)',
-            'Afiliacion': r'Afiliaci[óo]n[:\s]*(.*?)(?:Estado civil|Ocupacion)',
-            'Estado_civil': r'Estado\s*civil[:\s]*(.*?)(?:\n|$)',
-            'Evaluacion_Ocupacional': r'(?:TIPO\s*DE\s*EVALUACI[ÓO]N\s*REALIZADA|Tipo\s*de\s*Examen|Evaluaci[óo]n\s*Ocupacional)[:\s]*([^:\n]+?)(?=\s*Fecha\s*de\s*atenci[óo]n:|$)',
-            'Fecha de Atención': r'Fecha\s*(?:de)?\s*atenci[óo]n[:\s]*([0-9]{1,2}[/-][0-9]{1,2}[/-][0-9]{2,4})',
-            'Cargo': r'Cargo[:\s]*([^:\n]+?)(?=\s*Fecha\s*de|$)',
-            'Examenes_realizados': r'EX[ÁA]MENES\s*REALIZADOS[:\s]*(.*?)(?=\s*(?:RECOMENDACIONES|INCLUIR|RESTRICCIONES|MANEJO|$))',
-            'Recomendaciones_Laborales': r'RECOMENDACIONES\s*LABORALES[:\s]*(.*?)(?=MANEJO\s*EPS/ARL|\Z)',
-            'Incluir_SVE': r'Incluir\s*SVE[:\s]*([^\n:]+?)(?=\s*(?:RESTRICCIONES|Concepto|$))',
-            'Restricciones_Laborales': r'RESTRICCIONES\s*LABORALES[:\s]*(.*?)(?=\s*(?:Para\s*la\s*revisi[óo]n|INCLUIR|CONCEPTO|[A-ZÁ-Ú]+:|$))',
-            'Concepto_Medico': r'Concepto\s*Medico[:\s]*((?!LEVANTAMIENTO)[^:\n]+)',
-            'Concepto_Manipulacion_Alimento': r'Concepto\s*(?:Manipulaci[óo]n)?\s*Alimento[:\s]*(.*?)(?:\n|$)',
-            'Concepto_Altura': r'Concepto\s*Altura[:\s]*(.*?)(?:\n|$)',
-            'Concepto_trabajo_en_espacios_confinados': r'Concepto\s*de\s*trabajo\s*en\s*espacios\s*confinados[:\s]*([^\n:]+?)(?=\s*(?:MOTIVO|$))',
-            'Motivo_de_Restriccion': r'MOTIVO\s*DE\s*RESTRICCI[OÓ]N[:\s]*(.*?)(?=\nFIRMA|\Z)',
-        }
-        data = {}
-        for key, pattern in extraction_rules.items():
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-            value = ""
-            if match:
-                value = next((g for g in match.groups() if g is not None), "")
-            data[key] = value.strip()
         return data
 
     def _post_process_data(self, data):
@@ -171,60 +120,238 @@ class PdfProcessor:
 
 # --- Lógica Principal ---
 
+# En los procesos del lote (--batch) los logs se descartan: varios procesos
+# escribiendo en el mismo stdout mezclarían las líneas NDJSON.
+_logs_enabled = True
+
+
 def log(message, level='INFO'):
+    if not _logs_enabled:
+        return
     log_entry = {
         'type': 'log',
         'level': level,
         'message': message
     }
-    print(json.dumps(log_entry))
+    print(json.dumps(log_entry), flush=True)
 
-def main():
-    # Este es el manejador de errores de más alto nivel.
-    # Su propósito es asegurar que el script SIEMPRE devuelva un JSON de resultado.
+
+def _required_fields_valid(processor):
+    """
+    Validación del texto de un motor rápido: todos los campos 'required' del
+    formato detectado, con la forma esperada (FormatRules.invalid_fields).
+    """
+    def validate(data):
+        if processor.last_invalid:
+            log(f"Campos obligatorios vacíos o con formato inesperado: {', '.join(processor.last_invalid)}", level='WARNING')
+            return False
+        return True
+    return validate
+
+
+def _required_fields_resolved(text):
+    """Condición de parada de la lectura por páginas para el formato detectado en text."""
+    return REGISTRY.get(REGISTRY.detect(text) or "formato_generico").resolved(text)
+
+
+def process_pdf(pdf_path, options=None, processor=None):
+    """
+    Procesa un único PDF y devuelve el payload del resultado.
+    Reutilizable por el modo de una sola ejecución, el lote (--batch) y sidecar.py.
+
+    Opciones soportadas:
+        include_text (bool): incluir 'debug_full_text' en el payload (por defecto True).
+        stream (bool): dejar de leer páginas en cuanto los campos obligatorios del
+            formato estén resueltos (por defecto True). Con False se lee todo el PDF.
+        backend (str): forzar un motor de texto ('pdfplumber', 'pymupdf', 'pypdfium2').
+            Por defecto se usa pdfplumber; los motores rápidos promovidos con
+            SGSST_PDF_FAST_BACKENDS solo se aceptan si superan
+            _required_fields_valid (ver pdf_text.extract_with_fallback).
+        cache (bool): consultar y actualizar la caché de extracción (por defecto True;
+            se omite si se fuerza 'backend').
+    """
+    options = options or {}
     try:
-        if len(sys.argv) < 2:
+        if not pdf_path:
             raise ValueError("No se proporcionó la ruta del archivo PDF.")
-        
-        pdf_path = sys.argv[1]
+
         log(f"Iniciando procesamiento para el archivo: {pdf_path}")
-        
-        processor = PdfProcessor()
-        
-        log("Extrayendo texto del PDF...")
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                full_text = "".join(page.extract_text() or "" for page in pdf.pages)
-        except Exception as pdf_error:
-            raise RuntimeError(f"Error al leer el archivo PDF con pdfplumber: {pdf_error}")
-        log("Texto extraído exitosamente.")
+        include_text = options.get('include_text', True)
+        use_cache = options.get('cache', True) and not options.get('backend')
+        # La lectura completa (stream=False) puede dar otros valores: entradas separadas.
+        cache_namespace = 'process_pdf_cli' if options.get('stream', True) else 'process_pdf_cli_completo'
+        if use_cache:
+            cached = get_cache().get(pdf_path, cache_namespace, need_text=include_text)
+            if cached:
+                log("Datos recuperados de la caché de extracción.")
+                payload = {
+                    'success': True,
+                    'data': cached['data'],
+                    'format': cached['format'],
+                    **cached['meta'],
+                    'cached': True,
+                }
+                if include_text:
+                    payload['debug_full_text'] = cached['text']
+                return payload
 
-        extracted_data = processor.extract_pdf_data(pdf_path, full_text)
+        processor = processor or PdfProcessor()
+
+        log("Extrayendo texto del PDF...")
+        until = _required_fields_resolved if options.get('stream', True) else None
+        backends = [options['backend']] if options.get('backend') else None
+        extracted_data, full_text, text_info = extract_with_fallback(
+            pdf_path,
+            lambda text: processor.extract_pdf_data(pdf_path, text),
+            validate=_required_fields_valid(processor),
+            until=until,
+            backends=backends,
+            on_fallback=lambda backend, error: log(f"Motor de texto '{backend}' descartado: {error}", level='WARNING'),
+        )
+        log(f"Texto extraído con {text_info['backend']} ({text_info['pages_read']} de {text_info['pages_total']} páginas).")
         log("Datos estructurados extraídos del texto.")
-        
-        result = {
-            'type': 'result',
-            'payload': {
-                'success': True,
-                'data': extracted_data,
-                'debug_full_text': full_text
-            }
+
+        pdf_format = getattr(processor, 'last_format', None)
+        if use_cache:
+            get_cache().put(pdf_path, cache_namespace, extracted_data, pdf_format,
+                            text=full_text if include_text else None, meta=text_info)
+
+        payload = {
+            'success': True,
+            'data': extracted_data,
+            'format': pdf_format,
+            **text_info,
+            'cached': False,
         }
-        #Imprimir el resultado final en una sola línea (sin indent=2)
-        print(json.dumps(result, ensure_ascii=False))
+        if include_text:
+            payload['debug_full_text'] = full_text
+        return payload
 
     except Exception as e:
         log(f"Ha ocurrido un error crítico: {str(e)}", level='ERROR')
-        error_info = {
-            'type': 'result',
-            'payload': {
-                'success': False,
-                'error': str(e),
-                'traceback': traceback.format_exc()
-            }
+        return {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+
+
+# --- Modo por lotes (--batch) ---
+
+# Intervalo mínimo entre líneas de progreso del lote, en segundos.
+BATCH_PROGRESS_INTERVAL = 0.5
+
+_batch_processor = None
+
+
+def collect_pdfs(target):
+    """PDFs de un directorio (sin subcarpetas) o de un patrón glob ('**' recursivo), ordenados."""
+    if os.path.isdir(target):
+        paths = (str(p) for p in Path(target).iterdir() if p.is_file())
+    else:
+        paths = glob.glob(target, recursive=True)
+    return sorted(p for p in paths if p.lower().endswith('.pdf'))
+
+
+def _init_batch_worker():
+    global _logs_enabled, _batch_processor
+    _logs_enabled = False
+    _batch_processor = PdfProcessor()
+
+
+def _process_batch_item(pdf_path, options):
+    return process_pdf(pdf_path, options, _batch_processor)
+
+
+def _emit(message):
+    print(json.dumps(message, ensure_ascii=False), flush=True)
+
+
+def run_batch(target, workers=None, options=None):
+    """
+    Procesa todos los PDFs de target repartiéndolos en un ProcessPoolExecutor.
+    Escribe en stdout, una línea JSON por mensaje:
+
+        {'type': 'result', 'path': ..., 'payload': ...}   al terminar cada PDF
+        {'type': 'progress', ...}                         como máximo cada BATCH_PROGRESS_INTERVAL s
+        {'type': 'summary', ...}                          al final, con los totales
+
+    Devuelve el resumen.
+    """
+    options = options or {}
+    pdfs = collect_pdfs(target)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pdfs) or 1))
+    total = len(pdfs)
+    summary = {'type': 'summary', 'total': total, 'success': 0, 'failed': 0, 'cached': 0, 'workers': workers}
+    log(f"Procesando {total} PDF(s) de '{target}' con {workers} proceso(s).")
+
+    start = time.perf_counter()
+    last_progress = 0.0
+    completed = 0
+    if pdfs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker) as pool:
+            futures = {pool.submit(_process_batch_item, pdf, options): pdf for pdf in pdfs}
+            for future in as_completed(futures):
+                pdf = futures[future]
+                try:
+                    payload = future.result()
+                except Exception as e:
+                    # Solo llega aquí si el proceso del lote muere (p. ej. BrokenProcessPool).
+                    payload = {'success': False, 'error': str(e), 'traceback': traceback.format_exc()}
+                completed += 1
+                summary['success' if payload.get('success') else 'failed'] += 1
+                if payload.get('cached'):
+                    summary['cached'] += 1
+                _emit({'type': 'result', 'path': pdf, 'payload': payload})
+
+                now = time.perf_counter()
+                if completed == total or now - last_progress >= BATCH_PROGRESS_INTERVAL:
+                    last_progress = now
+                    _emit({
+                        'type': 'progress',
+                        'step': 'batch',
+                        'completed': completed,
+                        'total': total,
+                        'percentage': round(completed * 100 / total),
+                        'message': f"{completed} de {total} PDF(s) procesados",
+                    })
+
+    summary['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+    _emit(summary)
+    return summary
+
+
+def _parse_batch_args(argv):
+    parser = argparse.ArgumentParser(prog='process_pdf_cli.py --batch', description=run_batch.__doc__)
+    parser.add_argument('target', help="Directorio con los certificados o patrón glob (p. ej. 'Certificados/**/*.pdf').")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos en paralelo (por defecto, uno por núcleo).")
+    parser.add_argument('--include-text', action='store_true', help="Incluir 'debug_full_text' en cada resultado.")
+    parser.add_argument('--no-stream', action='store_true', help="Leer todas las páginas de cada PDF.")
+    parser.add_argument('--no-cache', action='store_true', help="No usar la caché de extracción.")
+    return parser.parse_args(argv)
+
+
+def main():
+    # Este es el manejador de errores de más alto nivel.
+    # Su propósito es asegurar que el script SIEMPRE devuelva un JSON de resultado.
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        sys.stdout.reconfigure(encoding='utf-8')
+        args = _parse_batch_args(sys.argv[2:])
+        options = {
+            'include_text': args.include_text,
+            'stream': not args.no_stream,
+            'cache': not args.no_cache,
         }
-        # Imprimir el error final en una sola línea (sin indent=2)
-        print(json.dumps(error_info, ensure_ascii=False))
+        run_batch(args.target, args.workers, options)
+        return
+
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else None
+    result = {
+        'type': 'result',
+        'payload': process_pdf(pdf_path)
+    }
+    # Imprimir el resultado final en una sola línea (sin indent=2)
+    print(json.dumps(result, ensure_ascii=False))
 
 if __name__ == "__main__":
     main()
@@ -12,13 +12,8 @@ import traceback
 import unicodedata
 from pathlib import Path
 from datetime import datetime
-import pdfplumber
-import pandas as pd
-from docxtpl import DocxTemplate
 import warnings
-import smtplib
 import webbrowser
-import pyperclip
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -28,6 +23,15 @@ from email.utils import formataddr
 from urllib.parse import quote
 import sys
 
+from extraction_rules import REGISTRY
+from pdf_text import extract_with_fallback
+from extraction_cache import get_cache
+from workbook_lock import WorkbookSpool
+from contact_index import find_contact, resolve_contacts
+from bulk_mailer import BulkMailer, get_mailer
+from contact_directory import normalize_cedula
+import email_outbox
+
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
 # Configuración de logging centralizada.
@@ -232,6 +236,7 @@ Correo: {remitente}"""
 
 class WhatsAppSender:
     def send_message(self, phone_number, message, file_path=None):
+        import pyperclip
         try:
             pyperclip.copy(message)
             log("Mensaje copiado al portapapeles.")
@@ -263,74 +268,55 @@ class EmailSender:
 
     def obtener_contacto(self, cedula):
         try:
-            if not self.base_datos or not Path(self.base_datos).exists():
-                log(f"Base de datos no encontrada: {self.base_datos}", level='WARNING')
-                return None, None
-                
-            df = pd.read_excel(
-                self.base_datos,
-                sheet_name="FORMATO" if self.empresa == "ASEL" else "COMPLETO",
-                dtype=str
-            )
-            
-            col_cedula = next((col for col in df.columns if 'CEDULA' in col.upper() or 'IDENTIFICACIÓN' in col.upper()), None)
-            col_celular = next((col for col in df.columns if 'CELULAR' in col.upper() or 'TELÉFONO' in col.upper()), None)
-            col_email = next((col for col in df.columns if 'CORREO' in col.upper() or 'EMAIL' in col.upper()), None)
-            
-            if not col_cedula or not col_celular:
-                log("Columnas críticas no encontradas en la base de datos", level='ERROR')
+            if not self.base_datos:
+                log(f"No hay base de datos de personal configurada para {self.empresa}", level='WARNING')
                 return None, None
-                
-            registro = df[df[col_cedula].astype(str).str.strip() == str(cedula).strip()]
-            
-            if not registro.empty:
-                telefono = registro.iloc[0][col_celular]
-                email = registro.iloc[0][col_email] if col_email else None
-                return telefono, email
-                
-            return None, None
+
+            # El índice cubre todas las bases de Config.BASES_DATOS y sigue
+            # respondiendo aunque Google Drive no esté disponible.
+            return find_contact(Config.BASES_DATOS, self.empresa, cedula)
         except Exception as e:
             log(f"Error al obtener contacto: {str(e)}", level='ERROR')
             return None, None
 
+    def construir_mensaje(self, destinatario, nombre, fecha_atencion, archivo_adjunto):
+        if not all([destinatario, nombre, archivo_adjunto]):
+            raise ValueError("Faltan parámetros requeridos (destinatario, nombre o adjunto) para enviar el correo")
+
+        if not Path(archivo_adjunto).exists():
+            raise FileNotFoundError(f"Archivo adjunto no encontrado: {archivo_adjunto}")
+
+        asunto = self.plantilla["asunto"]
+        cuerpo = self.plantilla["cuerpo"].format(
+            nombre=nombre,
+            fecha=fecha_atencion or 'N/A',
+            empresa=self.empresa,
+            remitente=self.credenciales["email"]
+        )
+
+        msg = MIMEMultipart()
+        encoded_empresa = Header(self.empresa, 'utf-8').encode()
+        email_address = self.credenciales["email"].encode('ascii', errors='ignore').decode('ascii')
+        msg['From'] = formataddr((encoded_empresa, email_address))
+        msg['To'] = destinatario
+        msg['Subject'] = Header(asunto, 'utf-8').encode()
+        msg.attach(MIMEText(cuerpo, 'plain', 'utf-8'))
+
+        with open(archivo_adjunto, "rb") as adjunto:
+            parte = MIMEBase('application', 'octet-stream')
+            parte.set_payload(adjunto.read())
+            encoders.encode_base64(parte)
+            nombre_archivo = os.path.basename(archivo_adjunto)
+            parte.add_header('Content-Disposition', f'attachment; filename= {nombre_archivo}')
+            msg.attach(parte)
+
+        return msg
+
     def enviar_correo(self, destinatario, nombre, fecha_atencion, archivo_adjunto):
         try:
-            if not all([destinatario, nombre, archivo_adjunto]):
-                raise ValueError("Faltan parámetros requeridos (destinatario, nombre o adjunto) para enviar el correo")
-                
-            if not Path(archivo_adjunto).exists():
-                raise FileNotFoundError(f"Archivo adjunto no encontrado: {archivo_adjunto}")
-
-            asunto = self.plantilla["asunto"]
-            cuerpo = self.plantilla["cuerpo"].format(
-                nombre=nombre,
-                fecha=fecha_atencion or 'N/A',
-                empresa=self.empresa,
-                remitente=self.credenciales["email"]
-            )
-
-            msg = MIMEMultipart()
-            encoded_empresa = Header(self.empresa, 'utf-8').encode()
-            email_address = self.credenciales["email"].encode('ascii', errors='ignore').decode('ascii')
-            msg['From'] = formataddr((encoded_empresa, email_address))
-            msg['To'] = destinatario
-            msg['Subject'] = Header(asunto, 'utf-8').encode()
-            msg.attach(MIMEText(cuerpo, 'plain', 'utf-8'))
-
-            with open(archivo_adjunto, "rb") as adjunto:
-                parte = MIMEBase('application', 'octet-stream')
-                parte.set_payload(adjunto.read())
-                encoders.encode_base64(parte)
-                nombre_archivo = os.path.basename(archivo_adjunto)
-                parte.add_header('Content-Disposition', f'attachment; filename= {nombre_archivo}')
-                msg.attach(parte)
-
-            servidor = smtplib.SMTP('smtp.gmail.com', 587)
-            servidor.starttls()
-            servidor.login(self.credenciales["email"], self.credenciales["password"])
-            texto = msg.as_string()
-            servidor.sendmail(self.credenciales["email"], destinatario, texto)
-            servidor.quit()
+            msg = self.construir_mensaje(destinatario, nombre, fecha_atencion, archivo_adjunto)
+            # La sesión SMTP de la cuenta se reutiliza entre envíos del mismo proceso.
+            get_mailer().send(self.credenciales, msg, destinatario)
 
             log(f"Correo enviado exitosamente a {destinatario}")
             return True
@@ -340,27 +326,38 @@ class EmailSender:
             return False
 
 class PdfProcessor:
-    def extract_pdf_data(self, pdf_path):
+    def extract_pdf_data(self, pdf_path, stream=True, use_cache=True):
         try:
             pdf_path = Path(pdf_path)
             if not pdf_path.exists():
                 raise FileNotFoundError(f"El archivo PDF no existe: {pdf_path}")
 
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text() or ""
-                    text += page_text + "\n"
-            text = unicodedata.normalize('NFC', text)
-
-            data = self._extract_formato_generico(text)
-            data = self._post_process_data(data)
-            self._validate_critical_data(data, pdf_path.name)
-
-            for campo in ['No. Identificacion', 'Nombre_Completo', 'Concepto Altura', 'Concepto de trabajo en espacios confinados','Motivo de Restricción', 'Incluir SVE', 'Restricciones Laborales', 'Concepto Manipulación Alimento']:
-                if not data.get(campo):
-                    data[campo] = "NINGUNO"
+            cache_namespace = 'remision_utils' if stream else 'remision_utils_completo'
+            cached = get_cache().get(pdf_path, cache_namespace) if use_cache else None
+            if cached:
+                log(f"Datos de {pdf_path.name} recuperados de la caché de extracción.")
+                data = cached['data']
+                data['archivo_origen'] = str(pdf_path)
+                data['fecha_procesamiento'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                return data
+
+            # pdfplumber primero; un motor rápido promovido (SGSST_PDF_FAST_BACKENDS) solo
+            # se acepta si todos los campos obligatorios tienen la forma esperada.
+            # Con stream=True se deja de leer en cuanto los campos obligatorios están resueltos.
+            data, _, text_info = extract_with_fallback(
+                pdf_path,
+                lambda text: self._extract_from_text(text, pdf_path),
+                validate=self._required_fields_valid,
+                until=self._required_fields_resolved if stream else None,
+                page_suffix="\n",
+                on_fallback=lambda backend, error: log(f"Motor de texto '{backend}' descartado para {pdf_path.name}: {error}", level='WARNING'),
+            )
+            if text_info['pages_read'] < text_info['pages_total']:
+                log(f"Lectura detenida en la página {text_info['pages_read']} de {text_info['pages_total']} de {pdf_path.name}: campos obligatorios resueltos.")
 
+            data['motor_texto'] = text_info['backend']
+            if use_cache:
+                get_cache().put(pdf_path, cache_namespace, data, 'formato_generico_remisiones', meta=text_info)
             data['archivo_origen'] = str(pdf_path)
             data['fecha_procesamiento'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             return data
@@ -368,35 +365,38 @@ class PdfProcessor:
             log(f"Error en extract_pdf_data para {pdf_path}: {str(e)}", level='ERROR')
             raise ValueError(f"Errores en la extracción de datos en {pdf_path.name}: {str(e)}")
 
-    def _extract_formato_generico(self, text):
-        extraction_rules = {
-            'Nombre Completo': {'pattern': r'(?:Nombre\s*Completo|Paciente|Nombre)[:\s]*(.*?)(?:\n|SEXO:|DOCUMENTO|IDENTIFICACI[ÓO]N|$)', 'processor': lambda x: x.strip().upper() if x else ""},
-            'No. Identificacion': {'pattern': r'(?:Documento[:\s]*CC[:\s]*(\d+))|(?:(?:No\.|N[úu]mero)\s*(?:de)?\s*Identificaci[óo]n[:\s]*(?:CC\s*-\s*)?(\d{7,12}))|(?:(?:CC|TI|CE)[:\s-]*(\d{7,12}))|(?:(?:c[ée]dula|documento|identificaci[óo]n)[:\s]*(\d{7,12}))', 'processor': lambda x: re.sub(r'[^\d]', '', x.strip()) if x else ""},
-            'Fecha Nac': {'pattern': r'Fecha\s*(?:de)?\s*Nac(?:imiento)?[:\s]*([\d/-]+)', 'processor': lambda x: self._format_date(x.strip()) if x else ""},
-            'Edad': {'pattern': r'Edad[:\s]*(\d+)', 'processor': lambda x: int(x.strip()) if x and x.strip().isdigit() else ""},
-            'Sexo': {'pattern': r'(?:Sexo|G[ée]nero)[:\s]*([A-Za-zÁ-Úá-ú]+)', 'processor': lambda x: x.strip().capitalize() if x else ""},
-            'Afiliación': {'pattern': r'(?:Afiliaci[óo]n|Empresa)[:\s]*(.*?)(?:\n|$)', 'processor': lambda x: self._process_afiliacion(x.strip()) if x else ""},
-            'Estado civil': {'pattern': r'Estado\s*civil[:\s]*(.*?)(?:\n|$)', 'processor': lambda x: x.strip().capitalize() if x else ""},
-            'Evaluación Ocupacional': {'pattern': r'(?:TIPO\s*DE\s*EVALUACI[ÓO]N\s*REALIZADA|Tipo\s*de\s*Examen|Evaluaci[óo]n\s*Ocupacional)[:\s]*([^:\n]+?)(?=\s*Fecha\s*de\s*atenci[óo]n:|$)', 'processor': lambda x: x.strip().upper() if x else ""},
-            'Fecha de Atención': {'pattern': r'Fecha\s*(?:de)?\s*atenc[\w\s]*[:\s]*([\d]{1,2}[\-/][\d]{1,2}[\-/][\d]{2,4})','processor': lambda x: self._format_date(x.strip()) if x else ""},
-            'Cargo': {'pattern': r'Cargo[:\s]*([^:\n]+?)(?=\s*Fecha\s*de|$)', 'processor': self._process_cargo},
-            'Exámenes realizados': {'pattern': r'EX[ÁA]MENES\s*REALIZADOS[:\s]*(.*?)(?=\s*(?:RECOMENDACIONES|INCLUIR|RESTRICCIONES|MANEJO|$))', 'processor': lambda x: x.strip().replace('\n', ' ').strip().upper() if x else ""},
-            'Recomendaciones Laborales': {'pattern': r'RECOMENDACIONES\s*LABORALES[:\s]*(.*?)(?=MANEJO\s*EPS/ARL|\Z)', 'processor': lambda x: x.strip().upper() if x else "NINGUNO"},
-            'Incluir SVE': {'pattern': r'Incluir\s*SVE[:\s]*([^\n:]+?)(?=\s*(?:RESTRICCIONES|Concepto|$))', 'processor': lambda x: x.strip().upper() if x and not x.strip().startswith('RESTRICCIONES') else "NINGUNO"},
-            'Restricciones Laborales': {'pattern': r'RESTRICCIONES\s*LABORALES[:\s]*(.*?)(?=\s*(?:Para\s*la\s*revisi[óo]n|INCLUIR|CONCEPTO|[A-ZÁ-Ú]+:|$))', 'processor': lambda x: x.strip().upper() if x else "NINGUNO"},
-            'Concepto Medico': {'pattern': r'Concepto\s*Medico[:\s]*((?!LEVANTAMIENTO)[^:\n]+)', 'processor': lambda x: x.strip().upper() if x else "NINGUNO"},
-            'Concepto Manipulación Alimento': {'pattern': r'Concepto\s*(?:Manipulaci[óo]n)?\s*Alimento[:\s]*(.*?)(?:\n|$)', 'processor': lambda x: x.strip().upper() if x else "NINGUNO"},
-            'Concepto Altura': {'pattern': r'Concepto\s*Altura[:\s]*(.*?)(?:\n|$)', 'processor': lambda x: x.strip().upper() if x else "NINGUNO"},
-            'Concepto de trabajo en espacios confinados': {'pattern': r'Concepto\s*de\s*trabajo\s*en\s*espacios\s*confinados[:\s]*([^:\n]+?)(?=\s*(?:MOTIVO|$))', 'processor': lambda x: x.strip().upper() if x and not x.strip().startswith('MOTIVO') else "NINGUNO"},
-            'Motivo de Restricción': {'pattern': r'MOTIVO\s*DE\s*RESTRICCI[OÓ]N[:\s]*(.*?)(?:\nFIRMA|\Z)', 'processor': lambda x: x.strip().upper() if x else "NINGUNO"},
-        }
+    def _extract_from_text(self, text, pdf_path):
+        text = unicodedata.normalize('NFC', text)
+
+        data = self._extract_formato_generico(text)
+        data = self._post_process_data(data)
+        self._validate_critical_data(data, pdf_path.name)
+
+        for campo in ['No. Identificacion', 'Nombre_Completo', 'Concepto Altura', 'Concepto de trabajo en espacios confinados','Motivo de Restricción', 'Incluir SVE', 'Restricciones Laborales', 'Concepto Manipulación Alimento']:
+            if not data.get(campo):
+                data[campo] = "NINGUNO"
+        return data
+
+    def _required_fields_resolved(self, text):
+        return REGISTRY.get('formato_generico_remisiones').resolved(text)
+
+    def _required_fields_valid(self, data):
+        invalid = REGISTRY.get('formato_generico_remisiones').invalid_fields(data)
+        if invalid:
+            log(f"Campos obligatorios vacíos o con formato inesperado: {', '.join(invalid)}", level='WARNING')
+        return not invalid
 
+    def _extract_formato_generico(self, text):
+        # Reglas en extraction_rules.json (formato_generico_remisiones), compiladas al importar.
+        extracted = REGISTRY.get('formato_generico_remisiones').extract(text, processors={
+            'format_date': self._format_date,
+            'afiliacion': self._process_afiliacion,
+            'cargo': self._process_cargo,
+        })
         data = {}
-        for key, rule in extraction_rules.items():
-            match = re.search(rule['pattern'], text, re.IGNORECASE | re.DOTALL)
-            if match:
-                value = next((g for g in match.groups() if g is not None), "")
-                data[key] = rule['processor'](value)
+        for key, value in extracted.items():
+            if value is not None:
+                data[key] = value
             else:
                 data[key] = ""
                 log(f"No se encontró el campo '{key}' usando regex genérico", level='WARNING')
@@ -436,12 +436,94 @@ class PdfProcessor:
     def _process_cargo(self, value):
         return value.strip().upper() if value else ""
 
+class ControlTransaction:
+    """
+    Agrupa las escrituras de varias remisiones en el archivo de control.
+
+    upsert() valida y encola cada registro; commit() abre cada libro de
+    control una sola vez, aplica sus registros en orden y lo guarda una vez.
+    Así una tanda de remisiones no provoca una lectura, una escritura y una
+    subida de Google Drive por registro.
+
+    La escritura de cada libro pasa por workbook_lock.WorkbookSpool: otros
+    procesos que escriben el mismo libro a la vez esperan el bloqueo, y sus
+    registros pendientes se aplican en el mismo guardado.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.pending = []
+
+    def upsert(self, data, control_path):
+        """Encola el registro y devuelve su posición en los resultados de commit()."""
+        # control_workbook carga openpyxl; los envíos de correo no lo necesitan.
+        from control_workbook import serialize_upsert
+        self.pending.append((Path(control_path), serialize_upsert(*self.handler._prepare_record(data))))
+        return len(self.pending) - 1
+
+    def commit(self, raise_errors=False):
+        """
+        Devuelve, en el orden de upsert(), {'success', 'controlPath', 'row',
+        'action'} por registro, o {'success': False, 'error'} si falló su libro
+        (con raise_errors=True el error se propaga).
+        """
+        from control_workbook import apply_upsert_batches
+        results = [None] * len(self.pending)
+        groups = {}
+        for position, (control_path, record) in enumerate(self.pending):
+            groups.setdefault(control_path, []).append((position, record))
+        self.pending = []
+
+        for control_path, records in groups.items():
+            logging.info(f"Actualizando archivo de control: {control_path} ({len(records)} registros)")
+            try:
+                spool = WorkbookSpool(control_path)
+                written = spool.commit(
+                    [record for _, record in records],
+                    lambda batches, path=control_path: apply_upsert_batches(path, Config.COLUMNAS_CONTROL, batches))
+            except Exception as e:
+                written = [{"success": False, "error": str(e)} for _ in records]
+                logging.debug(traceback.format_exc())
+            for (position, _), result in zip(records, written):
+                if result["success"]:
+                    logging.info(f"Archivo de control {result['action']}: {control_path}")
+                    result["controlPath"] = str(control_path)
+                else:
+                    logging.error(f"Error al actualizar archivo de control {control_path}: {result['error']}")
+                    if raise_errors:
+                        raise RuntimeError(result["error"])
+                results[position] = result
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.pending = []
+        return False
+
+
 class ExcelHandler:
+    def transaction(self):
+        return ControlTransaction(self)
+
     def update_control_file(self, data, control_path):
+        transaction = self.transaction()
+        transaction.upsert(data, control_path)
+        return transaction.commit(raise_errors=True)[0]["controlPath"]
+
+    def _prepare_record(self, data):
+        """
+        Valida los datos de una remisión y devuelve los argumentos de
+        ControlWorkbook.upsert: (cédula, fecha, valores de fila nueva,
+        valores a actualizar).
+        """
+        # pandas solo se carga al registrar remisiones, no al enviar correos.
+        import pandas as pd
         try:
-            control_path = Path(control_path)
-            logging.info(f"Actualizando archivo de control: {control_path}")
-
             # Las claves ahora se normalizan en el punto de entrada del script.
 
             
@@ -478,42 +560,6 @@ class ExcelHandler:
                 data_date = None
                 logging.info("No se encontró fecha de atención, continuando sin ella")
 
-            # 🔹 Cargar o crear el archivo
-            header_row = 6
-            if not control_path.exists():
-                logging.info(f"Archivo de control no existe. Creando nuevo en: {control_path}")
-                df = pd.DataFrame(columns=Config.COLUMNAS_CONTROL)
-            else:
-                try:
-                    df = pd.read_excel(control_path, engine='openpyxl', header=header_row, dtype={'No. Identificación': str})
-                except ValueError:
-                    df = pd.read_excel(control_path, engine='openpyxl', header=None, dtype={'No. Identificación': str})
-                    df.columns = Config.COLUMNAS_CONTROL
-                    df = df.iloc[header_row + 1:].reset_index(drop=True)
-
-            df = df.dropna(how='all')
-
-            if not df.empty:
-                if 'No. Identificación' in df.columns:
-                    df['No. Identificación'] = df['No. Identificación'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
-                if 'Fecha de Atención' in df.columns:
-                    df['Fecha de Atención'] = pd.to_datetime(df['Fecha de Atención'], format='%Y/%m/%d', errors='coerce')
-
-            # 🔹 Generar nuevo Item
-            if 'Item' in df.columns and not df['Item'].isnull().all():
-                max_item = df['Item'].dropna().astype(int).max()
-                new_item = max_item + 1
-            else:
-                new_item = 1
-
-            # 🔹 Buscar si ya existe el mismo registro
-            data_id = str(data['No. Identificación']).strip()
-            # Buscar si ya existe el mismo registro (solo por cédula si no hay fecha)
-            if data_date is not None:
-                same_person = (df['No. Identificación'] == data_id) & (df['Fecha de Atención'] == data_date)
-            else:
-                same_person = (df['No. Identificación'] == data_id)
-
             # 🔹 Mapear nombres de campos a columnas del Excel
             field_to_column_map = {
                 'Nombre_Completo': 'Nombre Completo',
@@ -540,7 +586,7 @@ class ExcelHandler:
             }
 
             # Crear new_row_data usando el mapeo correcto
-            new_row_data = {'Item': new_item}
+            new_row_data = {}
             for excel_col in Config.COLUMNAS_CONTROL:
                 if excel_col != 'Item':
                     # Buscar el valor en data usando el mapeo inverso
@@ -566,34 +612,10 @@ class ExcelHandler:
             # (Esto es menos probable ahora, pero puede ser una medida de seguridad si otras partes del código la agregan)
             # new_row_data.pop('No. Identificacion', None) # Descomentar si es necesario 
 
-            if same_person.any():
-                idx = df[same_person].index[0]
-                for col, value in new_row_data.items():
-                    if col in data and data[col]:
-                        if col == 'Edad':
-                            try:
-                                value = int(value)
-                            except (ValueError, TypeError):
-                                value = pd.NA
-                        elif col in df.columns and df[col].dtype in ['int64', 'float64']:
-                            value = pd.to_numeric(value, errors='coerce')
-                        elif col in df.columns and df[col].dtype == 'object':
-                            value = str(value)
-                        df.loc[idx, col] = value
-                action = "actualizado"
-                row_number = idx + header_row + 2
-            else:
-                new_row = pd.Series(new_row_data)
-                df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                row_number = len(df) + header_row + 1
-                action = f"añadido en la fila {row_number}"
-
-            # 🔹 Guardar archivo
-            with pd.ExcelWriter(control_path, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, header=True, startrow=header_row)
-                logging.info(f"Archivo de control {action}: {control_path}")
+            # Al actualizar solo se escriben las columnas que vienen en los datos.
+            update_data = {col: value for col, value in new_row_data.items() if col in data and data[col]}
 
-            return str(control_path)
+            return cedula_valor, data_date, new_row_data, update_data
 
         except Exception as e:
             logging.error(f"Error al actualizar archivo de control: {str(e)}")
@@ -603,6 +625,7 @@ class ExcelHandler:
 
 class DocumentGenerator:
     def generate_remision(self, data, template_path, output_dir):
+        from docxtpl import DocxTemplate
         try:
             template_path = Path(template_path)
             doc = DocxTemplate(template_path)
@@ -659,7 +682,82 @@ def generate_remision_document(data, empresa):
         log(f"Error al generar documento de remisión: {str(e)}", level='ERROR')
         return {"success": False, "error": str(e)}
 
-def send_remision_by_email(doc_path, data, empresa):
+def generate_remisiones_batch(records, empresa):
+    """
+    Genera varias remisiones y las registra en el control con una sola
+    escritura por libro. records es una lista de {'data', 'empresa'} (la
+    empresa es opcional). Devuelve un resultado por registro, en orden, con
+    la fila y la acción del control igual que generate_remision_document.
+    """
+    doc_generator = DocumentGenerator()
+    transaction = ExcelHandler().transaction()
+    results, queued = [], {}
+    for i, record in enumerate(records):
+        data = record['data']
+        empresa_registro = record.get('empresa') or empresa
+        try:
+            empresa_rutas = Config.get_empresa_paths(empresa_registro)
+            doc_path = doc_generator.generate_remision(data, empresa_rutas["plantilla"], empresa_rutas["remisiones"])
+            log(f"Documento de remisión generado en: {doc_path}")
+            queued[i] = transaction.upsert(data, empresa_rutas["control"])
+            results.append({"success": True, "documentPath": doc_path})
+        except Exception as e:
+            log(f"Error al generar documento de remisión: {str(e)}", level='ERROR')
+            results.append({"success": False, "error": str(e)})
+
+    control_results = transaction.commit()
+    for i, position in queued.items():
+        results[i].update(control_results[position])
+    log(f"Remisiones generadas: {sum(r['success'] for r in results)} de {len(results)}.")
+    return {"success": all(r["success"] for r in results), "results": results}
+
+def _resolve_contact(cedula, empresa):
+    """Resultado de resolve_contacts para una cédula (lo usan el correo y WhatsApp)."""
+    contact, = resolve_contacts(Config.BASES_DATOS, [(cedula, empresa)])
+    return contact
+
+def _contact_field(contact, field, missing):
+    """
+    'email' o 'telefono' de un resultado de resolve_contacts. ValueError si
+    la cédula es ambigua (el mismo mensaje en el correo y en WhatsApp) o si
+    no hay dato.
+    """
+    if contact['status'] == 'ambiguous':
+        raise ValueError(f"La cédula {contact['cedula']} aparece en varias filas de la base de personal")
+    if contact['status'] != 'found' or not contact.get(field):
+        raise ValueError(missing)
+    return contact[field]
+
+def _email_destinatario(contact):
+    return _contact_field(contact, 'email', "No se encontró la dirección de correo para el destinatario")
+
+def _outbox_enabled():
+    return os.environ.get('SGSST_EMAIL_OUTBOX', '1') != '0'
+
+def _enqueue_email(outbox, sender, cedula, destinatario, doc_path, data, file_name=None):
+    """Registra un correo en la bandeja de salida y devuelve el resultado para la interfaz."""
+    if not doc_path or not Path(doc_path).exists():
+        raise FileNotFoundError(f"Archivo adjunto no encontrado: {doc_path}")
+    entry = outbox.enqueue(
+        sender.empresa, normalize_cedula(cedula), destinatario, doc_path,
+        nombre=data.get('Nombre Completo', 'Trabajador'), fecha_atencion=data.get('Fecha de Atención', ''),
+        filename=file_name)
+    if entry['status'] == email_outbox.SENT:
+        message = f"Esta remisión ya se había enviado a {destinatario} el {entry['sent']}"
+    else:
+        message = f"Correo para {destinatario} en cola de envío"
+    log(message)
+    return {"success": True, "queued": True, "outboxId": entry['id'], "status": entry['status'],
+            "destinatario": destinatario, "message": message}
+
+def send_remision_by_email(doc_path, data, empresa, file_name=None):
+    """
+    Registra el correo de la remisión en la bandeja de salida (email_outbox)
+    y vuelve sin esperar a Gmail; el worker de la bandeja lo envía. Con
+    SGSST_EMAIL_OUTBOX=0 se envía en la misma llamada, como antes. El
+    contacto se resuelve como en send_remisiones_by_email: una cédula con
+    datos distintos en varias filas se rechaza.
+    """
     try:
         log(f"Iniciando envío de email para la empresa {empresa} con el documento {doc_path}")
         email_sender = EmailSender(empresa)
@@ -671,11 +769,14 @@ def send_remision_by_email(doc_path, data, empresa):
         if not cedula:
             raise ValueError("No se encontró el número de identificación en los datos para el email")
             
-        telefono, destinatario = email_sender.obtener_contacto(cedula)
-        
-        if not destinatario:
-            raise ValueError("No se encontró la dirección de correo para el destinatario")
-            
+        destinatario = _email_destinatario(_resolve_contact(cedula, email_sender.empresa))
+
+        if _outbox_enabled():
+            outbox = email_outbox.get_outbox()
+            result = _enqueue_email(outbox, email_sender, cedula, destinatario, doc_path, data, file_name)
+            email_outbox.ensure_worker(outbox)
+            return result
+
         success = email_sender.enviar_correo(destinatario, nombre, fecha_atencion, doc_path)
         
         if success:
@@ -688,6 +789,90 @@ def send_remision_by_email(doc_path, data, empresa):
         log(f"Error al enviar documento por email: {str(e)}", level='ERROR')
         return {"success": False, "error": str(e)}
 
+def send_remisiones_by_email(records, empresa):
+    """
+    Envía por correo varias remisiones ya generadas. records es una lista de
+    {'docPath', 'data', 'empresa', 'fileName'} (empresa y fileName son
+    opcionales). Los contactos se resuelven en una sola consulta. Cada correo
+    se registra en la bandeja de salida, igual que send_remision_by_email, y
+    el worker se arranca una sola vez para todo el lote. Devuelve un
+    resultado por registro, en orden.
+
+    Con SGSST_EMAIL_OUTBOX=0 los mensajes salen en la misma llamada, de una
+    cola con una sesión SMTP por cuenta, el límite por minuto y los
+    reintentos de bulk_mailer.
+    """
+    queries = [(record['data'].get('No. Identificación', ''), record.get('empresa') or empresa) for record in records]
+    contacts = resolve_contacts(Config.BASES_DATOS, queries)
+    if _outbox_enabled():
+        return _queue_remisiones_by_email(records, empresa, contacts)
+
+    results = [None] * len(records)
+    senders = {}
+    mailer = BulkMailer()
+    try:
+        for i, (record, contact) in enumerate(zip(records, contacts)):
+            data = record['data']
+            try:
+                empresa_registro = (record.get('empresa') or empresa).upper()
+                if empresa_registro not in senders:
+                    senders[empresa_registro] = EmailSender(empresa_registro)
+                sender = senders[empresa_registro]
+                _email_destinatario(contact)
+                msg = sender.construir_mensaje(contact['email'], data.get('Nombre Completo', 'Trabajador'),
+                                               data.get('Fecha de Atención', ''), record.get('docPath'))
+                mailer.enqueue(sender.credenciales, msg, contact['email'], key=i)
+                results[i] = {"success": False, "destinatario": contact['email']}
+            except Exception as e:
+                log(f"No se enviará la remisión de {data.get('Nombre Completo', 'N/A')}: {str(e)}", level='ERROR')
+                results[i] = {"success": False, "error": str(e)}
+
+        report = mailer.run()
+    finally:
+        mailer.close()
+    for sent in report['results']:
+        results[sent['key']].update(success=sent['success'], attempts=sent['attempts'])
+        if not sent['success']:
+            results[sent['key']]['error'] = sent['error']
+    return {
+        "success": all(r["success"] for r in results),
+        "results": results,
+        "sent": report['sent'],
+        "seconds": report['seconds'],
+        "messagesPerSecond": report['messages_per_second'],
+    }
+
+def _queue_remisiones_by_email(records, empresa, contacts):
+    outbox = email_outbox.get_outbox()
+    results = []
+    senders = {}
+    for record, contact in zip(records, contacts):
+        data = record['data']
+        try:
+            empresa_registro = (record.get('empresa') or empresa).upper()
+            if empresa_registro not in senders:
+                senders[empresa_registro] = EmailSender(empresa_registro)
+            destinatario = _email_destinatario(contact)
+            results.append(_enqueue_email(outbox, senders[empresa_registro], contact['cedula'], destinatario,
+                                          record.get('docPath'), data, record.get('fileName')))
+        except Exception as e:
+            log(f"No se enviará la remisión de {data.get('Nombre Completo', 'N/A')}: {str(e)}", level='ERROR')
+            results.append({"success": False, "error": str(e)})
+    email_outbox.ensure_worker(outbox)
+    return {
+        "success": all(r["success"] for r in results),
+        "results": results,
+        "queued": sum(1 for r in results if r.get("queued")),
+    }
+
+def get_email_status(ids=None, cedula=None, limit=50):
+    """Estado de los correos de la bandeja de salida, por id o por cédula."""
+    outbox = email_outbox.get_outbox()
+    # Si el worker se detuvo (reinicio del equipo) con envíos pendientes, se reanuda.
+    email_outbox.ensure_worker(outbox)
+    messages = outbox.status(ids=ids, cedula=normalize_cedula(cedula) if cedula else None, limit=limit)
+    return {"success": True, "messages": messages, "counts": outbox.counts()}
+
 def send_remision_by_whatsapp(doc_path, data, empresa):
     try:
         log(f"Iniciando preparación de documento para WhatsApp: {doc_path}")
@@ -696,10 +881,9 @@ def send_remision_by_whatsapp(doc_path, data, empresa):
         if not cedula:
             raise ValueError("No se encontró Cédula para buscar contacto de WhatsApp.")
         
-        telefono, _ = email_sender.obtener_contacto(cedula)
-        
-        if not telefono:
-            raise ValueError("No se encontró teléfono para el contacto.")
+        # Misma resolución que el correo: una cédula ambigua se rechaza en ambos canales.
+        telefono = _contact_field(_resolve_contact(cedula, email_sender.empresa), 'telefono',
+                                  "No se encontró teléfono para el contacto.")
 
         if os.path.exists(doc_path):
             log(f"Documento preparado para WhatsApp: {doc_path}")
@@ -720,6 +904,34 @@ def send_remision_by_whatsapp(doc_path, data, empresa):
         log(f"Error al preparar documento para WhatsApp: {str(e)}", level='ERROR')
         return {"success": False, "error": str(e)}
 
+def resolve_remision_contacts(cedulas, empresa=None):
+    """
+    Busca el celular y el correo de varias cédulas de una vez, para preparar
+    el envío de una tanda de remisiones. Cada elemento de cedulas es la
+    cédula o {'cedula', 'empresa'}; sin empresa se busca en todas las bases
+    de Config.BASES_DATOS. Devuelve un resultado por cédula, en orden, con
+    su 'status' (found, not_found o ambiguous) y el resumen por estado.
+    """
+    queries = []
+    for item in cedulas:
+        if isinstance(item, dict):
+            queries.append((item.get('cedula', ''), item.get('empresa') or empresa))
+        else:
+            queries.append((item, empresa))
+    for _, empresa_consulta in queries:
+        if empresa_consulta and empresa_consulta.upper() not in Config.BASES_DATOS:
+            raise ValueError(f"No hay base de datos de personal configurada para {empresa_consulta}")
+
+    results = resolve_contacts(Config.BASES_DATOS, queries)
+    summary = {status: sum(r['status'] == status for r in results) for status in ('found', 'not_found', 'ambiguous')}
+    log(f"Contactos resueltos: {summary['found']} encontrados, {summary['not_found']} sin encontrar, "
+        f"{summary['ambiguous']} ambiguos de {len(results)}.")
+    for result in results:
+        if result['status'] == 'ambiguous':
+            origenes = ', '.join(f"{'/'.join(m['empresas'])} fila {m['row']}" for m in result['matches'])
+            log(f"Cédula {result['cedula']} ambigua: {origenes}", level='WARNING')
+    return {"success": True, "results": results, "summary": summary}
+
 # --- Función de normalización de claves agregada ---
 def normalize_data_keys(data):
     """
@@ -799,6 +1011,56 @@ def normalize_data_keys(data):
     
     return normalized_data
 
+def run_command(command, temp_data):
+    """
+    Ejecuta un comando de la CLI (--generate-remision, --send-email,
+    --send-whatsapp) con los datos {'data', 'empresa', 'docPath'} y devuelve
+    el payload del resultado. --generate-remisiones recibe {'records':
+    [{'data', 'empresa'}, ...], 'empresa'} y --resolve-contacts {'cedulas':
+    [cédula o {'cedula', 'empresa'}, ...], 'empresa'}. --send-emails recibe
+    {'records': [{'docPath', 'data', 'empresa'}, ...], 'empresa'} y
+    --email-status {'ids', 'cedula', 'limit'}. Lo usan la CLI y sidecar.py.
+    """
+    if command == "--resolve-contacts":
+        return resolve_remision_contacts(temp_data.get('cedulas', []), temp_data.get('empresa'))
+
+    if command == "--email-status":
+        return get_email_status(temp_data.get('ids'), temp_data.get('cedula'), temp_data.get('limit', 50))
+
+    if command == "--send-emails":
+        records = [{**record, 'data': normalize_data_keys(record.get('data', {}))}
+                   for record in temp_data.get('records', [])]
+        return send_remisiones_by_email(records, temp_data.get('empresa', 'TEMPOACTIVA'))
+
+    if command == "--generate-remisiones":
+        records = [{**record, 'data': normalize_data_keys(record.get('data', {}))}
+                   for record in temp_data.get('records', [])]
+        return generate_remisiones_batch(records, temp_data.get('empresa', 'TEMPOACTIVA'))
+
+    # --- CORRECCIÓN: Normalizar las claves de los datos cargados ---
+    raw_data = temp_data.get('data', {})
+    data = normalize_data_keys(raw_data) # <-- Aplicar normalización aquí
+    log(f"Claves normalizadas. Claves finales: {list(data.keys())}")
+    # --- FIN CORRECCIÓN ---
+
+    empresa = temp_data.get('empresa', 'TEMPOACTIVA') # Asegurar valor por defecto
+
+    if command == "--generate-remision":
+        return generate_remision_document(data, empresa)
+    elif command == "--send-email":
+        # Asegurarse de pasar el docPath correcto
+        doc_path = temp_data.get('docPath')
+        if not doc_path:
+             raise ValueError("docPath no encontrado en los datos temporales para --send-email")
+        return send_remision_by_email(doc_path, data, empresa, temp_data.get('fileName'))
+    elif command == "--send-whatsapp":
+        # Asegurarse de pasar el docPath correcto
+        doc_path = temp_data.get('docPath')
+        if not doc_path:
+             raise ValueError("docPath no encontrado en los datos temporales para --send-whatsapp")
+        return send_remision_by_whatsapp(doc_path, data, empresa)
+    return {"success": False, "error": "Comando no reconocido"}
+
 if __name__ == "__main__":
     if len(sys.argv) > 2:
         command = sys.argv[1]
@@ -809,31 +1071,7 @@ if __name__ == "__main__":
             log(f"Comando '{command}' recibido con el archivo de datos: {data_file}")
             with open(data_file, 'r', encoding='utf-8') as f:
                 temp_data = json.load(f)
-
-            # --- CORRECCIÓN: Normalizar las claves de los datos cargados ---
-            raw_data = temp_data.get('data', {})
-            data = normalize_data_keys(raw_data) # <-- Aplicar normalización aquí
-            log(f"Claves normalizadas. Claves finales: {list(data.keys())}")
-            # --- FIN CORRECCIÓN ---
-            
-            empresa = temp_data.get('empresa', 'TEMPOACTIVA') # Asegurar valor por defecto
-            
-            if command == "--generate-remision":
-                result = generate_remision_document(data, empresa)
-            elif command == "--send-email":
-                # Asegurarse de pasar el docPath correcto
-                doc_path = temp_data.get('docPath') 
-                if not doc_path:
-                     raise ValueError("docPath no encontrado en los datos temporales para --send-email")
-                result = send_remision_by_email(doc_path, data, empresa)
-            elif command == "--send-whatsapp":
-                # Asegurarse de pasar el docPath correcto
-                doc_path = temp_data.get('docPath')
-                if not doc_path:
-                     raise ValueError("docPath no encontrado en los datos temporales para --send-whatsapp")
-                result = send_remision_by_whatsapp(doc_path, data, empresa)
-            else:
-                result = {"success": False, "error": "Comando no reconocido"}
+            result = run_command(command, temp_data)
 
         except Exception as e:
             log(f"Error crítico en la ejecución del script: {str(e)}", level='ERROR')
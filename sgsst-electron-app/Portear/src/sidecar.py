@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Sidecar residente de Python para la aplicación Electron.
+
+Antes, main.js lanzaba un proceso de Python por operación (process_pdf_cli.py,
+remision_utils.py, accident_processor.py extract, accident_report_generator.py,
+map_directory.py, convert_docx_to_pdf.py y los generadores de actas). Cada
+proceso pagaba el arranque del intérprete y la importación de pandas,
+docxtpl, pdfplumber u openpyxl. Este proceso se mantiene vivo y expone esas
+operaciones como métodos RPC. Cada módulo se importa una sola vez, en la
+primera llamada o al arrancar con --preload.
+
+El análisis con el LLM sigue en accident_model_server.py: ese proceso tiene
+su propia cola y libera la memoria del modelo cuando no se usa.
+
+Protocolo (una línea JSON por mensaje, como accident_model_server.py):
+
+    Entrada:
+        {"id": 1, "method": "pdf.process", "params": {"path": "...", "options": {...}}}
+        {"method": "shutdown"}             (o el cierre de stdin) termina el proceso
+
+    Salida:
+        {"type": "ready", "pid": ..., "methods": [...]}
+        {"type": "log", "id": ..., "level": ..., "message": ...}
+        {"type": "progress", "id": ..., "step": ..., "percentage": ..., "message": ...}
+        {"type": "result", "id": ..., "payload": {...}}
+
+Las solicitudes se atienden en paralelo en un pool de hilos (--workers). La
+conversión con Word por COM se ejecuta de una en una; las escrituras del
+archivo de control se coordinan en workbook_lock. Lo que los
+módulos imprimen en stdout (sus logs y progreso NDJSON, o texto suelto) sale
+etiquetado con el id de la solicitud del hilo que lo imprimió.
+
+Uso:
+    python sidecar.py [--workers N] [--preload]
+"""
+
+import io
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+import traceback
+import importlib
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+
+# Módulos que --preload importa en segundo plano al arrancar.
+PRELOAD_MODULES = [
+    'process_pdf_cli',
+    'remision_utils',
+    # remision_utils los importa al usarlos; en el sidecar se cargan de antemano.
+    'pandas',
+    'docxtpl',
+    'accident_processor',
+    'accident_extraction',
+    'accident_report_generator',
+    'accident_config',
+    'map_directory',
+    'convert_docx_to_pdf',
+    'copasst_acta_generator',
+    'comite_convivencia_acta_generator',
+]
+
+# nombre -> (función(params, request), nombre del candado o None)
+METHODS = {}
+
+_stdout = None
+_output_lock = threading.Lock()
+_local = threading.local()
+
+
+def method(name, lock=None):
+    def register(func):
+        METHODS[name] = (func, lock)
+        return func
+    return register
+
+
+def emit(message):
+    with _output_lock:
+        _stdout.write(json.dumps(message, ensure_ascii=False) + '\n')
+        _stdout.flush()
+
+
+class Request:
+    def __init__(self, request_id):
+        self.id = request_id
+
+    def progress(self, step, percentage, message, **extra):
+        emit({'type': 'progress', 'id': self.id, 'step': step, 'percentage': percentage, 'message': message, **extra})
+
+    def log(self, message, level='INFO'):
+        emit({'type': 'log', 'id': self.id, 'level': level, 'message': message})
+
+
+class _RequestOutput(io.TextIOBase):
+    """
+    Reemplaza a sys.stdout. Cada hilo acumula sus líneas por separado; las
+    que ya son mensajes NDJSON ('log', 'progress') se reenvían con el id de
+    la solicitud en curso y el resto sale como 'log'.
+    """
+    encoding = 'utf-8'
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        lines = (getattr(_local, 'buffer', '') + text).split('\n')
+        _local.buffer = lines.pop()
+        for line in lines:
+            self._forward(line)
+        return len(text)
+
+    def flush_line(self):
+        buffer = getattr(_local, 'buffer', '')
+        _local.buffer = ''
+        self._forward(buffer)
+
+    def _forward(self, line):
+        if not line.strip():
+            return
+        try:
+            message = json.loads(line)
+        except ValueError:
+            message = None
+        # Un 'result' impreso por un módulo no es el resultado de la solicitud.
+        if not isinstance(message, dict) or message.get('type') not in ('log', 'progress'):
+            message = {'type': 'log', 'level': 'INFO', 'message': line}
+        request_id = getattr(_local, 'request_id', None)
+        if request_id is not None:
+            message.setdefault('id', request_id)
+        emit(message)
+
+    def reconfigure(self, **kwargs):
+        # Los módulos lo llaman al arrancar como script; aquí la salida ya es UTF-8.
+        pass
+
+
+# --- Métodos ---
+
+@method('sidecar.ping')
+def _ping(params, request):
+    return {'success': True, 'pid': os.getpid()}
+
+
+@method('sidecar.methods')
+def _methods(params, request):
+    return {'success': True, 'methods': sorted(METHODS)}
+
+
+@method('pdf.process')
+def _pdf_process(params, request):
+    import process_pdf_cli
+    # PdfProcessor guarda el último formato detectado: uno por hilo.
+    if getattr(_local, 'pdf_processor', None) is None:
+        _local.pdf_processor = process_pdf_cli.PdfProcessor()
+    return process_pdf_cli.process_pdf(params.get('path'), params.get('options'), _local.pdf_processor)
+
+
+def _remision_method(command):
+    def handler(params, request):
+        import remision_utils
+        return remision_utils.run_command(command, params)
+    return handler
+
+
+# Las escrituras concurrentes del control se agrupan en workbook_lock.WorkbookSpool.
+method('remision.generate')(_remision_method('--generate-remision'))
+method('remision.generate_batch')(_remision_method('--generate-remisiones'))
+method('remision.send_email')(_remision_method('--send-email'))
+method('remision.send_email_batch')(_remision_method('--send-emails'))
+method('remision.email_status')(_remision_method('--email-status'))
+method('remision.send_whatsapp')(_remision_method('--send-whatsapp'))
+method('remision.resolve_contacts')(_remision_method('--resolve-contacts'))
+
+
+@method('accident.extract')
+def _accident_extract(params, request):
+    import accident_processor
+    return accident_processor.extract_data_from_pdf(params.get('pdf_path'))
+
+
+@method('accident.report')
+def _accident_report(params, request):
+    import accident_report_generator
+    return accident_report_generator.generate_report(params, progress=request.progress)
+
+
+@method('config.get')
+def _config_get(params, request):
+    import accident_config
+    return accident_config.get_config(params.get('empresa', 'TEMPOACTIVA'))
+
+
+@method('directory.map')
+def _directory_map(params, request):
+    import map_directory
+    return {'success': True, 'structure': map_directory.map_directory(params.get('path'))}
+
+
+@method('docx.to_pdf', lock='office')
+def _docx_to_pdf(params, request):
+    import convert_docx_to_pdf
+    return {'success': True, 'pdf_path': convert_docx_to_pdf.convert(params.get('path'))}
+
+
+@method('acta.copasst')
+def _acta_copasst(params, request):
+    import copasst_acta_generator
+    return copasst_acta_generator.generate_acta(params.get('changes', []), params.get('output_path'))
+
+
+@method('acta.convivencia')
+def _acta_convivencia(params, request):
+    import comite_convivencia_acta_generator
+    return comite_convivencia_acta_generator.generate_acta(params.get('changes', []), params.get('output_path'))
+
+
+# --- Servicio ---
+
+class Sidecar:
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sidecar')
+        self.locks = {lock: threading.Lock() for _, lock in METHODS.values() if lock}
+
+    def submit(self, request_id, name, params):
+        if name not in METHODS:
+            raise ValueError(f"Método desconocido: {name}")
+        self.executor.submit(self._handle, request_id, name, params or {})
+
+    def _handle(self, request_id, name, params):
+        func, lock = METHODS[name]
+        _local.request_id = request_id
+        try:
+            with self.locks[lock] if lock else nullcontext():
+                payload = func(params, Request(request_id))
+        except SystemExit as e:
+            # Algunos módulos terminan con sys.exit() al fallar.
+            payload = {'success': False, 'error': f"'{name}' terminó con código {e.code}."}
+        except Exception as e:
+            logging.error(f"Error en '{name}': {e}\n{traceback.format_exc()}")
+            payload = {'success': False, 'error': str(e), 'traceback': traceback.format_exc()}
+        finally:
+            sys.stdout.flush_line()
+            _local.request_id = None
+        emit({'type': 'result', 'id': request_id, 'payload': payload})
+
+    def preload(self):
+        def run():
+            for name in PRELOAD_MODULES:
+                try:
+                    importlib.import_module(name)
+                except Exception as e:
+                    emit({'type': 'log', 'level': 'WARNING', 'message': f"No se pudo precargar {name}: {e}"})
+            emit({'type': 'log', 'level': 'INFO', 'message': "Módulos precargados."})
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self.executor.shutdown(wait=True)
+
+
+def serve(workers, preload):
+    global _stdout
+    sys.stdin.reconfigure(encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    _stdout = sys.stdout
+    sys.stdout = _RequestOutput()
+
+    sidecar = Sidecar(workers)
+    emit({'type': 'ready', 'pid': os.getpid(), 'methods': sorted(METHODS)})
+    if preload:
+        sidecar.preload()
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('method') == 'shutdown':
+                break
+            sidecar.submit(request_id, request.get('method'), request.get('params'))
+        except Exception as e:
+            emit({'type': 'result', 'id': request_id, 'payload': {
+                'success': False,
+                'error': f"Solicitud inválida: {str(e)}",
+                'traceback': traceback.format_exc()
+            }})
+
+    sidecar.stop()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(sys.stderr)])
+    parser = argparse.ArgumentParser(description="Sidecar residente de Python para Electron.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Solicitudes atendidas en paralelo.")
+    parser.add_argument("--preload", action="store_true", help="Importar los módulos en segundo plano al arrancar.")
+    args = parser.parse_args()
+    # Los módulos se importan por nombre, como cuando main.js los lanza con cwd en src.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    serve(args.workers, args.preload)
+
+
+if __name__ == "__main__":
+    main()
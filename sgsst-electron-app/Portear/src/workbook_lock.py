@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Bloqueo entre procesos y agrupación de escrituras de los libros de control.
+
+Dos ventanas de Electron, o una tanda de la interfaz y una remisión de
+Electron, pueden escribir a la vez el mismo GI-FO-012. Sin coordinación el
+último en guardar borra las filas del otro, y mientras Google Drive sincroniza
+el archivo el guardado falla con PermissionError.
+
+WorkbookLock es un archivo de bloqueo junto al libro (.<libro>.lock), creado
+de forma exclusiva y con el pid, el equipo y un identificador único de quien
+lo tiene. Mientras lo tiene, un hilo renueva su hora de modificación cada
+cuarto de SGSST_CONTROL_LOCK_STALE_S (300 s por defecto), aunque apply() tarde
+minutos guardando un libro grande en Drive. Se considera abandonado si su
+proceso ya no existe en este equipo, o si dejó de renovarse durante
+SGSST_CONTROL_LOCK_STALE_S segundos (el proceso se colgó, su pid lo reutiliza
+otro programa o está en otro equipo). release() solo borra el bloqueo si
+sigue siendo suyo: nunca el de quien lo tomó después.
+
+WorkbookSpool agrupa las escrituras. Cada escritor deja sus registros en la
+carpeta .<libro>.spool y luego intenta tomar el bloqueo. Quien lo obtiene
+aplica en una sola apertura y un solo guardado todos los registros
+pendientes, los suyos y los de quienes llegaron mientras tanto, y deja a
+cada uno su resultado. Los demás encuentran su resultado sin tener que
+escribir el libro.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import logging
+import itertools
+import threading
+from pathlib import Path
+
+DEFAULT_STALE_SECONDS = 300
+POLL_INTERVAL = 0.05
+
+_counter = itertools.count()
+
+
+def _pid_alive(pid):
+    if sys.platform == 'win32':
+        # os.kill(pid, 0) terminaría el proceso en Windows.
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # Sin permiso para abrirlo sigue existiendo; si no, ya terminó.
+            return ctypes.GetLastError() == 5
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_json_atomic(path, data):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+class WorkbookLock:
+    def __init__(self, workbook_path, stale_seconds=None):
+        workbook_path = Path(workbook_path)
+        self.path = workbook_path.with_name(f".{workbook_path.name}.lock")
+        if stale_seconds is None:
+            stale_seconds = float(os.environ.get('SGSST_CONTROL_LOCK_STALE_S', DEFAULT_STALE_SECONDS))
+        self.stale_seconds = stale_seconds
+        self.held = False
+        self.token = None
+        self._heartbeat = None
+
+    def _owner(self):
+        return {'pid': os.getpid(), 'host': socket.gethostname(), 'thread': threading.get_ident(), 'time': time.time(),
+                'token': self.token}
+
+    def _read_owner(self):
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def try_acquire(self):
+        try:
+            fd = os.open(str(self.path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self._is_stale():
+                return False
+            logging.warning(f"Bloqueo abandonado de {self.path.name}; se elimina.")
+            try:
+                # Renombrar es atómico: si otro proceso ya lo retiró, no se toca el bloqueo nuevo.
+                stale = self.path.with_name(f"{self.path.name}.{os.getpid()}.{next(_counter)}.stale")
+                os.replace(self.path, stale)
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            return self.try_acquire()
+        self.token = uuid.uuid4().hex
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._owner(), f)
+        self.held = True
+        self._start_heartbeat()
+        return True
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+        return True
+
+    def owned(self):
+        """True si el archivo de bloqueo sigue siendo el de esta adquisición."""
+        if not self.held:
+            return False
+        try:
+            return self._read_owner().get('token') == self.token
+        except (OSError, ValueError):
+            return False
+
+    def refresh(self):
+        """Renueva la hora del bloqueo. False si ya no es de este objeto (lo tomó otro)."""
+        if not self.owned():
+            return False
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _start_heartbeat(self):
+        stop = threading.Event()
+        interval = max(self.stale_seconds / 4, POLL_INTERVAL)
+
+        def beat():
+            while not stop.wait(interval):
+                if not self.refresh():
+                    logging.warning(f"Se perdió el bloqueo de {self.path.name}.")
+                    return
+
+        self._heartbeat = stop
+        threading.Thread(target=beat, name=f"lock-{self.path.name}", daemon=True).start()
+
+    def release(self):
+        if self.held:
+            self._heartbeat.set()
+            # Si otro lo tomó (se consideró abandonado), el archivo ya es suyo.
+            if self.owned():
+                self._remove()
+            self.held = False
+            self.token = None
+
+    def _remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _is_stale(self):
+        try:
+            age = time.time() - self.path.stat().st_mtime
+        except OSError:
+            # Ya no existe, o en Windows otro proceso lo está borrando
+            # (PermissionError): no está abandonado; quien llama vuelve a intentar.
+            return False
+        try:
+            owner = self._read_owner()
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            # Recién creado y aún sin contenido, o dañado: solo cuenta la edad.
+            return age > self.stale_seconds
+        if owner.get('host') == socket.gethostname() and not _pid_alive(owner.get('pid', 0)):
+            return True
+        # El dueño vivo renueva el bloqueo cada stale_seconds / 4: si no lo hizo
+        # en stale_seconds, el pid ya no es suyo o el proceso no responde.
+        return age > self.stale_seconds
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class WorkbookSpool:
+    """
+    Cola en disco de escrituras pendientes de un libro. commit() entrega los
+    registros y espera su resultado; apply(lotes) recibe la lista de lotes
+    pendientes (uno por escritor, en orden de llegada) y devuelve una lista
+    de resultados por lote.
+    """
+
+    def __init__(self, workbook_path, coalesce=True, stale_seconds=None):
+        self.workbook_path = Path(workbook_path)
+        self.dir = self.workbook_path.with_name(f".{self.workbook_path.name}.spool")
+        self.lock = WorkbookLock(workbook_path, stale_seconds)
+        self.coalesce = coalesce
+
+    def submit(self, records):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        ticket = f"{time.time_ns():020d}-{os.getpid()}-{threading.get_ident()}-{next(_counter)}"
+        _write_json_atomic(self.dir / f"{ticket}.req.json", records)
+        return ticket
+
+    def commit(self, records, apply, timeout=None):
+        ticket = self.submit(records)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            results = self._take_result(ticket)
+            if results is not None:
+                return results
+            if self.lock.try_acquire():
+                try:
+                    self._drain(ticket, apply)
+                finally:
+                    self.lock.release()
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No se pudo escribir {self.workbook_path.name}: el libro sigue bloqueado.")
+            time.sleep(POLL_INTERVAL)
+
+    def _drain(self, ticket, apply):
+        if self.coalesce:
+            tickets = sorted(p.name[:-len('.req.json')] for p in self.dir.glob('*.req.json'))
+        else:
+            tickets = [ticket] if (self.dir / f"{ticket}.req.json").exists() else []
+        batches = []
+        for name in tickets:
+            with open(self.dir / f"{name}.req.json", encoding='utf-8') as f:
+                batches.append(json.load(f))
+        if not batches:
+            return
+        if len(batches) > 1:
+            logging.info(f"Agrupando {len(batches)} escrituras pendientes en un solo guardado.")
+        try:
+            results = apply(batches)
+        except Exception as e:
+            logging.error(f"Error al aplicar las escrituras pendientes: {e}")
+            results = [[{'success': False, 'error': str(e)} for _ in batch] for batch in batches]
+        for name, result in zip(tickets, results):
+            _write_json_atomic(self.dir / f"{name}.res.json", result)
+            (self.dir / f"{name}.req.json").unlink()
+        self._remove_orphan_results()
+
+    def _remove_orphan_results(self):
+        # Resultados de escritores que terminaron sin recogerlos.
+        limit = time.time() - self.lock.stale_seconds
+        for path in self.dir.glob('*.res.json'):
+            try:
+                if path.stat().st_mtime < limit:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _take_result(self, ticket):
+        path = self.dir / f"{ticket}.res.json"
+        try:
+            with open(path, encoding='utf-8') as f:
+                results = json.load(f)
+        except FileNotFoundError:
+            return None
+        path.unlink()
+        return results
@@ -11,6 +11,8 @@ class InvestigacionAccidenteComponent {
         this.extractedData = {};
         this.analysisResult = {};
         this.isProcessing = false;
+        this.isAnalyzing = false;
+        this.lastAnalysisCached = false; // El último análisis salió de la caché (se puede regenerar)
         this.logMessages = []; // Para almacenar mensajes de log internos
         this.progressListener = null;
     }
@@ -130,13 +132,19 @@ class InvestigacionAccidenteComponent {
         buttonContainer.style.gap = '10px';
         buttonContainer.innerHTML = `
             <button type="button" class="btn btn-success" id="process-btn" disabled>PROCESAR Y GENERAR INFORME</button>
+            <button type="button" class="btn btn-secondary" id="regenerate-btn" style="display:none;">REGENERAR ANÁLISIS</button>
+            <button type="button" class="btn btn-secondary" id="cancel-btn" style="display:none;">CANCELAR ANÁLISIS</button>
             <button type="button" class="btn btn-secondary" id="clear-btn">LIMPIAR</button>
         `;
         actionArea.appendChild(buttonContainer);
 
         const processBtn = actionArea.querySelector('#process-btn');
+        const regenerateBtn = actionArea.querySelector('#regenerate-btn');
+        const cancelBtn = actionArea.querySelector('#cancel-btn');
         const clearBtn = actionArea.querySelector('#clear-btn');
         processBtn.addEventListener('click', () => this.analyzeAndGenerateReport());
+        regenerateBtn.addEventListener('click', () => this.analyzeAndGenerateReport({ regenerate: true }));
+        cancelBtn.addEventListener('click', () => this.cancelAnalysis());
         clearBtn.addEventListener('click', () => this.clearAll());
 
         // --- Ensamblar todo ---
@@ -331,25 +339,46 @@ class InvestigacionAccidenteComponent {
             .replace(/\n/g, "<br>");
     }
 
-    async analyzeAndGenerateReport() {
+    async analyzeAndGenerateReport({ regenerate = false } = {}) {
         if (!this.extractedData || Object.keys(this.extractedData).length === 0 || !window.electronAPI || this.isProcessing) {
             this.logToActivity('No hay datos extraídos para analizar. Por favor, procese un PDF primero.', 'WARN');
             return;
         }
 
         this.isProcessing = true;
+        this.isAnalyzing = true;
         this.toggleProgressIndicator(true, "Iniciando análisis...");
         this.updateButtonStates();
         this.logToActivity('Iniciando análisis de causa raíz con IA...');
 
+        // Cada 'Por Qué N' se muestra en cuanto el modelo lo termina de generar.
+        const partialAnalysis = {};
+        this.progressListener = (progress) => {
+            this.updateProgress(progress.percentage, progress.message);
+            if (progress.level && progress.por_que) {
+                partialAnalysis[`Por Qué ${progress.level}`] = progress.por_que;
+                this.populateAnalysisResults(partialAnalysis);
+            }
+        };
+        window.electronAPI.onIpcMessage('accident-processing-progress', this.progressListener);
+
         try {
             const contextoAdicional = this.contextInput.value;
-            const analysisResult = await window.electronAPI.analyzeAccident(this.extractedData, contextoAdicional);
+            const analysisResult = await window.electronAPI.analyzeAccident(this.extractedData, contextoAdicional, { regenerate });
+            this.isAnalyzing = false;
+            this.lastAnalysisCached = Boolean(analysisResult.cached);
+            this.updateButtonStates();
 
-            if (analysisResult.success) {
+            if (analysisResult.cancelled) {
+                this.analysisResult = analysisResult.analysis || partialAnalysis;
+                this.populateAnalysisResults(this.analysisResult);
+                this.logToActivity('Análisis cancelado. No se generó el informe.');
+            } else if (analysisResult.success) {
                 this.analysisResult = analysisResult.analysis || {};
                 this.populateAnalysisResults(this.analysisResult);
-                this.logToActivity('Análisis de causa raíz completado.');
+                this.logToActivity(analysisResult.cached
+                    ? 'Análisis recuperado de la caché. Use "Regenerar análisis" para volver a generarlo con la IA.'
+                    : 'Análisis de causa raíz completado.');
 
                 // Combinar datos extraídos y de análisis sin mapeo manual en JS
                 const combinedData = { ...this.extractedData, ...this.analysisResult };
@@ -367,6 +396,7 @@ class InvestigacionAccidenteComponent {
             this.populateAnalysisResults({ error: error.message });
         } finally {
             this.isProcessing = false;
+            this.isAnalyzing = false;
             this.toggleProgressIndicator(false);
             this.updateButtonStates();
             if (this.progressListener) {
@@ -376,6 +406,16 @@ class InvestigacionAccidenteComponent {
         }
     }
 
+    async cancelAnalysis() {
+        if (!this.isAnalyzing || !window.electronAPI) return;
+        this.logToActivity('Cancelando el análisis...');
+        try {
+            await window.electronAPI.cancelAccidentAnalysis();
+        } catch (error) {
+            this.logToActivity(`No se pudo cancelar el análisis: ${error.message}`);
+        }
+    }
+
     async generateAccidentReport(combinedData) {
         try {
             this.logToActivity('Solicitando generación del informe al proceso principal...');
@@ -470,6 +510,14 @@ class InvestigacionAccidenteComponent {
                 processBtn.textContent = 'PROCESAR Y GENERAR INFORME';
             }
         }
+        const cancelBtn = this.container.querySelector('#cancel-btn');
+        if (cancelBtn) {
+            cancelBtn.style.display = this.isAnalyzing ? '' : 'none';
+        }
+        const regenerateBtn = this.container.querySelector('#regenerate-btn');
+        if (regenerateBtn) {
+            regenerateBtn.style.display = this.lastAnalysisCached && !this.isProcessing ? '' : 'none';
+        }
     }
 
     clearAll() {
@@ -477,6 +525,7 @@ class InvestigacionAccidenteComponent {
         this.selectedPdfPath = null;
         this.extractedData = {};
         this.analysisResult = {};
+        this.lastAnalysisCached = false;
         this.contextInput.value = 'Añade aquí cualquier detalle no presente en el FURAT...';
         this.container.querySelector('#pdf-path-display').value = '';
         this.populateExtractedData({});
@@ -32,6 +32,9 @@ function sendLog(message, level = 'INFO') {
 // Ruta del archivo de configuración
 const configPath = path.join(app.getPath('userData'), 'config.json');
 
+// Caché de extracciones de PDF compartida por los procesos de Python (extraction_cache.py).
+process.env.SGSST_CACHE_DIR = path.join(app.getPath('userData'), 'cache');
+
 // Verificar si se está ejecutando con squirrel (instalador de Windows)
 if (require('electron-squirrel-startup')) {
   app.quit();
@@ -56,6 +59,205 @@ const createWindow = () => {
   // mainWindow.webContents.openDevTools();
 };
 
+// --- Sidecar residente de Python ---
+// sidecar.py atiende como métodos RPC las operaciones que antes lanzaban un
+// proceso de Python cada una (PDF, remisiones, informes, actas, mapeo de
+// carpetas): el intérprete, pandas, docxtpl y pdfplumber se cargan una sola
+// vez. Las solicitudes se atienden en paralelo y cada mensaje trae su id.
+let sidecar = null;
+let sidecarReady = null;
+let sidecarRequestId = 0;
+const sidecarPending = new Map();
+
+function getSidecar() {
+  if (sidecar) {
+    return sidecarReady;
+  }
+
+  const scriptPath = path.join(__dirname, 'Portear', 'src', 'sidecar.py');
+  // --preload importa los módulos en segundo plano para que la primera operación ya sea rápida.
+  const child = spawn('python', [scriptPath, '--preload'], { cwd: path.dirname(scriptPath) });
+  sidecar = child;
+  let buffer = '';
+
+  sidecarReady = new Promise((resolve, reject) => {
+    child.stdout.on('data', (chunk) => {
+      buffer += chunk.toString('utf8');
+      const lines = buffer.split(/\r?\n/);
+      buffer = lines.pop();
+      lines.filter(line => line.trim() !== '').forEach(line => {
+        let output;
+        try {
+          output = JSON.parse(line);
+        } catch (e) {
+          sendLog(`No se pudo parsear la línea de salida de Python: ${line}`, 'WARN');
+          return;
+        }
+        if (output.type === 'ready') {
+          sendLog(`Sidecar de Python listo (pid ${output.pid}).`);
+          resolve(child);
+        } else if (output.type === 'log') {
+          sendLog(`[Python] ${output.message}`, output.level);
+        } else if (output.type === 'progress' && sidecarPending.has(output.id)) {
+          const { onProgress } = sidecarPending.get(output.id);
+          if (onProgress) onProgress(output);
+        } else if (output.type === 'result' && sidecarPending.has(output.id)) {
+          sidecarPending.get(output.id).resolve(output.payload);
+          sidecarPending.delete(output.id);
+        }
+      });
+    });
+
+    child.stderr.on('data', (data) => {
+      sendLog(`[Python STDERR] ${data.toString()}`, 'DEBUG');
+    });
+
+    const onExit = (reason) => {
+      if (sidecar === child) {
+        sidecar = null;
+        sidecarReady = null;
+      }
+      reject(new Error(reason));
+      sidecarPending.forEach(({ reject: rejectRequest }) => rejectRequest(new Error(reason)));
+      sidecarPending.clear();
+    };
+    child.on('error', (err) => onExit(`No se pudo iniciar el sidecar de Python: ${err.message}`));
+    child.on('exit', (code) => onExit(`El sidecar de Python terminó con código ${code}`));
+  });
+
+  return sidecarReady;
+}
+
+// Llama un método de sidecar.py; onProgress recibe sus mensajes 'progress'.
+async function sidecarRequest(method, params = {}, { onProgress } = {}) {
+  const child = await getSidecar();
+  const id = ++sidecarRequestId;
+  return new Promise((resolve, reject) => {
+    sidecarPending.set(id, { resolve, reject, onProgress });
+    child.stdin.write(JSON.stringify({ id, method, params }) + '\n');
+  });
+}
+
+function stopSidecar() {
+  if (sidecar) {
+    sidecar.stdin.end(JSON.stringify({ method: 'shutdown' }) + '\n');
+    sidecar = null;
+    sidecarReady = null;
+  }
+}
+
+// --- Servicio residente del modelo de análisis de accidentes ---
+// accident_model_server.py carga Mistral-7B una sola vez y atiende 'load' y
+// 'analyze' desde una cola; lo descarga tras un tiempo sin uso.
+let modelServer = null;
+let modelServerReady = null;
+let modelServerRequestId = 0;
+const modelServerPending = new Map();
+let modelServerState = 'unloaded';
+
+function getModelServer() {
+  if (modelServer) {
+    return modelServerReady;
+  }
+
+  // Motor, ruta del modelo y tiempo de inactividad: sección "model" de config.json.
+  let modelConfig = {};
+  try {
+    modelConfig = JSON.parse(fs.readFileSync(configPath, 'utf8')).model || {};
+  } catch (error) {
+    // Sin config.json se usan los valores por defecto de accident_config.py.
+  }
+  const env = { ...process.env };
+  if (modelConfig.backend) env.SGSST_MODEL_BACKEND = modelConfig.backend;
+  if (modelConfig.path) env.SGSST_MODEL_PATH = modelConfig.path;
+  if (modelConfig.idleTimeout !== undefined) env.SGSST_MODEL_IDLE_TIMEOUT = String(modelConfig.idleTimeout);
+  if (modelConfig.deterministic !== undefined) env.SGSST_MODEL_DETERMINISTIC = modelConfig.deterministic ? '1' : '0';
+  if (modelConfig.cpuQuantization) env.SGSST_MODEL_CPU_QUANT = modelConfig.cpuQuantization;
+
+  const scriptPath = path.join(__dirname, 'Portear', 'src', 'accident_model_server.py');
+  const server = spawn('python', [scriptPath], { cwd: path.dirname(scriptPath), env });
+  modelServer = server;
+  let buffer = '';
+
+  modelServerReady = new Promise((resolve, reject) => {
+    server.stdout.on('data', (chunk) => {
+      buffer += chunk.toString('utf8');
+      const lines = buffer.split(/\r?\n/);
+      buffer = lines.pop();
+      lines.filter(line => line.trim() !== '').forEach(line => {
+        let output;
+        try {
+          output = JSON.parse(line);
+        } catch (e) {
+          sendLog(`No se pudo parsear la línea de salida del servicio del modelo: ${line}`, 'WARN');
+          return;
+        }
+        if (output.type === 'ready') {
+          sendLog(`Servicio del modelo listo (pid ${output.pid}).`);
+          resolve(server);
+        } else if (output.type === 'status') {
+          modelServerState = output.state;
+          sendLog(`[Modelo] Estado: ${output.state}${output.error ? ` (${output.error})` : ''}`);
+          if (mainWindow) {
+            mainWindow.webContents.send('model-status', output);
+          }
+        } else if (output.type === 'log') {
+          sendLog(`[Modelo] ${output.message}`, output.level);
+        } else if (output.type === 'progress' && modelServerPending.has(output.id)) {
+          const { onProgress } = modelServerPending.get(output.id);
+          if (onProgress) onProgress(output);
+        } else if (output.type === 'result' && modelServerPending.has(output.id)) {
+          modelServerPending.get(output.id).resolve(output.payload);
+          modelServerPending.delete(output.id);
+        }
+      });
+    });
+
+    server.stderr.on('data', (data) => {
+      sendLog(`[Modelo STDERR] ${data.toString()}`, 'DEBUG');
+    });
+
+    const onExit = (reason) => {
+      if (modelServer === server) {
+        modelServer = null;
+        modelServerReady = null;
+        modelServerState = 'unloaded';
+      }
+      reject(new Error(reason));
+      modelServerPending.forEach(({ reject: rejectRequest }) => rejectRequest(new Error(reason)));
+      modelServerPending.clear();
+    };
+    server.on('error', (err) => onExit(`No se pudo iniciar el servicio del modelo: ${err.message}`));
+    server.on('exit', (code) => onExit(`El servicio del modelo terminó con código ${code}`));
+  });
+
+  return modelServerReady;
+}
+
+// onProgress recibe los mensajes 'progress' de la solicitud; onSent, su id
+// (para poder cancelarla con el comando 'cancel').
+async function modelServerRequest(command, params = {}, { onProgress, onSent } = {}) {
+  const server = await getModelServer();
+  const id = ++modelServerRequestId;
+  return new Promise((resolve, reject) => {
+    modelServerPending.set(id, { resolve, reject, onProgress });
+    server.stdin.write(JSON.stringify({ id, command, ...params }) + '\n');
+    if (onSent) onSent(id);
+  });
+}
+
+// Id del 'analyze' en curso, para 'cancel-accident-analysis'.
+let currentAnalysisId = null;
+
+function stopModelServer() {
+  if (modelServer) {
+    modelServer.stdin.end(JSON.stringify({ command: 'shutdown' }) + '\n');
+    modelServer = null;
+    modelServerReady = null;
+    modelServerState = 'unloaded';
+  }
+}
+
 // Función para registrar los manejadores IPC
 const registerIPCHandlers = () => {
   // Manejar selección de directorio
@@ -261,28 +463,12 @@ const registerIPCHandlers = () => {
   ipcMain.handle('map-directory', async (event, directoryPath) => {
     try {
       console.log('Mapping directory:', directoryPath);
-      // Ruta al script de mapeo de Python
-      const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'map_directory.py');
-      
-      // Verificar si el script de Python existe
-      try {
-        await fsp.access(pythonScriptPath);
-      } catch (error) {
-        throw new Error(`Python script not found at: ${pythonScriptPath}`);
+      const payload = await sidecarRequest('directory.map', { path: directoryPath });
+      if (!payload.success) {
+        throw new Error(payload.error);
       }
-      
-      // Ejecutar el script de Python
-      const command = `python "${pythonScriptPath}" "${directoryPath}"`;
-      console.log(`Executing command: ${command}`);
-      
-      const { stdout, stderr } = await execPromise(command, { cwd: path.dirname(pythonScriptPath) });
-      
-      // Parsear la salida JSON del script de Python
-      const structure = JSON.parse(stdout);
       console.log('Directory mapping completed successfully');
-      
-      // Devolver tanto la estructura como los posibles logs/errores de stderr
-      return { success: true, structure: structure, log: stderr || 'Mapeo completado sin errores.' };
+      return { success: true, structure: payload.structure, log: 'Mapeo completado sin errores.' };
     } catch (error) {
       console.error('Error mapping directory:', error);
       throw error;
@@ -480,6 +666,18 @@ const registerIPCHandlers = () => {
   // Manejar procesamiento de PDF
   ipcMain.handle('process-remision-pdf', async (event, pdfPath) => {
     sendLog(`IPC: process-remision-pdf recibido para: ${pdfPath}`);
+    try {
+      const finalResult = await sidecarRequest('pdf.process', { path: pdfPath });
+      if (finalResult.debug_full_text) {
+        sendLog(`Texto extraído del PDF ${path.basename(pdfPath)}:\n---\nINICIO ---\n${finalResult.debug_full_text}\n--- FIN ---`, 'DEBUG');
+        delete finalResult.debug_full_text;
+      }
+      sendLog('Procesamiento de PDF completado exitosamente.');
+      return finalResult;
+    } catch (sidecarError) {
+      sendLog(`Sidecar de Python no disponible (${sidecarError.message}); usando ejecución directa.`, 'WARN');
+    }
+
     try {
       const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'process_pdf_cli.py');
       const tempDataPath = path.join(app.getPath('temp'), `remision_data_${Date.now()}.json`);
@@ -528,44 +726,9 @@ const registerIPCHandlers = () => {
   // Manejar conversión de DOCX a PDF para previsualización
   ipcMain.handle('convert-docx-to-pdf', async (event, docxPath) => {
     try {
-      const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'convert_docx_to_pdf.py');
-      const command = `python "${pythonScriptPath}" "${docxPath}"`;
-      
-      console.log(`Executing DOCX conversion: ${command}`);
-      const { stdout, stderr } = await execPromise(command, { cwd: path.dirname(pythonScriptPath) });
-
-      // Si stderr contiene nuestro error JSON específico, lo procesamos como error.
-      if (stderr && stderr.includes('"success": false')) {
-        try {
-          const errJsonMatch = stderr.match(/\{.*\}/s);
-          if (errJsonMatch && errJsonMatch[0]) {
-            return JSON.parse(errJsonMatch[0]);
-          }
-          // Fallback si la expresión regular falla
-          throw new Error(`Error en script (no se pudo parsear JSON de error): ${stderr}`);
-        } catch (e) {
-          throw new Error(`Error al procesar error del script: ${stderr}`);
-        }
-      }
-
-      // Si stderr solo contenía la barra de progreso, lo ignoramos y confiamos en stdout.
-      if (!stdout) {
-        const errorMessage = stderr ? `El script produjo un error o mensaje inesperado: ${stderr}` : 'El script de conversión no produjo ninguna salida.';
-        throw new Error(errorMessage);
-      }
-
-      // Buscamos el JSON de éxito en stdout.
-      const jsonMatch = stdout.match(/\{.*\}/s);
-      if (jsonMatch && jsonMatch[0]) {
-        try {
-          return JSON.parse(jsonMatch[0]);
-        } catch (e) {
-          throw new Error(`Error al parsear la salida JSON del script: ${e.message}. Salida recibida: ${stdout}`);
-        }
-      }
-      
-      throw new Error(`No se encontró una respuesta JSON válida en la salida del script. Salida recibida: ${stdout}`);
-
+      console.log(`Converting DOCX to PDF: ${docxPath}`);
+      // Devuelve { success, pdf_path } o { success: false, error }.
+      return await sidecarRequest('docx.to_pdf', { path: docxPath });
     } catch (error) {
       console.error('Error executing DOCX conversion script:', error);
       return { success: false, error: error.message };
@@ -595,41 +758,7 @@ const registerIPCHandlers = () => {
   ipcMain.handle('generate-remision-document', async (event, extractedData, empresa) => {
     sendLog(`IPC: generate-remision-document recibido para empresa: ${empresa}`);
     try {
-      const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'remision_utils.py');
-      const tempDataPath = path.join(app.getPath('temp'), `remision_data_${Date.now()}.json`);
-      
-      sendLog(`Creando archivo de datos temporal: ${tempDataPath}`);
-      await fsp.writeFile(tempDataPath, JSON.stringify({ data: extractedData, empresa: empresa }));
-      
-      const command = `python "${pythonScriptPath}" --generate-remision "${tempDataPath}"`;
-      
-      sendLog(`Ejecutando script de generación de remisión: ${command.replace(/\\/g, '/')}`);
-      const { stdout, stderr } = await execPromise(command, { cwd: path.dirname(pythonScriptPath) });
-      
-      await fsp.unlink(tempDataPath);
-      
-      if (stderr) {
-        sendLog(`Error en script de generación de remisión: ${stderr}`, 'ERROR');
-      }
-
-      let finalResult = null;
-      const lines = stdout.split(/\r?\n/).filter(line => line.trim() !== '');
-      lines.forEach(line => {
-        try {
-          const output = JSON.parse(line);
-          if (output.type === 'log') {
-            sendLog(`[Python] ${output.message}`, output.level);
-          } else if (output.type === 'result') {
-            finalResult = output.payload; // Estandarizado para usar siempre el payload
-          }
-        } catch (e) {
-          sendLog(`No se pudo parsear la línea de salida de Python: ${line}`, 'WARN');
-        }
-      });
-
-      if (!finalResult) {
-        throw new Error("El script de Python no devolvió un resultado final.");
-      }
+      const finalResult = await sidecarRequest('remision.generate', { data: extractedData, empresa });
 
       sendLog(`Resultado de la generación: ${JSON.stringify(finalResult)}`);
       
@@ -696,44 +825,18 @@ const registerIPCHandlers = () => {
       await fsp.copyFile(docPath, tempFilePath);
       sendLog(`Archivo copiado a: ${tempFilePath}`);
       
-      const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'remision_utils.py');
-      const tempDataPath = path.join(app.getPath('temp'), `email_data_${Date.now()}.json`);
-      const tempData = { 
-        docPath: tempFilePath, 
-        data: extractedData, 
-        empresa: empresa 
-      };
-      
-      sendLog(`Creando archivo de datos temporal para email: ${tempDataPath}`);
-      await fsp.writeFile(tempDataPath, JSON.stringify(tempData), 'utf-8');
-      
-      const command = `python "${pythonScriptPath}" --send-email "${tempDataPath}"`;
-      
-      sendLog(`Ejecutando script de envío de email: ${command.replace(/\\/g, '/')}`);
-      const { stdout, stderr } = await execPromise(command, { encoding: 'utf-8', cwd: path.dirname(pythonScriptPath) });
-      
-      await fsp.unlink(tempFilePath);
-      await fsp.unlink(tempDataPath);
-
-      if (stderr) {
-        sendLog(`Error en script de email (stderr): ${stderr}`, 'ERROR');
+      let finalResult;
+      try {
+        finalResult = await sidecarRequest('remision.send_email', {
+          docPath: tempFilePath,
+          data: extractedData,
+          empresa: empresa,
+          fileName: path.basename(docPath)
+        });
+      } finally {
+        await fsp.unlink(tempFilePath);
       }
 
-      let finalResult = null;
-      const lines = stdout.split(/\r?\n/).filter(line => line.trim() !== '');
-      lines.forEach(line => {
-        try {
-          const output = JSON.parse(line);
-          if (output.type === 'log') {
-            sendLog(`[Python] ${output.message}`, output.level);
-          } else if (output.type === 'result') {
-            finalResult = output.payload;
-          }
-        } catch (e) {
-          sendLog(`No se pudo parsear la línea de salida de Python: ${line}`, 'WARN');
-        }
-      });
-
       if (finalResult) {
         sendLog(`Resultado del envío de email: ${JSON.stringify(finalResult)}`);
         return finalResult;
@@ -747,6 +850,16 @@ const registerIPCHandlers = () => {
     }
   });
   
+  // Estado de los correos encolados (ids devueltos por send-remision-by-email)
+  ipcMain.handle('get-email-delivery-status', async (event, ids) => {
+    try {
+      return await sidecarRequest('remision.email_status', { ids });
+    } catch (error) {
+      sendLog(`Fallo al consultar el estado de los correos: ${error.message}`, 'ERROR');
+      return { success: false, error: error.message };
+    }
+  });
+
   // Agrega este nuevo handler IPC en tu main.js
   ipcMain.handle('update-excel-cell', async (event, filePath, row, col, value) => {
     sendLog(`[MAIN] Actualizando celda en ${filePath}, fila: ${row}, columna: ${col}, valor: ${value}`);
@@ -783,40 +896,10 @@ const registerIPCHandlers = () => {
   ipcMain.handle('send-remision-by-whatsapp', async (event, docPath, extractedData, empresa) => {
     sendLog(`IPC: send-remision-by-whatsapp recibido para: ${docPath}`);
     try {
-      const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'remision_utils.py');
-      const tempDataPath = path.join(app.getPath('temp'), `whatsapp_data_${Date.now()}.json`);
-      
-      sendLog(`Creando archivo de datos temporal para WhatsApp: ${tempDataPath}`);
-      await fsp.writeFile(tempDataPath, JSON.stringify({
-        docPath: docPath, 
-        data: extractedData, 
-        empresa: empresa 
-      }));
-      
-      const command = `python "${pythonScriptPath}" --send-whatsapp "${tempDataPath}"`;
-      
-      sendLog(`Ejecutando script de preparación de WhatsApp: ${command.replace(/\\/g, '/')}`);
-      const { stdout, stderr } = await execPromise(command, { cwd: path.dirname(pythonScriptPath) });
-      
-      await fsp.unlink(tempDataPath);
-      
-      if (stderr) {
-        sendLog(`Error en script de WhatsApp: ${stderr}`, 'ERROR');
-      }
-
-      let finalResult = null;
-      const lines = stdout.split(/\r?\n/).filter(line => line.trim() !== '');
-      lines.forEach(line => {
-        try {
-          const output = JSON.parse(line);
-          if (output.type === 'log') {
-            sendLog(`[Python] ${output.message}`, output.level);
-          } else if (output.type === 'result') {
-            finalResult = output.payload;
-          }
-        } catch (e) {
-          sendLog(`No se pudo parsear la línea de salida de Python: ${line}`, 'WARN');
-        }
+      const finalResult = await sidecarRequest('remision.send_whatsapp', {
+        docPath: docPath,
+        data: extractedData,
+        empresa: empresa
       });
 
       if (finalResult) {
@@ -879,227 +962,106 @@ const registerIPCHandlers = () => {
     }
   });
 
-  ipcMain.handle('process-accident-pdf', (event, pdfPath) => {
-    return new Promise((resolve, reject) => {
-      sendLog(`IPC: process-accident-pdf (extract) recibido para: ${pdfPath}`);
-      
-      const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'accident_processor.py');
-      const pythonProcess = spawn('python', [pythonScriptPath, 'extract', '--pdf_path', pdfPath], { cwd: path.dirname(pythonScriptPath) });
-
-      let stdoutData = '';
-      let stderrData = '';
-
-      pythonProcess.stdout.on('data', (data) => {
-        stdoutData += data.toString();
-        const lines = stdoutData.split('\n');
-        stdoutData = lines.pop();
-
-        lines.forEach(line => {
-          if (line) {
-            try {
-              const json = JSON.parse(line);
-              if (json.type === 'progress') {
-                event.sender.send('accident-processing-progress', json);
-              } else if (json.type === 'result') {
-                resolve(json.payload);
-              }
-            } catch (e) {
-              sendLog(`Error parsing python output: ${e.message}`, 'WARN');
-            }
-          }
-        });
-      });
-
-      pythonProcess.stderr.on('data', (data) => {
-        stderrData += data.toString();
-        sendLog(`Python stderr: ${data}`, 'ERROR');
-      });
-
-      pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Python script exited with code ${code}: ${stderrData}`));
-        }
-      });
-
-      pythonProcess.on('error', (err) => {
-        reject(err);
-      });
+  ipcMain.handle('process-accident-pdf', async (event, pdfPath) => {
+    sendLog(`IPC: process-accident-pdf (extract) recibido para: ${pdfPath}`);
+    return sidecarRequest('accident.extract', { pdf_path: pdfPath }, {
+      onProgress: (output) => event.sender.send('accident-processing-progress', output)
     });
   });
 
-  ipcMain.handle('analyze-accident', (event, extractedData, contextoAdicional) => {
-    return new Promise((resolve, reject) => {
-      sendLog(`IPC: analyze-accident recibido`);
-      
-      const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'accident_processor.py');
-      const jsonData = JSON.stringify(extractedData);
-      const pythonProcess = spawn('python', [pythonScriptPath, 'analyze', '--json_data', jsonData, '--contexto', contextoAdicional], { cwd: path.dirname(pythonScriptPath) });
-
-      let stdoutData = '';
-      let stderrData = '';
-
-      pythonProcess.stdout.on('data', (data) => {
-        stdoutData += data.toString();
-        const lines = stdoutData.split('\n');
-        stdoutData = lines.pop();
-
-        lines.forEach(line => {
-          if (line) {
-            try {
-              const json = JSON.parse(line);
-              if (json.type === 'progress') {
-                event.sender.send('accident-processing-progress', json);
-              } else if (json.type === 'result') {
-                resolve(json.payload);
-              }
-            } catch (e) {
-              sendLog(`Error parsing python output: ${e.message}`, 'WARN');
-            }
-          }
-        });
-      });
-
-      pythonProcess.stderr.on('data', (data) => {
-        stderrData += data.toString();
-        sendLog(`Python stderr: ${data}`, 'ERROR');
-      });
+  ipcMain.handle('analyze-accident', async (event, extractedData, contextoAdicional, options = {}) => {
+    sendLog(`IPC: analyze-accident recibido`);
+    const progress = (step, percentage, message) =>
+      event.sender.send('accident-processing-progress', { type: 'progress', step, percentage, message });
 
-      pythonProcess.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Python script exited with code ${code}: ${stderrData}`));
-        }
+    progress('setup', 10, modelServerState === 'ready' ? 'Modelo de IA listo.' : 'Cargando modelo de IA...');
+    progress('analysis', 50, 'Analizando causas con IA...');
+    try {
+      // Cada 'Por Qué N' llega en el progreso en cuanto se genera (campos level y por_que).
+      const payload = await modelServerRequest('analyze', {
+        descripcion: extractedData['Descripcion del Accidente'] || '',
+        contexto: contextoAdicional || '',
+        // regenerate: ignora la caché de análisis y vuelve a llamar al modelo.
+        regenerate: Boolean(options.regenerate)
+      }, {
+        onProgress: (output) => event.sender.send('accident-processing-progress', output),
+        onSent: (id) => { currentAnalysisId = id; }
       });
+      if (payload.success) {
+        progress('finished', 100, payload.cached ? 'Análisis recuperado de la caché.' : 'Análisis completado.');
+      } else if (payload.cancelled) {
+        progress('cancelled', 100, 'Análisis cancelado.');
+      }
+      return payload;
+    } finally {
+      currentAnalysisId = null;
+    }
+  });
 
-      pythonProcess.on('error', (err) => {
-        reject(err);
-      });
-    });
+  ipcMain.handle('cancel-accident-analysis', async () => {
+    if (currentAnalysisId === null || !modelServer) {
+      return { success: true, cancelled: false };
+    }
+    sendLog(`Cancelando el análisis ${currentAnalysisId}...`);
+    return modelServerRequest('cancel', { target: currentAnalysisId });
   });
-  // En main.js, dentro de registerIPCHandlers()
   ipcMain.handle('start-model-loading', async () => {
       try {
-          console.log('Iniciando carga del modelo LLM en segundo plano...');
-          // Aquí podrías ejecutar un script que inicie un proceso Python separado
-          // o simplemente lanzar el comando de carga con un tiempo de espera.
-          // Por simplicidad, vamos a simularlo con un timeout.
-          await new Promise(resolve => setTimeout(resolve, 5000)); // Simula 5 segundos de carga
-          console.log('Modelo LLM cargado en segundo plano.');
-          return { success: true };
+          sendLog('Iniciando carga del modelo LLM en segundo plano...');
+          // Resuelve cuando el servicio termina de cargar el modelo (o ya lo tenía cargado).
+          const payload = await modelServerRequest('load');
+          if (!payload.success) {
+              throw new Error(payload.error);
+          }
+          sendLog('Modelo LLM cargado en segundo plano.');
+          return { success: true, state: payload.state };
       } catch (error) {
           console.error('Error al iniciar la carga del modelo:', error);
           return { success: false, error: error.message };
       }
   });
 
-  // --- Manejar generación de informe de accidente ---
-  ipcMain.handle('generate-accident-report', (event, combinedData) => {
-    return new Promise(async (resolve, reject) => {
-      sendLog(`IPC: generate-accident-report recibido`);
-      let tempDataPath;
-      try {
-        // Crear archivo temporal con los datos
-        tempDataPath = path.join(app.getPath('temp'), `accident_report_data_${Date.now()}.json`);
-        
-        const reportData = {
-          combinedData: combinedData,
-          empresa: combinedData.empresa || 'TEMPOACTIVA'
-        };
-        
-        sendLog(`Creando archivo de datos temporal: ${tempDataPath}`);
-        await fsp.writeFile(tempDataPath, JSON.stringify(reportData, null, 2));
-        
-        const pythonExecutable = 'python';
-        const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'accident_report_generator.py');
-
-        // Verificar que el script existe
-        await fsp.access(pythonScriptPath);
-        
-        sendLog(`Ejecutando script con UTF-8 forzado: ${pythonExecutable} -X utf8 "${pythonScriptPath}"`);
-
-        const pythonProcess = spawn(pythonExecutable, [
-          '-X', 'utf8',
-          pythonScriptPath,
-          tempDataPath
-        ], { cwd: path.dirname(pythonScriptPath) });
-
-        let stdoutData = '';
-        let stderrData = '';
-
-        pythonProcess.stdout.on('data', (data) => {
-          stdoutData += data.toString();
-        });
-
-        pythonProcess.stderr.on('data', (data) => {
-          // Loguear errores de Python en tiempo real
-          const stderrLine = data.toString();
-          stderrData += stderrLine;
-          sendLog(`[Python STDERR] ${stderrLine}`, 'ERROR');
-        });
-
-        pythonProcess.on('close', async (code) => {
-          sendLog(`Proceso de Python terminado con código: ${code}`);
-          
-          // Limpiar archivo temporal
-          if (tempDataPath) {
-            await fsp.unlink(tempDataPath).catch(err => sendLog(`No se pudo limpiar el archivo temporal: ${err.message}`, 'WARN'));
-          }
-
-          if (code !== 0) {
-            return reject(new Error(`El script de Python falló con código ${code}. Revisa los logs de STDERR.`));
-          }
-
-          // Procesar la salida estándar para encontrar el resultado JSON final
-          let finalResult = null;
-          const lines = stdoutData.split(/\r?\n/).filter(line => line.trim() !== '');
-          
-          for (const line of lines) {
-            try {
-              const output = JSON.parse(line);
-              if (output.type === 'progress') {
-                sendLog(`[Python Progress] ${output.message}`, 'INFO');
-              } else if (output.success !== undefined) {
-                finalResult = output;
-              }
-            } catch (e) {
-              sendLog(`No se pudo parsear la línea de salida de Python (stdout): ${line}`, 'WARN');
-            }
-          }
-
-          if (finalResult) {
-            // Limpiar el prefijo de ruta larga de Windows si existe, para que sea usable por el frontend.
-            if (finalResult.documentPath && finalResult.documentPath.startsWith('\\\\?\\')) {
-              finalResult.documentPath = finalResult.documentPath.substring(4);
-              console.log('Path corregido:', finalResult.documentPath);
-            }
-            // Asegurar que los separadores de ruta son los correctos para el OS actual.
-            finalResult.documentPath = finalResult.documentPath.replace(/[\\\/]/g, path.sep);
+  ipcMain.handle('get-model-status', async () => {
+      if (!modelServer) {
+          return { success: true, state: modelServerState };
+      }
+      return modelServerRequest('status');
+  });
 
-            sendLog(`Resultado de la generación: ${JSON.stringify(finalResult)}`);
-            resolve(finalResult);
-          } else {
-            reject(new Error(`El script de Python no devolvió un resultado JSON válido en stdout.`));
-          }
-        });
+  // --- Manejar generación de informe de accidente ---
+  ipcMain.handle('generate-accident-report', async (event, combinedData) => {
+    sendLog(`IPC: generate-accident-report recibido`);
+    try {
+      const finalResult = await sidecarRequest('accident.report', {
+        combinedData: combinedData,
+        empresa: combinedData.empresa || 'TEMPOACTIVA'
+      }, {
+        onProgress: (output) => sendLog(`[Python Progress] ${output.message}`, 'INFO')
+      });
 
-        pythonProcess.on('error', (err) => {
-          sendLog(`Fallo al iniciar el proceso de Python: ${err.message}`, 'CRITICAL');
-          reject(err);
-        });
+      if (!finalResult.success) {
+        throw new Error(`Error general en el proceso: ${finalResult.error}`);
+      }
 
-      } catch (error) {
-        sendLog(`Fallo en la ejecución del script de generación de informe: ${error.message}`, 'ERROR');
-        if (tempDataPath) {
-          await fsp.unlink(tempDataPath).catch(err => sendLog(`No se pudo limpiar el archivo temporal tras error: ${err.message}`, 'WARN'));
-        }
-        reject(error);
+      // Limpiar el prefijo de ruta larga de Windows si existe, para que sea usable por el frontend.
+      if (finalResult.documentPath && finalResult.documentPath.startsWith('\\\\?\\')) {
+        finalResult.documentPath = finalResult.documentPath.substring(4);
+        console.log('Path corregido:', finalResult.documentPath);
       }
-    });
+      // Asegurar que los separadores de ruta son los correctos para el OS actual.
+      finalResult.documentPath = finalResult.documentPath.replace(/[\\\/]/g, path.sep);
+
+      sendLog(`Resultado de la generación: ${JSON.stringify(finalResult)}`);
+      return finalResult;
+    } catch (error) {
+      sendLog(`Fallo en la ejecución del script de generación de informe: ${error.message}`, 'ERROR');
+      throw error;
+    }
   });
 
   ipcMain.handle('get-config', async (event, empresa) => {
-      const investAppPath = path.join(__dirname, 'Portear', 'src', 'Invest_APP_V_3.py');
-      const { stdout } = await execFilePromise('python', [investAppPath, '--get-config', empresa], { cwd: path.dirname(investAppPath) });
-      return JSON.parse(stdout.trim());
+      // accident_config.py no importa la interfaz ni el modelo de Invest_APP_V_3.py.
+      return sidecarRequest('config.get', { empresa });
   });
 
   // Manejador para leer la plantilla de acta de COPASST
@@ -1192,41 +1154,8 @@ const registerIPCHandlers = () => {
             return { success: false, canceled: true };
         }
 
-        // 2. Preparar para llamar al script de Python
-        const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'copasst_acta_generator.py');
-        const tempDataPath = path.join(app.getPath('temp'), `copasst_data_${Date.now()}.json`);
-        
-        sendLog(`Creando archivo de datos temporal: ${tempDataPath}`);
-        await fsp.writeFile(tempDataPath, JSON.stringify({ changes }, null, 2));
-
-        // 3. Ejecutar el script de Python con la ruta del JSON y la ruta de salida
-        const command = `python "${pythonScriptPath}" "${tempDataPath}" "${filePath}"`;
-        
-        sendLog(`Ejecutando script de generación de acta: ${command.replace(/\\/g, '/')}`);
-        const { stdout, stderr } = await execPromise(command, { cwd: path.dirname(pythonScriptPath) });
-        
-        // 4. Limpiar el archivo temporal
-        await fsp.unlink(tempDataPath);
-
-        if (stderr) {
-            sendLog(`Error en script de generación de acta: ${stderr}`, 'ERROR');
-        }
-
-        // 5. Procesar la respuesta del script
-        let finalResult = null;
-        const lines = stdout.split(/\r?\n/).filter(line => line.trim() !== '');
-        lines.forEach(line => {
-            try {
-                const output = JSON.parse(line);
-                if (output.type === 'log') {
-                    sendLog(`[Python] ${output.message}`, output.level);
-                } else if (output.type === 'result') {
-                    finalResult = output.payload;
-                }
-            } catch (e) {
-                sendLog(`No se pudo parsear la línea de salida de Python: ${line}`, 'WARN');
-            }
-        });
+        // 2. Generar el acta en el sidecar de Python
+        const finalResult = await sidecarRequest('acta.copasst', { changes, output_path: filePath });
 
         if (finalResult) {
             sendLog(`Resultado de la generación: ${JSON.stringify(finalResult)}`);
@@ -1259,41 +1188,8 @@ const registerIPCHandlers = () => {
             return { success: false, canceled: true };
         }
 
-        // 2. Preparar para llamar al script de Python
-        const pythonScriptPath = path.join(__dirname, 'Portear', 'src', 'comite_convivencia_acta_generator.py');
-        const tempDataPath = path.join(app.getPath('temp'), `convivencia_data_${Date.now()}.json`);
-        
-        sendLog(`Creando archivo de datos temporal: ${tempDataPath}`);
-        await fsp.writeFile(tempDataPath, JSON.stringify({ changes }, null, 2));
-
-        // 3. Ejecutar el script de Python
-        const command = `python "${pythonScriptPath}" "${tempDataPath}" "${filePath}"`;
-        
-        sendLog(`Ejecutando script de generación de acta de convivencia: ${command.replace(/\\/g, '/')}`);
-        const { stdout, stderr } = await execPromise(command, { cwd: path.dirname(pythonScriptPath) });
-        
-        // 4. Limpiar el archivo temporal
-        await fsp.unlink(tempDataPath);
-
-        if (stderr) {
-            sendLog(`Error en script de generación de acta de convivencia: ${stderr}`, 'ERROR');
-        }
-
-        // 5. Procesar la respuesta del script
-        let finalResult = null;
-        const lines = stdout.split(/\r?\n/).filter(line => line.trim() !== '');
-        lines.forEach(line => {
-            try {
-                const output = JSON.parse(line);
-                if (output.type === 'log') {
-                    sendLog(`[Python] ${output.message}`, output.level);
-                } else if (output.type === 'result') {
-                    finalResult = output.payload;
-                }
-            } catch (e) {
-                sendLog(`No se pudo parsear la línea de salida de Python: ${line}`, 'WARN');
-            }
-        });
+        // 2. Generar el acta en el sidecar de Python
+        const finalResult = await sidecarRequest('acta.convivencia', { changes, output_path: filePath });
 
         if (finalResult) {
             sendLog(`Resultado de la generación: ${JSON.stringify(finalResult)}`);
@@ -1725,6 +1621,12 @@ app.whenReady().then(() => {
   registerIPCHandlers(); // Registrar todos los manejadores de eventos
   createWindow(); // Crear la ventana principal
 
+  // Arrancar el sidecar de Python mientras el usuario navega la interfaz
+  // y reanudar el envío de los correos que quedaron en cola al cerrar.
+  getSidecar()
+    .then(() => sidecarRequest('remision.email_status', { limit: 1 }))
+    .catch(err => sendLog(err.message, 'ERROR'));
+
   // Iniciar la búsqueda de actualizaciones una vez que la app está lista
   autoUpdater.checkForUpdatesAndNotify();
 
@@ -1741,6 +1643,8 @@ app.whenReady().then(() => {
 // Allí, es común que las aplicaciones y su barra de menú permanezcan activas
 // hasta que el usuario salga explícitamente con Cmd + Q.
 app.on('window-all-closed', () => {
+  stopSidecar();
+  stopModelServer();
   if (process.platform !== 'darwin') {
     app.quit();
   }
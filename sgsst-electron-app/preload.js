@@ -55,16 +55,21 @@ contextBridge.exposeInMainWorld('electronAPI', {
   // Enviar remisión por correo electrónico
   sendRemisionByEmail: (docPath, extractedData, empresa) => ipcRenderer.invoke('send-remision-by-email', docPath, extractedData, empresa),
 
+  // Estado de los correos en la cola de envío
+  getEmailDeliveryStatus: (ids) => ipcRenderer.invoke('get-email-delivery-status', ids),
+
   // Agrega esto en el contextBridge.exposeInMainWorld
   updateExcelCell: (filePath, row, col, value) => ipcRenderer.invoke('update-excel-cell', filePath, row, col, value),
   
   // Funciones para procesamiento de accidentes
   selectAccidentPdf: () => ipcRenderer.invoke('select-accident-pdf'),
   processAccidentPdf: (pdfPath) => ipcRenderer.invoke('process-accident-pdf', pdfPath),
-  analyzeAccident: (extractedData, contextoAdicional) => ipcRenderer.invoke('analyze-accident', extractedData, contextoAdicional),
+  analyzeAccident: (extractedData, contextoAdicional, options) => ipcRenderer.invoke('analyze-accident', extractedData, contextoAdicional, options),
+  cancelAccidentAnalysis: () => ipcRenderer.invoke('cancel-accident-analysis'),
   
   // Funciones para procesamiento de accidentes
   startModelLoading: () => ipcRenderer.invoke('start-model-loading'),
+  getModelStatus: () => ipcRenderer.invoke('get-model-status'),
 
   // --- LÍNEA QUE FALTABA ---
   // Generar informe de accidente
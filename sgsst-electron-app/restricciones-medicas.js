@@ -446,7 +446,14 @@ class RestriccionesMedicasComponent {
             
             this.logMessage(`Respuesta del servidor: ${JSON.stringify(result)}`, 'info');
             
-            if (result.success) {
+            if (result.success && result.queued) {
+                // El correo queda en la bandeja de salida; un proceso aparte lo envía y reintenta.
+                this.logMessage(`Correo en cola de envío para ${result.destinatario} (id ${result.outboxId}, estado: ${result.status}).`);
+                alert(result.message || 'Correo en cola de envío.');
+                if (result.status !== 'sent') {
+                    this.followEmailDelivery(result.outboxId);
+                }
+            } else if (result.success) {
                 this.logMessage('Correo electrónico enviado exitosamente.');
                 alert('Correo electrónico enviado exitosamente.');
             } else {
@@ -475,6 +482,34 @@ class RestriccionesMedicasComponent {
         }
     }
 
+    async followEmailDelivery(outboxId, intervalMs = 5000, maxChecks = 60) {
+        // Consulta la bandeja de salida hasta que el correo se envíe o falle definitivamente.
+        let lastAttempts = 0;
+        for (let check = 0; check < maxChecks; check++) {
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+            const result = await window.electronAPI.getEmailDeliveryStatus([outboxId]);
+            const entry = result && result.success && result.messages && result.messages[0];
+            if (!entry) {
+                this.logMessage(`No se pudo consultar el estado del correo ${outboxId}: ${(result && result.error) || 'sin datos'}`, 'warning');
+                return;
+            }
+            if (entry.status === 'sent') {
+                this.logMessage(`Correo enviado a ${entry.destinatario} (${entry.filename}).`);
+                return;
+            }
+            if (entry.status === 'failed') {
+                this.logMessage(`No se pudo enviar el correo a ${entry.destinatario}: ${entry.lastError}`, 'error');
+                alert(`No se pudo enviar el correo a ${entry.destinatario}: ${entry.lastError}`);
+                return;
+            }
+            if (entry.lastError && entry.attempts !== lastAttempts) {
+                this.logMessage(`Envío a ${entry.destinatario} pendiente (intento ${entry.attempts}): ${entry.lastError}. Se reintentará a las ${entry.nextAttempt}.`, 'warning');
+            }
+            lastAttempts = entry.attempts;
+        }
+        this.logMessage(`El correo ${outboxId} sigue en cola; se enviará en segundo plano.`, 'warning');
+    }
+
     logMessage(message, type = 'info') {
         const logArea = document.getElementById('remision-log-text');
         if (logArea) {